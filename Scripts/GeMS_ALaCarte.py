@@ -397,3 +397,4 @@ if __name__ == "__main__":
     # gdb_items = sys.argv[2]
     value_table = arcpy.GetParameter(1)
     process(db, value_table)
+    guf.finish_trace()
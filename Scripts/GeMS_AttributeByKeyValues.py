@@ -9,6 +9,10 @@
 #   Manually edited the rest to make string building for messages
 #   and whereClauses more pythonic
 #   Added better handling of boolean to determine overwriting or not of existing values
+#
+# 17 October 2026: the key-value file is read once into a rule table per feature class,
+#   see key_values.py, and the rules are applied in one UpdateCursor pass per feature
+#   class instead of a table view and a CalculateField per dependent field per line
 
 usage = """
 Usage: GeMS_AttributeByKeyValues.py <geodatabase> <file.txt> <force calculation>
@@ -23,13 +27,12 @@ Usage: GeMS_AttributeByKeyValues.py <geodatabase> <file.txt> <force calculation>
      """
 import arcpy, sys
 from GeMS_utilityFunctions import *
+import key_values
 
-versionString = "GeMS_AttributeByKeyValues.py, version of 8/21/23"
+versionString = "GeMS_AttributeByKeyValues.py, version of 10/17/26"
 rawurl = "https://raw.githubusercontent.com/DOI-USGS/gems-tools-pro/master/Scripts/GeMS_AttributeByKeyValues.py"
 checkVersion(versionString, rawurl, "gems-tools-pro")
 
-separator = "|"
-
 
 def makeFieldTypeDict(fds, fc):
     fdict = {}
@@ -62,154 +65,42 @@ arcpy.env.workspace = "GeologicMap"
 featureClasses = arcpy.ListFeatureClasses()
 arcpy.env.workspace = gdb
 
-# remove empty lines from keylines1
-keylines = []
-for lin in keylines1:
-    lin = lin.strip()
-    if len(lin) > 1 and lin[0:1] != "#":
-        keylines.append(lin)
+# every rule of the file, by feature class
+try:
+    ruleTables = key_values.parse(keylines1)
+except key_values.KeyValueError as e:
+    addMsgAndPrint(str(e))
+    sys.exit()
+
+for table in ruleTables:
+    fClass = table.fc
+    if not fClass in featureClasses:
+        addMsgAndPrint("  {} not in {}/GeologicMap".format(fClass, gdb))
+        continue
+    addMsgAndPrint("  {}".format(fClass))
 
-countPerLines = []
-for line in keylines:
-    countPerLines.append(len(line.split(separator)))
+    try:
+        missing = table.compile(makeFieldTypeDict("GeologicMap", fClass))
+    except key_values.KeyValueError as e:
+        addMsgAndPrint(str(e))
+        sys.exit()
+    if missing:
+        addMsgAndPrint("    fields {} not in {}".format(", ".join(missing), fClass))
+        continue
 
-n = 0
-while n < len(keylines):
-    terms = keylines[n].split(separator)  # remove newline and split on commas
-    if len(terms) == 1:
-        fClass = terms[0]
-        if fClass in featureClasses:
-            mFieldTypeDict = makeFieldTypeDict("GeologicMap", fClass)
-            n = n + 1
-            mFields = keylines[n].split(separator)
-            for i in range(len(mFields)):
-                mFields[i] = mFields[
-                    i
-                ].strip()  # remove leading and trailing whitespace
-                numMFields = len(mFields)
-            addMsgAndPrint("  {}".format(fClass))
-        else:
-            if len(fClass) > 0:  # catch trailing empty lines
-                addMsgAndPrint("  {} not in {}/GeologicMap".format(fClass, gdb))
-                while (
-                    countPerLines[n + 1] > 1
-                ):  # This advances the loop till the number of items in the terms list is again one
-                    # , which is when the next feature class is considered
-                    # arcpy.AddMessage("loop count = " + str(n))
-                    if n < len(countPerLines) - 2:
-                        # arcpy.AddMessage("count per line = " + str(countPerLines[n]))
-                        n = n + 1
-                    elif n == len(countPerLines) - 2:
-                        n = len(countPerLines)
-                        break
-                    else:
-                        arcpy.warnings("Unexpected condition met")
+    # all of the rules in one pass through the feature class
+    fields = [table.independent] + table.dependent
+    nRows = 0
+    nChanged = 0
+    with arcpy.da.Editor(gdb):
+        with arcpy.da.UpdateCursor("GeologicMap/{}".format(fClass), fields) as cursor:
+            for row in cursor:
+                nRows += 1
+                if table.apply(row, forceCalc):
+                    cursor.updateRow(row)
+                    nChanged += 1
 
-    else:  # must be a key-value: dependent values line
-        vals = keylines[n].split(separator)
-        if len(vals) != numMFields:
-            addMsgAndPrint(
-                "\nline:\n  {}\nhas wrong number of values. Exiting.".format(
-                    keylines[n]
-                )
-            )
-            sys.exit()
-        for i in range(len(vals)):  # strip out quotes
-            vals[i] = vals[i].replace("'", "")
-            vals[i] = vals[i].replace('"', "")
-            # remove leading and trailing whitespace
-            vals[i] = vals[i].strip()
-        # iterate through mFields 0--len(mFields)
-        #  if i == 0, make table view, else resel rows with NULL values for attrib[i] and calc values
-        arcpy.env.overwriteOutput = True  # so we can reuse table tempT
-        for i in range(len(mFields)):
-            if i == 0:  # select rows with specified independent value
-                whereClause = "{} = '{}'".format(
-                    arcpy.AddFieldDelimiters(fClass, mFields[i]), vals[0]
-                )
-                arcpy.MakeTableView_management(
-                    "GeologicMap/{}".format(fClass), "tempT", whereClause
-                )
-                nSel = int(
-                    str(arcpy.GetCount_management("tempT"))
-                )  # convert from Result object to integer
-                if nSel == -1:
-                    addMsgAndPrint(
-                        "    appears to be no value named: {} in: {}".format(
-                            vals[0], mFields[0]
-                        )
-                    )
-                else:
-                    addMsgAndPrint(
-                        "    selected {} = {}, n = {}".format(
-                            mFields[0], vals[0], str(nSel)
-                        )
-                    )
-            else:  # reselect rows where dependent values are NULL and assign new value
-                if forceCalc:
-                    if nSel > 0:
-                        if mFieldTypeDict[mFields[i]] == "String":
-                            arcpy.CalculateField_management(
-                                "tempT", mFields[i], '"{}"'.format(str(vals[i]))
-                            )
-                        elif mFieldTypeDict[mFields[i]] in [
-                            "Double",
-                            "Single",
-                            "Integer",
-                            "SmallInteger",
-                        ]:
-                            arcpy.CalculateField_management(
-                                "tempT", mFields[i], vals[i]
-                            )
-                        addMsgAndPrint(
-                            "        calculated {} = {}".format(
-                                mFields[i], str(vals[i])
-                            )
-                        )
-                elif nSel > 0:
-                    addMsgAndPrint("Calculating only NULL fields")
-                    whereClause = "{} IS NULL".format(
-                        arcpy.AddFieldDelimiters(fClass, mFields[i])
-                    )
-                    if mFieldTypeDict[mFields[i]] == "String":
-                        whereClause = "{0} OR {1} = '' OR {1} = ' '".format(
-                            whereClause, mFields[i]
-                        )
-                    elif mFieldTypeDict[mFields[i]] in [
-                        "Double",
-                        "Single",
-                        "Integer",
-                        "SmallInteger",
-                    ]:
-                        whereClause = "{} OR {} = 0".format(whereClause, mFields[i])
-                    arcpy.SelectLayerByAttribute_management(
-                        "tempT", "NEW_SELECTION", whereClause
-                    )
-                    nResel = int(
-                        str(arcpy.GetCount_management("tempT"))
-                    )  # convert result object to int
-                    addMsgAndPrint(
-                        "      reselected {} = NULL, blank, or 0, n = {}".format(
-                            mFields[i], (nResel)
-                        )
-                    )
-                    if nResel > 0:
-                        if mFieldTypeDict[mFields[i]] == "String":
-                            arcpy.CalculateField_management(
-                                "tempT", mFields[i], '"{}"'.format(str(vals[i]))
-                            )
-                        elif mFieldTypeDict[mFields[i]] in [
-                            "Double",
-                            "Single",
-                            "Integer",
-                            "SmallInteger",
-                        ]:
-                            arcpy.CalculateField_management(
-                                "tempT", mFields[i], vals[i]
-                            )
-                        addMsgAndPrint(
-                            "        calculated {} = {}".format(
-                                mFields[i], str(vals[i])
-                            )
-                        )
-    n = n + 1
+    for line in table.report():
+        addMsgAndPrint(line)
+    addMsgAndPrint("    {} of {} rows changed".format(nChanged, nRows))
+finish_trace()
@@ -68,3 +68,4 @@ if backup == "true":
             "Cannot get a valid name for a backup copy. Forcing an exit."
         )
         guf.forceExit()
+guf.finish_trace()
@@ -6,6 +6,14 @@ feature datasets and standalone tables not in a feature datasets retain
 the original name but feature classes inside feature datasets have the
 name of the feature dataset pre-prended to the name of the feature class
 
+Tables are read from the gdb with GDAL/OGR, several at a time, each into
+its own staging geopackage, with rows written in large transactions and no
+spatial index. The staging geopackages are then merged into the output
+geopackage, spatial indexes are built once all rows are loaded, and coded
+value and range domains and relationship classes are carried over. The
+number of rows and the rows per second of each table are reported. If GDAL
+cannot be imported, each table is exported with ExportFeatures/ExportTable.
+
 Usage: 
     Provide the path to a .gdb, an optional output folder. If no output 
     directory is specified, the gpkg will be created in the parent folder
@@ -20,29 +28,190 @@ Args:
 """
 
 import arcpy
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from GeMS_utilityFunctions import addMsgAndPrint as ap
 import GeMS_utilityFunctions as guf
 
-versionString = "GeMS_Convert2GPKG.py, version of 8/21/23"
+try:
+    from osgeo import gdal, ogr
+
+    gdal.UseExceptions()
+    use_gdal = True
+except ImportError:
+    use_gdal = False
+
+versionString = "GeMS_Convert2GPKG.py, version of 10/17/26"
 rawurl = "https://raw.githubusercontent.com/DOI-USGS/gems-tools-pro/master/Scripts/GeMS_Convert2GPKG.py"
 guf.checkVersion(versionString, rawurl, "gems-tools-pro")
 
+# rows per transaction and number of tables read at the same time
+batch_size = 100000
+workers = 4
 
-def convert(input_gdb, output_dir):
-    # Set up input and output paths
-    input_gdb = Path(input_gdb)
-    if output_dir in (None, "", "#"):
-        output_dir = input_gdb.parent
 
-    output_gpkg = Path(output_dir) / f"{input_gdb.stem}.gpkg"
+def list_objects(input_gdb):
+    """[(name in gdb, name in gpkg, is feature class)] of the feature classes
+    in feature datasets, the feature classes outside them and the tables"""
+    objects = []
+    arcpy.env.workspace = str(input_gdb)
+    for dataset in arcpy.ListDatasets():
+        for fc in arcpy.ListFeatureClasses("", "", dataset):
+            objects.append((fc, f"{dataset}_{fc}", True))
 
-    if output_gpkg.exists():
-        arcpy.Delete_management(str(output_gpkg))
+    arcpy.env.workspace = str(input_gdb)
+    for fc in arcpy.ListFeatureClasses():
+        objects.append((fc, fc, True))
+    for table in arcpy.ListTables():
+        objects.append((table, table, False))
 
-    ap(f"Creating {input_gdb.stem}.gpkg")
-    arcpy.CreateSQLiteDatabase_management(str(output_gpkg), "GEOPACKAGE_1.3")
+    return objects
+
+
+def stage(input_gdb, stage_gpkg, name, new_name, is_fc):
+    """copy one table into its own geopackage. Returns the number of rows and
+    the seconds it took"""
+    start = time.time()
+    options = [
+        "-gt",
+        str(batch_size),
+        "-preserve_fid",
+        "-nln",
+        new_name,
+        "-lco",
+        "FID=OBJECTID",
+    ]
+    if is_fc:
+        options.extend(["-lco", "SPATIAL_INDEX=NO", "-lco", "GEOMETRY_NAME=Shape"])
+    gdal.VectorTranslate(
+        str(stage_gpkg),
+        str(input_gdb),
+        options=gdal.VectorTranslateOptions(
+            options=options, layers=[name], format="GPKG"
+        ),
+    )
+    ds = ogr.Open(str(stage_gpkg))
+    rows = ds.GetLayerByName(new_name).GetFeatureCount()
+    ds = None
+    return rows, time.time() - start
+
+
+def merge(stage_gpkg, output_gpkg):
+    """append the layer of a staging geopackage to the output geopackage"""
+    options = ["-gt", str(batch_size), "-preserve_fid", "-lco", "SPATIAL_INDEX=NO"]
+    gdal.VectorTranslate(
+        str(output_gpkg),
+        str(stage_gpkg),
+        options=gdal.VectorTranslateOptions(options=options, accessMode="update"),
+    )
+
+
+def add_spatial_indexes(output_gpkg, objects):
+    ds = ogr.Open(str(output_gpkg), 1)
+    for name, new_name, is_fc in objects:
+        layer = ds.GetLayerByName(new_name)
+        if is_fc and layer is not None and layer.GetGeometryColumn():
+            geom = layer.GetGeometryColumn()
+            ds.ExecuteSQL(f"SELECT gpkgAddSpatialIndex('{new_name}', '{geom}')")
+    ds = None
+
+
+def copy_domains(input_gdb, output_gpkg):
+    """add the domains of the gdb that are not in the geopackage yet, merging
+    tables only brings over the ones that are assigned to fields"""
+    src = ogr.Open(str(input_gdb))
+    dst = ogr.Open(str(output_gpkg), 1)
+    if not hasattr(src, "GetFieldDomainNames"):
+        ap("  This version of GDAL cannot copy domains")
+        return
+    for name in src.GetFieldDomainNames() or []:
+        if dst.GetFieldDomain(name) is None:
+            try:
+                dst.AddFieldDomain(src.GetFieldDomain(name))
+            except Exception as e:
+                ap(f"  Could not copy domain {name}: {e}")
+    src = None
+    dst = None
+
+
+def copy_relationships(input_gdb, output_gpkg, objects):
+    """add the relationship classes of the gdb between tables with their new
+    names"""
+    new_names = {name: new_name for name, new_name, is_fc in objects}
+    src = ogr.Open(str(input_gdb))
+    dst = ogr.Open(str(output_gpkg), 1)
+    if not hasattr(src, "GetRelationshipNames"):
+        ap("  This version of GDAL cannot copy relationship classes")
+        return
+    for name in src.GetRelationshipNames() or []:
+        rel = src.GetRelationship(name)
+        left = new_names.get(rel.GetLeftTableName())
+        right = new_names.get(rel.GetRightTableName())
+        if left is None or right is None:
+            continue
+        new_rel = ogr.Relationship(name, left, right, rel.GetCardinality())
+        new_rel.SetType(rel.GetType())
+        new_rel.SetLeftTableFields(rel.GetLeftTableFields())
+        new_rel.SetRightTableFields(rel.GetRightTableFields())
+        new_rel.SetForwardPathLabel(rel.GetForwardPathLabel())
+        new_rel.SetBackwardPathLabel(rel.GetBackwardPathLabel())
+        new_rel.SetRelatedTableType(rel.GetRelatedTableType())
+        if rel.GetMappingTableName():
+            mapping = new_names.get(rel.GetMappingTableName())
+            if mapping is None:
+                continue
+            new_rel.SetMappingTableName(mapping)
+            new_rel.SetLeftMappingTableFields(rel.GetLeftMappingTableFields())
+            new_rel.SetRightMappingTableFields(rel.GetRightMappingTableFields())
+        try:
+            dst.AddRelationship(new_rel)
+        except Exception as e:
+            ap(f"  Could not copy relationship class {name}: {e}")
+    src = None
+    dst = None
 
+
+def report(new_name, rows, seconds):
+    rate = rows / seconds if seconds else 0
+    ap(f"  {new_name}: {rows} rows in {seconds:.1f} s, {rate:.0f} rows/s")
+
+
+def convert_ogr(input_gdb, output_gpkg):
+    objects = list_objects(input_gdb)
+    stage_dir = Path(tempfile.mkdtemp(dir=output_gpkg.parent))
+    try:
+        # several tables at a time, each into its own file
+        ap(f"Reading {len(objects)} tables and feature classes")
+        stages = [stage_dir / f"stage_{i}.gpkg" for i in range(len(objects))]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(stage, input_gdb, stages[i], *obj)
+                for i, obj in enumerate(objects)
+            ]
+            for obj, future in zip(objects, futures):
+                report(obj[1], *future.result())
+
+        # one writer for the geopackage
+        ap(f"Writing {output_gpkg.name}")
+        start = time.time()
+        for stage_gpkg in stages:
+            merge(stage_gpkg, output_gpkg)
+        ap(f"  merged in {time.time() - start:.1f} s")
+    finally:
+        shutil.rmtree(stage_dir, ignore_errors=True)
+
+    ap("Building spatial indexes")
+    add_spatial_indexes(output_gpkg, objects)
+
+    ap("Copying domains and relationship classes")
+    copy_domains(input_gdb, output_gpkg)
+    copy_relationships(input_gdb, output_gpkg, objects)
+
+
+def convert_arcpy(input_gdb, output_gpkg):
     # Export feature classes in feature datasets
     arcpy.env.workspace = str(input_gdb)
     datasets = arcpy.ListDatasets()
@@ -66,6 +235,26 @@ def convert(input_gdb, output_dir):
         ap(f"Exporting {table}")
         arcpy.ExportTable_conversion(table, str(output_gpkg / table))
 
+
+def convert(input_gdb, output_dir):
+    # Set up input and output paths
+    input_gdb = Path(input_gdb)
+    if output_dir in (None, "", "#"):
+        output_dir = input_gdb.parent
+
+    output_gpkg = Path(output_dir) / f"{input_gdb.stem}.gpkg"
+
+    if output_gpkg.exists():
+        arcpy.Delete_management(str(output_gpkg))
+
+    ap(f"Creating {input_gdb.stem}.gpkg")
+    arcpy.CreateSQLiteDatabase_management(str(output_gpkg), "GEOPACKAGE_1.3")
+
+    if use_gdal:
+        convert_ogr(input_gdb, output_gpkg)
+    else:
+        convert_arcpy(input_gdb, output_gpkg)
+
     ap("Export complete.")
 
 
@@ -74,3 +263,4 @@ if __name__ == "__main__":
     param1 = arcpy.GetParameterAsText(1)
 
     convert(param0, param1)
+    guf.finish_trace()
@@ -627,3 +627,4 @@ if len(sys.argv) >= 6:
 
 else:
     addMsgAndPrint(usage)
+finish_trace()
@@ -439,3 +439,4 @@ def main(params):
 
 if __name__ == "__main__":
     main(sys.argv[1:])
+    guf.finish_trace()
@@ -59,10 +59,14 @@ drop field mergeNumber and add any unconserved fields (Notes, Label, Symbol, ...
 # No debugging necessary after running through 2to3.
 # The script ran with no errors.
 
+# 10/17/26: nodes are found with an in-memory node graph (node_graph.py) made in
+#   one read of ContactsAndFaults, no more temporary endpoint feature classes
+
 import arcpy, os.path, sys
 from GeMS_utilityFunctions import *
+import node_graph
 
-versionString = "GeMS_Deplanarize.py, version of 8/21/23"
+versionString = "GeMS_Deplanarize.py, version of 10/17/26"
 rawurl = "https://raw.githubusercontent.com/DOI-USGS/gems-tools-pro/master/Scripts/GeMS_Deplanarize.py"
 checkVersion(versionString, rawurl, "gems-tools-pro")
 
@@ -106,174 +110,46 @@ def smallerOf(a, b):
         return b
 
 
-def pointPairGeographicAzimuth(pt1, pt2):
-    dx = pt2[0] - pt1[0]
-    dy = pt2[1] - pt1[1]
-    azi = math.atan2(dy, dx)
-    azi = 90 - math.degrees(azi)
-    if azi < 0:
-        azi = azi + 360
-    return azi
-
-
-def startGeogDirection(lineSeg):
-    firstPoint = [lineSeg[0].X, lineSeg[0].Y]
-    secondPoint = [lineSeg[1].X, lineSeg[1].Y]
-    return pointPairGeographicAzimuth(firstPoint, secondPoint)
-
-
-def endGeogDirection(lineSeg):
-    lpt = len(lineSeg) - 1
-    ntlPoint = [lineSeg[lpt - 1].X, lineSeg[lpt - 1].Y]
-    lastPoint = [lineSeg[lpt].X, lineSeg[lpt].Y]
-    return pointPairGeographicAzimuth(lastPoint, ntlPoint)
-
-
-def nodeName(x, y):
-    xstr = str(int(round(x * 100)))
-    ystr = str(int(round(y * 100)))
-    return xstr + "_" + ystr
-
-
-def makeNodeName2ArcsDict(caf, fields):
-    # takes arc fc, list of fields (e.g. [Left_MapUnit, Right_MapUnit] )
-    #   makes to and from node fcs, concatenates, sorts, finds arc-ends
-    #   that share common XY values
+def makeNodeName2ArcsDict(graph, caf, fields):
+    # takes node graph of ContactsAndFaults, arc fc, list of fields (e.g. [FID_xxx, Left_MapUnit, Right_MapUnit] )
+    #   finds the graph node at each end of each arc in caf
     # returns dictionary of arcs at each node, keyed to nodename
     #    i.e., dict[nodename] = [[arc1 fields], [arc2 fields],...]
-    fv1 = os.path.dirname(caf) + "/xxxNfv1"
-    fv2 = os.path.dirname(caf) + "/xxxNfv12"
-
-    lenFields = len(fields)
-    addMsgAndPrint("  making endpoint feature classes")
-    testAndDelete(fv1)
-    arcpy.FeatureVerticesToPoints_management(caf, fv1, "BOTH_ENDS")
-    addMsgAndPrint("  adding XY values and sorting by XY")
-    arcpy.AddXY_management(fv1)
-    testAndDelete(fv2)
-    arcpy.Sort_management(
-        fv1, fv2, [["POINT_X", "ASCENDING"], ["POINT_Y", "ASCENDING"]]
-    )
-    ##fix fields statement and following field references
-    fields.append("SHAPE@XY")
-    indexShape = len(fields) - 1
-
-    isFirst = True
-    nArcs = 0
-    nodeList = []
-    with arcpy.da.SearchCursor(fv2, fields) as cursor:
-        for row in cursor:
-            x = row[indexShape][0]
-            y = row[indexShape][1]
-            arcFields = row[0:lenFields]
-            if isFirst:
-                isFirst = False
-                lastX = x
-                lastY = y
-                arcs = [arcFields]
-            elif abs(x - lastX) < searchRadius and abs(y - lastY) < searchRadius:
-                arcs.append(arcFields)
-            else:
-                nodeList.append([nodeName(lastX, lastY), arcs])
-                lastX = x
-                lastY = y
-                arcs = [arcFields]
-        nodeList.append([nodeName(lastX, lastY), arcs])
-
-    addMsgAndPrint("  " + str(len(nodeList)) + " distinct nodes")
-    addMsgAndPrint("  cleaning up")
-    for fc in fv1, fv2:
-        testAndDelete(fc)
-
+    addMsgAndPrint("  finding endpoints in node graph")
     nodeDict = {}
-    for n in nodeList:
-        nodeDict[n[0]] = n[1]
+    with arcpy.da.SearchCursor(caf, ["SHAPE@"] + fields) as cursor:
+        for row in cursor:
+            if row[0] is None:
+                continue
+            arcFields = row[1:]
+            for pt in (row[0].firstPoint, row[0].lastPoint):
+                n = graph.findNode(pt.X, pt.Y)
+                if n is None:
+                    name = node_graph.nodeName(pt.X, pt.Y)
+                else:
+                    name = graph.nodeName(n)
+                nodeDict.setdefault(name, []).append(arcFields)
+
+    addMsgAndPrint("  " + str(len(nodeDict)) + " distinct nodes")
     return nodeDict
 
 
-def makeNodeList(caf, fields1, arcDirs=False):
-    # takes arc fc, list of fields (e.g. [FID, Type, LocConfM] )
-    #   makes to and from node fcs, concatenates, sorts, finds arc-ends
-    #   that share common XY values
+def makeNodeList(graph, arcDirs=False):
+    # takes node graph of arc fc, made with list of fields (e.g. [Type, LocConfM] )
     # returns list of arcs at each node, keyed to nodename
-    #    i.e., list of [nodename, [[arc1 fields], [arc2 fields],...] ]
-    #  and, if arcDirs == True, includes initial direction for each arc
-    tempCaf = os.path.dirname(caf) + "/xxxtempCaf"
-    fv1 = os.path.dirname(caf) + "/xxxfv1"
-    fv1a = os.path.dirname(caf) + "/xxxfv1a"
-    fv2 = os.path.dirname(caf) + "/xxxfv12"
-
-    fields = list(fields1)  # make a copy of fields1, so that we don't modify it
-    lenFields = len(fields)
-    if not arcDirs:
-        xCaf = caf
-    else:
-        addMsgAndPrint("  calculating line directions at line ends")
-        fields.append("LineDir")
-        lineDirIndex = len(fields) - 1
-        testAndDelete(tempCaf)
-        arcpy.Copy_management(caf, tempCaf)
-        xCaf = tempCaf
-        arcpy.AddField_management(tempCaf, "LineDir", "FLOAT")
-        arcpy.AddField_management(tempCaf, "EndDir", "FLOAT")
-        dirFields = ["SHAPE@", "LineDir", "EndDir"]
-        with arcpy.da.UpdateCursor(tempCaf, dirFields) as cursor:
-            for row in cursor:
-                lineSeg = row[0].getPart(0)
-                row[1] = startGeogDirection(lineSeg)
-                row[2] = endGeogDirection(lineSeg)
-                cursor.updateRow(row)
-        xcaf = tempCaf
-        lenFields = lenFields + 1
-    addMsgAndPrint("  making endpoint feature classes")
-    testAndDelete(fv1)
-    testAndDelete(fv1a)
-    arcpy.FeatureVerticesToPoints_management(xCaf, fv1, "START")
-    arcpy.FeatureVerticesToPoints_management(xCaf, fv1a, "END")
-    if arcDirs:
-        arcpy.CalculateField_management(fv1a, "LineDir", "!EndDir!", "PYTHON")
-    arcpy.Append_management(fv1a, fv1)
-    addMsgAndPrint("  adding XY values and sorting by XY")
-    arcpy.AddXY_management(fv1)
-    testAndDelete(fv2)
-    arcpy.Sort_management(
-        fv1, fv2, [["POINT_X", "ASCENDING"], ["POINT_Y", "ASCENDING"]]
-    )
-
-    ##fix fields statement and following field references
-    fields.append("SHAPE@XY")
-    indexShape = len(fields) - 1
-    FID = "ORIG_FID"
-    fields.append(FID)
-    indexFID = len(fields) - 1
-
-    isFirst = True
-    nArcs = 0
+    #    i.e., list of [nodename, [[arcFID, (arc1 fields)], [arcFID, (arc2 fields)],...] ]
+    #  and, if arcDirs == True, includes direction of each arc leaving the node as last field
     nodeList = []
-    with arcpy.da.SearchCursor(fv2, fields) as cursor:
-        for row in cursor:
-            x = row[indexShape][0]
-            y = row[indexShape][1]
-            origFID = row[indexFID]
-            arcFields = row[0:lenFields]
-            if isFirst:
-                lastX = x
-                lastY = y
-                isFirst = False
-                arcs = []
-            if abs(x - lastX) < searchRadius and abs(y - lastY) < searchRadius:
-                arcs.append([origFID, arcFields])
+    for n in range(len(graph)):
+        arcs = []
+        for end in graph.nodeEnds[n]:
+            if arcDirs:
+                arcs.append([end.arcID, end.attribs + (end.direction,)])
             else:
-                nodeList.append([nodeName(lastX, lastY), arcs])
-                arcs = [[origFID, arcFields]]
-                lastX = x
-                lastY = y
-        nodeList.append([nodeName(lastX, lastY), arcs])
+                arcs.append([end.arcID, end.attribs])
+        nodeList.append([graph.nodeName(n), arcs])
 
     addMsgAndPrint("  " + str(len(nodeList)) + " distinct nodes")
-    addMsgAndPrint("  cleaning up")
-    for fc in tempCaf, fv1, fv1a, fv2:
-        testAndDelete(fc)
     return nodeList
 
 
@@ -429,15 +305,20 @@ testAndDelete(copy2Caf)
 arcpy.Identity_analysis(
     "notConcealedCaf", inMup, copy2Caf, "ALL", "", "KEEP_RELATIONSHIPS"
 )
+addMsgAndPrint("Building node graph of " + inCaf)
+nodeGraph = node_graph.NodeGraph.fromFeatureClass(inCaf, compareFields, searchRadius)
+
 # make dictionary Dict[nodeName] = [[arcFID,lMapUnit,rMapUnit],[arcFID,lMapUnit,rMapUnit],...] of arcs at each node
 addMsgAndPrint("Building nodeName2ArcsDict")
 nodeName2ArcsDict = makeNodeName2ArcsDict(
-    copy2Caf, ["FID_" + os.path.basename(copyCaf), "LEFT_MapUnit", "RIGHT_MapUnit"]
+    nodeGraph,
+    copy2Caf,
+    ["FID_" + os.path.basename(copyCaf), "LEFT_MapUnit", "RIGHT_MapUnit"],
 )
 
 addMsgAndPrint("Building allNodeList")
 
-allNodeList = makeNodeList(inCaf, compareFields)
+allNodeList = makeNodeList(nodeGraph)
 
 addMsgAndPrint("Iterating through nodes to find arcs to be unsplit")
 for node in allNodeList:
@@ -564,6 +445,7 @@ addMsgAndPrint("Cleaning up")
 addMsgAndPrint("  but not deleting tempCaf = " + tempCaf)
 for fc in copyCaf, copy2Caf:  # ,tempCaf:
     testAndDelete(fc)
+finish_trace()
 
 
 """
@@ -16,12 +16,12 @@ from lxml import etree
 import sys
 import GeMS_Definition as gDef
 import GeMS_utilityFunctions as guf
-from osgeo import ogr  # only used in def max_bounding
 import spatial_utils as su
+import metadata_stream as ms
 import copy
 import requests
 
-versionString = "GeMS_FGDCMetadata.py, version of 2/27/24"
+versionString = "GeMS_FGDCMetadata.py, version of 10/17/26"
 rawurl = "https://raw.githubusercontent.com/DOI-USGS/gems-tools-pro/master/Scripts/GeMS_FGDCMetadata.py"
 guf.checkVersion(versionString, rawurl, "gems-tools-pro")
 
@@ -105,7 +105,7 @@ def max_bounding(db_path):
     south = []
     west = []
     east = []
-    for layer in ogr.Open(db_path):
+    for layer in su.pool.get(str(db_path)):
         # if layer.GetGeomType() != 100:
         if "MapUnitPolys" in layer.GetName() or "ContactsAndFaults" in layer.GetName():
             if layer.GetSpatialRef():
@@ -123,34 +123,6 @@ def max_bounding(db_path):
     return bounding
 
 
-def catch_m2m(dictionary, field_value):
-    """DataSourceIDs could be concatenated, eg., "DAS03 | DAS05"
-    To list these values properly when writing out enumerated domains,
-    look here for a delimiter, split the foreign keys, look them up, and
-    return a concatenated string of sources
-    or just return the dictionary entry if field_value is not concatenated
-    """
-    if not field_value is None:
-        if "|" in field_value:
-            defs = []
-            src_ids = field_value.split("|")
-            for src_id in src_ids:
-                src_id = src_id.strip()
-                if src_id in dictionary:
-                    defs.append(dictionary[src_id][0])
-                else:
-                    defs.append(f"PROVIDE A DEFINITION FOR {src_id}")
-            def_str = " | ".join(defs)
-            return def_str
-        else:
-            if field_value in dictionary:
-                return dictionary[field_value]
-            else:
-                return f"PROVIDE A DEFINITION FOR {field_value}"
-    else:
-        return
-
-
 def which_dict(tbl, fld):
     if fld == "MapUnit":
         return units_dict
@@ -165,7 +137,7 @@ def which_dict(tbl, fld):
 
 
 def term_dict(obj_dict, table, fields):
-    """sources_dict needs to be built first"""
+    """sources_terms needs to be built first"""
     # always supply field to be the dictionary key as fields[0]
     # and the 'ID' field as fields[-1]
     if table in obj_dict:
@@ -186,10 +158,10 @@ def term_dict(obj_dict, table, fields):
                 else:
                     if not row[1] is None:
                         data_dict[row[0]] = [row[1]]
-                data_dict[row[0]].append(catch_m2m(sources_dict, row[-1]))
+                data_dict[row[0]].append(sources_terms.m2m(row[-1]))
             else:
                 data_dict[row[0]] = list(row[1:-1])
-                data_dict[row[0]].append(catch_m2m(sources_dict, row[-1]))
+                data_dict[row[0]].append(sources_terms.m2m(row[-1]))
         return data_dict
     else:
         return None
@@ -222,7 +194,7 @@ def remove_node(node, xpath):
     parent.remove(child)
 
 
-def add_entity(fc_name, elem_dict):
+def entity_node(fc_name, elem_dict):
     ##metadata
     ##  entity
     ##    detailed
@@ -231,7 +203,7 @@ def add_entity(fc_name, elem_dict):
     ##        enttypd
     ##        enttypds
     ##
-    ## return the detailed node
+    ## return the enttyp node, write_entity writes the detailed node
     # print(fc_name)
     # add a note about which feature dataset the entity is in
     # when a dataset contents dictionary is built using ogr_db_contents, no feature datasets are
@@ -244,9 +216,6 @@ def add_entity(fc_name, elem_dict):
     else:
         append = ""
 
-    # add a detailed node for each database object
-    detailed = etree.Element("detailed")
-
     # create enttyp node, but append to it before appending to the detailed node
     enttyp = etree.Element("enttyp")
 
@@ -294,16 +263,11 @@ def add_entity(fc_name, elem_dict):
     for n in [enttypl, enttypd, enttypds]:
         enttyp.append(n)
 
-    # append the entity node to the detailed node
-    detailed.append(enttyp)
-
-    # append the detailed node to the dataqual node
-    base_md.find("eainfo").append(detailed)
+    return enttyp
 
-    return detailed
 
-
-def add_attributes(fc_name, detailed_node):
+def attribute_nodes(fc_name):
+    """yields the attr node of each field of fc_name"""
     arcpy.AddMessage(f"Adding attribute and value definitions for {fc_name}")
     ##metadata
     ##  eainfo
@@ -322,13 +286,6 @@ def add_attributes(fc_name, detailed_node):
     # check for attrdefs = annotation class and set all attrdefs to ESRI
     # and unrepresentable domain
 
-    try:
-        gDef.enumeratedValueDomainFieldList.extend(
-            myDef.myEnumeratedValueDomainFieldList
-        )
-    except:
-        pass
-
     # check for whether this is an annotation feature class
     describe = obj_dict[fc_name]
 
@@ -445,7 +402,7 @@ def add_attributes(fc_name, detailed_node):
             attr.append(attrdomv)
 
         # look for fields that have enumerated domains
-        elif key in gDef.enumeratedValueDomainFieldList:
+        elif key in enum_fields:
             arcpy.AddMessage(key)
             # collect a unique set of all the values of this attribute
             with arcpy.da.SearchCursor(
@@ -462,7 +419,7 @@ def add_attributes(fc_name, detailed_node):
                 # if enumerated values, have to build an attrdomv node for each value
                 attrdomv = etree.Element("attrdomv")
                 if field.endswith("SourceID"):
-                    val_text = catch_m2m(sources_dict, val)
+                    val_text = sources_terms.m2m(val)
                     val_source = "This report"
 
                 # otherwise, find the appropriate dictionary and put the definition
@@ -511,16 +468,33 @@ def add_attributes(fc_name, detailed_node):
             attrdomv.append(udom)
             attr.append(attrdomv)
 
-        detailed_node.append(attr)
+        yield attr
+
+
+def write_entity(xf, fc_name, elem_dict):
+    """write the detailed node of a database object to an xmlfile, one attr
+    node at a time"""
+    with xf.element("detailed"):
+        xf.write("\n")
+        xf.write(entity_node(fc_name, elem_dict), pretty_print=True)
+        if "fields" in elem_dict:
+            for attr in attribute_nodes(fc_name):
+                xf.write(attr, pretty_print=True)
+    xf.write("\n")
+
+
+def write_entities(xf):
+    arcpy.AddMessage("Adding metadata for the following feature classes:")
+    for k, v in obj_dict.items():
+        write_entity(xf, k, v)
 
 
 def validate_online(md_record):
     """validate the xml metadata against the USGS metadata validation service API"""
     # first write out the xml dom that is in memory to a file on disk
+    # eainfo/detailed nodes are written as they are made
     temp_path = db_dir / "temp.xml"
-    et = etree.ElementTree(md_record)
-    with open(temp_path, "wb") as f:
-        et.write(f, encoding="utf-8", xml_declaration=True, pretty_print=True)
+    ms.write_metadata(temp_path, md_record, write_entities)
 
     # send the temp file to the API
     url = r"https://www1.usgs.gov/mp/service.php"
@@ -626,6 +600,9 @@ if sys.argv[2].lower() in ["true", "yes"]:
 else:
     arc_md = False
 
+# fields with enumerated domains, GeMS and custom
+enum_fields = set(gDef.enumeratedValueDomainFieldList)
+
 # my_definitions.py
 my_defs_path = Path(sys.argv[3])
 if my_defs_path.is_file():
@@ -653,6 +630,11 @@ if my_defs_path.is_file():
         arcpy.AddMessage(gDef.rangeDomainDict)
     except:
         pass
+
+    try:
+        enum_fields.update(myDef.myEnumeratedValueDomainFieldList)
+    except:
+        pass
 else:
     myEntityDict = {}
 
@@ -699,7 +681,9 @@ else:
 
 # dictionaries of some tables
 # term_dict returns [term]:[definition, sourceid]
+# each read once, concatenated source ids are looked up once per value
 sources_dict = term_dict(obj_dict, "DataSources", ["DataSources_ID", "Source"])
+sources_terms = ms.Terms(sources_dict)
 units_dict = term_dict(
     obj_dict,
     "DescriptionOfMapUnits",
@@ -801,48 +785,53 @@ for child in child_nodes:
 # use spatial_utils from Metadata Wizard tools to add spatial stuff
 # An option here is to include `spdom` and `spref` in the routine above, to check that all 1st level children exist, and then ask if they should be updated in a user-supplied template xml. They might already exist in that case and the user may know they want to use their own, rather than have them calculated here.
 
-# find the bounding box that covers the extent of all features
+# the datasets opened by spatial_utils are closed when the spatial elements are
+# done, so that the gdb is not held open in ArcGIS Pro after the tool has finished
 try:
-    if base_md.find("idinfo/spdom/bounding") is None:
-        arcpy.AddMessage("  spdom")
-        spdom = etree.Element("spdom")
-        bounding = max_bounding(str(db_path))
-        spdom.append(bounding)
-        base_md.find("idinfo").append(spdom)
-except Exception as error:
-    e = """Could not calculate a bounding box.
-    Set environment variable PROJ_LIB to location of proj.db and try again.
-    See the ArcGIS Pro wiki for more information - https://github.com/usgs/gems-tools-pro/wiki/GeMS-Tools-Documentation#BuildMetadata"""
-    arcpy.AddError(e)
-    arcpy.AddError(error)
-    sys.exit()
-
-# collect the feature classes and inspect the sdtsterm
-if base_md.find("spdoinfo") is None:
-    fcs = [k for k in obj_dict if "FeatureClass" in obj_dict[k]["concat_type"]]
-    arcpy.AddMessage("  spdoinfo")
-    spdoinfo = su.get_spdoinfo(str(db_path), fcs[0])
-    ptvctinf = spdoinfo.find("ptvctinf")
-    for fc in fcs[1:]:
-        arcpy.AddMessage(f"\rspdoinfo/sdtsterm for {fc}")
-        lyr_spdo = su.get_spdoinfo(str(db_path), fc)
-        sdtsterm = lyr_spdo.find("ptvctinf/sdtsterm")
-        ptvctinf.append(sdtsterm)
-    spdoinfo.append(ptvctinf)
-    base_md.insert(2, spdoinfo)
-
-if base_md.find("spref") is None:
-    arcpy.AddMessage("spref")
+    # find the bounding box that covers the extent of all features
     try:
-        spref_node = su.get_spref(str(db_path), "MapUnitPolys")
-    except Exception as e:
-        arcpy.AddError(
-            """Could not determine the coordinate system of MapUnitPolys.
-        Check in ArcCatalog that it is valid"""
-        )
+        if base_md.find("idinfo/spdom/bounding") is None:
+            arcpy.AddMessage("  spdom")
+            spdom = etree.Element("spdom")
+            bounding = max_bounding(str(db_path))
+            spdom.append(bounding)
+            base_md.find("idinfo").append(spdom)
+    except Exception as error:
+        e = """Could not calculate a bounding box.
+        Set environment variable PROJ_LIB to location of proj.db and try again.
+        See the ArcGIS Pro wiki for more information - https://github.com/usgs/gems-tools-pro/wiki/GeMS-Tools-Documentation#BuildMetadata"""
         arcpy.AddError(e)
+        arcpy.AddError(error)
         sys.exit()
-    base_md.insert(3, spref_node)
+
+    # collect the feature classes and inspect the sdtsterm
+    if base_md.find("spdoinfo") is None:
+        fcs = [k for k in obj_dict if "FeatureClass" in obj_dict[k]["concat_type"]]
+        arcpy.AddMessage("  spdoinfo")
+        spdoinfo = su.get_spdoinfo(str(db_path), fcs[0])
+        ptvctinf = spdoinfo.find("ptvctinf")
+        for fc in fcs[1:]:
+            arcpy.AddMessage(f"\rspdoinfo/sdtsterm for {fc}")
+            lyr_spdo = su.get_spdoinfo(str(db_path), fc)
+            sdtsterm = lyr_spdo.find("ptvctinf/sdtsterm")
+            ptvctinf.append(sdtsterm)
+        spdoinfo.append(ptvctinf)
+        base_md.insert(2, spdoinfo)
+
+    if base_md.find("spref") is None:
+        arcpy.AddMessage("spref")
+        try:
+            spref_node = su.get_spref(str(db_path), "MapUnitPolys")
+        except Exception as e:
+            arcpy.AddError(
+                """Could not determine the coordinate system of MapUnitPolys.
+            Check in ArcCatalog that it is valid"""
+            )
+            arcpy.AddError(e)
+            sys.exit()
+        base_md.insert(3, spref_node)
+finally:
+    su.pool.close(str(db_path))
 
 # add the rest of the gems_nodes
 g_nodes = deez_nodes["gems_nodes"]
@@ -905,12 +894,7 @@ if sources_param in [1, 4, 5, 7]:
     else:
         arcpy.AddError("There are no data sources to add!")
 
-# add Entity Attributes
-arcpy.AddMessage("Adding metadata for the following feature classes:")
-for k, v in obj_dict.items():
-    detailed = add_entity(k, v)
-    if "fields" in obj_dict[k]:
-        add_attributes(k, detailed)
+# Entity Attributes are added by write_entities when the metadata are written
 
 # merge with template
 # If no template specified, just write out the metadata as generated here which could include embedded metadata.
@@ -927,7 +911,7 @@ for k, v in obj_dict.items():
 
 if Path(template_path).is_file():
     arcpy.AddMessage(f"Migrating database metadata to {template_path}")
-    template_root = etree.parse(template_path).getroot()
+    template_root = ms.parse_template(template_path)
 
     # adding text for GeMS nodes
     # if the xpaths already exist in the template metadata,
@@ -1020,3 +1004,4 @@ if Path(template_path).is_file():
 
 arcpy.AddMessage("Validating")
 validate_online(base_md)
+guf.finish_trace()
@@ -3,42 +3,66 @@
 ##      Converts "<null>", "" and similar to <null> (system nulls).
 #       Ralph Haugerud, 28 July 2020
 #       Updated to Python 3, 8/20/21 and added to toolbox, Evan Thoms
+#       17 October 2026: tables are read, several at a time, in one pass each, and only
+#         the rows and fields with values that need fixing are updated, see string_fixes.py.
+#         With a second argument of true, lists the values that would be fixed and changes
+#         nothing
 
 import arcpy, os, os.path, sys
+from concurrent.futures import ThreadPoolExecutor
 from GeMS_utilityFunctions import *
+import string_fixes
+import table_scan as ts
 
-versionString = "GeMS_FixStrings.py, version of 10/5/23"
+versionString = "GeMS_FixStrings.py, version of 10/17/26"
 rawurl = "https://raw.githubusercontent.com/DOI-USGS/gems-tools-pro/master/Scripts/GeMS_FixStrings.py"
 checkVersion(versionString, rawurl, "gems-tools-pro")
 
+# tables read at the same time and rows updated per cursor
+workers = 4
+batchSize = 1000
 
-def fixTableStrings(fc, ws):
-    fields1 = arcpy.ListFields(fc, "", "String")
-    fields = ["OBJECTID"]
-    for f in fields1:
-        fields.append(f.name)
+
+def stringTables(db_dict):
+    # tables and feature classes with text fields
+    tables = []
+    for name, props in db_dict.items():
+        if not any(props["concat_type"].endswith(n) for n in ("Table", "Feature Class")):
+            continue
+        if [f for f in props["fields"] if f.type == "String"]:
+            tables.append(name)
+    return tables
+
+
+def findTableStrings(scan, table):
+    # {oid: {field: fixed value}} of the values of table that need fixing
+    textFields = [f.name for f in scan.db_dict[table]["fields"] if f.type == "String"]
+    cols = scan.columns(table)
+    oids = cols[scan.oid_field(table)]
+    changes = string_fixes.changes(oids, {f: cols[f] for f in textFields})
+    # the columns are not needed again
+    scan.invalidate(table)
+    return changes
+
+
+def fixTableStrings(fc, oidField, changes, ws):
+    # update the changed fields of the changed rows, batchSize rows at a time
+    oids = sorted(changes)
     with arcpy.da.Editor(ws) as edit:
-        with arcpy.da.UpdateCursor(fc, fields) as cursor:
-            for row in cursor:
-                trash = ""
-                updateRowFlag = False
-                row1 = [row[0]]
-                for f in row[1:]:
-                    updateFieldFlag = False
-                    f0 = f
-                    if f != None:
-                        if f != f.strip():
-                            f = f.strip()
-                            updateFieldFlag = True
-                        if f.lower() == "<null>" or f == "":
-                            f = None
-                            updateFieldFlag = True
-                        if updateFieldFlag:
-                            updateRowFlag = True
-                    row1.append(f)
-                if updateRowFlag:
+        for i in range(0, len(oids), batchSize):
+            batch = {oid: changes[oid] for oid in oids[i : i + batchSize]}
+            fields = sorted({f for fixes in batch.values() for f in fixes})
+            where = "{} IN ({})".format(oidField, ",".join(str(o) for o in batch))
+            with arcpy.da.UpdateCursor(fc, [oidField] + fields, where) as cursor:
+                for row in cursor:
+                    fixes = batch.get(row[0])
+                    if not fixes:
+                        continue
+                    for j, f in enumerate(fields, 1):
+                        if f in fixes:
+                            row[j] = fixes[f]
                     try:
-                        cursor.updateRow(row1)
+                        cursor.updateRow(row)
                     except Exception as error:
                         addMsgAndPrint(f"\u200B  Row {str(row[0])}. {error}")
 
@@ -46,25 +70,38 @@ def fixTableStrings(fc, ws):
 #########################
 
 db = sys.argv[1]
+dryRun = len(sys.argv) > 2 and eval_bool(sys.argv[2])
 
 addMsgAndPrint(versionString)
 arcpy.env.workspace = db
 
-tables = arcpy.ListTables()
-for tb in tables:
-    addMsgAndPrint(".........")
-    addMsgAndPrint(os.path.basename(tb))
-    fixTableStrings(tb, db)
+db_dict = gdb_object_dict(db)
+tables = stringTables(db_dict)
+scan = ts.TableScan(db, db_dict)
 
-datasets = arcpy.ListDatasets(feature_type="feature")
-datasets = [""] + datasets if datasets is not None else []
+addMsgAndPrint(f"Looking for text values to fix in {len(tables)} tables")
+with ThreadPoolExecutor(max_workers=workers) as pool:
+    found = dict(zip(tables, pool.map(lambda t: findTableStrings(scan, t), tables)))
 
-for ds in datasets:
-    for fc in arcpy.ListFeatureClasses(feature_dataset=ds):
-        path = os.path.join(arcpy.env.workspace, ds, fc)
-        try:
-            fixTableStrings(path, db)
-        except Exception as error:
-            addMsgAndPrint(error)
+for table in tables:
+    changes = found[table]
+    addMsgAndPrint(".........")
+    addMsgAndPrint(f"{table}: {len(changes)} rows to fix")
+    if not changes:
+        continue
+    if dryRun:
+        for oid in sorted(changes):
+            for field, value in changes[oid].items():
+                addMsgAndPrint(f"  {scan.oid_field(table)} {oid}, {field}: {value!r}")
+        continue
+    try:
+        fixTableStrings(
+            db_dict[table]["catalogPath"], scan.oid_field(table), changes, db
+        )
+    except Exception as error:
+        addMsgAndPrint(error)
 
+if dryRun:
+    addMsgAndPrint("Dry run, nothing was changed")
 addMsgAndPrint("DONE")
+finish_trace()
@@ -9,6 +9,12 @@ Arguments:
     DMU - GeMS DescriptionOfMapUnits table. Geodatabase, CSV, tab delimeted TXT, or DBF. Required.
     Extent - one or more (comma separated) state or US region abbreviations. Required.
     open report - open the Excel report file when finished. True (default) or False. Optional.
+    GEOLEX dump - JSON file of GEOLEX unit records. Names are found in it, in this run
+        only, without connecting to GEOLEX or using the cache. Optional, command line
+        only: it is not a parameter of the tool in GeMS_Tools.tbx.
+
+GEOLEX answers are cached in ~/gems_geolex_cache.sqlite (or GEMS_GEOLEX_CACHE) for 30 days.
+Set GEMS_GEOLEX_OFFLINE=1 to only use the cache.
     
 Enclose any arguments with spaces within double-quotes.
 """
@@ -24,8 +30,6 @@ Enclose any arguments with spaces within double-quotes.
 import os, sys
 import string
 import arcpy
-import requests
-from requests.adapters import HTTPAdapter, Retry
 from distutils.util import strtobool
 import re
 import pandas as pd
@@ -34,9 +38,10 @@ from openpyxl.styles.borders import Border, Side
 from openpyxl.styles import Font, PatternFill, Alignment
 import tempfile
 import GeMS_utilityFunctions as guf
+import geolex_cache
 
 
-versionString = "GeMS_GeolexCheck.py, 1/10/24"
+versionString = "GeMS_GeolexCheck.py, 10/17/26"
 rawurl = "https://raw.githubusercontent.com/DOI-USGS/gems-tools-pro/master/Scripts/GeMS_GeolexCheck.py"
 guf.checkVersion(versionString, rawurl, "gems-tools-pro")
 
@@ -121,40 +126,6 @@ def parse_age(age_list):
     return " | ".join(ages)
 
 
-# API
-def units_query(name):
-    """Prepare and send the GET request"""
-    units_api = r"https://ngmdb.usgs.gov/connect/apiv1/geolex/units/?"
-    payload = {"units_in": name}
-    try:
-        s = requests.Session()
-        retries = Retry(
-            total=5, backoff_factor=0.1, status_forcelist=[500, 502, 503, 504]
-        )
-        s.mount("https://", HTTPAdapter(max_retries=retries))
-
-        # response = requests.get(units_api, params)  # .text
-        response = s.get(units_api, params=payload)
-        if not response.status_code == 200:
-            arcpy.AddMessage("")
-            arcpy.AddMessage(
-                f"Server error {response.status_code} with the following url:"
-            )
-            arcpy.AddMessage(response.url)
-            arcpy.AddMessage(
-                "The server may be down. Try again later or write to gems@usgs.gov"
-            )
-            arcpy.AddMessage("")
-            raise SystemError
-        else:
-            return response.json()["results"]
-    # except ConnectionError as e:
-    except Exception as e:
-        arcpy.AddWarning("There was a problem connecting to GEOLEX.")
-        arcpy.AddWarning(e)
-        return "no connection"
-
-
 # EXCEL
 def table_to_pandas_data_frame(feature_class):
     """
@@ -437,11 +408,37 @@ dmu_str = dmu_str.replace(" ", "")
 dmu_exts = re.split(";|,", dmu_str)
 
 # open the report after running?
-if len(sys.argv) == 4:
+if len(sys.argv) >= 4:
     open_xl = bool(strtobool(sys.argv[3]))
 else:
     open_xl = True
 
+# local GEOLEX cache, or the units of a dump if one is given
+cache = geolex_cache.GeolexCache()
+index = None
+if len(sys.argv) >= 5 and sys.argv[4] not in ("", "#"):
+    index = geolex_cache.NameIndex(geolex_cache.load_dump(sys.argv[4]))
+offline = bool(strtobool(os.environ.get("GEMS_GEOLEX_OFFLINE", "False")))
+
+# query GEOLEX once for every different name and fullname, only those
+# that are not in the cache go over the network
+texts = []
+for row in dmu_df.itertuples():
+    for text in (row.name, row.fullname):
+        if not (pd.isna(text) or text == ""):
+            texts.append(text)
+if index is not None:
+    arcpy.AddMessage(
+        f"Looking for GEOLEX names in the {len(index)} units of {sys.argv[4]}, "
+        "not in GEOLEX"
+    )
+else:
+    arcpy.AddMessage(f"Looking for GEOLEX names in {len(set(texts))} names")
+answers = geolex_cache.fetch_units(
+    texts, cache, index, offline=offline, warn=arcpy.AddWarning
+)
+cache.close()
+
 cols = [
     "HierarchyKey",
     "MapUnit",
@@ -518,12 +515,10 @@ for row in dmu_df.itertuples():
         sn_results = None
         fn_results = None
         if not sn == None:
-            arcpy.AddMessage(f"Looking for GEOLEX names in {sn}")
-            sn_results = units_query(sn)
+            sn_results = answers[sn]
 
         if not fn == None:
-            arcpy.AddMessage(f"Looking for GEOLEX names in {fn}")
-            fn_results = units_query(fn)
+            fn_results = answers[fn]
 
         # if there are name and fullname matches, take the intersection of the sets
         if sn_results == "no connection" and fn_results == "no connection":
@@ -662,3 +657,4 @@ df.to_excel(xl_path, freeze_panes=(2, 0), index=False, engine="openpyxl")
 format_excel(xl_path)
 if open_xl == True:
     os.startfile(xl_path)
+guf.finish_trace()
@@ -15,11 +15,21 @@
 #   Ran script through 2to3 to find and fix simple syntactical differences
 #   Manually debugged remaining issues mostly to do with to with methods
 #   which are no longer available in arcpy.
+# 17 October 2026: label positions are computed for all points at once, see
+#   label_placement.py, and written with one insert cursor. With incremental true,
+#   only the labels of points that changed are inserted, updated or deleted. With a
+#   label spacing (mm) greater than 0, labels that would sit on top of another label
+#   or symbol are turned around their symbol to a clear spot. incremental (3rd argument)
+#   and label spacing (4th argument) are command line only, they are not parameters of
+#   the tool in GeMS_Tools.tbx
 
 import arcpy, os.path, sys, math, shutil
+from collections import Counter
+import numpy as np
 from GeMS_utilityFunctions import *
+import label_placement as lp
 
-versionString = "GeMS_InclinationNumbers.py, version of 8/21/23"
+versionString = "GeMS_InclinationNumbers.py, version of 10/17/26"
 rawurl = "https://raw.githubusercontent.com/DOI-USGS/gems-tools-pro/master/Scripts/GeMS_InclinationNumbers.py"
 checkVersion(versionString, rawurl, "gems-tools-pro")
 
@@ -61,8 +71,91 @@ def writeLayerNames(lyr):
         arcpy.AddMessage(lyr.connectionProperties)
 
 
+def readAttitudes(OPfc):
+    # (ids, types, x, y, azimuths, inclinations, plotAtScales) of the points
+    # that get a label
+    OPfields = [
+        "SHAPE@XY",
+        "OrientationPoints_ID",
+        "Type",
+        "Azimuth",
+        "Inclination",
+        "PlotAtScale",
+    ]
+    columns = [[] for i in range(7)]
+    with arcpy.da.SearchCursor(OPfc, OPfields) as attitudes:
+        for row in attitudes:
+            oType = row[2]
+            if row[0] is None or oType is None or row[3] is None or row[4] is None:
+                continue
+            if showInclination(oType):
+                for column, value in zip(
+                    columns,
+                    (row[1], oType, row[0][0], row[0][1], row[3], row[4], row[5]),
+                ):
+                    column.append(value)
+    return columns
+
+
+def readLabels(OPL):
+    # {OrientationPointsID: (x, y, inclination, PlotAtScale)} of the labels in
+    # OPL and the OIDs of second labels of the same point
+    labels = {}
+    extras = []
+    fields = ["OID@", "SHAPE@XY", "OrientationPointsID", "Inclination", "PlotAtScale"]
+    with arcpy.da.SearchCursor(OPL, fields) as cursor:
+        for oid, xy, opID, inc, paScale in cursor:
+            if opID in labels or opID is None:
+                extras.append(oid)
+                continue
+            x, y = xy if xy is not None else (None, None)
+            labels[opID] = (x, y, inc, paScale)
+    return labels, extras
+
+
+def updateLabels(OPL, wanted, existing, extras, tolerance):
+    # insert, update and delete only the labels that changed
+    inserts, updates, deletes = lp.diff(existing, wanted, tolerance)
+    deletes = set(deletes)
+    updates = set(updates)
+    addMsgAndPrint(
+        "    {} labels unchanged, {} new, {} changed, {} removed".format(
+            len(wanted) - len(inserts) - len(updates),
+            len(inserts),
+            len(updates),
+            len(deletes) + len(extras),
+        )
+    )
+    if updates or deletes or extras:
+        extras = set(extras)
+        OPLfields = [
+            "OID@",
+            "SHAPE@XY",
+            "OrientationPointsID",
+            "Inclination",
+            "PlotAtScale",
+        ]
+        with arcpy.da.UpdateCursor(OPL, OPLfields) as cursor:
+            for row in cursor:
+                if row[0] in extras or row[2] in deletes:
+                    cursor.deleteRow()
+                elif row[2] in updates:
+                    x, y, inc, paScale = wanted[row[2]]
+                    cursor.updateRow([row[0], (x, y), row[2], inc, paScale])
+    if inserts:
+        insertLabels(OPL, inserts, wanted)
+
+
+def insertLabels(OPL, ids, wanted):
+    OPLfields = ["SHAPE@XY", "OrientationPointsID", "Inclination", "PlotAtScale"]
+    with arcpy.da.InsertCursor(OPL, OPLfields) as inclinLabels:
+        for opID in ids:
+            x, y, inc, paScale = wanted[opID]
+            inclinLabels.insertRow(((x, y), opID, inc, paScale))
+
+
 ##main routine from DipNumbers2.py
-def dipNumbers(gdb, mapScaleDenominator):
+def dipNumbers(gdb, mapScaleDenominator, incremental=False, labelSpacing=0):
     OPfc = os.path.join(gdb, "GeologicMap", "OrientationPoints")
     if not arcpy.Exists(OPfc):
         addMsgAndPrint(
@@ -83,6 +176,23 @@ def dipNumbers(gdb, mapScaleDenominator):
         addMsgAndPrint("  0 rows in OrientationPoints.")
         return
 
+    ## LABEL POSITIONS FOR ROWS IN ORIENTATIONPOINTS WITHOUT 'HORIZONTAL' OR 'VERTICAL' IN THE TYPE VALUE
+    ids, types, x, y, azimuths, inclinations, paScales = readAttitudes(OPfc)
+    planar = [isPlanar(oType) for oType in types]
+    lx, ly = lp.label_points(
+        x, y, np.array(azimuths, dtype=float), planar, mapUnitsPerMM
+    )
+    if labelSpacing > 0:
+        lx, ly, moved = lp.displace(lx, ly, x, y, labelSpacing * mapUnitsPerMM)
+        addMsgAndPrint("    {} labels moved away from other labels".format(moved))
+    # Inclination is a text field
+    incs = [str(int(round(inc))) for inc in inclinations]
+    counts = Counter(
+        oType + (" S" if isPlan else " L") for oType, isPlan in zip(types, planar)
+    )
+    for oType in sorted(counts):
+        addMsgAndPrint("    {} {} labels".format(counts[oType], oType))
+
     ## MAKE ORIENTATIONPOINTLABELS FEATURE CLASS
     arcpy.env.workspace = os.path.join(gdb, "GeologicMap")
     OPL = os.path.join(gdb, "GeologicMap", "OrientationPointLabels")
@@ -91,51 +201,44 @@ def dipNumbers(gdb, mapScaleDenominator):
         addMsgAndPrint("Cannot get a schema lock!")
         forceExit()
 
+    if incremental:
+        if not arcpy.Exists(OPL) or not {
+            "OrientationPointsID",
+            "Inclination",
+            "PlotAtScale",
+        } <= set(fieldNameList(OPL)):
+            addMsgAndPrint("    no {} to update, making it".format(OPLName))
+            incremental = False
+        elif None in ids or len(set(ids)) < len(ids):
+            # labels are matched to points on OrientationPoints_ID
+            addMsgAndPrint(
+                "    OrientationPoints_ID values are missing or repeated, remaking {}".format(
+                    OPLName
+                )
+            )
+            incremental = False
+
+    if incremental:
+        wanted = {
+            opID: (float(ix), float(iy), inc, paScale)
+            for opID, ix, iy, inc, paScale in zip(ids, lx, ly, incs, paScales)
+        }
+        existing, extras = readLabels(OPL)
+        # labels within a hundredth of a mm on the page have not moved
+        updateLabels(OPL, wanted, existing, extras, 0.01 * mapUnitsPerMM)
+        return
+
     testAndDelete(OPL)
     arcpy.CreateFeatureclass_management(fds, "OrientationPointLabels", "POINT")
     arcpy.AddField_management(OPL, "OrientationPointsID", "TEXT", "", "", 50)
     arcpy.AddField_management(OPL, "Inclination", "TEXT", "", "", 3)
     arcpy.AddField_management(OPL, "PlotAtScale", "FLOAT")
 
-    ## ADD FEATURES FOR ROWS IN ORIENTATIONPOINTS WITHOUT 'HORIZONTAL' OR 'VERTICAL' IN THE TYPE VALUE
-    OPfields = [
-        "SHAPE@XY",
-        "OrientationPoints_ID",
-        "Type",
-        "Azimuth",
-        "Inclination",
-        "PlotAtScale",
-    ]
-    attitudes = arcpy.da.SearchCursor(OPfc, OPfields)
     OPLfields = ["SHAPE@XY", "OrientationPointsID", "Inclination", "PlotAtScale"]
-    inclinLabels = arcpy.da.InsertCursor(OPL, OPLfields)
-    for row in attitudes:
-        oType = row[2]
-        if showInclination(oType):
-            x = row[0][0]
-            y = row[0][1]
-            OP_ID = row[1]
-            azi = row[3]
-            inc = int(round(row[4]))
-            paScale = row[5]
-            if isPlanar(oType):
-                geom = " S "
-                inclinRadius = 2.4 * mapUnitsPerMM
-                azir = math.radians(azi)
-            else:  # assume linear
-                geom = " L "
-                inclinRadius = 7.4 * mapUnitsPerMM
-                azir = math.radians(azi - 90)
-            ix = x + math.cos(azir) * inclinRadius
-            iy = y - math.sin(azir) * inclinRadius
-
-            addMsgAndPrint(
-                "    inserting " + oType + geom + str(int(round(azi))) + "/" + str(inc)
-            )
-            inclinLabels.insertRow(([ix, iy], OP_ID, inc, paScale))
-
-    del inclinLabels
-    del attitudes
+    with arcpy.da.InsertCursor(OPL, OPLfields) as inclinLabels:
+        for ix, iy, opID, inc, paScale in zip(lx, ly, ids, incs, paScales):
+            inclinLabels.insertRow(((float(ix), float(iy)), opID, inc, paScale))
+    addMsgAndPrint("    {} labels inserted".format(len(ids)))
 
     # INSTALL NEWLY-MADE FEATURE CLASS USING .LYR FILE. SET DATA SOURCE. SET DEFINITION QUERY
 
@@ -172,6 +275,11 @@ addMsgAndPrint("  " + versionString)
 # get inputs
 inFds = sys.argv[1]
 mapScale = float(sys.argv[2])
+incremental = len(sys.argv) > 3 and eval_bool(sys.argv[3])
+if len(sys.argv) > 4 and sys.argv[4] not in ("", "#"):
+    labelSpacing = float(sys.argv[4])
+else:
+    labelSpacing = 0
 
 gdb = os.path.dirname(inFds)
 fds = os.path.join(gdb, "GeologicMap")
@@ -180,8 +288,9 @@ tools = os.path.dirname(scripts)
 lyrx_path = os.path.join(tools, "Resources", "OrientationPointsLabels.lyrx")
 
 if os.path.basename(inFds) == "GeologicMap":
-    dipNumbers(gdb, mapScale)
+    dipNumbers(gdb, mapScale, incremental, labelSpacing)
 else:
     addMsgAndPrint(
         "Not GeologicMap feature class, OrientationPointLabels not (re)created."
     )
+finish_trace()
@@ -2,6 +2,7 @@ import arcpy
 import sys
 from pathlib import Path
 import GeMS_utilityFunctions as guf
+import poly_builder
 
 """
 Parameters
@@ -25,9 +26,14 @@ simple_mode : Use simple mode or reporting mode. Boolean, true by default. Use
     where MapUnit = Null, and polgyons where MapUnit has changed. Reporting mode
     can take a long time but might be useful in large maps with conmplicated, 
     convoluted polygon boundaries.
+engine : arcpy or shapely, optional, arcpy by default. With shapely, the
+    polygons are built with Shapely (GEOS) instead of FeatureToPolygon and only
+    the polygons in MapUnitPolys whose shape or attributes changed are updated,
+    added, or deleted. Falls back to arcpy if Shapely is not installed.
+    Command line only, engine is not a parameter of the tool in GeMS_Tools.tbx
 """
 
-versionString = "GeMS_MakePolys3.py, version of 24 June 2022"
+versionString = "GeMS_MakePolys3.py, version of 17 October 2026"
 rawurl = "https://raw.githubusercontent.com/DOI-USGS/gems-tools-pro/master/Scripts/GeMS_MakePolys3.py"
 guf.checkVersion(versionString, rawurl, "gems-tools-pro")
 
@@ -60,6 +66,222 @@ def sql_list(var):
         return f"({n})"
 
 
+def same_unit_contacts():
+    """contacts with the same MapUnit on either side"""
+    inter_lines = r"memory\inter_lines"
+    arcpy.analysis.Identity(caf, mup, inter_lines, relationship="KEEP_RELATIONSHIPS")
+    id_field = f"FID_{str(short_caf)}"
+    same_unit = []
+    with arcpy.da.SearchCursor(
+        inter_lines, [id_field, "left_mapunit", "right_mapunit"]
+    ) as cursor:
+        for row in cursor:
+            if row[1] == row[2]:
+                same_unit.append(row[0])
+
+    return same_unit
+
+
+def report_layers(null_vals, extra_labels, dup_oids, changed, same_unit):
+    if null_vals or extra_labels or dup_oids or changed or same_unit:
+        # build report feature layers
+        arcpy.AddMessage("Preparing report layers")
+
+        # prepare group layer
+        # get the active map
+        aprx = arcpy.mp.ArcGISProject("CURRENT")
+        active_map = aprx.activeMap
+
+        for l in active_map.listLayers():
+            if l.longName == "Make Polys - Report Layers":
+                active_map.removeLayer(l)
+
+        # find genericgroup.lyrx in the \Scripts folder
+        this_py = Path(__file__)
+        scripts = this_py.parent
+        group_lyr = scripts / "genericgroup.lyrx"
+
+        # add it to the map and rename it
+        group = active_map.addDataFromPath(str(group_lyr))
+        group.name = "Make Polys - Report Layers"
+
+        # add report layers
+        # multiple label point polygons
+        # just testing for boolean(True) of lists seemed to miss them so we'll
+        # test for length > 0
+        if len(extra_labels) > 0:
+            arcpy.AddMessage("Creating extra labels layer")
+            exp = f"OBJECTID in {sql_list(extra_labels)}"
+            extras = arcpy.management.MakeFeatureLayer(
+                label_points, "Extra label points", exp
+            )[0]
+            active_map.addLayerToGroup(group, extras)
+
+        # the polygons where those extra labels are found
+        if len(dup_oids) > 0:
+            arcpy.AddMessage("Creating layer for polygons with extra labels")
+            exp = f"OBJECTID in {sql_list(dup_oids)}"
+            poly_layer = arcpy.management.MakeFeatureLayer(
+                mup, "Polygons with extra labels", exp
+            )[0]
+            active_map.addLayerToGroup(group, poly_layer)
+
+        # polygons that don't have a MapUnit value
+        if len(null_vals) > 0:
+            arcpy.AddMessage("Creating layer for polygons with no MapUnit value")
+            exp = f"OBJECTID in {sql_list(null_vals)}"
+            null_polys = arcpy.management.MakeFeatureLayer(
+                mup, "Polygons with no MapUnit", exp
+            )[0]
+            active_map.addLayerToGroup(group, null_polys)
+
+        # polygons that changed MapUnit (but not Null to a new map unit)
+        if len(changed) > 0:
+            arcpy.AddMessage("Creating layer for polygons where MapUnit changed")
+            exp = f"OBJECTID in {sql_list(changed)}"
+            changed_polys = arcpy.management.MakeFeatureLayer(
+                mup, "Polygons where MapUnit changed", exp
+            )[0]
+            active_map.addLayerToGroup(group, changed_polys)
+
+        # contacts that have the same MapUnit on either side
+        if len(same_unit) > 0:
+            arcpy.AddMessage(
+                "Creating layer for contacts that have the same MapUnit on either side"
+            )
+            exp = f"OBJECTID in {sql_list(same_unit)}"
+            sandwiched_lines = arcpy.management.MakeFeatureLayer(
+                caf, "Contacts with same MapUnit on either side", exp
+            )[0]
+            active_map.addLayerToGroup(group, sandwiched_lines)
+    else:
+        arcpy.AddMessage("No errors or changes to report")
+
+
+def shapely_polys(where):
+    """Build new polygons with poly_builder and write only the ones that
+    changed to MapUnitPolys. In reporting mode, returns the lists of
+    null_vals, extra_labels, dup_oids, and changed for report_layers"""
+    sr = arcpy.Describe(mup).spatialReference
+    fields = [
+        f.name
+        for f in mup_fields
+        if f.editable
+        and not f.type in ("OID", "Geometry")
+        and not f.name.lower().startswith("shape_")
+    ]
+    n_fields = len(fields)
+
+    arcpy.AddMessage("Reading lines and polygons")
+    wkbs = [row[0] for row in arcpy.da.SearchCursor(caf, ["SHAPE@WKB"], where)]
+    lines = poly_builder.from_wkb([w for w in wkbs if w])
+
+    old_oids = []
+    old_wkbs = []
+    old_attribs = []
+    null_shapes = set()
+    with arcpy.da.SearchCursor(mup, ["OID@", "SHAPE@WKB"] + fields) as cursor:
+        for row in cursor:
+            if row[1] is None:
+                null_shapes.add(row[0])
+                continue
+            old_oids.append(row[0])
+            old_wkbs.append(row[1])
+            old_attribs.append(tuple(row[2:]))
+    old_polys = poly_builder.from_wkb(old_wkbs)
+
+    labels = None
+    label_attribs = []
+    label_oids = []
+    if label_points:
+        # label point fields that are also in MapUnitPolys, the others are Null
+        label_names = [f.name.lower() for f in arcpy.ListFields(label_points)]
+        label_fields = [f for f in fields if f.lower() in label_names]
+        positions = [fields.index(f) for f in label_fields]
+        label_wkbs = []
+        with arcpy.da.SearchCursor(
+            label_points, ["OID@", "SHAPE@WKB"] + label_fields
+        ) as cursor:
+            for row in cursor:
+                if row[1] is None:
+                    continue
+                attribs = [None] * n_fields
+                for p, v in zip(positions, row[2:]):
+                    attribs[p] = v
+                label_oids.append(row[0])
+                label_wkbs.append(row[1])
+                label_attribs.append(tuple(attribs))
+        labels = poly_builder.from_wkb(label_wkbs)
+
+    arcpy.AddMessage("Building new map unit polygons")
+    polys = poly_builder.polygonize(lines, sr.XYResolution)
+    plan = poly_builder.plan(
+        polys,
+        old_polys,
+        old_attribs,
+        labels,
+        label_attribs,
+        label_oids,
+        # in simple mode, label points are used instead of the old polygons
+        use_old=not (simple_mode and label_points),
+        tolerance=sr.XYTolerance,
+    )
+
+    targets = plan.target.tolist()
+    new_oids = [old_oids[k] if k >= 0 else None for k in targets]
+    updates = {}
+    inserts = []
+    for i, k in enumerate(targets):
+        if k < 0:
+            inserts.append(i)
+        elif plan.write_shape[i] or plan.write_attribs[i]:
+            updates[old_oids[k]] = i
+    deletes = set(old_oids[k] for k in plan.deletes) | null_shapes
+
+    arcpy.AddMessage(
+        f"{plan.unchanged()} polygons unchanged, updating {len(updates)}, "
+        f"adding {len(inserts)}, deleting {len(deletes)}"
+    )
+    with arcpy.da.Editor(str(gdb)):
+        if updates or deletes:
+            with arcpy.da.UpdateCursor(mup, ["OID@", "SHAPE@"] + fields) as cursor:
+                for row in cursor:
+                    if row[0] in deletes:
+                        cursor.deleteRow()
+                    elif row[0] in updates:
+                        i = updates[row[0]]
+                        if plan.write_shape[i]:
+                            row[1] = arcpy.FromWKB(poly_builder.to_wkb(polys[i]), sr)
+                        if plan.write_attribs[i]:
+                            row[2:] = plan.attribs[i] or [None] * n_fields
+                        cursor.updateRow(row)
+
+        if inserts:
+            with arcpy.da.InsertCursor(mup, ["SHAPE@"] + fields) as cursor:
+                for i in inserts:
+                    shape = arcpy.FromWKB(poly_builder.to_wkb(polys[i]), sr)
+                    attribs = plan.attribs[i] or [None] * n_fields
+                    new_oids[i] = cursor.insertRow([shape] + list(attribs))
+
+    if simple_mode:
+        return None
+
+    mu = [f.lower() for f in fields].index("mapunit")
+    units = [a[mu] if a else None for a in plan.attribs]
+    null_vals = [new_oids[i] for i, u in enumerate(units) if u in (None, "", " ")]
+    multi_label = plan.multi_label.tolist()
+    extra_labels = [label_oids[j] for i in multi_label for j in plan.labels_in[i]]
+    dup_oids = set(new_oids[i] for i in multi_label)
+    old_units = [a[mu] for a in old_attribs]
+    changed = [
+        new_oids[i]
+        for i in poly_builder.unit_changes(
+            polys, units, old_polys, old_units, sr.XYTolerance
+        )
+    ]
+    return null_vals, extra_labels, dup_oids, changed
+
+
 fds = sys.argv[1]
 gdb = Path(fds).parent
 save_mup = False
@@ -75,6 +297,13 @@ simple_mode = True
 if sys.argv[4].lower() in ["false", "no"]:
     simple_mode = False
 
+engine = "arcpy"
+if len(sys.argv) > 5 and sys.argv[5].lower() == "shapely":
+    if poly_builder.use_shapely:
+        engine = "shapely"
+    else:
+        arcpy.AddWarning("Shapely is not installed, using the ArcGIS tools")
+
 # get caf, mup, name_token
 # dictionary
 fd_dict = arcpy.da.Describe(fds)
@@ -117,7 +346,14 @@ contacts = arcpy.management.SelectLayerByAttribute(caf, where_clause=where)
 
 # make new polys
 new_polys = r"memory\mup"
-if simple_mode:
+if engine == "shapely":
+    arcpy.AddMessage("Using Shapely to build the polygons")
+    reports = shapely_polys(where)
+    if not simple_mode:
+        arcpy.AddMessage("Looking for errors and changes")
+        report_layers(*reports, same_unit_contacts())
+
+elif simple_mode:
     arcpy.AddMessage("Continuing in simple mode")
     # simple mode is for speed. EITHER label_points or existing polygons will
     # be used for attributes of new polygons. No reconciliation or error reporting
@@ -270,88 +506,6 @@ else:
             if row[1] != row[2] and row[1] not in [None, ""]:
                 changed.append(row[0])
 
-    # look for contacts with the same MapUnit on either side
-    inter_lines = r"memory\inter_lines"
-    arcpy.analysis.Identity(caf, mup, inter_lines, relationship="KEEP_RELATIONSHIPS")
-    id_field = f"FID_{str(short_caf)}"
-    same_unit = []
-    with arcpy.da.SearchCursor(
-        inter_lines, [id_field, "left_mapunit", "right_mapunit"]
-    ) as cursor:
-        for row in cursor:
-            if row[1] == row[2]:
-                same_unit.append(row[0])
-
-    if null_vals or extra_labels or dup_oids or changed or same_unit:
-        # build report feature layers
-        arcpy.AddMessage("Preparing report layers")
-
-        # prepare group layer
-        # get the active map
-        aprx = arcpy.mp.ArcGISProject("CURRENT")
-        active_map = aprx.activeMap
-
-        for l in active_map.listLayers():
-            if l.longName == "Make Polys - Report Layers":
-                active_map.removeLayer(l)
-
-        # find genericgroup.lyrx in the \Scripts folder
-        this_py = Path(__file__)
-        scripts = this_py.parent
-        group_lyr = scripts / "genericgroup.lyrx"
-
-        # add it to the map and rename it
-        group = active_map.addDataFromPath(str(group_lyr))
-        group.name = "Make Polys - Report Layers"
-
-        # add report layers
-        # multiple label point polygons
-        # just testing for boolean(True) of lists seemed to miss them so we'll
-        # test for length > 0
-        if len(extra_labels) > 0:
-            arcpy.AddMessage("Creating extra labels layer")
-            exp = f"OBJECTID in {sql_list(extra_labels)}"
-            extras = arcpy.management.MakeFeatureLayer(
-                label_points, "Extra label points", exp
-            )[0]
-            active_map.addLayerToGroup(group, extras)
-
-        # the polygons where those extra labels are found
-        if len(dup_oids) > 0:
-            arcpy.AddMessage("Creating layer for polygons with extra labels")
-            exp = f"OBJECTID in {sql_list(dup_oids)}"
-            poly_layer = arcpy.management.MakeFeatureLayer(
-                mup, "Polygons with extra labels", exp
-            )[0]
-            active_map.addLayerToGroup(group, poly_layer)
-
-        # polygons that don't have a MapUnit value
-        if len(null_vals) > 0:
-            arcpy.AddMessage("Creating layer for polygons with no MapUnit value")
-            exp = f"OBJECTID in {sql_list(null_vals)}"
-            null_polys = arcpy.management.MakeFeatureLayer(
-                mup, "Polygons with no MapUnit", exp
-            )[0]
-            active_map.addLayerToGroup(group, null_polys)
-
-        # polygons that changed MapUnit (but not Null to a new map unit)
-        if len(changed) > 0:
-            arcpy.AddMessage("Creating layer for polygons where MapUnit changed")
-            exp = f"OBJECTID in {sql_list(changed)}"
-            changed_polys = arcpy.management.MakeFeatureLayer(
-                mup, "Polygons where MapUnit changed", exp
-            )[0]
-            active_map.addLayerToGroup(group, changed_polys)
-
-        # contacts that have the same MapUnit on either side
-        if len(same_unit) > 0:
-            arcpy.AddMessage(
-                "Creating layer for contacts that have the same MapUnit on either side"
-            )
-            exp = f"OBJECTID in {sql_list(same_unit)}"
-            sandwiched_lines = arcpy.management.MakeFeatureLayer(
-                caf, "Contacts with same MapUnit on either side", exp
-            )[0]
-            active_map.addLayerToGroup(group, sandwiched_lines)
-    else:
-        arcpy.AddMessage("No errors or changes to report")
+    same_unit = same_unit_contacts()
+    report_layers(null_vals, extra_labels, dup_oids, changed, same_unit)
+guf.finish_trace()
@@ -68,3 +68,4 @@ def buildCafMupTopology(inFds, um):
 addMsgAndPrint(versionString)
 addMsgAndPrint(sys.argv[1])
 buildCafMupTopology(sys.argv[1], sys.argv[2])
+finish_trace()
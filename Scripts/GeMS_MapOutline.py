@@ -250,3 +250,4 @@ arcpy.Delete_management("xxtics")
 arcpy.Delete_management("xxMapOutline")
 
 # sys.exit()   # force exit with failure
+finish_trace()
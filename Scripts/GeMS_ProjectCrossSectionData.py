@@ -3,7 +3,7 @@ Projects all data in GeologicMap feature dataset (inFds) to cross-section plane
 Creates featureclasses with names prefixed by 'ed_'
 Output feature classes have all input FC attributes. In addition, point feature
   classes are given attribute:
-    DistanceFromSection 
+    DistanceFromSection
     LocalCsAzimuth  (Trend of section line at projected point,
          0..360, measured CCW from grid N)
 If points are OrientationData, we also calculate attributes:
@@ -30,12 +30,17 @@ rhaugerud@usgs.gov
 # Ran script through 2to3 and it worked with no other edits necessary.
 # Consider re-writing some sections to work with new Python modules, but none of the
 # 'older' code causes any errors.
+# 17 October 2026: the section line and DEM are read once into arrays and all features
+# are located along the line with NumPy, see xs_projection.py. No routes, event
+# tables, scratch feature classes or Spatial Analyst are needed
 
 import arcpy, sys, os.path, math
+import numpy as np
 from GeMS_Definition import tableDict
 from GeMS_utilityFunctions import *
+import xs_projection as xp
 
-versionString = "GeMS_ProjectCrossSectionData.py, version of 7/3/24"
+versionString = "GeMS_ProjectCrossSectionData.py, version of 10/17/26"
 rawurl = "https://raw.githubusercontent.com/DOI-USGS/gems-tools-pro/master/Scripts/GeMS_ProjectCrossSectionData.py"
 checkVersion(versionString, rawurl, "gems-tools-pro")
 
@@ -89,13 +94,6 @@ def wsName(obj):
     return os.path.dirname(obj)
 
 
-def cartesianToGeographic(angle):
-    ctg = -90 - angle
-    if ctg < 0:
-        ctg = ctg + 360
-    return ctg
-
-
 def isAxial(ptType):
     m = False
     for s in ("axis", "lineation", " L"):
@@ -104,65 +102,6 @@ def isAxial(ptType):
     return m
 
 
-def obliq(theta1, theta2):
-    obl = abs(theta1 - theta2)
-    if obl > 180:
-        obl = obl - 180
-    if obl > 90:
-        obl = 180 - obl
-    return obl
-
-
-def azimuthDifference(a, b):
-    # a, b are two azimuths in clockwise geographic notation
-    # azDiff is in range -180..180
-    # if azDiff < 0, a is counterclockwise of b
-    # if azDiff > 0, a is clockwise of b
-    azDiff = a - b
-    if azDiff > 180:
-        azDiff = azDiff - 360
-    if azDiff < -180:
-        azDiff = azDiff + 360
-    return azDiff
-
-
-def plotAzimuth(inclinationDirection, thetaXS, apparentInclination):
-    azDiff = azimuthDifference(thetaXS, inclinationDirection)
-    if azDiff >= -90 and azDiff <= 90:
-        return 270 + apparentInclination
-    else:
-        return 270 - apparentInclination
-
-
-def apparentPlunge(azi, inc, thetaXS):
-    obliquity = obliq(azi, thetaXS)
-    appInc = math.degrees(
-        math.atan(
-            vertEx * math.tan(math.radians(inc)) * math.cos(math.radians(obliquity))
-        )
-    )
-    return appInc, obliquity
-
-
-def apparentDip(azi, inc, thetaXS):
-    obliquity = obliq(azi, thetaXS)
-    appInc = math.degrees(
-        math.atan(
-            vertEx * math.tan(math.radians(inc)) * math.sin(math.radians(obliquity))
-        )
-    )
-    return appInc, obliquity
-
-
-def getIdField(fc):
-    idField = ""
-    fcFields = arcpy.ListFields(fc)
-    for fld in fcFields:
-        if fld.name.find("_ID") > 0:
-            idField = fld.name
-    return idField
-
-
 #  copied from NCGMP09v1.1_CreateDatabase_Arc10.0.py, version of 20 September 2012
 def createFeatureClass(thisDB, featureDataSet, featureClass, shapeType, fieldDefs):
     try:
@@ -211,44 +150,278 @@ def createFeatureClass(thisDB, featureDataSet, featureClass, shapeType, fieldDef
         )
 
 
-def locateEventTable(
-    gdb, inFC, pts, dem, sDistance, eventProperties, zType, isLines=False
-):
-    desc = arcpy.Describe(pts)
-
-    if not desc.hasZ:
-        addMsgAndPrint("      adding Z values")
-        arcpy.sa.AddSurfaceInformation(pts, dem, zType, "LINEAR")
-
-    ## working around bug in LocateFeaturesAlongRoutes
-    # add special field for duplicate detection
-    dupDetectField = "xDupDetect"
-    arcpy.AddField_management(pts, dupDetectField, "LONG")
-    # and calc this field = OBJECTID
-    OID = arcpy.Describe(pts).OIDFieldName
-    expr = '"!' + OID + '!"'
-    arcpy.CalculateField_management(pts, dupDetectField, expr, "PYTHON")
-    # locate linePts along route
-    addMsgAndPrint("      making event table")
-    eventTable = gdb + "/evTb_" + inFC
-    testAndDelete(eventTable)
-    arcpy.LocateFeaturesAlongRoutes_lr(
-        pts, ZMline, idField, sDistance, eventTable, eventProperties
+def shapeParts(shape):
+    # [(n, 2) array] of the parts of a polyline or the rings of a polygon
+    parts = []
+    for part in shape:
+        ring = []
+        for pnt in part:
+            # None separates the rings of a polygon part
+            if pnt is None:
+                if ring:
+                    parts.append(np.array(ring))
+                ring = []
+            else:
+                ring.append((pnt.X, pnt.Y))
+        if ring:
+            parts.append(np.array(ring))
+    return parts
+
+
+def readSection(xsLine):
+    # section line as an xs_projection.Section. Measures and elevations of a
+    # line that has both are used, otherwise the line is measured from the
+    # start quadrant and elevations come from the DEM
+    desc = arcpy.Describe(xsLine)
+    with arcpy.da.SearchCursor(xsLine, ["SHAPE@"]) as cursor:
+        shape = next(cursor)[0]
+    pnts = [pnt for part in shape for pnt in part if pnt is not None]
+    xy = [(pnt.X, pnt.Y) for pnt in pnts]
+    m = z = None
+    if desc.hasZ and desc.hasM:
+        m = [pnt.M for pnt in pnts]
+        z = [pnt.Z for pnt in pnts]
+        if None in m or None in z:
+            m = z = None
+    return xp.Section(xy, m, z, startQuadrant)
+
+
+def readDem(dem, bounds):
+    # the cells of the DEM that cover bounds, (xmin, ymin, xmax, ymax), as an
+    # xs_projection.Dem, read with GDAL if it is there
+    if xp.use_gdal:
+        try:
+            return xp.read_dem(arcpy.Describe(dem).catalogPath, bounds)
+        except Exception as error:
+            addMsgAndPrint("    GDAL cannot read " + dem + ": " + str(error))
+    raster = arcpy.Raster(dem)
+    ext = raster.extent
+    transform = (ext.XMin, raster.meanCellWidth, 0, ext.YMax, 0, -raster.meanCellHeight)
+    window = xp.dem_window(transform, raster.width, raster.height, bounds)
+    if window is None:
+        addMsgAndPrint("OOPS! " + dem + " does not cover the section line")
+        sys.exit()
+    xoff, yoff, ncols, nrows = window
+    transform = xp.window_transform(transform, xoff, yoff)
+    # RasterToNumPyArray takes the lower left corner of the block
+    lowerLeft = arcpy.Point(transform[0], transform[3] - nrows * raster.meanCellHeight)
+    z = arcpy.RasterToNumPyArray(raster, lowerLeft, ncols, nrows).astype(float)
+    return xp.Dem(z, transform, raster.noDataValue)
+
+
+def copyFields(inFC, outFC):
+    # fields of outFC, made with inFC as template, to copy from inFC
+    inFieldNames = fieldNameList(inFC)
+    return [
+        f.name
+        for f in arcpy.ListFields(outFC)
+        if f.editable and f.type not in ("OID", "Geometry") and f.name in inFieldNames
+    ]
+
+
+def newFeatureClass(inFC, outFC, shapeType):
+    # empty copy of inFC in outFds
+    testAndDelete(outFds + "/" + outFC)
+    addMsgAndPrint("      creating feature class " + outFC + " in " + shortName(outFds))
+    try:
+        arcpy.CreateFeatureclass_management(
+            outFds, outFC, shapeType, inFC, "DISABLED", "SAME_AS_TEMPLATE"
+        )
+    except:
+        addMsgAndPrint(
+            "Failed to create copy of "
+            + shortName(inFC)
+            + ". Maybe this feature class has a join?"
+        )
+        raise arcpy.ExecuteError
+    return outFds + "/" + outFC
+
+
+def sectionLine(stations, z):
+    # polyline in the section plane from stations and elevations
+    return arcpy.Polyline(
+        arcpy.Array([arcpy.Point(x, y * vertEx) for x, y in zip(stations, z)]),
+        outSR,
     )
-    nRows = numberOfRows(eventTable)
-    nPts = numberOfRows(pts)
-    if (
-        nRows > nPts and not isLines
-    ):  # if LocateFeaturesAlongRoutes has made duplicates  (A BUG!)
-        addMsgAndPrint("      correcting for bug in LocateFeaturesAlongRoutes")
-        addMsgAndPrint("        " + str(nRows) + " rows in event table")
-        addMsgAndPrint("        removing duplicate entries in event table")
-        arcpy.DeleteIdentical_management(eventTable, dupDetectField)
+
+
+def nanToNone(value, digits=None):
+    if value is None or math.isnan(value):
+        return None
+    return round(value, digits) if digits is not None else value
+
+
+def projectLines(lineFC, crossingLength):
+    # vertical line at every spot where a feature crosses the section line
+    fields = copyFields(lineFC, lineFC)
+    attributes = []
+    p0, p1, owner = [], [], []
+    with arcpy.da.SearchCursor(lineFC, ["SHAPE@"] + fields) as cursor:
+        for row in cursor:
+            if row[0] is None:
+                continue
+            for part in shapeParts(row[0]):
+                p0.append(part[:-1])
+                p1.append(part[1:])
+                owner.append(np.full(len(part) - 1, len(attributes)))
+            attributes.append(row[1:])
+    if not p0:
+        addMsgAndPrint(
+            "      " + shortName(lineFC) + " does not intersect section line"
+        )
+        return
+    k, stations, cx, cy = section.crossings(np.concatenate(p0), np.concatenate(p1))
+    features = np.concatenate(owner)[k]
+    # a crossing at a vertex of a feature is found on the segments on both sides
+    crossings = sorted(set(zip(features.tolist(), np.round(stations, 6).tolist())))
+    if not crossings:
         addMsgAndPrint(
-            "        " + str(numberOfRows(eventTable)) + " rows in event table"
+            "      " + shortName(lineFC) + " does not intersect section line"
+        )
+        return
+    addMsgAndPrint("      " + str(len(crossings)) + " crossings of section line")
+    features = [c[0] for c in crossings]
+    stations = np.array([c[1] for c in crossings])
+    zs = section.z_at(stations, profileDem)
+
+    outFC = newFeatureClass(lineFC, "ed_CS" + outFdsTag + shortName(lineFC), "POLYLINE")
+    outFields = copyFields(lineFC, outFC)
+    take = [fields.index(f) for f in outFields]
+    with arcpy.da.InsertCursor(outFC, ["SHAPE@"] + outFields) as cursor:
+        for f, x, z in zip(features, stations, zs):
+            if math.isnan(z):
+                z = -999
+            shape = sectionLine([x, x, x], [z - crossingLength, z, z + crossingLength])
+            cursor.insertRow([shape] + [attributes[f][i] for i in take])
+
+
+def projectPoints(pointClass):
+    # points within bufferDistance of the section line, moved to their
+    # station and elevation
+    inFC = shortName(pointClass)
+    desc = arcpy.Describe(pointClass)
+    fields = copyFields(pointClass, pointClass)
+    inFieldNames = fieldNameList(pointClass)
+    isOrientationData = "Azimuth" in inFieldNames and "Inclination" in inFieldNames
+    readFields = ["OID@", "SHAPE@XY"] + (["SHAPE@Z"] if desc.hasZ else [])
+    rows = []
+    with arcpy.da.SearchCursor(pointClass, readFields + fields) as cursor:
+        for row in cursor:
+            if row[1] is not None:
+                rows.append(row)
+    if not rows:
+        addMsgAndPrint(
+            "      0 points within " + str(bufferDistance) + " of section line"
+        )
+        return
+    x = np.array([row[1][0] for row in rows])
+    y = np.array([row[1][1] for row in rows])
+    stations, offsets, angles, inside = section.locate(x, y)
+    keep = np.nonzero(inside & (np.abs(offsets) <= bufferDistance))[0]
+    addMsgAndPrint(
+        "      "
+        + str(len(keep))
+        + " points within "
+        + str(bufferDistance)
+        + " of section line"
+    )
+    if len(keep) == 0:
+        return
+    rows = [rows[i] for i in keep]
+    stations, offsets, angles = stations[keep], offsets[keep], angles[keep]
+    if desc.hasZ:
+        zs = np.array([np.nan if row[2] is None else row[2] for row in rows])
+    else:
+        zs = dem.sample(x[keep], y[keep])
+    csAzi = xp.cartesian_to_geographic(angles)
+    attributes = [row[len(readFields) :] for row in rows]
+
+    outFC = newFeatureClass(pointClass, "ed_CS" + outFdsTag + inFC, "POINT")
+    addMsgAndPrint("      adding fields")
+    newFields = ["DistanceFromSection", "LocalCSAzimuth"]
+    if isOrientationData:
+        newFields += ["ApparentInclination", "Obliquity", "MapAzimuth"]
+    for fld in newFields:
+        arcpy.AddField_management(outFC, fld, "FLOAT")
+
+    if isOrientationData:
+        azi = fields.index("Azimuth")
+        inc = fields.index("Inclination")
+        azimuths = np.array(
+            [r[azi] if r[azi] is not None else np.nan for r in attributes]
+        )
+        inclinations = np.array(
+            [r[inc] if r[inc] is not None else np.nan for r in attributes]
+        )
+        if "Type" in fields:
+            # isAxial is called once for each type
+            types = [r[fields.index("Type")] for r in attributes]
+            axialTypes = {t: t is not None and isAxial(t) for t in set(types)}
+            axial = np.array([axialTypes[t] for t in types])
+        else:
+            axial = np.zeros(len(attributes), dtype=bool)
+        appInc, oblique, plotAzi = xp.orientations(
+            azimuths, inclinations, csAzi, vertEx, axial
         )
-    arcpy.DeleteField_management(eventTable, dupDetectField)
-    return eventTable
+
+    addMsgAndPrint("      calculating shapes and attributes")
+    outFields = copyFields(pointClass, outFC)
+    take = [fields.index(f) for f in outFields]
+    with arcpy.da.InsertCursor(outFC, ["SHAPE@XY"] + outFields + newFields) as cursor:
+        for j, row in enumerate(rows):
+            if math.isnan(zs[j]):
+                y = -999
+                addMsgAndPrint(
+                    "OBJECTID = " + str(row[0]) + " Z missing, assigned value of -999"
+                )
+            else:
+                y = zs[j] * vertEx
+            values = [attributes[j][i] for i in take]
+            values += [float(offsets[j]), float(csAzi[j])]
+            if isOrientationData:
+                values[outFields.index("Azimuth")] = nanToNone(float(plotAzi[j]), 2)
+                values += [
+                    nanToNone(float(appInc[j]), 2),
+                    nanToNone(float(oblique[j]), 2),
+                    attributes[j][azi],
+                ]
+            cursor.insertRow([(float(stations[j]), y)] + values)
+
+
+def projectPolys(polyFC):
+    # pieces of the section line inside each polygon, draped on the profile
+    fields = copyFields(polyFC, polyFC)
+    lo = section.xy.min(axis=0)
+    hi = section.xy.max(axis=0)
+    pieces = []
+    with arcpy.da.SearchCursor(polyFC, ["SHAPE@"] + fields) as cursor:
+        for row in cursor:
+            shape = row[0]
+            if shape is None:
+                continue
+            ext = shape.extent
+            if (
+                ext.XMax < lo[0]
+                or ext.XMin > hi[0]
+                or ext.YMax < lo[1]
+                or ext.YMin > hi[1]
+            ):
+                continue
+            for start, end in section.intervals(shapeParts(shape)):
+                pieces.append((start, end, row[1:]))
+    addMsgAndPrint("      " + str(len(pieces)) + " pieces of section line")
+
+    outFC = newFeatureClass(polyFC, "ed_CS" + outFdsTag + shortName(polyFC), "POLYLINE")
+    outFields = copyFields(polyFC, outFC)
+    take = [fields.index(f) for f in outFields]
+    with arcpy.da.InsertCursor(outFC, ["SHAPE@"] + outFields) as cursor:
+        for start, end, attributes in pieces:
+            stations = section.stations_between(start, end, dem.cell_size)
+            zs = section.z_at(stations, profileDem)
+            zs = np.where(np.isnan(zs), -999, zs)
+            cursor.insertRow(
+                [sectionLine(stations, zs)] + [attributes[i] for i in take]
+            )
 
 
 ###############################################################
@@ -265,6 +438,8 @@ vertEx = float(sys.argv[8])
 bufferDistance = float(sys.argv[9])
 addLTYPE = sys.argv[10]
 forceExit = sys.argv[11]
+# scratchWS and saveIntermediate are no longer used, nothing intermediate is
+# written
 scratchws = sys.argv[12]
 saveIntermediate = sys.argv[13]
 
@@ -286,31 +461,13 @@ if forceExit == "true":
 else:
     forceExit = False
 
-if saveIntermediate == "true":
-    saveIntermediate = True
-else:
-    saveIntermediate = False
-
 inFds = gdb + "/GeologicMap"
 outFds = gdb + "/CrossSection" + outFdsTag
 
-if arcpy.Exists(scratchws):
-    scratch = scratchws
-else:
-    scratch = outFds
-addMsgAndPrint("  Scratch directory is " + scratch)
-
 arcpy.env.overwriteOutput = True
 
-try:
-    arcpy.CheckOutExtension("Spatial")
-except:
-    addMsgAndPrint("\nCannot check out Spatial Analyst extension.")
-    sys.exit()
-
 ## Checking section line
 addMsgAndPrint("  Checking section line")
-idField = getIdField(xsLine)
 ##   does xsLine have 1-and-only-1 arc? if not, bail
 i = numberOfRows(xsLine)
 if i > 1:
@@ -325,59 +482,19 @@ elif i == 0:
 if not arcpy.Exists(outFds):
     addMsgAndPrint("  Making feature data set " + shortName(outFds))
     arcpy.CreateFeatureDataset_management(gdb, shortName(outFds), inFds)
-
-addMsgAndPrint("  Prepping section line")
-## make copy of section line
-tempXsLine = arcpy.CreateScratchName(
-    "xx", outFdsTag + "xsLine", "FeatureClass", scratch
-)
-addMsgAndPrint("    copying " + shortName(xsLine) + " to xxxXsLine")
-# addMsgAndPrint(xsLine+' '+scratch)
-arcpy.FeatureClassToFeatureClass_conversion(xsLine, scratch, shortName(tempXsLine))
-
-desc = arcpy.Describe(tempXsLine)
-xslfields = fieldNameList(tempXsLine)
-idField = ""
-for fld in xslfields:
-    if fld.find("_ID") > 0:
-        idField = fld
-if idField == "":
-    idField = "ORIG_ID"
-    arcpy.AddField_management(tempXsLine, idField, "TEXT")
-    arcpy.CalculateField_management(tempXsLine, idField, "01", "PYTHON3")
-specialFields = [
-    desc.OIDFieldName,
-    desc.shapeFieldName,
-    idField,
-    "Shape_Length",
-    "Length",
-]
-addMsgAndPrint("    deleting most fields")
-for nm in xslfields:
-    if nm not in specialFields:
-        try:
-            arcpy.DeleteField_management(tempXsLine, nm)
-        except:
-            pass
-##   check for Z and M values
-desc = arcpy.Describe(tempXsLine)
-if desc.hasZ and desc.hasM:
-    ZMline = tempXsLine
+outSR = arcpy.Describe(outFds).spatialReference
+
+addMsgAndPrint("  Reading section line and DEM")
+section = readSection(xsLine)
+# only the part of the DEM within bufferDistance of the section line is read
+lo = section.xy.min(axis=0) - bufferDistance
+hi = section.xy.max(axis=0) + bufferDistance
+dem = readDem(dem, (lo[0], lo[1], hi[0], hi[1]))
+if section.z is None:
+    profileDem = dem
 else:
-    # Add Z values
-    addMsgAndPrint("    getting elevation values for " + shortName(tempXsLine))
-    Zline = arcpy.CreateScratchName("xx", outFdsTag + "_Z", "FeatureClass", scratch)
-    arcpy.sa.InterpolateShape(dem, tempXsLine, Zline)
-    # Add M values
-    addMsgAndPrint("    measuring " + shortName(Zline))
-    ZMline = arcpy.CreateScratchName("xx", outFdsTag + "_ZM", "FeatureClass", scratch)
-    arcpy.CreateRoutes_lr(Zline, idField, ZMline, "LENGTH", "#", "#", startQuadrant)
-## buffer line to get selection polygon
-addMsgAndPrint("    buffering " + shortName(tempXsLine) + " to get selection polygon")
-tempBuffer = arcpy.CreateScratchName(
-    "xx", outFdsTag + "xsBuffer", "FeatureClass", scratch
-)
-arcpy.Buffer_analysis(ZMline, tempBuffer, bufferDistance, "FULL", "FLAT")
+    addMsgAndPrint("    using Z and M values of " + shortName(xsLine))
+    profileDem = None
 
 ## get lists of feature classes to be projected
 lineFCs = []
@@ -411,279 +528,21 @@ else:
 
 addMsgAndPrint("\n  Projecting line feature classes:")
 for lineFC in lineFCs:
-    inFC = shortName(lineFC)
-    addMsgAndPrint("    " + inFC)
-    arcpy.env.workspace = wsName(lineFC)
-    if inFC == "ContactsAndFaults":
-        lineCrossingLength = -lineCrossingLength
-    # intersect inFC with ZMline to get points where arcs cross section line
-    linePts = scratch + "/xxxLinePts" + outFdsTag
-    arcpy.Intersect_analysis([inFC, ZMline], linePts, "ALL", "#", "POINT")
-    if numberOfRows(linePts) == 0:
-        addMsgAndPrint("      " + inFC + " does not intersect section line")
-    else:  # numberOfRows > 0
-        eventProperties = "rtID POINT M fmp"
-        eventTable = locateEventTable(
-            gdb, inFC, linePts, dem, 10, eventProperties, "Z_MEAN", True
-        )
-        addMsgAndPrint("      placing events on section line")
-        eventLyr = "xxxLineEvents"
-        arcpy.MakeRouteEventLayer_lr(
-            ZMline, idField, eventTable, eventProperties, eventLyr
-        )
-        outFC = "ed_CS" + outFdsTag + shortName(inFC)
-        addMsgAndPrint(
-            "      creating feature class " + outFC + " in " + shortName(outFds)
-        )
-        # make new feature class using old as template
-        testAndDelete(outFds + "/" + outFC)
-        arcpy.CreateFeatureclass_management(
-            outFds, outFC, "POLYLINE", inFC, "DISABLED", "SAME_AS_TEMPLATE"
-        )
-        outFC = outFds + "/" + outFC
-        addMsgAndPrint("      moving and calculating attributes")
-        ## open search cursor on inFC, open insert cursor on outFC
-        inRows = arcpy.SearchCursor(eventLyr)
-        outRows = arcpy.InsertCursor(outFC)
-        # get field names
-        inFieldNames = fieldNameList(eventLyr)
-        outFieldNames = fieldNameList(outFC)
-        # get fields to ignore
-        ignoreFields = []
-        desc = arcpy.Describe(eventLyr)
-        ignoreFields.append(desc.ShapeFieldName)
-        ignoreFields.append(desc.OIDFieldName)
-        for inRow in inRows:
-            outRow = outRows.newRow()
-            # do shape
-            X = inRow.M
-            Y = inRow.Shape.firstPoint.Z
-            pnt1 = arcpy.Point(X, (Y - lineCrossingLength) * vertEx)
-            pnt2 = arcpy.Point(X, Y * vertEx)
-            pnt3 = arcpy.Point(X, (Y + lineCrossingLength) * vertEx)
-            lineArray = arcpy.Array([pnt1, pnt2, pnt3])
-            outRow.Shape = lineArray
-            # transfer matching fields
-            for field in inFieldNames:
-                if field in outFieldNames and not field in ignoreFields:
-                    stuff = inRow.getValue(field)
-                    outRow.setValue(field, stuff)
-            outRows.insertRow(outRow)
-        ## clean up
-        if not saveIntermediate:
-            for f in eventTable, eventLyr, linePts:
-                testAndDelete(f)
-        del inRows, outRows
+    addMsgAndPrint("    " + shortName(lineFC))
+    if shortName(lineFC) == "ContactsAndFaults":
+        projectLines(lineFC, -lineCrossingLength)
+    else:
+        projectLines(lineFC, lineCrossingLength)
 
 addMsgAndPrint("\n  Projecting point feature classes:")
-## for each input point feature class:
 for pointClass in pointFCs:
-    inFC = shortName(pointClass)
-    addMsgAndPrint("    " + inFC)
-    arcpy.env.workspace = wsName(pointClass)
-    # clip inputfc with selection polygon to make tempPoints
-    addMsgAndPrint("      clipping with selection polygon")
-    tempPoints = scratch + "/xxx" + outFdsTag + inFC
-    arcpy.Clip_analysis(pointClass, tempBuffer, tempPoints)
-    # check to see if nonZero number of rows and not in excluded feature classes
-    nPts = numberOfRows(tempPoints)
-    addMsgAndPrint("      " + str(nPts) + " points within selection polygon")
-    if nPts > 0:
-        eventProperties = "rtID POINT M fmp"
-        eventTable = locateEventTable(
-            gdb, inFC, tempPoints, dem, bufferDistance + 200, eventProperties, "Z"
-        )
-        addMsgAndPrint("      placing events on section line")
-        eventLyr = "xxxPtEvents"
-        arcpy.MakeRouteEventLayer_lr(
-            ZMline,
-            idField,
-            eventTable,
-            eventProperties,
-            eventLyr,
-            "#",
-            "#",
-            "ANGLE_FIELD",
-            "TANGENT",
-        )
-        outFC = outFds + "/ed_CS" + outFdsTag + shortName(inFC)
-        outFCa = outFC + "a"
-        addMsgAndPrint("      copying event layer to " + shortName(outFCa))
-        arcpy.CopyFeatures_management(eventLyr, outFCa)
-        addMsgAndPrint("      adding fields")
-        # add DistanceFromSection and LocalXsAzimuth
-        arcpy.AddField_management(outFCa, "DistanceFromSection", "FLOAT")
-        arcpy.AddField_management(outFCa, "LocalCSAzimuth", "FLOAT")
-        # set isOrientationData
-        addMsgAndPrint("      checking for Azimuth and Inclination fields")
-        inFieldNames = fieldNameList(inFC)
-        if "Azimuth" in inFieldNames and "Inclination" in inFieldNames:
-            isOrientationData = True
-            arcpy.AddField_management(outFCa, "ApparentInclination", "FLOAT")
-            arcpy.AddField_management(outFCa, "Obliquity", "FLOAT")
-            arcpy.AddField_management(outFCa, "MapAzimuth", "FLOAT")
-        else:
-            isOrientationData = False
-        arcpy.CreateFeatureclass_management(outFds, shortName(outFC), "POINT", outFCa)
-        addMsgAndPrint("      calculating shapes and attributes")
-        ## open update cursor on outFC
-        cursor = arcpy.UpdateCursor(outFCa)
-        outCursor = arcpy.InsertCursor(outFC)
-        i = 0
-        ii = 0
-        for row in cursor:
-            # keep track of how many rows are processed
-            i = i + 1
-            ii = ii + 1
-            ####addMsgAndPrint(str(i))
-            if ii == 50:
-                addMsgAndPrint("       row " + str(i))
-                ii = 0
-            #   substitute M,Z for X,Y
-            try:
-                pntObj = arcpy.Point()
-                pntObj.X = row.M
-                if row.Z == None:
-                    pntObj.Y = -999
-                    addMsgAndPrint(
-                        "OBJECTID = "
-                        + str(row.OBJECTID)
-                        + " Z missing, assigned value of -999"
-                    )
-                else:
-                    pntObj.Y = row.Z * vertEx
-                row.Shape = pntObj
-            except:
-                addMsgAndPrint(
-                    "Failed to make shape: OBJECTID = "
-                    + str(row.OBJECTID)
-                    + ", M = "
-                    + str(row.M)
-                    + ", Z = "
-                    + str(row.Z)
-                )
-                ## need to do something to flag rows that failed?
-            #   convert from cartesian  to geographic angle
-            ###addMsgAndPrint(str(pntObj.X)+'  '+str(pntObj.Y)+'  '+str(pntObj.Z))
-            csAzi = cartesianToGeographic(row.LOC_ANGLE)
-            row.LocalCSAzimuth = csAzi
-            row.DistanceFromSection = row.Distance
-            if isOrientationData:
-                row.MapAzimuth = row.Azimuth
-                if isAxial(row.Type):
-                    appInc, oblique = apparentPlunge(
-                        row.Azimuth, row.Inclination, csAzi
-                    )
-                    inclinationDirection = row.Azimuth
-                else:
-                    appInc, oblique = apparentDip(row.Azimuth, row.Inclination, csAzi)
-                    inclinationDirection = row.Azimuth + 90
-                    if inclinationDirection > 360:
-                        inclinationDirection = inclinationDirection - 360
-                plotAzi = plotAzimuth(inclinationDirection, csAzi, appInc)
-                row.Obliquity = round(oblique, 2)
-                row.ApparentInclination = round(appInc, 2)
-                row.Azimuth = round(plotAzi, 2)
-            ## print row data
-            # fields = arcpy.ListFields(outFC)
-            # for field in fields:
-            #    addMsgAndPrint(field.name+' = '+str(row.getValue(field.name)))
-
-            # cursor.updateRow(row)
-            ##  update cursor (line above) doesn't always work, so build a new FC instead:
-            outCursor.insertRow(row)
-
-        for fld in "Distance", "LOC_ANGLE", "rtID":
-            arcpy.DeleteField_management(outFC, fld)
-        del row
-        del cursor
-        ## clean up
-        if not saveIntermediate:
-            for f in (tempPoints, eventTable, eventLyr, outFCa):
-                testAndDelete(f)
-
+    addMsgAndPrint("    " + shortName(pointClass))
+    projectPoints(pointClass)
 
 addMsgAndPrint("\n  Projecting polygon feature classes:")
 for polyFC in polyFCs:
-    inFC = shortName(polyFC)
-    addMsgAndPrint("    " + inFC)
-    arcpy.env.workspace = wsName(polyFC)
-    # locate features along routes
-    addMsgAndPrint("      making event table")
-    eventTable = gdb + "/evTb_" + inFC
-    addMsgAndPrint(eventTable)
-    testAndDelete(eventTable)
-    eventProperties = "rtID LINE FromM ToM"
-    arcpy.LocateFeaturesAlongRoutes_lr(
-        inFC, ZMline, idField, "#", eventTable, eventProperties
-    )
-    addMsgAndPrint("      placing events on section line")
-    eventLyr = "xxxPolyEvents"
-    arcpy.MakeRouteEventLayer_lr(ZMline, idField, eventTable, eventProperties, eventLyr)
-    outFC = "ed_CS" + outFdsTag + shortName(inFC)
-    addMsgAndPrint("      creating feature class " + outFC + " in " + shortName(outFds))
-    # make new feature class using old as template
-    testAndDelete(outFds + "/" + outFC)
-    addMsgAndPrint(outFds + " " + outFC + " " + inFC)
-    try:
-        arcpy.CreateFeatureclass_management(
-            outFds, outFC, "POLYLINE", inFC, "DISABLED", "SAME_AS_TEMPLATE"
-        )
-    except:
-        addMsgAndPrint(
-            "Failed to create copy of "
-            + inFC
-            + ". Maybe this feature class has a join?"
-        )
-        raise arcpy.ExecuteError
-    outFC = outFds + "/" + outFC
-    addMsgAndPrint("      moving and calculating attributes")
-    # get field names
-    inFieldNames = fieldNameList(eventLyr)
-    outFieldNames = fieldNameList(outFC)
-    # get fields to ignore
-    ignoreFields = []
-    desc = arcpy.Describe(eventLyr)
-    ignoreFields.append(desc.ShapeFieldName)
-    ignoreFields.append(desc.OIDFieldName)
-    ## open search cursor on inFC, open insert cursor on outFC
-    inRows = arcpy.SearchCursor(eventLyr)
-    outRows = arcpy.InsertCursor(outFC)
-    for inRow in inRows:
-        outRow = outRows.newRow()
-        # flip shape
-        oldLine = inRow.Shape
-        newLine = arcpy.Array()
-        a = 0
-        while a < oldLine.partCount:
-            array = oldLine.getPart(a)
-            newArray = arcpy.Array()
-            pnt = next(array)
-            while pnt:
-                pnt.X = float(pnt.M)
-                pnt.Y = float(pnt.Z) * vertEx
-                newArray.add(pnt)
-                pnt = next(array)
-            newLine.add(newArray)
-            a = a + 1
-        outRow.Shape = newLine
-        # transfer matching fields
-        for field in inFieldNames:
-            if field in outFieldNames and not field in ignoreFields:
-                stuff = inRow.getValue(field)
-                outRow.setValue(field, stuff)
-        outRows.insertRow(outRow)
-    ## clean up
-    if not saveIntermediate:
-        for f in eventTable, eventLyr:
-            testAndDelete(f)
-    del inRows, outRows
-
-arcpy.CheckInExtension("Spatial")
-if not saveIntermediate:
-    addMsgAndPrint("\n  Deleting intermediate data sets")
-    for fc in tempXsLine, ZMline, Zline, tempBuffer:
-        testAndDelete(fc)
+    addMsgAndPrint("    " + shortName(polyFC))
+    projectPolys(polyFC)
 
 # make NCGMP09 cross-section feature classes if they are not present in output FDS
 for fc in ("MapUnitPolys", "ContactsAndFaults", "OrientationPoints"):
@@ -705,6 +564,7 @@ for fc in ("MapUnitPolys", "ContactsAndFaults", "OrientationPoints"):
         createFeatureClass(gdb, shortName(outFds), fclass, shp, fieldDefs)
 
 addMsgAndPrint("\n \nFinished successfully.")
+finish_trace()
 if forceExit:
     addMsgAndPrint("Forcing exit by raising ExecuteError")
     raise arcpy.ExecuteError
@@ -123,3 +123,4 @@ for key, value in fc_dict.items():
             rc_handler(key, value, field.name, "MapUnit", "DescriptionOfMapUnits")
 
 addMsgAndPrint("Done")
+finish_trace()
@@ -49,3 +49,4 @@ def main(db):
 if __name__ == "__main__":
     db = sys.argv[1]
     main(db)
+    guf.finish_trace()
@@ -5,11 +5,14 @@
 # June 2019: updated to work with Python 3 in ArcGIS Pro.
 # Ran script through 2to3. Only incidental debugging required after.
 # November 2021: reordered linew 9-14
+# October 2026: PointDistance near table and list.remove loop replaced by the
+#   grid and priority queue solver in point_thinning.py. Same PlotAtScale values.
 
 import arcpy, os.path, sys
 from GeMS_utilityFunctions import *
+import point_thinning
 
-versionString = "GeMS_SetPlotAtScales.py, version of 8/21/23"
+versionString = "GeMS_SetPlotAtScales.py, version of 10/17/26"
 rawurl = "https://raw.githubusercontent.com/DOI-USGS/gems-tools-pro/master/Scripts/GeMS_SetPlotAtScales.py"
 checkVersion(versionString, rawurl, "gems-tools-pro")
 
@@ -114,8 +117,6 @@ if os.path.basename(inFc) == "OrientationPoints":
 else:
     isOP = False
 
-outTable = gdb + "/xxxPlotAtScales"
-testAndDelete(outTable)
 mapUnits = "meters"
 minSeparationMapUnits = minSeparation_mm / 1000.0
 searchRadius = minSeparationMapUnits * maxPlotAtScale
@@ -125,43 +126,27 @@ if not "meter" in arcpy.Describe(inFc).spatialReference.linearUnitName.lower():
     searchRadius = searchRadius * 3.2808
     minSeparationMapUnits = minSeparationMapUnits * 3.2808
 addMsgAndPrint("Search radius is " + str(searchRadius) + " " + mapUnits)
-addMsgAndPrint("Building near table")
-arcpy.PointDistance_analysis(inFc, inFc, outTable, searchRadius)
 
-inPoints = []
-outPointDict = {}
-
-# read outTable into Python list inPoints, with each list component = [distance, fid1, fid2]
-fields = ["DISTANCE", "INPUT_FID", "NEAR_FID"]
-with arcpy.da.SearchCursor(outTable, fields) as cursor:
+# read point locations into dictionary inPoints[OBJECTID] = (x, y)
+inPoints = {}
+with arcpy.da.SearchCursor(inFc, ["OBJECTID", "SHAPE@XY"]) as cursor:
     for row in cursor:
-        inPoints.append([row[0], row[1], row[2]])
-addMsgAndPrint("   " + str(len(inPoints)) + " rows in initial near table")
-
-# step through inPoints, smallest distance first, and write list of FID, PlotAtScale (outPoints)
-addMsgAndPrint("   Sorting through near table and calculating PlotAtScale values")
-inPoints.sort()
-lastLenInPoints = 0
-while len(inPoints) > 1 and lastLenInPoints != len(inPoints):
-    lastLenInPoints = len(inPoints)
-    pointSep = inPoints[0][0]
-    if isOP:  # figure out the most significant point
-        pt = lessSignificantOP(inPoints[0][1], inPoints[0][2])
-    else:  # take the second point
-        pt = inPoints[0][2]
+        if row[1][0] is not None:
+            inPoints[row[0]] = row[1]
+addMsgAndPrint("   " + str(len(inPoints)) + " points")
+
+# drop points closest pair first, and write dictionary of FID: PlotAtScale (outPointDict)
+addMsgAndPrint("   Thinning points and calculating PlotAtScale values")
+if isOP:  # figure out the most significant point
+    dropped = point_thinning.thinPoints(inPoints, searchRadius, lessSignificantOP)
+else:  # take the second point
+    dropped = point_thinning.thinPoints(inPoints, searchRadius)
+outPointDict = {}
+for pt, pointSep in dropped:
     outPointDict[pt] = plotScale(pointSep, minSeparationMapUnits)
-    inPoints.remove(inPoints[0])
-    j = len(inPoints)
-    for i in range(1, j + 1):
-        # addMsgAndPrint(str(i)+', '+str(j))
-        aPt = inPoints[j - i]
-        if aPt[1] == pt or aPt[2] == pt:
-            inPoints.remove(aPt)
-            # addMsgAndPrint( 'removing '+str(aPt))
-    addMsgAndPrint("   # inPoints = " + str(len(inPoints)))
-
-for i in range(0, len(inPoints)):
-    addMsgAndPrint("      " + str(inPoints[i]))
+addMsgAndPrint(
+    "   " + str(len(outPointDict)) + " points with PlotAtScale < " + str(maxPlotAtScale)
+)
 
 
 # attach plotScale values from outPoints to inFc
@@ -170,12 +155,9 @@ with arcpy.da.Editor(gdb) as edit:
     fields = ["OBJECTID", "PlotAtScale"]
     with arcpy.da.UpdateCursor(inFc, fields) as cursor:
         for row in cursor:
-            if row[0] in list(outPointDict.keys()):
+            if row[0] in outPointDict:
                 row[1] = outPointDict[row[0]]
             else:
                 row[1] = maxPlotAtScale
             cursor.updateRow(row)
-
-# get rid of xxxPlotAtScales
-addMsgAndPrint("Deleting " + outTable)
-testAndDelete(outTable)
+finish_trace()
@@ -6,12 +6,16 @@ import shutil
 import glob
 
 from GeMS_utilityFunctions import *
+import symbol_engine
 
 # September 2017: now invokes arcpy.da.Editor in line 183
 # 5 October 2017: fixed crash when symbolizing CMU feature dataset
 # 17 July 2019: upgraded to python 3, renamed GeMS_SetSymbols_AGP2.py
+# 17 October 2026: symbols of lines and orientation points are picked from lookup tables
+#   compiled from Type-FgdcSymbol.txt, see symbol_engine.py, and only changed rows are
+#   written, in one edit operation per feature class
 
-versionString = "GeMS_SetSymbols.py, version of 8/21/23"
+versionString = "GeMS_SetSymbols.py, version of 10/17/26"
 rawurl = "https://raw.githubusercontent.com/DOI-USGS/gems-tools-pro/master/Scripts/GeMS_SetSymbols.py"
 checkVersion(versionString, rawurl, "gems-tools-pro")
 
@@ -57,17 +61,10 @@ def buildSymbolDicts(dFile):
                         aDict[key] = val1
 
 
-def incrementSymbol(sym, increment):
-    symWords = sym.split(".")
-    lastWord = symWords[len(symWords) - 1]
-    newLastWord = str(int(lastWord) + increment).zfill(len(lastWord))
-    newSym = sym[0 : 0 - len(lastWord)] + newLastWord
-    return newSym
-
-
-def unrecognizedType(t):
-    if not t in unrecognizedTypes:
-        unrecognizedTypes.append(t)
+def unrecognizedType(types):
+    for t in types:
+        if not t in unrecognizedTypes:
+            unrecognizedTypes.append(t)
 
 
 def hasCartoRep(fds, fc):
@@ -101,6 +98,54 @@ def buildRepRuleDict(repDomain):
     return newDict
 
 
+def readColumns(fc, fields):
+    # list of the values of each field, in one read of fc
+    rows = [row for row in arcpy.da.SearchCursor(fc, fields)]
+    if not rows:
+        return [[] for f in fields]
+    return [list(col) for col in zip(*rows)]
+
+
+def writeSymbols(fc, changed):
+    # writes the symbols in changed, {oid: symbol}, and the representation rules
+    # that go with them, in one edit operation. Other rows are not touched
+    if not changed:
+        addMsgAndPrint("    no symbols changed")
+        return
+    addMsgAndPrint("    {} symbols changed".format(len(changed)))
+    fields = ["OID@", "Symbol"]
+    hasRep, repDomain = hasCartoRep(inFds, fc)
+    if hasRep:
+        fields.append("RuleID1")
+        repRuleDict = buildRepRuleDict(repDomain)
+
+    # a few rows are selected by OBJECTID, many are picked out of all rows
+    where = None
+    if len(changed) <= 1000:
+        oidField = arcpy.Describe(fc).OIDFieldName
+        where = "{} IN ({})".format(oidField, ",".join(str(o) for o in changed))
+
+    edit = arcpy.da.Editor(gdb)
+    edit.startEditing(False, False)
+    edit.startOperation()
+    with arcpy.da.UpdateCursor(fc, fields, where) as cursor:
+        for row in cursor:
+            if row[0] in changed:
+                row[1] = changed[row[0]]
+                if hasRep:
+                    # turn GSC label into original FGDC label: 06.03 to 6.3
+                    try:
+                        noZeros = trimLeftZeros(row[1])
+                    except ValueError:
+                        noZeros = None
+                    if noZeros in repRuleDict:
+                        row[2] = repRuleDict[noZeros]
+                cursor.updateRow(row)
+    edit.stopOperation()
+    edit.stopEditing(True)
+    del edit
+
+
 def test_locks(gdb, n):
     match_string = os.path.join(gdb, "{}*rd.lock".format(n))
     read_locks = glob.glob(match_string)
@@ -199,6 +244,9 @@ dmu = os.path.join(os.path.dirname(inFds), "DescriptionOfMapUnits")
 
 # addMsgAndPrint('  Feature dataset {}, can be locked = {}'.format(inFds, arcpy.TestSchemaLock(inFds)))
 top_bool = True
+symbolTable = symbol_engine.SymbolTable(
+    EightfoldLineDict, TwofoldOrientPointDict, MySymbolDict, isQuestionable
+)
 for fc in caf, gel:
     if arcpy.Exists(fc):
         if numberOfRows(fc) > 0:
@@ -206,128 +254,42 @@ for fc in caf, gel:
         if debug:
             addMsgAndPrint("fields = {}".format(fields))
 
-        hasRep, repDomain = hasCartoRep(inFds, fc)
-        if hasRep:
-            fields.append("RuleID1")
-            repRuleDict = buildRepRuleDict(repDomain)
-
         # if there are table-view or edit locks on the layer,
         # the updatecursor will fail, so check now and end if necessary
         test_locks(gdb, os.path.basename(fc))
 
-        edit = arcpy.da.Editor(gdb)
-        edit.startEditing(False, False)
-
-        with arcpy.da.UpdateCursor(fc, fields) as cursor:
-            for row in cursor:
-                rowChanged = False
-                typ = row[0]
-                isCon = row[1]
-                locConfM = row[2]
-                exConf = row[3]
-                idConf = row[4]
-                sym = row[5]
-                if debug1:
-                    addMsgAndPrint(typ)
-
-                if typ in list(EightfoldLineDict.keys()):
-                    if debug1:
-                        addMsgAndPrint("{} is in EightfoldLineDict".format(typ))
-                    inc = 0
-                    if isQuestionable(exConf) or isQuestionable(idConf):
-                        inc = inc + 1
-                    if isCon.lower() == "n":
-                        if useInferred and locConfM > inferredThreshold:
-                            inc = inc + 4
-                        elif locConfM > approxThreshold:
-                            inc = inc + 2
-                    else:  # isCon == 'Y'
-                        inc = inc + 6
-                    row[5] = incrementSymbol(EightfoldLineDict[typ], inc)
-                    if row[5] != sym:
-                        rowChanged = True
-                elif typ in list(MySymbolDict.keys()):
-                    row[5] = MySymbolDict[typ]
-                    if row[5] != sym:
-                        rowChanged = True
-                else:
-                    unrecognizedType(typ)
-
-                if rowChanged:
-                    # arcpy.AddMessage('{}: {} : {}'.format(row[6], sym, row[5]))
-                    if hasRep:
-                        # turn GSC label into original FGDC label: 06.03 to 6.3
-                        noZeros = trimLeftZeros(row[5])
-                        if repRuleDict.has_key(noZeros):
-                            row[6] = repRuleDict[noZeros]
-                    if top_bool:
-                        edit.startOperation()
-                    cursor.updateRow(row)
-                    if top_bool:
-                        edit.stopOperation()
-
-        if top_bool:
-            edit.stopEditing(True)
-        if top_bool:
-            del edit
+        cols = readColumns(fc, fields)
+        symbols, unrecognized = symbolTable.line_symbols(
+            cols[0],
+            cols[1],
+            cols[2],
+            cols[3],
+            cols[4],
+            approxThreshold,
+            inferredThreshold,
+            useInferred,
+        )
+        unrecognizedType(unrecognized)
+        writeSymbols(fc, symbol_engine.changes(cols[6], cols[5], symbols))
 
-fields = ["Type", "OrientationConfidenceDegrees", "Symbol"]
+fields = ["Type", "OrientationConfidenceDegrees", "Symbol", "OID@"]
 fc = orp
 if arcpy.Exists(fc):
     addMsgAndPrint("  processing {}".format(os.path.basename(fc)))
-    hasRep, repDomain = hasCartoRep(inFds, fc)
-    if hasRep:
-        fields.append("RuleID1")
-        repRuleDict = buildRepRuleDict(repDomain)
 
     # if there are table-view or edit locks on the layer,
     # the updatecursor will fail, so check now and end if necessary
     test_locks(gdb, os.path.basename(fc))
 
-    # #featureclasses in topologies can only be editing inside
-    # #edit sessions
-    # top_bool = test_topology(gdb, os.path.basename(fc))
-    # if top_bool:
-    edit = arcpy.da.Editor(gdb)
-    edit.startEditing(False, False)
-
     if debug:
         addMsgAndPrint("fields = {},  fc = {}".format(fields, fc))
 
-    with arcpy.da.UpdateCursor(fc, fields) as cursor:
-        for row in cursor:
-            typ = row[0]
-            orConf = row[1]
-            rowChanged = False
-            if typ in list(TwofoldOrientPointDict.keys()):
-                rowChanged = True
-                if orConf > orientThresholdDegrees and useApproxOrient:
-                    row[2] = TwofoldOrientPointDict[typ][1]
-                else:
-                    row[2] = TwofoldOrientPointDict[typ][0]
-            elif typ in list(MySymbolDict.keys()):
-                # addMsgAndPrint('**'+typ+'**')
-                rowChanged = True
-                row[2] = MySymbolDict[typ]
-            else:
-                # addMsgAndPrint('++'+typ+'++')
-                unrecognizedType(typ)
-            if rowChanged:
-                if hasRep:
-                    # turn GSC label into original FGDC label: 06.03 to 6.3
-                    noZeros = trimLeftZeros(row[2])
-                    if repRuleDict.has_key(noZeros):
-                        row[3] = repRuleDict[noZeros]
-                if top_bool:
-                    edit.startOperation()
-                cursor.updateRow(row)
-                if top_bool:
-                    edit.stopOperation()
-
-    if top_bool:
-        edit.stopEditing(True)
-    if top_bool:
-        del edit
+    cols = readColumns(fc, fields)
+    symbols, unrecognized = symbolTable.point_symbols(
+        cols[0], cols[1], orientThresholdDegrees, useApproxOrient
+    )
+    unrecognizedType(unrecognized)
+    writeSymbols(fc, symbol_engine.changes(cols[3], cols[2], symbols))
 
 addMsgAndPrint("  \n  Unrecognized Type values: ")
 if len(unrecognizedTypes) == 0:
@@ -416,3 +378,4 @@ if setPolys:
         edit.stopEditing(True)
     if top_bool:
         del edit
+finish_trace()
@@ -159,3 +159,4 @@ if __name__ == "__main__":
     basedata = guf.convert_bool(arcpy.GetParameterAsText(5))
 
     make_tree(parent_dir, postal_code, year, mapped_area, version, basedata)
+    guf.finish_trace()
@@ -53,12 +53,17 @@ Significant assumptions:
 #   functionality of a class is specifically needed. Also, apparently will be faster.
 #   expanded all commas and plus signs with no spaces for readability (mine, at least!)
 #   increased length of Type field in _Topology geodatabase from 100 to 500 to accommodate longer concatenations
+# 10/17/26
+#   nodes are sorted and classified with NumPy arrays in node_arrays.py, see getNodeArrays and processNodeArrays.
+#   Same results as getNodes and processNodes, which are removed. See version of 8/21/23 for them
+#   line ends of the planarized CAF are read into a node_graph.NodeGraph instead of an endpoints feature class
 
 import arcpy, os, sys, math, os.path, operator, time
 from GeMS_utilityFunctions import *
+import node_arrays, node_graph
 
 # see gems-tools-pro version<=2.2.2 to get earlier TopologyCheck tool
-versionString = "GeMS_TopologyCheck.py, version of 8/21/23"
+versionString = "GeMS_TopologyCheck.py, version of 10/17/26"
 rawurl = "https://raw.githubusercontent.com/DOI-USGS/gems-tools-pro/master/Scripts/GeMS_TopologyCheck.py"
 checkVersion(versionString, rawurl, "gems-tools-pro")
 
@@ -123,117 +128,6 @@ class CAF_arc:
             return False
 
 
-def sameArcAttributes(a, b):  # a and b are CAF_arc
-    if (
-        a.Type == b.Type
-        and a.IsConc == b.IsConc
-        and a.ExConf == b.ExConf
-        and a.IdConf == b.IdConf
-        and a.LCM == b.LCM
-        and a.DSID == b.DSID
-        and a.Notes == b.Notes
-    ):
-        return True
-    else:
-        return False
-
-
-def sameTypeIndices(arcs):  # arcs is triplet of CAF_arc
-    a = arcs[0]
-    b = arcs[1]
-    c = arcs[2]
-    if a.Type == b.Type:
-        same = [0, 1]
-        diff = 2
-        if b.Type == c.Type:
-            same = [0, 1, 2]
-            diff = None
-    elif a.Type == c.Type:
-        same = [0, 2]
-        diff = 1
-        if b.Type == c.Type:
-            same = [0, 1, 2]
-            diff = None
-    elif b.Type == c.Type:
-        same = [1, 2]
-        diff = 0
-    else:
-        same = [0]
-        diff = [0, 1, 2]
-    return same, diff
-
-
-def sameToFrom(a, b, c=None):
-    if c == None:
-        c = a
-    if a.ToFrom == b.ToFrom == c.ToFrom:
-        return True
-    else:
-        return False
-
-
-def concealedArcs(arcs):  # arcs is a list of CAF_arc
-    nConcealed = 0
-    concealedIndices = []
-    for a in arcs:
-        if a.isConcealed() == True:
-            nConcealed += 1
-            concealedIndices.append(arcs.index(a))
-    return nConcealed, concealedIndices
-
-
-def adjoiningMapUnits(arcs):
-    # for 3 arcs around a node, returns list ['a', 'b', 'c'] of adjoining map units
-    # 'a' is map unit opposite (not adjoining) arcs[0], 'b' is map unit opposite arcs[1], ...
-    mapUnits = []
-    if arcs[1].ToFrom == "From":
-        mapUnits.append(arcs[1].RMU)
-    else:
-        mapUnits.append(arcs[1].LMU)
-    if arcs[2].ToFrom == "From":
-        mapUnits.append(arcs[2].RMU)
-    else:
-        mapUnits.append(arcs[2].LMU)
-    if arcs[0].ToFrom == "From":
-        mapUnits.append(arcs[0].RMU)
-    else:
-        mapUnits.append(arcs[0].LMU)
-    return mapUnits
-
-
-def arcOrder(i):
-    # for 4 arcs around a node, indexed 0--3, returns index of arcOpposite and indices of arcsAdjacent
-    if i == 0:
-        return 2, [1, 3]
-    elif i == 1:
-        return 3, [0, 2]
-    elif i == 2:
-        return 0, [1, 3]
-    elif i == 3:
-        return 1, [0, 2]
-
-
-def ptsGeographicAzimuth(pt1, pt2):
-    dx = pt2[0] - pt1[0]
-    dy = pt2[1] - pt1[1]
-    azi = math.atan2(dy, dx)
-    azi = 90 - math.degrees(azi)
-    if azi < 0:
-        azi = azi + 360
-    return azi
-
-
-def startEndGeogDirections(lineSeg):
-    firstPoint = [lineSeg[0].X, lineSeg[0].Y]
-    secondPoint = [lineSeg[1].X, lineSeg[1].Y]
-    lpt = len(lineSeg) - 1
-    ntlPoint = [lineSeg[lpt - 1].X, lineSeg[lpt - 1].Y]
-    lastPoint = [lineSeg[lpt].X, lineSeg[lpt].Y]
-    return ptsGeographicAzimuth(firstPoint, secondPoint), ptsGeographicAzimuth(
-        lastPoint, ntlPoint
-    )
-
-
 def makeNodeFC(fd, fc):
     addMsgAndPrint("Building feature class " + fc)
     fdfc = os.path.join(fd, fc)
@@ -271,208 +165,6 @@ def buildHKeyDict(DMU):
     return hKeyDict, sortedUnits
 
 
-def youngestMapUnit(mapUnits, hKeyDict):
-    # arcpy.AddMessage(f'mapUnits = {mapUnits}')
-    # arcpy.AddMessage(hKeyDict)
-    # returns youngest map unit in list mapUnits
-    ymu = mapUnits[0]
-    for mu in mapUnits[1:]:
-        # in Python 2.7 None is returned if the dictionary key is not found and 'None < str', evaluates to True.
-        # Python 3 is not so forgiving, this produces a TypeError
-        # but the code below reproduces the Python 2.7 behavior by returning "" if the dictionary key is not found
-        # Because '' and None can be be keys in hKeyDict, mu_hkey = hKeyDict.get(mu, "") was not working, returning None.
-        if hKeyDict[ymu] is None:
-            ymu_hkey = ""
-        else:
-            ymu_hkey = hKeyDict[ymu]
-
-        if hKeyDict[mu] is None:
-            mu_hkey = ""
-        else:
-            mu_hkey = hKeyDict[mu]
-
-        if mu_hkey < ymu_hkey:
-            ymu = mu
-    return ymu
-
-
-def isCoveringUnit(mu, hKeyDict):
-    if mu == None or mu == "":  # stuff outside map, unmapped areas
-        return False
-    elif hKeyDict[mu] < hKeyTestValue:
-        return True
-    else:
-        return False
-
-
-def processNodes(nodeList, hKeyDict):
-    # nodes is a list of nodes (points at which one or more arcs begins or ends)
-    addMsgAndPrint("Processing nodes")
-    badNodes = []
-    connectFIDs = []  # pairs of OIDs denoting arcs that should be merged
-    missingConcealedArcNodes = []
-    faultFlipNodes = []
-    count1 = 0
-    count2 = 0
-    count3 = 0
-    count4 = 0
-    count5 = 0
-    for node in nodeList:
-        arcs = node[2]
-        nArcs = len(arcs)
-        ######################
-        if nArcs == 1:
-            count1 += 1
-            if not isFault(arcs[0].Type):  # is a contact
-                if arcs[0].isConcealed():
-                    node.append("dangling concealed contact")
-                    badNodes.append(node)
-                else:  # dangling contact
-                    node.append("dangling contact")
-                    badNodes.append(node)
-        ######################
-        elif nArcs == 2:
-            count2 += 1
-            if arcs[0].Type != arcs[1].Type:
-                node.append("mismatched Type values")
-                badNodes.append(node)
-            if arcs[0].IsConc != arcs[1].IsConc:
-                node.append("one arc concealed, one not")
-                badNodes.append(node)
-            if sameArcAttributes(arcs[0], arcs[1]):
-                connectFIDs.append([arcs[0].OFID, arcs[1].OFID])
-            if (
-                isFault(arcs[0].Type)
-                and isFault(arcs[1].Type)
-                and sameToFrom(arcs[0], arcs[1])
-            ):
-                node.append(arcs[0].ToFrom + ", " + arcs[1].ToFrom)
-                faultFlipNodes.append(node)
-        ######################
-        elif nArcs == 3:
-            count3 += 1
-            nCon, conIndx = concealedArcs(arcs)
-            same, diff = sameTypeIndices(arcs)
-            mapUnits = adjoiningMapUnits(
-                arcs
-            )  # map units are ordered by not-adjacent arcs
-            if nCon in (1, 2):  # 1 or 2 arcs are concealed
-                node.append("impossible number of concealed arcs")
-                badNodes.append(node)
-            elif len(same) < 2:  # no two arcs have same type
-                node.append("at least 2 arcs must be same Type")
-                badNodes.append(node)
-            else:  # all arcs or none are concealed, at least two are of same type
-                if nCon == 3:
-                    if mapUnits[0] != mapUnits[1] or mapUnits[1] != mapUnits[2]:
-                        node.append(
-                            "all arcs concealed but bounding map units not all the same"
-                        )
-                        badNodes.append(node)
-                if len(same) == 2:  # only two arcs have same Type
-                    if isFault(arcs[same[0]].Type):
-                        if sameToFrom(arcs[same[0]], arcs[same[1]]):
-                            faultFlipNodes.append(node)
-                        elif sameArcAttributes(arcs[same[0]], arcs[same[1]]):
-                            connectFIDs.append([arcs[same[0]].OFID, arcs[same[1]].OFID])
-                    else:  # two arcs with same Type are not-faults; their shared adjacent poly should be youngest
-                        if youngestMapUnit(mapUnits, hKeyDict) == mapUnits[diff]:
-                            # if same arc attributes, flag for merge
-                            if sameArcAttributes(arcs[same[0]], arcs[same[1]]):
-                                connectFIDs.append(
-                                    [arcs[same[0]].OFID, arcs[same[1]].OFID]
-                                )
-                            # test to see if we could add a concealed extension
-                            if isCoveringUnit(
-                                youngestMapUnit(mapUnits, hKeyDict), hKeyDict
-                            ):
-                                missingConcealedArcNodes.append(node)
-                        else:
-                            node.append(
-                                "# "
-                                + str(mapUnits[diff])
-                                + " is not youngest unit in "
-                                + str(mapUnits)
-                            )
-                            badNodes.append(node)
-                else:  # all 3 arcs have same Type
-                    if isFault(arcs[same[0]].Type):
-                        if sameToFrom(arcs[0], arcs[1], arcs[2]):
-                            faultFlipNodes.append(node)
-                    else:  # all arcs are not-faults
-                        # find the arcs that bound the youngest map unit
-                        ymu = youngestMapUnit(mapUnits, hKeyDict)
-                        youngArcs = [0, 1, 2]
-                        youngArcs.remove(mapUnits.index(ymu))
-                        if sameArcAttributes(arcs[youngArcs[0]], arcs[youngArcs[1]]):
-                            connectFIDs.append(
-                                [arcs[youngArcs[0]].OFID, arcs[youngArcs[1]].OFID]
-                            )
-                        if isCoveringUnit(ymu, hKeyDict) == True:
-                            missingConcealedArcNodes.append(node)
-        ######################
-        elif nArcs == 4:
-            nCon, conIndx = concealedArcs(arcs)
-            if nCon != 0:
-                opp, adj = arcOrder(conIndx[0])
-            if nCon > 2:
-                node.append("too many concealed arcs")
-                badNodes.append(node)
-            elif nCon == 2:
-                if (
-                    arcs[conIndx[0]].Type != arcs[conIndx[1]].Type
-                    or arcs[adj[0]].Type != arcs[adj[1]].Type
-                ):
-                    node.append("opposite arcs must have same Type")
-                    badNodes.append(node)
-                elif not arcs[
-                    opp
-                ].isConcealed():  # thus the 2nd concealed arc must be adjacent
-                    node.append("adjacent arcs concealed")
-                    badNodes.append(node)
-                else:  #  geometry is OK. Test for arcs to be merged
-                    if sameArcAttributes(arcs[adj[0]], arcs[adj[1]]):
-                        connectFIDs.append([arcs[adj[0]].OFID, arcs[adj[1]].OFID])
-                    if isFault(arcs[conIndx[0]].Type) and sameToFrom(
-                        arcs[conIndx[0]], arcs[opp]
-                    ):
-                        faultFlipNodes.append(node)
-                    elif sameArcAttributes(
-                        arcs[conIndx[0]], arcs[opp]
-                    ):  # don't merge arcs when one should be flipped
-                        connectFIDs.append([arcs[conIndx[0]].OFID, arcs[opp].OFID])
-            elif nCon == 1:
-                # adjacent arcs must be same-type contacts and opposite arc must be of same type
-                if isFault(arcs[adj[0]].Type):
-                    node.append(
-                        "arcs adjacent to single concealed arc must not be faults"
-                    )
-                    badNodes.append(node)
-                elif arcs[opp].Type != arcs[conIndx[0]].Type:
-                    node.append(
-                        "concealed arc and unconcealed continuation must be same Type"
-                    )
-                    badNodes.append(node)
-                else:
-                    if sameArcAttributes(arcs[adj[0]], arcs[adj[1]]):
-                        connectFIDs.append([arcs[adj[0]].OFID, arcs[adj[1]].OFID])
-            else:  # nConc = 0
-                node.append("4 unconcealed arcs")
-                badNodes.append(node)
-            count4 += 1
-        ######################
-        else:  # 5 or more arcs at this node
-            count5 += 1
-            node.append("too many arcs")
-            badNodes.append(node)
-    addMsgAndPrint("  " + str(count1) + " 1-arc nodes")
-    addMsgAndPrint("  " + str(count2) + " 2-arc nodes")
-    addMsgAndPrint("  " + str(count3) + " 3-arc nodes")
-    addMsgAndPrint("  " + str(count4) + " 4-arc nodes")
-    addMsgAndPrint("  " + str(count5) + " 5+ arc nodes")
-    return badNodes, faultFlipNodes, missingConcealedArcNodes, connectFIDs
-
-
 def insertNodes(ptFc, nodeList):
     # creates insertcursor in pointFc
     addMsgAndPrint("  inserting points into " + os.path.basename(ptFc))
@@ -503,43 +195,41 @@ def insertNodesXY(ptFc, nodeList):
         cursor.insertRow(row)
 
 
-def getNodes(arcEndPoints):
-    #  sorts arcEndPoints into a Python list of nodes
+def getNodeArrays(graph):
+    #  makes a node_arrays.EndPoints, arrays of line ends sorted into nodes, from a node graph
     addMsgAndPrint("Sorting segment endpoints into nodes")
-    addMsgAndPrint("  " + str(numberOfRows(arcEndPoints)) + " endpoints")
-    nodeList = []
-    # open searchCursor on arcEndPoints sorted by POINT_X and POINT_Y
-    sql = (None, "ORDER BY POINT_X, POINT_Y")
-    fieldNames = ["POINT_X", "POINT_Y"]
-    fieldNames.extend(CAF_arc.fieldList)
-    lastX = -99999
-    lastY = -99999
-    nodeArcs = []
-    with arcpy.da.SearchCursor(
-        arcEndPoints, fieldNames, None, None, False, sql
-    ) as cursor:
-        for row in cursor:
-            x = row[0]
-            y = row[1]
-            thisArc = CAF_arc(row[2:])
-            if abs(x - lastX) < zeroValue and abs(y - lastY) < zeroValue:
-                nodeArcs.append(thisArc)
-            else:
-                if len(nodeArcs) > 0:
-                    # note that we sort arcs by LineDir, so that they are in clockwise order
-                    nodeArcs.sort(key=operator.attrgetter("LineDir"))
-                    nodeList.append([lastX, lastY, nodeArcs])
-                lastX = x
-                lastY = y
-                nodeArcs = [thisArc]
-        nodeArcs.sort(key=operator.attrgetter("LineDir"))
-        nodeList.append([lastX, lastY, nodeArcs])
-    addMsgAndPrint("  " + str(len(nodeList)) + " nodes")
-    return nodeList
+    rows = []
+    for end in graph.arcEnds():
+        # same fields as CAF_arc.fieldList, LineDir is the azimuth away from the node
+        row = [end.x, end.y]
+        row.extend(end.attribs[:7])
+        row.extend([end.direction, end.toFrom()])
+        row.extend(end.attribs[7:])
+        row.append(end.arcID)
+        rows.append(row)
+    addMsgAndPrint("  " + str(len(rows)) + " endpoints")
+    ends = node_arrays.EndPoints(rows, zeroValue)
+    addMsgAndPrint("  " + str(len(ends)) + " nodes")
+    return ends
+
+
+def processNodeArrays(ends, hKeyDict):
+    # same as processNodes(getNodes(arcEndPoints), hKeyDict), rules are evaluated for all nodes at once
+    addMsgAndPrint("Processing nodes")
+    (
+        badNodes,
+        faultFlipNodes,
+        missingConcealedArcNodes,
+        connectFIDs,
+        counts,
+    ) = node_arrays.processNodeArrays(ends, hKeyDict, hKeyTestValue, CAF_arc)
+    for n, label in zip(counts, ("1-arc", "2-arc", "3-arc", "4-arc", "5+ arc")):
+        addMsgAndPrint("  " + str(n) + " " + label + " nodes")
+    return badNodes, faultFlipNodes, missingConcealedArcNodes, connectFIDs
 
 
 def planarizeAndGetArcEndPoints(fds, caf, mup, fdsToken):
-    # returns a feature class of endpoints of all caf lines, two per planarized line segment
+    # returns planarized caf and a node_graph.NodeGraph of its line ends, two per planarized line segment
     addMsgAndPrint(
         "Planarizing " + os.path.basename(caf) + " and getting segment endpoints"
     )
@@ -566,45 +256,15 @@ def planarizeAndGetArcEndPoints(fds, caf, mup, fdsToken):
                 if hf in fns:
                     deleteFields.append(hf)
     arcpy.DeleteField_management(cafp, deleteFields)
-    #   calculate azimuths startDir and endDir
-    addMsgAndPrint("  adding StartAzimuth and EndAzimuth")
-    for f in ("LineDir", "StartAzimuth", "EndAzimuth"):
-        arcpy.AddField_management(cafp, f, "FLOAT")
+    #   LineDir and ToFrom are read from cafp by adjacencyTables
+    arcpy.AddField_management(cafp, "LineDir", "FLOAT")
     arcpy.AddField_management(cafp, "ToFrom", "TEXT", "", "", 4)
-    fields = ["SHAPE@", "StartAzimuth", "EndAzimuth"]
-    with arcpy.da.UpdateCursor(cafp, fields) as cursor:
-        for row in cursor:
-            lineSeg = row[0].getPart(0)
-            row[1], row[2] = startEndGeogDirections(lineSeg)
-            cursor.updateRow(row)
-    #   make endpoint feature class
-    addMsgAndPrint("  converting line ends to points")
-    arcEndPoints = (
-        fds + "/" + fdsToken + "xxx_EndPoints"
-    )  # will be a feature class in fds
-    arcEndPoints2 = arcEndPoints + "_end"
-    testAndDelete(arcEndPoints)
-    arcpy.FeatureVerticesToPoints_management(cafp, arcEndPoints, "START")
-    arcpy.CalculateField_management(arcEndPoints, "LineDir", "!StartAzimuth!", "PYTHON")
-    arcpy.CalculateField_management(arcEndPoints, "ToFrom", '"From"', "PYTHON")
-    testAndDelete(arcEndPoints2)
-    arcpy.FeatureVerticesToPoints_management(cafp, arcEndPoints2, "END")
-    arcpy.CalculateField_management(arcEndPoints2, "LineDir", "!EndAzimuth!", "PYTHON")
-    arcpy.CalculateField_management(arcEndPoints2, "ToFrom", '"To"', "PYTHON")
-    arcpy.Append_management(arcEndPoints2, arcEndPoints)
-    testAndDelete(arcEndPoints2)
-    #  delete some more fields
-    deleteFields = [
-        "EndAzimuth",
-        "StartAzimuth",
-        "LEFT_MapUnitPolys",
-        "RIGHT_MapUnitPolys",
-    ]
-    arcpy.DeleteField_management(arcEndPoints, deleteFields)
-    addMsgAndPrint("  adding POINT_X and POINT_Y")
-    arcpy.AddXY_management(arcEndPoints)
+    #   read line ends and their azimuths into a node graph
+    addMsgAndPrint("  reading line ends")
+    fields = CAF_arc.fieldList[:7] + ["RIGHT_MapUnit", "LEFT_MapUnit"]
+    graph = node_graph.NodeGraph.fromFeatureClass(cafp, fields, zeroValue)
     testAndDelete(planCaf)
-    return cafp, arcEndPoints
+    return cafp, graph
 
 
 def unplanarize(cafp, caf, connectFIDs):
@@ -1012,19 +672,18 @@ for infc in (inCaf, inMup):
 topoStuff = esriTopology(outFds, caf, mup)
 
 ### NODES
-planarizedCAF, arcEndPoints = planarizeAndGetArcEndPoints(outFds, caf, mup, fdsToken)
+planarizedCAF, nodeGraph = planarizeAndGetArcEndPoints(outFds, caf, mup, fdsToken)
 
-# sort arcEndPoints into list of nodes
-nodeList = getNodes(arcEndPoints)
+# sort line ends into arrays of nodes
+endPoints = getNodeArrays(nodeGraph)
 # assign nodes to various groups
-badNodes, faultFlipNodes, missingConcealedArcNodes, connectFIDs = processNodes(
-    nodeList, hKeyDict
+badNodes, faultFlipNodes, missingConcealedArcNodes, connectFIDs = processNodeArrays(
+    endPoints, hKeyDict
 )
 addMsgAndPrint("Bad nodes: " + str(len(badNodes)))
 addMsgAndPrint("Fault-flip nodes: " + str(len(faultFlipNodes)))
 addMsgAndPrint("Missing concealed-arc nodes: " + str(len(missingConcealedArcNodes)))
 addMsgAndPrint("ConnectFIDs: " + str(len(connectFIDs)))
-testAndDelete(arcEndPoints)
 
 ### MAKE OUTPUT FEATURE CLASSES
 badNodesFC = makeNodeFC(outFds, "errors_" + fdsToken + "_BadNodes")
@@ -1168,3 +827,4 @@ else:
 outHtml.write(htmlEnd)
 outHtml.close()
 addMsgAndPrint("DONE!")
+finish_trace()
@@ -18,15 +18,18 @@
 # 27 June 2019. Many fixes when investigating Issue 30 (described at master github repo)
 # 18 July 2019. Just a few syntax edits to make it usable in ArcGIS Pro with Python 3
 #  renamed to GeMS_TranslateToShape_AGP2.py
+# 17 October 2026. Long-field tables are streamed with the csv module, and a
+#  manifest.json in each output directory lets an interrupted export resume where it
+#  stopped. Tables are exported one at a time, arcpy geoprocessing is not thread-safe
 
 import arcpy
 import sys, os, glob, time
-import datetime
-import glob
+import csv
+import io
+import json
 from GeMS_utilityFunctions import *
-from numbers import Number
 
-versionString = "GeMS_TranslateToShape.py, version of 8/21/23"
+versionString = "GeMS_TranslateToShape.py, version of 10/17/26"
 rawurl = "https://raw.githubusercontent.com/DOI-USGS/gems-tools-pro/master/Scripts/GeMS_TranslateToShape.py"
 checkVersion(versionString, rawurl, "gems-tools-pro")
 
@@ -165,10 +168,13 @@ def dumpTable(fc, outName, isSpatial, outputDir, logfile, isOpen, fcName):
     if isSpatial:
         dumpString = "  " + dumpString
     addMsgAndPrint(dumpString)
+    fcLabel = os.path.basename(fc)
     if isSpatial:
-        logfile.write("  feature class {} dumped to shapefile {}\n".format(fc, outName))
+        logfile.write(
+            "  feature class {} dumped to shapefile {}\n".format(fcLabel, outName)
+        )
     else:
-        logfile.write("  table {} dumped to table\n".format(fc, outName))
+        logfile.write("  table {} dumped to table\n".format(fcLabel, outName))
     logfile.write("    field name remapping: \n")
 
     longFields = []
@@ -178,7 +184,11 @@ def dumpTable(fc, outName, isSpatial, outputDir, logfile, isOpen, fcName):
         # get the name string and chop off the joined table name if necessary
         fName = field.name
         for prefix in ("DescriptionOfMapUnits", "DataSources", "Glossary", fcName):
-            if fc != prefix and fName.find(prefix) == 0 and fName != fcName + "_ID":
+            if (
+                fcLabel != prefix
+                and fName.find(prefix) == 0
+                and fName != fcName + "_ID"
+            ):
                 fName = fName[len(prefix) + 1 :]
 
         if not fName.lower() in forget:
@@ -213,6 +223,7 @@ def dumpTable(fc, outName, isSpatial, outputDir, logfile, isOpen, fcName):
             )
         except:
             addMsgAndPrint("failed to translate table " + fc)
+            raise
     else:
         arcpy.TableToTable_conversion(
             fc, outputDir, outName, field_mapping=fieldmappings
@@ -224,57 +235,134 @@ def dumpTable(fc, outName, isSpatial, outputDir, logfile, isOpen, fcName):
             outText = outName[0:-4] + ".txt"
             logfile.write(
                 "    table "
-                + fc
+                + fcLabel
                 + " has long fields, thus dumped to file "
                 + outText
                 + "\n"
             )
-            csv_path = os.path.join(outputDir, outText)
-            csvFile = open(csv_path, "w")
-            fields = arcpy.ListFields(fc)
-            f_names = [
-                f.name for f in fields if f.type not in ["Blob", "Geometry", "Raster"]
-            ]
-
-            col_names = "|".join(f_names)
-            csvFile.write("{}\n|".format(col_names))
-            # addMsgAndPrint("FC name: "+ fc)
-            with arcpy.da.SearchCursor(fc, f_names) as cursor:
-                for row in cursor:
-                    rowString = str(row[0])
-                    for i in range(1, len(row)):  # use enumeration here?
-                        # if debug: addMsgAndPrint("Index: "+str(i))
-                        # if debug: addMsgAndPrint("Current row is: " + str(row[i]))
-                        if row[i] != None:
-                            xString = str(row[i])
-                            if isinstance(row[i], Number) or isinstance(
-                                row[i], datetime.datetime
-                            ):
-                                xString = str(row[i])
-                            else:
-                                # if debug: addMsgAndPrint("Current row type is: " + str(type(row[i])))
-                                xString = row[i].encode("ascii", "xmlcharrefreplace")
-                            # rowString = rowString+'|'+xString
-                        else:
-                            rowString = rowString + "|"
-                    csvFile.write(rowString + "\n")
-            csvFile.close()
+            dumpLongFields(fc, os.path.join(outputDir, outText))
     addMsgAndPrint("    Finished dump\n")
 
 
+def dumpLongFields(fc, txt_path):
+    """write all the fields of fc, except geometries, blobs and rasters, to a
+    pipe-delimited text file. Non-ascii characters are written as xml character
+    references"""
+    fields = arcpy.ListFields(fc)
+    f_names = [f.name for f in fields if f.type not in ["Blob", "Geometry", "Raster"]]
+    with open(
+        txt_path,
+        "w",
+        newline="",
+        encoding="ascii",
+        errors="xmlcharrefreplace",
+        buffering=1 << 20,
+    ) as txtFile:
+        writer = csv.writer(txtFile, delimiter="|", lineterminator="\n")
+        writer.writerow(f_names)
+        with arcpy.da.SearchCursor(fc, f_names) as cursor:
+            writer.writerows(cursor)
+
+
+def gdbStamp(gdb):
+    """latest modification time of the files in gdb. Lock files, which arcpy makes
+    and removes while the gdb is open, are left out"""
+    stamps = [
+        os.path.getmtime(f)
+        for f in glob.glob(os.path.join(gdb, "*"))
+        if not f.lower().endswith(".lock")
+    ]
+    return max(stamps, default=0)
+
+
+class Manifest:
+    """Record of the tables in an output directory that have been exported, and of
+    their part of logfile.txt, kept in manifest.json. An export of the same
+    geodatabase, unchanged, with the same version of this script, skips them"""
+
+    def __init__(self, outputDir, gdb):
+        self.path = os.path.join(outputDir, "manifest.json")
+        self.source = {
+            "gdb": os.path.abspath(gdb),
+            "stamp": gdbStamp(gdb),
+            "version": versionString,
+        }
+        self.done = {}
+
+    def load(self):
+        """True if there is a manifest of an earlier export of the same source"""
+        try:
+            with open(self.path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if manifest.get("source") != self.source:
+            return False
+        self.done = manifest["done"]
+        return True
+
+    def log(self, key):
+        return self.done.get(key)
+
+    def finish(self, key, log):
+        self.done[key] = log
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"source": self.source, "done": self.done}, f)
+        os.replace(tmp, self.path)
+
+
 def makeOutputDir(gdb, outWS, isOpen):
     outputDir = os.path.join(outWS, os.path.basename(gdb)[0:-4])
     if isOpen:
         outputDir = outputDir + "-open"
     else:
         outputDir = outputDir + "-simple"
-    addMsgAndPrint("  Making {}...".format(outputDir))
-    if os.path.exists(outputDir):
-        arcpy.Delete_management(outputDir)
-    os.mkdir(outputDir)
+    manifest = Manifest(outputDir, gdb)
+    if os.path.exists(outputDir) and manifest.load():
+        addMsgAndPrint("  Resuming {}...".format(outputDir))
+    else:
+        addMsgAndPrint("  Making {}...".format(outputDir))
+        if os.path.exists(outputDir):
+            arcpy.Delete_management(outputDir)
+        os.mkdir(outputDir)
     logfile = open(os.path.join(outputDir, "logfile.txt"), "w")
     logfile.write("file written by " + versionString + "\n\n")
-    return outputDir, logfile
+    return outputDir, logfile, manifest
+
+
+def runExports(pieces, manifest, logfile):
+    """pieces are strings for the logfile and (key, job) exports. job(log) exports
+    one table and writes its part of the logfile to log. Exports that are in the
+    manifest are skipped. An export is added to the manifest only if job does not
+    raise an error, so a failed table is tried again on the next run. The logfile
+    is written in the order of pieces"""
+    todo = [p for p in pieces if not isinstance(p, str) and manifest.log(p[0]) is None]
+    if len(todo) < sum(1 for p in pieces if not isinstance(p, str)):
+        addMsgAndPrint("  Skipping tables exported by an earlier run")
+
+    failed = {}
+    for key, job in todo:
+        log = io.StringIO()
+        try:
+            job(log)
+        except Exception as error:
+            addMsgAndPrint("  Failed to export {}: {}".format(key, error))
+            failed[key] = log.getvalue() + "    FAILED: {}\n".format(error)
+            continue
+        manifest.finish(key, log.getvalue())
+
+    for piece in pieces:
+        if isinstance(piece, str):
+            logfile.write(piece)
+        elif piece[0] in failed:
+            logfile.write(failed[piece[0]])
+        else:
+            logfile.write(manifest.log(piece[0]) or "")
+
+
+def dumpJob(fc, outName, isSpatial, outputDir, isOpen, fcName):
+    return lambda log: dumpTable(fc, outName, isSpatial, outputDir, log, isOpen, fcName)
 
 
 def dummyVal(pTerm, pVal):
@@ -379,10 +467,11 @@ def mapUnitPolys(stdLithDict, outputDir, logfile):
     except:
         addMsgAndPrint(arcpy.GetMessages())
         addMsgAndPrint("  Failed to translate MapUnitPolys")
-
-    for lyr in ["DMU", "MUP", "MUP2"]:
-        if arcpy.Exists(lyr):
-            arcpy.Delete_management(lyr)
+        raise
+    finally:
+        for lyr in ["DMU", "MUP", "MUP2"]:
+            if arcpy.Exists(lyr):
+                arcpy.Delete_management(lyr)
 
 
 def linesAndPoints(fc, outputDir, logfile):
@@ -427,47 +516,53 @@ def main(gdbCopy, outWS, oldgdb):
     #
     isOpen = False
     addMsgAndPrint("")
-    outputDir, logfile = makeOutputDir(oldgdb, outWS, isOpen)
+    outputDir, logfile, manifest = makeOutputDir(oldgdb, outWS, isOpen)
     arcpy.env.workspace = gdbCopy
 
-    if "StandardLithology" in arcpy.ListTables():
-        stdLithDict = makeStdLithDict()
-    else:
-        stdLithDict = "None"
-    mapUnitPolys(stdLithDict, outputDir, logfile)
+    def mupJob(log):
+        if "StandardLithology" in arcpy.ListTables():
+            stdLithDict = makeStdLithDict()
+        else:
+            stdLithDict = "None"
+        mapUnitPolys(stdLithDict, outputDir, log)
+
+    pieces = [("MapUnitPolys.shp", mupJob)]
 
     arcpy.env.workspace = os.path.join(gdbCopy, "GeologicMap")
     pointfcs = arcpy.ListFeatureClasses("", "POINT")
     linefcs = arcpy.ListFeatureClasses("", "LINE")
     arcpy.env.workspace = gdbCopy
-    for fc in linefcs:
-        linesAndPoints(fc, outputDir, logfile)
-    for fc in pointfcs:
-        linesAndPoints(fc, outputDir, logfile)
+    for fc in linefcs + pointfcs:
+        job = lambda log, fc=fc: linesAndPoints(fc, outputDir, log)
+        pieces.append((fc + ".shp", job))
+
+    runExports(pieces, manifest, logfile)
     logfile.close()
     #
     # Open version
     #
     isOpen = True
-    outputDir, logfile = makeOutputDir(oldgdb, outWS, isOpen)
+    outputDir, logfile, manifest = makeOutputDir(oldgdb, outWS, isOpen)
 
     # list featuredatasets
     arcpy.env.workspace = gdbCopy
     fds = arcpy.ListDatasets()
 
     # for each featuredataset
+    pieces = []
     for fd in fds:
         addMsgAndPrint("  Processing feature data set {}...".format(fd))
-        logfile.write("Feature data set {}\n".format(fd))
+        fdLog = "Feature data set {}\n".format(fd)
         try:
-            spatialRef = arcpy.Describe(fd).SpatialReference
-            logfile.write("  spatial reference framework\n")
-            logfile.write("    name = {}\n".format(spatialRef.Name))
-            logfile.write("    spheroid = {}\n".format(spatialRef.SpheroidName))
-            logfile.write("    projection = {}\n".format(spatialRef.ProjectionName))
-            logfile.write("    units = {}\n".format(spatialRef.LinearUnitName))
+            spatialRef = arcpy.Describe(os.path.join(gdbCopy, fd)).SpatialReference
+            fdLog += "  spatial reference framework\n"
+            fdLog += "    name = {}\n".format(spatialRef.Name)
+            fdLog += "    spheroid = {}\n".format(spatialRef.SpheroidName)
+            fdLog += "    projection = {}\n".format(spatialRef.ProjectionName)
+            fdLog += "    units = {}\n".format(spatialRef.LinearUnitName)
         except:
-            logfile.write("  spatial reference framework appears to be undefined\n")
+            fdLog += "  spatial reference framework appears to be undefined\n"
+        pieces.append(fdLog)
 
         # generate featuredataset prefix
         pfx = ""
@@ -478,25 +573,29 @@ def main(gdbCopy, outWS, oldgdb):
         arcpy.env.workspace = os.path.join(gdbCopy, fd)
         fcList = arcpy.ListFeatureClasses()
         if fcList != None:
-            arcpy.AddMessage(fc)
             for fc in fcList:
                 # don't dump Anno classes
-                if arcpy.Describe(fc).featureType != "Annotation":
+                fcPath = os.path.join(gdbCopy, fd, fc)
+                if arcpy.Describe(fcPath).featureType != "Annotation":
                     outName = "{}_{}.shp".format(pfx, fc)
-                    dumpTable(fc, outName, True, outputDir, logfile, isOpen, fc)
+                    job = dumpJob(fcPath, outName, True, outputDir, isOpen, fc)
+                    pieces.append((outName, job))
                 else:
                     addMsgAndPrint(
                         "    Skipping annotation feature class {}\n".format(fc)
                     )
         else:
             addMsgAndPrint("   No feature classes in this dataset!")
-        logfile.write("\n")
+        pieces.append("\n")
 
     # list tables
     arcpy.env.workspace = gdbCopy
     for tbl in arcpy.ListTables():
         outName = tbl + ".csv"
-        dumpTable(tbl, outName, False, outputDir, logfile, isOpen, tbl)
+        job = dumpJob(os.path.join(gdbCopy, tbl), outName, False, outputDir, isOpen, tbl)
+        pieces.append((outName, job))
+
+    runExports(pieces, manifest, logfile)
     logfile.close()
 
 
@@ -533,3 +632,4 @@ else:
     except:
         addMsgAndPrint("    As usual, failed to delete temporary geodatabase")
         addMsgAndPrint("    Please delete " + newgdb + "\n")
+finish_trace()
@@ -76,11 +76,18 @@ import os
 import sys
 import time
 import copy
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from lxml import etree
 from pathlib import Path
 import GeMS_utilityFunctions as guf
 import GeMS_Definition as gdef
 import topology as tp
+import table_scan as ts
+import id_index as idx
+import validation_cache as vc
+import vocabulary as vb
+import string_fixes as sf
 from jinja2 import Environment, FileSystemLoader
 
 scripts_dir = Path.cwd()
@@ -102,7 +109,7 @@ reload(mu)
 # values dictionary gets sent to report_template.jinja errors_template.jinja
 val = {}
 
-version_string = "GeMS_ValidateDatabase.py, version of 02/19/2025"
+version_string = "GeMS_ValidateDatabase.py, version of 10/17/2026"
 val["version_string"] = version_string
 val["datetime"] = time.asctime(time.localtime(time.time()))
 
@@ -116,6 +123,14 @@ for f in gdef.standard_fields:
 
 use_idfield = False
 
+# TableScan of the database, made in main(). Rules read table values through
+# values() or the scan directly so that each table is only read once
+table_scan = None
+
+# References of the database (DMU MapUnits, Glossary Terms, DataSources_IDs and
+# valid GeoMaterials), made in main(). See vocabulary.py
+vocab = None
+
 
 def check_sr(db_obj, db_dict):
     """Checks the datum of the spatial reference. Warning if not NAD83 or WGS84"""
@@ -153,32 +168,57 @@ def compare_sr(obj1, obj2, db_dict):
 
 def values(db_dict, table, field, what, where=None):
     """List or dictionary {[oid]: value} of values found in a field in a
-    dictionary is {oid: value}"""
+    dictionary is {oid: value}
+    Values come from the shared table scan unless a where clause is supplied"""
     vals = None
-    if table in db_dict:
+    if table in db_dict and where is None and not table_scan is None:
+        cols = table_scan.columns(table)
+        if what == "dictionary":
+            oid = which_id(db_dict, table)
+            # same order as ORDER BY field, nulls first
+            pairs = sorted(
+                zip(cols[oid], cols[field]), key=lambda p: (p[1] is not None, p[1])
+            )
+            vals = {k: v for k, v in pairs}
+        else:
+            vals = list(cols[field])
+    elif table in db_dict:
         # fields = db_dict[table]["fields"]
         if what == "dictionary":
             oid = which_id(db_dict, table)
 
-            vals = {
-                r[0]: r[1]
-                for r in arcpy.da.SearchCursor(
-                    db_dict[table]["catalogPath"],
-                    field_names=[oid, field],
-                    where_clause=where,
-                    sql_clause=(None, f"ORDER BY {field}"),
-                )
-            }
+            with ts.arcpy_lock:
+                vals = {
+                    r[0]: r[1]
+                    for r in arcpy.da.SearchCursor(
+                        db_dict[table]["catalogPath"],
+                        field_names=[oid, field],
+                        where_clause=where,
+                        sql_clause=(None, f"ORDER BY {field}"),
+                    )
+                }
         else:
-            vals = [
-                r[0]
-                for r in arcpy.da.SearchCursor(
-                    db_dict[table]["catalogPath"], field_names=field, where_clause=where
-                )
-            ]
+            with ts.arcpy_lock:
+                vals = [
+                    r[0]
+                    for r in arcpy.da.SearchCursor(
+                        db_dict[table]["catalogPath"],
+                        field_names=field,
+                        where_clause=where,
+                    )
+                ]
     return vals
 
 
+def duplicates(db_dict, table, field):
+    """Sorted list of the non-null values that occur more than once in a field"""
+    vals = [v for v in values(db_dict, table, field, "list") if not v is None]
+    dups = [k for k, n in Counter(vals).items() if n > 1]
+    dups.sort()
+
+    return dups
+
+
 def which_id(db_dict, table):
     """Determine whether to report the value in the table's _ID field or OBJECTID"""
     fields = db_dict[table]["fields"]
@@ -371,11 +411,14 @@ def check_fields(db_dict, level, schema_extensions):
     return errors, schema_extensions, fld_warnings
 
 
-def check_topology(db_dict, workdir, is_gpkg, topo_pairs):
+def check_topology(db_dict, workdir, is_gpkg, topo_pairs, db_path=None):
     """2.3 GeologicMap topology: no internal gaps or overlaps in MapUnitPolys, boundaries of
     MapUnitPolys are covered by ContactsAndFaults 3.2 All map-like feature datasets obey
     topology rules. No MapUnitPolys gaps or overlaps. No ContactsAndFaults overlaps, self-overlaps,
-    or self-intersections. MapUnitPoly boundaries covered by ContactsAndFaults"""
+    or self-intersections. MapUnitPoly boundaries covered by ContactsAndFaults
+    Where there is no topology to evaluate and GEMS_TOPOLOGY_ENGINE=native, the rules
+    are checked by topology_engine on the feature classes in db_path instead of in a
+    topology made in a scratch gdb"""
     has_been_validated = False
     level_2_errors = [
         "topology errors",
@@ -408,6 +451,12 @@ def check_topology(db_dict, workdir, is_gpkg, topo_pairs):
             if not is_gpkg:
                 ap(f"\tNo topology found in {gmap}")
 
+            if db_path and tp.use_native():
+                level_2_errors, level_3_errors = tp.eval_native(
+                    db_path, topo_pair, db_dict, level_2_errors, level_3_errors
+                )
+                continue
+
             top_path, has_been_validated = tp.make_topology(workdir, topo_pair, db_dict)
 
         # evaluate the topology
@@ -448,9 +497,9 @@ def check_map_units(db_dict, level, all_map_units, fds_map_units):
     #     else:
     #         return missing, unused, None, None
 
-    dmu_units = list(set(values(db_dict, "DescriptionOfMapUnits", "MapUnit", "list")))
-    dmu_units = [u for u in dmu_units if not u == None]
-    fds_map_units["DescriptionOfMapUnits"] = dmu_units
+    dmu_units = vocab["MapUnit"]
+    fds_map_units["DescriptionOfMapUnits"] = list(dmu_units)
+    all_map_units = vb.count(all_map_units, [])
 
     if level == 2:
         # just checking MapUnitPolys gems_equivalent feature classes
@@ -521,21 +570,18 @@ def check_map_units(db_dict, level, all_map_units, fds_map_units):
             ]
 
             if mu_fields:
-                with arcpy.da.SearchCursor(
-                    db_dict[mu_table]["catalogPath"], mu_fields
-                ) as cursor:
-                    for row in cursor:
-                        for i, val in enumerate(row):
-                            if val:
-                                if not val in dmu_units:
-                                    html = f"""
-                                        <span class="table">{mu_table}</span>,
-                                        <span class="field">{mu_fields[i]}</span>,
-                                        <span class="value">{val}</span> 
-                                        """
-                                    missing.append(html)
-                                all_map_units.append(val)
-                                fds_map_units[fd].extend(row)
+                for row in table_scan.rows(mu_table, mu_fields):
+                    for i, val in enumerate(row):
+                        if val:
+                            if not val in dmu_units:
+                                html = f"""
+                                    <span class="table">{mu_table}</span>,
+                                    <span class="field">{mu_fields[i]}</span>,
+                                    <span class="value">{val}</span> 
+                                    """
+                                missing.append(html)
+                            all_map_units[val] += 1
+                            fds_map_units[fd].extend(row)
 
             # reset mu_fields and check again
             # look at fields that have MapUnit in the name but are qualified
@@ -551,26 +597,21 @@ def check_map_units(db_dict, level, all_map_units, fds_map_units):
             ]
 
             if mu_fields:
-                with arcpy.da.SearchCursor(
-                    db_dict[mu_table]["catalogPath"], mu_fields
-                ) as cursor:
-                    for row in cursor:
-                        for i, val in enumerate(row):
-                            if not val in dmu_units and not val == None:
-                                html = f"""
-                                <span class="table">{mu_table}</span>,
-                                <span class="field">{mu_fields[i]}</span>,
-                                <span class="value">{val}</span>
-                                """
-                                mu_warnings.append(html)
+                for row in table_scan.rows(mu_table, mu_fields):
+                    for i, val in enumerate(row):
+                        if not val in dmu_units and not val == None:
+                            html = f"""
+                            <span class="table">{mu_table}</span>,
+                            <span class="field">{mu_fields[i]}</span>,
+                            <span class="value">{val}</span>
+                            """
+                            mu_warnings.append(html)
 
             fds_map_units[fd] = list(set(fds_map_units[fd]))
 
-        all_map_units.extend(list(set(all_map_units)))
-
     missing = [i for n, i in enumerate(missing) if i not in missing[:n]]
 
-    unused.extend(list(set(dmu_units) - set(all_map_units)))
+    unused.extend(dmu_units.unused(all_map_units))
 
     if level == 2:
         return (missing, all_map_units, fds_map_units)
@@ -629,9 +670,7 @@ def glossary_check(db_dict, level, all_gloss_terms):
     ]
 
     # compare Term fields in the tables with the Glossary
-    glossary_terms = values(db_dict, "Glossary", "Term", "list")
-    if not glossary_terms:
-        glossary_terms = [""]
+    glossary_terms = vocab["Term"]
     if tables:
         for table in tables:
             id_fld = which_id(db_dict, table)
@@ -645,19 +684,18 @@ def glossary_check(db_dict, level, all_gloss_terms):
 
             if fields:
                 for field in fields:
-                    if field == "GeoMaterialConfidence":
-                        where = "GeoMaterial IS NOT NULL"
-                    else:
-                        where = None
-
                     # vals = values(db_dict, table, field, "dictionary", where)
-                    vals = values(db_dict, table, field, "list", where)
+                    vals = values(db_dict, table, field, "list")
+
+                    # GeoMaterialConfidence only matters where there is a GeoMaterial
+                    if field == "GeoMaterialConfidence" and "GeoMaterial" in [
+                        f.name for f in db_dict[table]["fields"]
+                    ]:
+                        geomats = values(db_dict, table, "GeoMaterial", "list")
+                        vals = [v for v, gm in zip(vals, geomats) if gm is not None]
 
-                    # put all of these glossary terms in all_gloss_terms list
-                    field_vals = list(set(vals))
-                    if None in field_vals:
-                        field_vals.remove(None)
-                    all_gloss_terms.extend(field_vals)
+                    # count all of these glossary terms in all_gloss_terms
+                    all_gloss_terms = vb.count(all_gloss_terms, vals)
 
                     # sort the list and remove null values
                     # sorted_vals = {k: vals[k] for k in sorted(vals) if vals[k]}
@@ -712,8 +750,8 @@ def glossary_check(db_dict, level, all_gloss_terms):
                             # listed as warnings, not errors
                             for g_field in gemsy_fields:
                                 vals = values(db_dict, table, g_field, "list")
+                                all_gloss_terms = vb.count(all_gloss_terms, vals)
                                 vals = list(set([el for el in vals if el]))
-                                all_gloss_terms.extend(vals)
                                 sorted_vals = [el for el in sorted(vals) if el]
 
                                 # look for missing values
@@ -742,10 +780,13 @@ def sources_check(db_dict, level, all_sources):
 
     # first check for DataSources table and DataSources_ID field
     if not "DataSources" in db_dict:
-        return "Could not find DataSources table. See Rule 2.1", []
+        return "Could not find DataSources table. See Rule 2.1", Counter()
 
     if not "DataSources_ID" in [f.name for f in db_dict["DataSources"]["fields"]]:
-        return "Could not find DataSources_ID field in DataSources. See Rule 2.1", []
+        return (
+            "Could not find DataSources_ID field in DataSources. See Rule 2.1",
+            Counter(),
+        )
 
     # found table and field, proceeed
     # decide which tables to check
@@ -780,7 +821,8 @@ def sources_check(db_dict, level, all_sources):
         f"MissingDataSources{level}",
     ]
 
-    gems_sources = list(set(values(db_dict, "DataSources", "DataSources_ID", "list")))
+    gems_sources = vocab["DataSources_ID"]
+    all_sources = vb.count(all_sources, [])
     missing = []
     for table in tables:
         where = None
@@ -799,8 +841,7 @@ def sources_check(db_dict, level, all_sources):
                 if val:
                     # parse pipe-delimited source ids
                     for el in val.split("|"):
-                        if not el.strip() in all_sources:
-                            all_sources.append(el.strip())
+                        all_sources[el.strip()] += 1
                         if not el.strip() in gems_sources:
                             if guf.is_bad_null(el):
                                 el = "NULL value or empty string (see Rule 3.13)"
@@ -868,7 +909,7 @@ def rule3_5_and_7(db_dict, table, all_vals):
     """3.5 No unnecessary terms in Glossary
     3.7 No unnecessary sources in DataSources"""
     if table == "glossary":
-        terms = set(values(db_dict, "Glossary", "Term", "list"))
+        terms = vocab["Term"]
         unused = [
             "unnecessary term(s) in Glossary",
             "3.5 Terms in Glossary that are not used in geodatabase",
@@ -876,14 +917,14 @@ def rule3_5_and_7(db_dict, table, all_vals):
         ]
 
     elif table == "datasources":
-        terms = set(values(db_dict, "DataSources", "DataSources_ID", "list"))
+        terms = vocab["DataSources_ID"]
         unused = [
             "unused source(s) in DataSources",
             "3.7 DataSources_IDs in DataSources that are not used in geodatabase",
             "UnusedSources",
         ]
 
-    unused.extend(list(terms - set(all_vals)))
+    unused.extend(terms.unused(all_vals))
 
     return unused
 
@@ -953,9 +994,13 @@ def rule3_10(db_dict):
         }
 
         # find duplicated pipe delim keys
-        pipe_keys = [v[0] for v in piped_dict.values()]
-        dupe_pipes = [hk for hk in pipe_keys if pipe_keys.count(hk) > 1]
-        dupe_pipes = set(dupe_pipes)
+        hk_index = idx.IdIndex()
+        hk_index.add_column(
+            "DescriptionOfMapUnits",
+            piped_dict.keys(),
+            [v[0] for v in piped_dict.values()],
+        )
+        dupe_pipes = set(hk_index.duplicates())
 
         # iterate through dictionary items
         for k, v in piped_dict.items():
@@ -993,9 +1038,9 @@ def rule3_10(db_dict):
         # or 001, 002, 003
 
         # look for duplicates
-        hks = list(hk_dict.values())
-        dupes = [hk for hk in hks if hks.count(hk) > 1]
-        dupes = set(dupes)
+        hk_index = idx.IdIndex()
+        hk_index.add_column("DescriptionOfMapUnits", hk_dict.keys(), hk_dict.values())
+        dupes = set(hk_index.duplicates())
 
         # itrate through dictionary
         for oid, hkey in hk_dict.items():
@@ -1048,32 +1093,31 @@ def rule3_11(db_dict, ref_gmd):
 
     # look for null values in GeoMaterialDict
     flds = ["HierarchyKey", "GeoMaterial", "IndentedName", "Definition"]
-    with arcpy.da.SearchCursor(gdb_gmd, flds) as cursor:
-        for row in cursor:
-            if any(n is None for n in row):
-                errors.append(
-                    f'There are null values in <span class="table">GeoMaterialDict</span>. Check "Refresh GeoMaterial Dict" on next validation'
-                )
-                return errors
+    for row in table_scan.rows("GeoMaterialDict", flds):
+        if any(n is None for n in row):
+            errors.append(
+                f'There are null values in <span class="table">GeoMaterialDict</span>. Check "Refresh GeoMaterial Dict" on next validation'
+            )
+            return errors
 
     # compare ref_gmd with gdb_gmd
-    ref_gmd_dict = {
-        # r[0].lower().strip(): r[1].lower().strip()
-        r[0]: r[1]
+    ref_geomats = vocab["GeoMaterial"]
+    ref_definitions = {
+        vb.normalized(r[0]): r[1].lower().strip()
         for r in arcpy.da.SearchCursor(ref_gmd, ["GeoMaterial", "Definition"])
     }
     gdb_gmd_dict = {
         # r[0].lower().strip(): r[1].lower().strip()
         r[0]: r[1]
-        for r in arcpy.da.SearchCursor(gdb_gmd, ["GeoMaterial", "Definition"])
+        for r in table_scan.rows("GeoMaterialDict", ["GeoMaterial", "Definition"])
     }
     for k, v in gdb_gmd_dict.items():
         if k:
             # is the geomaterial in ref_gmd?
-            if k.lower().strip() in [n.lower().strip() for n in ref_gmd_dict.keys()]:
+            if k in ref_geomats:
                 if v:
                     # is the definition correct?
-                    if not v.lower().strip() == ref_gmd_dict[k].lower().strip():
+                    if not v.lower().strip() == ref_definitions[vb.normalized(k)]:
                         html = f'Definition of <span class="value">{k}</span> does not match GeMS standard'
                         errors.append(html)
                 else:
@@ -1106,10 +1150,6 @@ def rule3_11(db_dict, ref_gmd):
 
     # iterate through those tables
     msgs = []
-    # list of reference geomaterials
-    ref_geomats = [
-        r[0].lower().strip() for r in arcpy.da.SearchCursor(ref_gmd, "GeoMaterial")
-    ]
     for table in geomat_tables:
         # list of GeoMaterials in the table
         tbl_geomats = list(set(values(db_dict, table, "GeoMaterial", "list")))
@@ -1117,7 +1157,7 @@ def rule3_11(db_dict, ref_gmd):
             tbl_geomats = list(filter(None, tbl_geomats))
         if tbl_geomats:
             for geomat in tbl_geomats:
-                if not geomat.lower().strip() in ref_geomats and not guf.empty(geomat):
+                if not geomat in ref_geomats and not guf.empty(geomat):
                     html = f'<span class="value">{geomat}</span> in <span class="table">{table}</span> is not a valid GeoMaterial'
                     msgs.append(html)
     if msgs:
@@ -1134,22 +1174,36 @@ def rule3_12(db_dict, gdb_path):
         "3.12 Duplicated _ID Values. Missing value indicates an empty string, i.e., one or more space or tabs",
         "duplicate_ids",
     ]
-    all_ids = [None]
-    set_ids = []
+    # one index of every _ID value in the database
+    id_index = idx.IdIndex()
     for k in [t for t, v in db_dict.items() if "fields" in v]:
         idf = f"{k}_ID"
         if idf in [f.name for f in db_dict[k]["fields"]]:
-            with arcpy.da.SearchCursor(db_dict[k]["catalogPath"], idf) as cursor:
-                for row in cursor:
-                    if not row[0] in all_ids:
-                        all_ids.append(row[0])
-                    else:
-                        to_html = f"""
-                            <span class="table">{k}</span>, 
-                            <span class="field">{idf}</span>, 
-                            <span class="value">{row[0]}</span>
-                            """
-                        set_ids.append(to_html)
+            cols = table_scan.columns(k)
+            id_index.add_column(k, cols[table_scan.oid_field(k)], cols[idf])
+
+    set_ids = []
+    for dupe in id_index.duplicates():
+        origin = id_index.first_seen[dupe][0]
+        for k, oid in id_index.repeats[dupe]:
+            to_html = f"""
+                <span class="table">{k}</span>, 
+                <span class="field">{k}_ID</span>, 
+                <span class="value">{dupe}</span>
+                """
+            # report where the value was first found if it is another table
+            if k != origin:
+                to_html = f"""{to_html}(also in <span class="table">{origin}</span>)"""
+            set_ids.append(to_html)
+
+    # null _IDs are reported too
+    for k, oid in id_index.nulls:
+        to_html = f"""
+            <span class="table">{k}</span>, 
+            <span class="field">{k}_ID</span>, 
+            <span class="value">None</span>
+            """
+        set_ids.append(to_html)
 
     if set_ids:
         duplicate_ids.extend((list(set(set_ids))))
@@ -1179,28 +1233,20 @@ def rule3_13(db_dict):
         text_fields = [f.name for f in db_dict[table]["fields"] if f.type == "String"]
         for field in text_fields:
             val_dict = values(db_dict, table, field, "dictionary")
-            for k, v in val_dict.items():
-                if v:
-                    if v.isspace() or v.lower() in ("&ltnull&gt", "<null>", ""):
-                        html = f"""
-                            <span class="table">{table}</span>, 
-                            <span class="field"> {field}</span>, 
-                            <span class="field">{id_fld}</span> 
-                            <span class="value">{str(k)}</span>
-                            """
-                        zero_length_strings.append(html)
-
-            # also collect leading_trailing_spaces for 'other stuff' report
-            for n in [
-                k for k, v in val_dict.items() if v and (len(v.strip()) != len(v))
-            ]:
+            # the same test as the dry run of GeMS_FixStrings
+            found = sf.problems(list(val_dict), {field: list(val_dict.values())})
+            for f, k, issue in found:
                 html = f"""
                     <span class="table">{table}</span>, 
                     <span class="field"> {field}</span>, 
                     <span class="field">{id_fld}</span> 
-                    <span class="value">{str(n)}</span>
+                    <span class="value">{str(k)}</span>
                     """
-                leading_trailing_spaces.append(html)
+                if issue == sf.NULL:
+                    zero_length_strings.append(html)
+                else:
+                    # also collect leading_trailing_spaces for 'other stuff' report
+                    leading_trailing_spaces.append(html)
 
     return zero_length_strings, leading_trailing_spaces
 
@@ -1430,6 +1476,578 @@ def del_extra(db_dict, table, field, all_terms):
             if not row[0] in all_terms:
                 cursor.deleteRow()
 
+    # rows are gone, the next request for this table has to re-read it
+    table_scan.invalidate(table)
+    vocab.invalidate(field)
+
+
+# RULE REGISTRY
+# Each rule is registered with its key, its function and the keys of the rules it needs.
+# The functions take the ctx dictionary of database information and the results
+# of earlier rules and return a dictionary of entries for val. A rule only starts
+# after the rules it needs have finished. Results are merged into val in the order
+# of the registry, not in the order in which the rules finish, so the reports are
+# the same no matter how many workers are used.
+# Rules registered with serial=True run geoprocessing tools or arcpy cursors and
+# are run in the main thread, alone: the rules already running are waited for
+# first and no rule starts until they are done. Other rules run in worker threads
+# and read through OGR and the table scan, which hold table_scan.arcpy_lock around
+# any arcpy fallback.
+# inputs and geometry are functions of ctx that return the tables whose values
+# or shapes the rule reads (inputs=None means every table) and outputs are the ctx
+# entries the rule makes for the rules that need it. state is a function of ctx and
+# the cache that returns anything else the rule reads, e.g., a file or the state
+# of a topology. These are used to decide whether the results of the last
+# validation can be reused, see validation_cache.py
+rule_registry = []
+
+# number of rules that are allowed to run at the same time
+rule_workers = min(8, os.cpu_count() or 1)
+
+
+def register(
+    key, needs=(), serial=False, inputs=None, geometry=None, state=None, outputs=()
+):
+    def wrap(func):
+        rule_registry.append(
+            {
+                "key": key,
+                "func": func,
+                "needs": tuple(needs),
+                "serial": serial,
+                "inputs": inputs,
+                "geometry": geometry,
+                "state": state,
+                "outputs": tuple(outputs),
+            }
+        )
+        return func
+
+    return wrap
+
+
+def all_tables(ctx):
+    return [k for k, v in ctx["db_dict"].items() if "fields" in v]
+
+
+def no_tables(ctx):
+    # rules that only look at the schema, which is always part of the fingerprint
+    return []
+
+
+def gems_tables(*gems_names):
+    """inputs function for the tables that are the GeMS equivalent of gems_names"""
+
+    def tables(ctx):
+        return [
+            k
+            for k, v in ctx["db_dict"].items()
+            if v["gems_equivalent"] in gems_names and "fields" in v
+        ]
+
+    return tables
+
+
+def topology_fcs(ctx):
+    return [n for pair in ctx["tp_pairs"] for n in pair[2:] if not "__missing__" in n]
+
+
+def topology_state(ctx, cache):
+    # errors tables and dirty areas of the topologies in the database, which
+    # change when a topology is validated or errors are marked as exceptions
+    if ctx["is_gpkg"]:
+        return None
+    return [
+        tp.topology_state(v["catalogPath"])
+        for k, v in sorted(ctx["db_dict"].items())
+        if v.get("dataType") == "Topology"
+    ]
+
+
+def ref_gmd_state(ctx, cache):
+    return cache.file_fingerprint(ctx["ref_gmd"])
+
+
+req_elements = [t for t in gdef.rule2_1_elements if t != "GeologicMap"]
+
+
+@register("2.1", inputs=no_tables, outputs=("tp_pairs",))
+def run_rule2_1(ctx):
+    ap(
+        """Rule 2.1 - Has required elements: nonspatial tables DataSources, 
+        DescriptionOfMapUnits, GeoMaterialDict; feature dataset GeologicMap with 
+        feature classes ContactsAndFaults and MapUnitPolys"""
+    )
+    rule2_1_results = rule2_1(ctx["db_dict"], ctx["is_gpkg"])
+    ctx["tp_pairs"] = rule2_1_results[1]
+
+    return {"rule2_1": rule2_1_results[0], "sr_warnings": rule2_1_results[2]}
+
+
+@register("2.2", inputs=no_tables, outputs=("schema_extensions",))
+def run_rule2_2(ctx):
+    # Required fields within required elements are present and correctly defined
+    ap(
+        "Rule 2.2 - Required fields within required elements are present and correctly defined"
+    )
+    # fld_warnings is not getting defined right now. Should we use it?
+    errors, ctx["schema_extensions"], fld_warnings = check_fields(ctx["db_dict"], 2, [])
+
+    return {"rule2_2": errors}
+
+
+@register(
+    "2.3",
+    needs=("2.1",),
+    serial=True,
+    inputs=no_tables,
+    geometry=topology_fcs,
+    state=topology_state,
+    outputs=("level_3_errors",),
+)
+def run_rule2_3(ctx):
+    ap(
+        """2.3 All MapUnitPolys and ContactsAndFaults based feature classes obey Level 2 topology rules: 
+        no internal gaps or overlaps in MapUnitPolys, boundaries of MapUnitPolys are covered by ContactsAndFaults"""
+    )
+    if ctx["skip_topology"]:
+        level_2_errors = ["Topology check was skipped"]
+        level_3_errors = ["Topology check was skipped"]
+        ap("Topology check was skipped")
+    elif not ctx["tp_pairs"]:
+        level_2_errors = [
+            "No MapUnitPolys and ContactAndFaults pairs on which to check topology",
+            None,
+        ]
+        level_3_errors = [
+            "No MapUnitPolys and ContactAndFaults pairs on which to check topology",
+            None,
+        ]
+        ap("No MapUnitPolys and ContactAndFaults pairs on which to check topology")
+    else:
+        # returns (level_2_errors, level_3_errors
+        gmap_missing = False
+        for message in ctx["rule2_1"]:
+            if message == 'Feature dataset <span class="table">GeologicMap</span>':
+                gmap_missing = True
+
+        if gmap_missing:
+            level_2_errors = [
+                'Feature dataset <span class="table">GeologicMap</span> is missing. Topology not checked'
+            ]
+            level_3_errors = level_2_errors
+        else:
+            topo_results = check_topology(
+                ctx["db_dict"],
+                ctx["workdir"],
+                ctx["is_gpkg"],
+                ctx["tp_pairs"],
+                ctx["gdb_path"],
+            )
+            level_2_errors = topo_results[0]
+            level_3_errors = topo_results[1]
+
+    ctx["level_3_errors"] = level_3_errors
+
+    return {"rule2_3": level_2_errors}
+
+
+@register(
+    "2.4",
+    inputs=gems_tables("DescriptionOfMapUnits", "MapUnitPolys"),
+    outputs=("all_map_units", "fds_map_units"),
+)
+def run_rule2_4(ctx):
+    # All map units in MapUnitPolys have entries in DescriptionOfMapUnits table
+    ap("2.4 All map units in MapUnitPolys have entries in DescriptionOfMapUnits table")
+    ctx["all_map_units"] = Counter()
+    ctx["fds_map_units"] = {}
+    if "DescriptionOfMapUnits" in ctx["db_dict"]:
+        errors, ctx["all_map_units"], ctx["fds_map_units"] = check_map_units(
+            ctx["db_dict"], 2, ctx["all_map_units"], ctx["fds_map_units"]
+        )
+    else:
+        errors = ["DMU cannot be found. Rule not checked"]
+
+    return {"rule2_4": errors}
+
+
+@register("2.5", inputs=gems_tables("DescriptionOfMapUnits"))
+def run_rule2_5(ctx):
+    # No duplicate MapUnit values in DescriptionOfMapUnit table
+    ap("2.5 No duplicate MapUnit values in DescriptionOfMapUnits table")
+    dmu_map_units_duplicates = [
+        "duplicated MapUnit(s) in DMU",
+        "Duplicated MapUnit values in DescriptionOfMapUnits",
+        "DuplicatedMU",
+    ]
+    if "DescriptionOfMapUnits" in ctx["db_dict"]:
+        dmu_map_units_duplicates.extend(
+            duplicates(ctx["db_dict"], "DescriptionOfMapUnits", "MapUnit")
+        )
+    else:
+        dmu_map_units_duplicates = ["DMU cannot be found. Rule not checked"]
+
+    return {"rule2_5": dmu_map_units_duplicates}
+
+
+@register("2.6", inputs=gems_tables(*req_elements), outputs=("all_gloss_terms",))
+def run_rule2_6(ctx):
+    # Certain field values within required elements have entries in Glossary table
+    ap(
+        "2.6 Certain field values within required elements have entries in Glossary table"
+    )
+    ctx["all_gloss_terms"] = Counter()
+    if "Glossary" in ctx["db_dict"]:
+        errors, ctx["all_gloss_terms"] = glossary_check(
+            ctx["db_dict"], 2, ctx["all_gloss_terms"]
+        )
+    else:
+        errors = ["Glossary cannot be found. Rule not checked"]
+
+    return {"rule2_6": errors}
+
+
+@register("2.7", inputs=gems_tables("Glossary"))
+def run_rule2_7(ctx):
+    # No duplicate Term values in Glossary table
+    ap("2.7 No duplicate Term values in Glossary table")
+    glossary_term_duplicates = [
+        "duplicated terms in Glossary",
+        "2.7 Duplicated terms in Glossary",
+        "DuplicatedTerms",
+    ]
+    if "Glossary" in ctx["db_dict"]:
+        glossary_term_duplicates.extend(duplicates(ctx["db_dict"], "Glossary", "Term"))
+    else:
+        glossary_term_duplicates = ["Glossary cannot be found. Rule not checked"]
+
+    return {"rule2_7": glossary_term_duplicates}
+
+
+@register("2.8", inputs=gems_tables(*req_elements), outputs=("all_sources",))
+def run_rule2_8(ctx):
+    # All xxxSourceID values in required elements have entries in DataSources table
+    ap(
+        "2.8 All xxxSourceID values in required elements have entries in DataSources table"
+    )
+    ctx["all_sources"] = Counter()
+    if "DataSources" in ctx["db_dict"]:
+        errors, ctx["all_sources"] = sources_check(
+            ctx["db_dict"], 2, ctx["all_sources"]
+        )
+    else:
+        errors = ["DataSources cannot be found. Rule not checked"]
+
+    return {"rule2_8": errors}
+
+
+@register("2.9", inputs=gems_tables("DataSources"))
+def run_rule2_9(ctx):
+    # No duplicate DataSources_ID values in DataSources table
+    ap("2.9 No duplicate DataSources_ID values in DataSources table")
+    duplicated_source_ids = [
+        "duplicated source IDs in DataSources",
+        "Duplicated source_IDs in DataSources",
+        "DuplicatedIDs",
+    ]
+    if "DataSources" in ctx["db_dict"]:
+        duplicated_source_ids.extend(
+            duplicates(ctx["db_dict"], "DataSources", "DataSources_ID")
+        )
+    else:
+        duplicated_source_ids = ["DataSources cannot be found. Rule not checked"]
+
+    return {"rule2_9": duplicated_source_ids}
+
+
+@register("3.1", needs=("2.2",), inputs=no_tables, outputs=("schema_extensions",))
+def run_rule3_1(ctx):
+    # Table and field definitions conform to GeMS schema
+    ap("3.1 Table and field definitions conform to GeMS schema")
+    errors, ctx["schema_extensions"], fld_warnings = check_fields(
+        ctx["db_dict"], 3, ctx["schema_extensions"]
+    )
+
+    return {"rule3_1": errors, "fld_warnings": fld_warnings}
+
+
+@register("3.2", needs=("2.3",), inputs=no_tables)
+def run_rule3_2(ctx):
+    ap(
+        """3.2 All MapUnitPolys and ContactsAndFaults based feature classes obey Level 3 topology rules: 
+        no overlaps, self-overlaps, or self-intersections in ContactsAndFaults."""
+    )
+
+    return {"rule3_2": ctx["level_3_errors"]}
+
+
+@register("3.3")
+def run_rule3_3(ctx):
+    # No missing required values
+    ap("3.3 No missing required values")
+    if "Glossary" in ctx["db_dict"]:
+        errors, warnings = rule3_3(ctx["db_dict"])
+    else:
+        errors, warnings = ["Glossary cannot be found. Rule not checked"], []
+
+    return {"rule3_3": errors, "missing_warnings": warnings}
+
+
+@register("3.4", needs=("2.6",), outputs=("all_gloss_terms",))
+def run_rule3_4(ctx):
+    # No missing terms in Glossary
+    ap("3.4 No missing terms in Glossary")
+    if "Glossary" in ctx["db_dict"]:
+        errors, ctx["all_gloss_terms"], warnings = glossary_check(
+            ctx["db_dict"], 3, ctx["all_gloss_terms"]
+        )
+    else:
+        errors, ctx["all_gloss_terms"], warnings = (
+            ["Glossary cannot be found. Rule not checked"],
+            Counter(),
+            [],
+        )
+
+    return {"rule3_4": errors, "term_warnings": warnings}
+
+
+@register("3.5", needs=("3.4",), serial=True, inputs=gems_tables("Glossary"))
+def run_rule3_5(ctx):
+    # No unnecessary terms in Glossary
+    ap("3.5 No unnecessary terms in Glossary")
+    if ctx["delete_extra"]:
+        ap("\tRemoving unused terms from Glossary")
+        del_extra(ctx["db_dict"], "Glossary", "Term", ctx["all_gloss_terms"])
+
+    if "Glossary" in ctx["db_dict"]:
+        errors = rule3_5_and_7(ctx["db_dict"], "glossary", ctx["all_gloss_terms"])
+    else:
+        errors = ["Glossary cannot be found. Rule not checked"]
+
+    return {"rule3_5": errors}
+
+
+@register("3.6", needs=("2.8",), outputs=("all_sources",))
+def run_rule3_6(ctx):
+    # No missing sources in DataSources
+    ap("3.6 No missing sources in DataSources")
+    if "DataSources" in ctx["db_dict"]:
+        errors, ctx["all_sources"] = sources_check(
+            ctx["db_dict"], 3, ctx["all_sources"]
+        )
+    else:
+        errors, ctx["all_sources"] = [
+            "DataSources cannot be found. Rule not checked"
+        ], Counter()
+
+    return {"rule3_6": errors}
+
+
+@register("3.7", needs=("3.6",), serial=True, inputs=gems_tables("DataSources"))
+def run_rule3_7(ctx):
+    # No unnecessary sources in DataSources
+    ap("3.7 No unnecessary sources in DataSources")
+    if ctx["delete_extra"]:
+        ap("\tRemoving unused sources from DataSources")
+        del_extra(ctx["db_dict"], "DataSources", "DataSources_ID", ctx["all_sources"])
+
+    if "DataSources" in ctx["db_dict"]:
+        errors = rule3_5_and_7(ctx["db_dict"], "datasources", ctx["all_sources"])
+    else:
+        errors = ["DataSources cannot be found. Rule not checked"]
+
+    return {"rule3_7": errors}
+
+
+@register("3.8", needs=("2.4",), outputs=("all_map_units", "fds_map_units"))
+def run_rule3_8(ctx):
+    # No map units without entries in DescriptionOfMapUnits
+    # and rule 3.9
+    # No unnecessary map units in DescriptionOfMapUnits
+    ap("3.8 No map units without entries in DescriptionOfMapUnits")
+    ap("3.9 No unnecessary map units in DescriptionOfMapUnits")
+    if "DescriptionOfMapUnits" in ctx["db_dict"]:
+        (
+            missing,
+            unused,
+            ctx["all_map_units"],
+            ctx["fds_map_units"],
+            mu_warnings,
+        ) = check_map_units(
+            ctx["db_dict"], 3, ctx["all_map_units"], ctx["fds_map_units"]
+        )
+    else:
+        missing = ["DMU cannot be found. Rule not checked"]
+        unused = missing
+        ctx["all_map_units"] = Counter()
+        ctx["fds_map_units"] = []
+        mu_warnings = []
+
+    return {"rule3_8": missing, "rule3_9": unused, "mu_warnings": mu_warnings}
+
+
+@register("3.10", inputs=gems_tables("DescriptionOfMapUnits"))
+def run_rule3_10(ctx):
+    # HierarchyKey values in DescriptionOfMapUnits are unique and well formed
+    ap("3.10 HierarchyKey values in DescriptionOfMapUnits are unique and well formed")
+    if "DescriptionOfMapUnits" in ctx["db_dict"]:
+        errors, warnings = rule3_10(ctx["db_dict"])
+    else:
+        errors, warnings = ["DMU cannot be found. Rule not checked"], []
+
+    return {"rule3_10": errors, "hkey_warnings": warnings}
+
+
+@register("3.11", serial=True, state=ref_gmd_state)
+def run_rule3_11(ctx):
+    # All values of GeoMaterial are defined in GeoMaterialDict.
+    ap(
+        "3.11 All values of GeoMaterial are defined in GeoMaterialDict. GeoMaterialDict is as specified in the GeMS standard"
+    )
+
+    return {"rule3_11": rule3_11(ctx["db_dict"], ctx["ref_gmd"])}
+
+
+@register("3.12")
+def run_rule3_12(ctx):
+    # No duplicate _ID values
+    ap("3.12 No duplicate _ID values")
+
+    return {"rule3_12": rule3_12(ctx["db_dict"], str(ctx["gdb_path"]))}
+
+
+@register("3.13")
+def run_rule3_13(ctx):
+    # No zero-length or whitespace-only strings
+    ap("3.13 No zero-length or whitespace-only strings")
+    errors, end_spaces = rule3_13(ctx["db_dict"])
+
+    return {"rule3_13": errors, "end_spaces": end_spaces}
+
+
+def rule_needs(ctx):
+    """{rule key: set of rule keys} that have to finish before each rule starts"""
+    keys = [r["key"] for r in rule_registry]
+    needs = {r["key"]: set(r["needs"]) for r in rule_registry}
+
+    if ctx["delete_extra"]:
+        # 3.5 and 3.7 delete rows from Glossary and DataSources. Every rule that
+        # comes before them has to see the rows and every rule after them must not
+        for key in [k for k in ("3.5", "3.7") if k in keys]:
+            i = keys.index(key)
+            needs[key].update(keys[:i])
+            for later in keys[i + 1 :]:
+                needs[later].add(key)
+
+    return needs
+
+
+def rule_fingerprint(rule, ctx, needs, cache):
+    """Fingerprint of the tables and other state read by a rule and by all of
+    the rules it needs, since their results are part of its input"""
+    rules = {r["key"]: r for r in rule_registry}
+    tables = set()
+    geometry = set()
+    state = {}
+    todo = [rule["key"]]
+    seen = set()
+    while todo:
+        key = todo.pop()
+        if key in seen:
+            continue
+        seen.add(key)
+        r = rules[key]
+        inputs = r["inputs"] if r["inputs"] else all_tables
+        tables.update(inputs(ctx))
+        if r["geometry"]:
+            geometry.update(r["geometry"](ctx))
+        if r["state"]:
+            state[key] = vc.digest(r["state"](ctx, cache))
+        todo.extend(needs[key])
+
+    fp = cache.fingerprint(tables, geometry)
+    if state:
+        fp["__state__"] = state
+
+    return fp
+
+
+def evaluate(rule, ctx, needs, cache):
+    """Run one rule or, if its tables have not changed since the last
+    validation, take its results from the cache"""
+    if cache is None:
+        with guf.span(rule["key"], "rule"):
+            return rule["func"](ctx)
+
+    fp = rule_fingerprint(rule, ctx, needs, cache)
+    cached = cache.get(rule["key"], fp)
+    if cached:
+        ap(f"{rule['key']} tables unchanged, using results of the last validation")
+        for k in rule["outputs"]:
+            ctx[k] = cached["ctx"][k]
+        return cached["val"]
+
+    with guf.span(rule["key"], "rule"):
+        result = rule["func"](ctx)
+    cache.put(
+        rule["key"],
+        fp,
+        {"val": result, "ctx": {k: ctx[k] for k in rule["outputs"]}},
+    )
+
+    return result
+
+
+def collect(finished, running, results, ctx):
+    """Move the results of the finished futures from running to results"""
+    for future in finished:
+        key = running.pop(future)
+        # result() raises any exception from the rule here
+        results[key] = future.result()
+        ctx.update(results[key])
+
+
+def run_rules(ctx, workers=None, cache=None):
+    """Run every rule in the registry, each as soon as the rules it needs are
+    finished, and merge the results into val in registry order"""
+    if workers is None:
+        workers = rule_workers
+    rules = {r["key"]: r for r in rule_registry}
+    needs = rule_needs(ctx)
+
+    results = {}
+    waiting = [r["key"] for r in rule_registry]
+    running = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        while waiting or running:
+            ready = [k for k in waiting if needs[k].issubset(results)]
+            if not ready and not running:
+                raise ValueError(f"Rules {waiting} need rules that never run")
+
+            serial = [k for k in ready if rules[k]["serial"]]
+            if serial:
+                # arcpy is not thread-safe, a serial rule runs with no rule in a
+                # worker thread
+                collect(wait(running)[0], running, results, ctx)
+                for key in serial:
+                    waiting.remove(key)
+                    results[key] = evaluate(rules[key], ctx, needs, cache)
+                    ctx.update(results[key])
+                continue
+
+            for key in ready:
+                waiting.remove(key)
+                future = pool.submit(evaluate, rules[key], ctx, needs, cache)
+                running[future] = key
+
+            if running:
+                finished = wait(running, return_when=FIRST_COMPLETED)[0]
+                collect(finished, running, results, ctx)
+
+    for key in [r["key"] for r in rule_registry]:
+        val.update(results[key])
+
 
 ##############start here##################
 # get inputs
@@ -1467,6 +2085,7 @@ def main(argv):
         workdir = gdb_path.parent / "validate"
         workdir.mkdir(exist_ok=True)
     val["parameters"].append(f"Output directory: {workdir}")
+    guf.trace_workdir(workdir)
 
     # path to metadata file
     metadata_file = None
@@ -1511,6 +2130,13 @@ def main(argv):
     else:
         skip_topology = False
     val["parameters"].append(f"Skip topology check: {skip_topology}")
+    if not skip_topology:
+        # which path check_topology takes for databases without a topology
+        if tp.use_native():
+            engine = "topology_engine (GEMS_TOPOLOGY_ENGINE=native)"
+        else:
+            engine = "Esri topology in a scratch gdb"
+        val["parameters"].append(f"Topology rules checked with: {engine}")
 
     # refresh GeoMaterialDict?
     if 7 < args_len:
@@ -1549,6 +2175,10 @@ def main(argv):
     # make the database dictionary
     db_dict = guf.gdb_object_dict(str(gdb_path))
 
+    # all rules share one read of each table
+    global table_scan
+    table_scan = ts.TableScan(gdb_path, db_dict)
+
     # edit session?
     if guf.editSessionActive(gdb_path):
         arcpy.AddWarning(
@@ -1597,6 +2227,24 @@ def main(argv):
                         )
     val["gm_errors"] = geo_material_errors
 
+    # reference vocabularies, each read on first use by a rule
+    global vocab
+    vocab = vb.References(
+        {
+            "MapUnit": lambda: values(
+                db_dict, "DescriptionOfMapUnits", "MapUnit", "list"
+            ),
+            "Term": lambda: values(db_dict, "Glossary", "Term", "list"),
+            "DataSources_ID": lambda: values(
+                db_dict, "DataSources", "DataSources_ID", "list"
+            ),
+            "GeoMaterial": lambda: [
+                r[0] for r in arcpy.da.SearchCursor(str(ref_gmd), "GeoMaterial")
+            ],
+        },
+        keys={"GeoMaterial": vb.normalized},
+    )
+
     # look for geodatabase version
     # not implemented yet
     # if "PublicationTable" in db_dict.keys():
@@ -1607,277 +2255,31 @@ def main(argv):
     #     else:
     #         gdb_ver = ""
 
-    # level 2 compliance
-    ap("\u200b")
-    ap("Looking at level 2 compliance")
-    # check 2.1
-    ap(
-        """Rule 2.1 - Has required elements: nonspatial tables DataSources, 
-        DescriptionOfMapUnits, GeoMaterialDict; feature dataset GeologicMap with 
-        feature classes ContactsAndFaults and MapUnitPolys"""
-    )
-    rule2_1_results = rule2_1(db_dict, is_gpkg)
-    val["rule2_1"] = rule2_1_results[0]
-    val["sr_warnings"] = rule2_1_results[2]
-
-    # rule 2.2
-    # Required fields within required elements are present and correctly defined
-    ap(
-        "Rule 2.2 - Required fields within required elements are present and correctly defined"
-    )
-    schema_extensions = []
-    # fld_warnings is not getting defined right now. Should we use it?
-    val["rule2_2"], schema_extensions, fld_warnings = check_fields(
-        db_dict, 2, schema_extensions
-    )
-
-    # rule 2.3 topology
-    ap(
-        """2.3 All MapUnitPolys and ContactsAndFaults based feature classes obey Level 2 topology rules: 
-        no internal gaps or overlaps in MapUnitPolys, boundaries of MapUnitPolys are covered by ContactsAndFaults"""
-    )
-
-    if skip_topology:
-        level_2_errors = ["Topology check was skipped"]
-        level_3_errors = ["Topology check was skipped"]
-        ap("Topology check was skipped")
-    elif not rule2_1_results[1]:
-        level_2_errors = [
-            "No MapUnitPolys and ContactAndFaults pairs on which to check topology",
-            None,
-        ]
-        level_3_errors = [
-            "No MapUnitPolys and ContactAndFaults pairs on which to check topology",
-            None,
-        ]
-        ap("No MapUnitPolys and ContactAndFaults pairs on which to check topology")
-    else:
-        # returns (level_2_errors, level_3_errors
-        # arcpy.AddMessage(val["rule2_1"])
-        gmap_missing = False
-        for message in val["rule2_1"]:
-            if message == 'Feature dataset <span class="table">GeologicMap</span>':
-                gmap_missing = True
-
-        if gmap_missing:
-            level_2_errors = [
-                'Feature dataset <span class="table">GeologicMap</span> is missing. Topology not checked'
-            ]
-            level_3_errors = level_2_errors
-        else:
-            topo_results = check_topology(db_dict, workdir, is_gpkg, rule2_1_results[1])
-            level_2_errors = topo_results[0]
-            level_3_errors = topo_results[1]
-
-    val["rule2_3"] = level_2_errors
-
-    # rule 2.4
-    # All map units in MapUnitPolys have entries in DescriptionOfMapUnits table
-    # make a list of MapUnits found in the DMU
-    # dmu_units = values("DescriptonOfMapUnits", "MapUnit", "list")
-    ap("2.4 All map units in MapUnitPolys have entries in DescriptionOfMapUnits table")
-    all_map_units = []
-    fds_map_units = {}
-    if "DescriptionOfMapUnits" in db_dict:
-        val["rule2_4"], all_map_units, fds_map_units = check_map_units(
-            db_dict, 2, all_map_units, fds_map_units
-        )
-    else:
-        val["rule2_4"] = ["DMU cannot be found. Rule not checked"]
-
-    # rule 2.5
-    # No duplicate MapUnit values in DescriptionOfMapUnit table
-    ap("2.5 No duplicate MapUnit values in DescriptionOfMapUnits table")
-    dmu_map_units_duplicates = [
-        "duplicated MapUnit(s) in DMU",
-        "Duplicated MapUnit values in DescriptionOfMapUnits",
-        "DuplicatedMU",
-    ]
-    if "DescriptionOfMapUnits" in db_dict:
-        dmu_path = db_dict["DescriptionOfMapUnits"]["catalogPath"]
-        dmu_map_units_duplicates.extend(guf.get_duplicates(dmu_path, "MapUnit"))
-        val["rule2_5"] = dmu_map_units_duplicates
-    else:
-        val["rule2_5"] = ["DMU cannot be found. Rule not checked"]
-
-    # rule 2.6
-    # Certain field values within required elements have entries in Glossary table
-    ap(
-        "2.6 Certain field values within required elements have entries in Glossary table"
-    )
-    all_gloss_terms = []
-    if "Glossary" in db_dict:
-        val["rule2_6"], all_gloss_terms = glossary_check(db_dict, 2, all_gloss_terms)
-    else:
-        val["rule2_6"], all_gloss_terms = [
-            "Glossary cannot be found. Rule not checked"
-        ], []
-
-    # rule 2.7
-    # No duplicate Term values in Glossary table
-    ap("2.7 No duplicate Term values in Glossary table")
-    glossary_term_duplicates = [
-        "duplicated terms in Glossary",
-        "2.7 Duplicated terms in Glossary",
-        "DuplicatedTerms",
-    ]
-    if "Glossary" in db_dict:
-        gloss_path = db_dict["Glossary"]["catalogPath"]
-        glossary_term_duplicates.extend(guf.get_duplicates(gloss_path, "Term"))
-        val["rule2_7"] = glossary_term_duplicates
-    else:
-        val["rule2_7"] = ["Glossary cannot be found. Rule not checked"]
-
-    # rule 2.8
-    # All xxxSourceID values in required elements have entries in DataSources table
-    ap(
-        "2.8 All xxxSourceID values in required elements have entries in DataSources table"
-    )
-    all_sources = []
-    if "DataSources" in db_dict:
-        val["rule2_8"], all_sources = sources_check(db_dict, 2, all_sources)
-    else:
-        val["rule2_8"], all_sources = [
-            "DataSources cannot be found. Rule not checked"
-        ], []
-
-    # rule 2.9
-    # No duplicate DataSources_ID values in DataSources table
-    ap("2.9 No duplicate DataSources_ID values in DataSources table")
-    duplicated_source_ids = [
-        "duplicated source IDs in DataSources",
-        "Duplicated source_IDs in DataSources",
-        "DuplicatedIDs",
-    ]
-    if "DataSources" in db_dict:
-        ds_path = db_dict["DataSources"]["catalogPath"]
-        duplicated_source_ids.extend(guf.get_duplicates(ds_path, "DataSources_ID"))
-        val["rule2_9"] = duplicated_source_ids
-    else:
-        val["rule2_9"] = ["DataSources cannot be found. Rule not checked"]
-
+    # level 2 and level 3 compliance
     ap("\u200b")
-    ap("Looking at level 3 compliance")
-    # rule 3.1
-    # Table and field definitions conform to GeMS schema
-    ap("3.1 Table and field definitions conform to GeMS schema")
-    val["rule3_1"], schema_extensions, val["fld_warnings"] = check_fields(
-        db_dict, 3, schema_extensions
-    )
-
-    # rule 3.2
-    ap(
-        """3.2 All MapUnitPolys and ContactsAndFaults based feature classes obey Level 3 topology rules: 
-        no overlaps, self-overlaps, or self-intersections in ContactsAndFaults."""
-    )
-    val["rule3_2"] = level_3_errors
-
-    # rule 3.3
-    # No missing required values
-    ap("3.3 No missing required values")
-    if "Glossary" in db_dict:
-        val["rule3_3"], val["missing_warnings"] = rule3_3(db_dict)
-    else:
-        val["rule3_3"], val["missing_warnings"] = [
-            "Glossary cannot be found. Rule not checked"
-        ], []
-
-    # rule 3.4
-    # No missing terms in Glossary
-    ap("3.4 No missing terms in Glossary")
-    if "Glossary" in db_dict:
-        val["rule3_4"], all_gloss_terms, val["term_warnings"] = glossary_check(
-            db_dict, 3, all_gloss_terms
-        )
-    else:
-        val["rule3_4"], all_gloss_terms, val["term_warnings"] = (
-            ["Glossary cannot be found. Rule not checked"],
-            [],
-            [],
+    ap("Looking at level 2 and level 3 compliance")
+    ctx = {
+        "db_dict": db_dict,
+        "gdb_path": gdb_path,
+        "is_gpkg": is_gpkg,
+        "workdir": workdir,
+        "skip_topology": skip_topology,
+        "delete_extra": delete_extra,
+        "ref_gmd": ref_gmd,
+    }
+    # rules whose tables have not changed since the last validation are not
+    # evaluated again. The cache is not used when rows are being deleted
+    cache = None
+    if not delete_extra:
+        cache = vc.ValidationCache(
+            workdir / f"{gdb_name}-ValidationCache.json",
+            (version_string, use_idfield, skip_topology, is_gpkg, tp.use_native()),
+            table_scan,
         )
-
-    # rule 3.5
-    # No unnecessary terms in Glossary
-    ap("3.5 No unnecessary terms in Glossary")
-    if delete_extra:
-        ap("\tRemoving unused terms from Glossary")
-        del_extra(db_dict, "Glossary", "Term", all_gloss_terms)
-
-    if "Glossary" in db_dict:
-        val["rule3_5"] = rule3_5_and_7(db_dict, "glossary", all_gloss_terms)
-    else:
-        val["rule3_5"] = ["Glossary cannot be found. Rule not checked"]
-
-    # rule 3.6
-    # No missing sources in DataSources
-    ap("3.6 No missing sources in DataSources")
-    if "DataSources" in db_dict:
-        val["rule3_6"], all_sources = sources_check(db_dict, 3, all_sources)
-    else:
-        val["rule3_6"], all_sources = [
-            "DataSources cannot be found. Rule not checked"
-        ], []
-
-    # rule 3.7
-    # No unnecessary sources in DataSources
-    ap("3.7 No unnecessary sources in DataSources")
-
-    if delete_extra:
-        ap("\tRemoving unused sources from DataSources")
-        del_extra(db_dict, "DataSources", "DataSources_ID", all_sources)
-
-    if "DataSources" in db_dict:
-        val["rule3_7"] = rule3_5_and_7(db_dict, "datasources", all_sources)
-    else:
-        val["rule3_7"] = ["DataSources cannot be found. Rule not checked"]
-
-    # rule 3.8
-    # No map units without entries in DescriptionOfMapUnits
-    # rule 3.9
-    # No unnecessary map units in DescriptionOfMapUnits
-    ap("3.8 No map units without entries in DescriptionOfMapUnits")
-    ap("3.9 No unnecessary map units in DescriptionOfMapUnits")
-    if "DescriptionOfMapUnits" in db_dict:
-        (
-            val["rule3_8"],
-            val["rule3_9"],
-            all_map_units,
-            fds_map_units,
-            val["mu_warnings"],
-        ) = check_map_units(db_dict, 3, all_map_units, fds_map_units)
-    else:
-        error_list = ["DMU cannot be found. Rule not checked"]
-        val["rule3_8"] = error_list
-        val["rule3_9"] = error_list
-        all_map_units = []
-        fds_map_units = []
-        val["mu_warnings"] = []
-
-    # rule 3.10
-    # HierarchyKey values in DescriptionOfMapUnits are unique and well formed
-    ap("3.10 HierarchyKey values in DescriptionOfMapUnits are unique and well formed")
-    if "DescriptionOfMapUnits" in db_dict:
-        val["rule3_10"], val["hkey_warnings"] = rule3_10(db_dict)
-    else:
-        val["rule3_10"], val["hkey_warnings"] = [
-            "DMU cannot be found. Rule not checked"
-        ]
-    # 3.11
-    # All values of GeoMaterial are defined in GeoMaterialDict.
-    ap(
-        "3.11 All values of GeoMaterial are defined in GeoMaterialDict. GeoMaterialDict is as specified in the GeMS standard"
-    )
-    val["rule3_11"] = rule3_11(db_dict, ref_gmd)
-
-    # 3.12
-    # No duplicate _ID values
-    ap("3.12 No duplicate _ID values")
-    val["rule3_12"] = rule3_12(db_dict, str(gdb_path))
-
-    # 3.13
-    # No zero-length or whitespace-only strings
-    ap("3.13 No zero-length or whitespace-only strings")
-    val["rule3_13"], val["end_spaces"] = rule3_13(db_dict)
+    run_rules(ctx, cache=cache)
+    schema_extensions = ctx["schema_extensions"]
+    all_map_units = ctx["all_map_units"]
+    fds_map_units = ctx["fds_map_units"]
 
     # check for editor tracking
     val["et_warnings"] = ["Editor tracking enabled on:"]
@@ -1898,7 +2300,14 @@ def main(argv):
 
     if metadata_file:
         if Path(metadata_file).exists:
-            md_summary = validate_w_mp(metadata_file, workdir)
+            md_fp = cache.file_fingerprint(metadata_file) if cache else None
+            md_summary = cache.get("metadata", md_fp) if md_fp else None
+            if md_summary:
+                ap("Metadata unchanged, using results of the last validation")
+            else:
+                md_summary = validate_w_mp(metadata_file, workdir)
+                if md_fp:
+                    cache.put("metadata", md_fp, md_summary)
         else:
             md_summary = f"{metadata_file} does not exist."
     else:
@@ -1919,8 +2328,7 @@ def main(argv):
     # prepare lists of units for Occurrence table
     if "DescriptionOfMapUnits" in db_dict:
         ap("\tFinding occurrences of map units")
-        all_map_units.sort()
-        val["all_units"] = list(set(all_map_units))
+        val["all_units"] = sorted(all_map_units)
         fds_map_units = sort_fds_units(fds_map_units)
         val["fds_units"] = fds_map_units
     else:
@@ -1943,6 +2351,12 @@ def main(argv):
     else:
         pass
 
+    ap(f"\tRead {table_scan.reads} tables")
+    if cache:
+        ap(f"\tReused the results of {len(cache.hits)} cached checks")
+        cache.save()
+    table_scan.close()
+
     write_html("report_template.jinja", val["report_path"])
     write_html("errors_template.jinja", val["errors_path"])
 
@@ -1954,3 +2368,4 @@ def main(argv):
 
 if __name__ == "__main__":
     main(sys.argv)
+    guf.finish_trace()
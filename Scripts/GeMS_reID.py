@@ -6,7 +6,7 @@ import arcpy, sys, time, os.path, math, uuid
 from string import whitespace
 from GeMS_utilityFunctions import *
 
-versionString = "GeMS_reID.py, version of 8/21/23"
+versionString = "GeMS_reID.py, version of 10/17/26"
 rawurl = "https://raw.githubusercontent.com/DOI-USGS/gems-tools-pro/master/Scripts/GeMS_reID.py"
 checkVersion(versionString, rawurl, "gems-tools-pro")
 
@@ -20,6 +20,10 @@ checkVersion(versionString, rawurl, "gems-tools-pro")
 #   MUP to MPT! With this table missing, a user reported that MUP_IDs were being written with the
 #   prefix 'X3X'. I think it's absence is the reason for line "if tableName == 'MapUnitPoints'"
 #   around line 215.  - Evan Thoms
+# 17 October 2026: keys of each table are read in one pass, the old -> new ID map is built
+#   in memory and each table is updated in one da.UpdateCursor pass, in one edit session.
+#   Optional 4th argument DryRun lists the changes without making them. DryRun is
+#   command-line only, it is not a parameter of the tool in GeMS_Tools.tbx
 
 idRootDict = {
     "CartographicLines": "CAL",
@@ -67,7 +71,7 @@ def usage():
     print(
         """
     Usage:  prompt> ncgmp09_reID.py <inGeodatabaseName> <outGeodatabaseName>
-                  <UseGUID>
+                  <UseGUID> <noSources> <DryRun>
   
     <inGeodatabaseName> can be either a personal geodatabase or a file 
     geodatabase, .mdb or .gdb. The filename extension must be included.
@@ -81,6 +85,8 @@ def usage():
     Otherwise ID values are short character strings that identify tables
         (e.g., MUP for MapUnitPolys) followed by consecutive zero-padded
         integers.
+    If <DryRun> (boolean) is True, nothing is changed. The ID values that
+        would be changed are written to file <inGeodatabaseName>_reID_dryrun.txt
 """
     )
 
@@ -147,123 +153,147 @@ def inventoryDatabase(dbf, noSources):
                 fctbs.append([dbf, fdset, fc, pKey, fKeys])
 
 
-def buildIdDict(table, sortKey, keyRoot, pKey, lastTime, useGUIDs):
-    addMsgAndPrint("  Setting new _IDs for " + table)
-    result = arcpy.GetCount_management(table)
-    nrows = int(result.getOutput(0))
-    width = int(math.ceil(math.log10(nrows + 1)))
-    arcpy.env.workspace = dbf
-    edit = arcpy.da.Editor(arcpy.env.workspace)
-    edit.startEditing(False, True)
-    edit.startOperation()
-    rows = arcpy.UpdateCursor(table, "", "", "", sortKey)
+def sortFieldName(tableName, fieldNames):
+    # field that new _ID values are numbered in the order of
+    if tableName == "Glossary":
+        return "Term"
+    elif tableName == "DescriptionOfMapUnits":
+        return "HierarchyKey"
+    elif tableName == "StandardLithology":
+        return "MapUnit"
+    elif "OBJECTID" in fieldNames:
+        return "OBJECTID"
+    elif "objectid" in fieldNames:
+        return "objectid"
+    else:
+        addMsgAndPrint("Warning: OBJECTID field not present")
+        return None
+
+
+def readKeys(path, pKey, fKeys, sortField):
+    # reads the primary and foreign keys of a table in one pass
+    # returns list of [OID, pKey value, fKey values...], sorted on sortField
+    fields = ["OID@", pKey] + fKeys
+    if sortField != None:
+        sql = (None, "ORDER BY " + sortField)
+    else:
+        sql = (None, None)
+    with arcpy.da.SearchCursor(path, fields, sql_clause=sql) as cursor:
+        return [list(row) for row in cursor]
+
+
+def buildIdDict(keys, keyRoot, useGUIDs):
+    # assigns new _IDs to the rows of keys, in order. Adds oldID: newID to idDict
+    # returns dictionary newIDs[OID] = newID
+    width = int(math.ceil(math.log10(len(keys) + 1)))
+    newIDs = {}
     n = 1
-    for row in rows:
-        oldID = row.getValue(pKey)
-        # calculate newID
+    for row in keys:
+        oldID = row[1]
         if useGUIDs:
             newID = str(uuid.uuid4())
         else:
             newID = keyRoot + str(n).zfill(width)
-        try:
-            row.setValue(pKey, newID)
-            rows.updateRow(row)
-        except:
-            print("ERROR")
-            print("pKey = " + str(pKey) + "  newID = " + str(newID))
+        newIDs[row[0]] = newID
         n = n + 1
-        # print oldID, newID
-        # add oldID,newID to idDict
         if oldID != "" and oldID != None:
             idDict[oldID] = newID
-    edit.stopOperation()
-    edit.stopEditing(True)
-    return elapsedTime(lastTime)
+    return newIDs
 
 
-def reID(table, keyFields, lastTime, outfile):
-    addMsgAndPrint("  resetting IDs for " + table)
-    arcpy.env.workspace = dbf
-    edit = arcpy.da.Editor(arcpy.env.workspace)
-    edit.startEditing(False, True)
-    edit.startOperation()
-    rows = arcpy.UpdateCursor(table)
-    n = 1
-    row = next(rows)
-    while row:
-        for field in keyFields:
-            oldValue = row.getValue(field)
+def remapKeys(table, fKeys, keys, newIDs, outfile, unresolved):
+    # works out new key values for every row of a table from newIDs and idDict
+    # returns dictionary changes[OID] = [old values, new values] of rows that change
+    # writes foreign key values that are not in idDict to outfile and counts them in unresolved
+    changes = {}
+    for row in sorted(keys, key=lambda r: r[0]):
+        newRow = [newIDs.get(row[0], row[1])]
+        for field, oldValue in zip(fKeys, row[2:]):
             if oldValue in idDict:
-                row.setValue(field, idDict[oldValue])
+                newRow.append(idDict[oldValue])
             else:
+                newRow.append(oldValue)
                 outfile.write(table + " " + field + " " + str(oldValue) + "\n")
-        rows.updateRow(row)
-        n = n + 1
-        row = next(rows)
-    edit.stopOperation()
-    edit.stopEditing(True)
-    return elapsedTime(lastTime)
+                stats = unresolved.setdefault((table, field), [0, 0, set()])
+                stats[0] += 1
+                if oldValue == None or len(str(oldValue).split()) == 0:
+                    stats[1] += 1
+                else:
+                    stats[2].add(oldValue)
+        if newRow != row[1:]:
+            changes[row[0]] = [row[1:], newRow]
+    return changes
+
+
+def applyChanges(path, pKey, fKeys, changes):
+    # one UpdateCursor pass, only rows with changes are written
+    with arcpy.da.UpdateCursor(path, ["OID@", pKey] + fKeys) as cursor:
+        for row in cursor:
+            if row[0] in changes:
+                cursor.updateRow([row[0]] + changes[row[0]][1])
+
+
+def writeDiff(diffFile, table, pKey, fKeys, changes):
+    fields = [pKey] + fKeys
+    for oid in sorted(changes):
+        old, new = changes[oid]
+        for field, o, n in zip(fields, old, new):
+            if o != n:
+                diffFile.write(
+                    table
+                    + " "
+                    + str(oid)
+                    + " "
+                    + field
+                    + " "
+                    + str(o)
+                    + " -> "
+                    + str(n)
+                    + "\n"
+                )
 
 
-def main(lastTime, dbf, useGUIDs, noSources):
+def main(lastTime, dbf, useGUIDs, noSources, dryRun):
     rootCounter = 0
     addMsgAndPrint("Inventorying database")
     inventoryDatabase(dbf, noSources)
     addMsgAndPrint("Inventory done...")
     addMsgAndPrint("--------------------------")
-    # lastTime = elapsedTime(lastTime)
     arcpy.env.workspace = dbf
-    addMsgAndPrint("Cycling through inventory")
-    addMsgAndPrint(str(fctbs))
+
+    # read all primary and foreign keys, one pass per table, and build idDict
+    addMsgAndPrint("Reading keys and setting new _IDs")
+    tableKeys = []
     for fctb in fctbs:
-        addMsgAndPrint(fctb)
-        # in previous script, with Python 2.7, fctb[0]+fctb[1] was (somehow) sufficient for defining
-        # workspace. With Python 3, it fails. Feature classes within feature datasets cannot be found.
-        # set workspace using os.path.join and, better yet, re-write inventoryDatabase to use arcpy.da.walk and full # paths to tables
-        # stop depending on setting the workspace correctly and try to always point to a table with a full path
-        arcpy.env.workspace = os.path.join(fctb[0], fctb[1])
-        arcpy.AddMessage(arcpy.env.workspace)
+        # use full paths, not the workspace, feature classes in feature datasets are not found otherwise
+        path = os.path.join(fctb[0], fctb[1], fctb[2])
         tabName = tableName = fctb[2]
-        pKey, fKeys = getPFKeys(
-            tableName
-        )  # Why does this have to be called again (already in inventorDatadase)
-        # TODO figure out the intention behind the next two line more - creates an error for me
-        # if tableName == 'MapUnitPoints':
-        #     pKey = 'MapUnitPolys_ID'
-        fields = arcpy.ListFields(tableName)
-        fieldNames = [x.name for x in fields]
-        if "OBJECTID" in fieldNames:
-            case = "UPPER"
-        elif "objectid" in fieldNames:
-            case = "LOWER"
-        if tableName == "Glossary":
-            sortKey = "Term A"
-        elif tableName == "DescriptionOfMapUnits":
-            sortKey = "HierarchyKey A"
-        elif tableName == "StandardLithology":
-            sortKey = "MapUnit A"
-        elif case == "UPPER":
-            sortKey = "OBJECTID A"
-        elif case == "LOWER":
-            sortKey = "objectid A"
-        else:
-            addMsgAndPrint("Warning: OBJECTID field not present")
-        # deal with naming of CrossSection tables as CSxxTableName
-        if fctb[1].find("CrossSection") == 0:
-            csSuffix = fctb[1][12:]
-            tabName = tableName[2 + len(csSuffix) :]
-        idRt, rootCounter = idRoot(tabName, rootCounter)
-        if tabName != tableName:
-            prefix = "CS" + csSuffix + idRt
+        pKey = fctb[3]
+        fKeys = fctb[4]
+        if pKey == "":
+            # primary key doesn't exist, so not a GeMS feature class, leave alone
+            continue
+        fieldNames = fieldNameList(path)
+        sortField = sortFieldName(tableName, fieldNames)
+        if sortField != None and not sortField in fieldNames:
+            addMsgAndPrint("Skipping " + tableName + ", no field " + sortField)
+            keys = readKeys(path, pKey, fKeys, None)
+            newIDs = {}
         else:
-            prefix = idRt
-        if pKey != "":
-            if sortKey[:-2] in fieldNameList(tableName):
-                lastTime = buildIdDict(
-                    tableName, sortKey, prefix, pKey, lastTime, useGUIDs
-                )
+            # deal with naming of CrossSection tables as CSxxTableName
+            if fctb[1].find("CrossSection") == 0:
+                csSuffix = fctb[1][12:]
+                tabName = tableName[2 + len(csSuffix) :]
+            idRt, rootCounter = idRoot(tabName, rootCounter)
+            if tabName != tableName:
+                prefix = "CS" + csSuffix + idRt
             else:
-                addMsgAndPrint("Skipping " + tableName + ", no field " + sortKey[:-2])
+                prefix = idRt
+            addMsgAndPrint("  Setting new _IDs for " + tableName)
+            keys = readKeys(path, pKey, fKeys, sortField)
+            newIDs = buildIdDict(keys, prefix, useGUIDs)
+        tableKeys.append([path, tableName, pKey, fKeys, keys, newIDs])
+    lastTime = elapsedTime(lastTime)
 
     # purge IdDict of quasi-null keys
     addMsgAndPrint("Purging idDict of quasi-null keys")
@@ -280,16 +310,65 @@ def main(lastTime, dbf, useGUIDs, noSources):
         + ". \nList of ID values that do not correspond to any primary key in the database\n"
     )
     outfile.write("--table---field----field value---\n")
-    for fctb in fctbs:
-        arcpy.env.workspace = fctb[0] + fctb[1]
-        keyFields = fctb[4]
-        # keyFields.append(fctb[3])
-        if (
-            fctb[3] != ""
-        ):  # primary key is identified as '' (i.e., doesn't exist, so not an NCGMP09 feature class)
-            lastTime = reID(fctb[2], keyFields, lastTime, outfile)
+    if dryRun:
+        addMsgAndPrint("Dry run, no changes are written to " + os.path.basename(dbf))
+        diffFile = open(dbf + "_reID_dryrun.txt", "w")
+        diffFile.write(
+            "Database " + dbf + ". \nID values that would be changed by reID\n"
+        )
+        diffFile.write("--table---OBJECTID---field----old value -> new value---\n")
+    else:
+        # one edit session for all tables
+        edit = arcpy.da.Editor(dbf)
+        edit.startEditing(False, True)
+        edit.startOperation()
+
+    unresolved = {}
+    for path, tableName, pKey, fKeys, keys, newIDs in tableKeys:
+        changes = remapKeys(tableName, fKeys, keys, newIDs, outfile, unresolved)
+        addMsgAndPrint(
+            "  "
+            + tableName
+            + ": "
+            + str(len(changes))
+            + " of "
+            + str(len(keys))
+            + " rows changed"
+        )
+        if dryRun:
+            writeDiff(diffFile, tableName, pKey, fKeys, changes)
+        elif len(changes) > 0:
+            applyChanges(path, pKey, fKeys, changes)
+
+    if dryRun:
+        diffFile.close()
+        addMsgAndPrint("Changes listed in " + dbf + "_reID_dryrun.txt")
+    else:
+        edit.stopOperation()
+        edit.stopEditing(True)
     outfile.close()
-    return lastTime
+
+    # unresolved-key statistics
+    addMsgAndPrint("ID values that do not correspond to any primary key:")
+    if len(unresolved) == 0:
+        addMsgAndPrint("  none")
+    for table, field in sorted(unresolved):
+        n, nEmpty, distinct = unresolved[(table, field)]
+        addMsgAndPrint(
+            "  "
+            + table
+            + " "
+            + field
+            + ": "
+            + str(n)
+            + " values, "
+            + str(len(distinct))
+            + " distinct, "
+            + str(nEmpty)
+            + " null or blank"
+        )
+    addMsgAndPrint("  listed in " + dbf + ".txt")
+    return elapsedTime(lastTime)
 
 
 ### START HERE ###
@@ -297,6 +376,8 @@ def main(lastTime, dbf, useGUIDs, noSources):
 startTime = time.time()
 lastTime = time.time()
 useGUIDs = False
+noSources = False
+dryRun = False
 addMsgAndPrint(versionString)
 
 if not os.path.exists(sys.argv[1]):
@@ -313,9 +394,13 @@ else:
             noSources = True
         else:
             noSources = False
+    if len(sys.argv) >= 5:
+        if sys.argv[4].upper() == "TRUE":
+            dryRun = True
 
     dbf = os.path.abspath(sys.argv[1])
     arcpy.env.workspace = ""
     # lastTime = elapsedTime(lastTime)
-    lastTime = main(lastTime, dbf, useGUIDs, noSources)
+    lastTime = main(lastTime, dbf, useGUIDs, noSources, dryRun)
     lastTime = elapsedTime(startTime)
+finish_trace()
@@ -2,11 +2,22 @@
 
 import arcpy, os.path, time, glob
 import GeMS_Definition as gdef
+import version_check
+import tool_trace
 
 
 editPrefixes = ("xxx", "edit_", "errors_", "ed_")
 debug = False
-import requests
+
+# timing spans and counters of the run, see tool_trace.py. With GEMS_TRACE=1
+# every tool writes a trace of its spans, cursor row counts and messages. The
+# trace of a run starts in checkVersion, at the top of the tool, and is written
+# by finish_trace at the bottom of the tool
+span = tool_trace.span
+count = tool_trace.count
+trace_workdir = tool_trace.set_workdir
+finish_trace = tool_trace.finish
+tool_trace.instrument(arcpy)
 
 # from importlib import reload
 # reload(gdef)
@@ -82,6 +93,7 @@ def addMsgAndPrint(msg, severity=0):
 
 def forceExit():
     addMsgAndPrint("Forcing exit by raising ExecuteError")
+    finish_trace()
     raise arcpy.ExecuteError
 
 
@@ -263,23 +275,11 @@ def editSessionActive(gdb):
 
 
 def checkVersion(vString, rawurl, toolbox):
-    # compares versionString of tool script to the current script at the repo
-    try:
-        page = requests.get(rawurl)
-        raw = page.text
-        if vString in raw:
-            pass
-            arcpy.AddMessage(f"This version of the tool is up to date: {vString}")
-        else:
-            repourl = "https://github.com/DOI-USGS/{}/releases".format(toolbox)
-            arcpy.AddWarning(
-                "You are using an obsolete version of this tool!\n"
-                + "Please download the latest version from {}".format(repourl)
-            )
-    except:
-        arcpy.AddWarning(
-            "Could not connect to Github to determine if this version of the tool is the most recent.\n"
-        )
+    # compares versionString of tool script to the current script at the repo.
+    # Runs in the background and caches the answer, see version_check.py
+    # As it is called at the top of every tool, it also starts the trace of the run
+    tool_trace.start(os.path.splitext(vString.split(",")[0].strip())[0])
+    version_check.check(vString, rawurl, toolbox, arcpy.AddMessage, arcpy.AddWarning)
 
 
 def gdb_object_dict(gdb_path):
@@ -0,0 +1,262 @@
+"""Local cache and name index for GEOLEX queries made by GeMS_GeolexCheck.py
+
+Every query ("units_in" = the text of a Name or Fullname) and the GEOLEX units
+it returned are saved in a SQLite database, by default
+~/gems_geolex_cache.sqlite or the path in the environment variable
+GEMS_GEOLEX_CACHE. Answers younger than ttl days are used instead of asking
+GEOLEX again, older ones and the least recently used ones beyond max_queries
+are evicted when the cache is opened.
+
+A GEOLEX dump is a JSON file with a list of unit records as they are returned
+by the units API (or a {"results": [...]} page of them). When the names check
+is given one, names are found in a NameIndex of its units, in memory, and
+neither GEOLEX nor the cache is asked, which is how to run the names check
+offline or against a stub dataset. The dump is only used in that run, it is
+not saved in the cache. Without a dump, only the texts that are not in the
+cache are sent to GEOLEX, several at a time over one pooled session.
+
+Does not import arcpy
+"""
+
+import json
+import os
+import re
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+units_api = r"https://ngmdb.usgs.gov/connect/apiv1/geolex/units/?"
+default_path = os.environ.get(
+    "GEMS_GEOLEX_CACHE",
+    os.path.join(os.path.expanduser("~"), "gems_geolex_cache.sqlite"),
+)
+NO_CONNECTION = "no connection"
+DAY = 86400.0
+
+
+def query_key(text):
+    """cache key of a query, case and extra white space don't matter"""
+    return " ".join(text.lower().split())
+
+
+def name_tokens(text):
+    """lower case words of a name. Periods and apostrophes are dropped so
+    that St. John's, St Johns and st. johns are the same name"""
+    text = re.sub(r"[.']", "", text.lower())
+    return tuple(re.sub(r"[^\w]+", " ", text).split())
+
+
+def load_dump(dump_path):
+    """list of the unit records in a GEOLEX dump"""
+    with open(dump_path, encoding="utf-8") as f:
+        dump = json.load(f)
+    if isinstance(dump, dict):
+        dump = dump["results"]
+    return dump
+
+
+class NameIndex:
+    """GEOLEX unit names by their tokens. units_in(text) answers the same
+    question as the units_in parameter of the API, which units have a name
+    that occurs in the text"""
+
+    def __init__(self, records):
+        self.units = {}  # id: record
+        self.names = {}  # name tokens: [record, ...]
+        self.first = {}  # first token: set of name token tuples
+        for r in records:
+            self.units[r["id"]] = r
+            tokens = name_tokens(r["unit_name"])
+            if not tokens:
+                continue
+            self.names.setdefault(tokens, []).append(r)
+            self.first.setdefault(tokens[0], set()).add(tokens)
+
+    def __len__(self):
+        return len(self.units)
+
+    def lookup(self, name):
+        """records of the units called name"""
+        return self.names.get(name_tokens(name), [])
+
+    def summary(self, unit_id):
+        """(usages, age, extent) of a unit. usages is [usage text, ...],
+        extent is the sorted states of all usages"""
+        r = self.units[unit_id]
+        usages = [u["usage"] for u in r["usages"]]
+        states = sorted({s for u in r["usages"] for s in u["states"]})
+        return usages, r["age_description"], states
+
+    def units_in(self, text):
+        tokens = name_tokens(text)
+        found = []
+        seen = set()
+        for i, t in enumerate(tokens):
+            for name in self.first.get(t, ()):
+                if name in seen or tokens[i : i + len(name)] != name:
+                    continue
+                seen.add(name)
+                found.extend(self.names[name])
+        return found
+
+
+class GeolexCache:
+    def __init__(self, path=default_path, ttl=30, max_queries=5000):
+        """ttl is the number of days a GEOLEX answer is good for"""
+        self.path = path
+        self.ttl = ttl * DAY
+        self.max_queries = max_queries
+        self.con = sqlite3.connect(path)
+        # units.seeded is always 0, it is left from when dumps were saved in
+        # the cache so that older cache files still open
+        self.con.executescript(
+            """
+            create table if not exists units (
+                id integer primary key, record text, seeded integer);
+            create table if not exists queries (
+                key text primary key, unit_ids text, fetched real, used real);
+            """
+        )
+        self.evict()
+
+    def close(self):
+        self.con.commit()
+        self.con.close()
+
+    def evict(self):
+        """remove expired answers, then the least recently used ones over
+        max_queries, then the units that no answer refers to"""
+        cur = self.con.cursor()
+        cur.execute("delete from queries where fetched < ?", (time.time() - self.ttl,))
+        cur.execute(
+            """delete from queries where key not in
+            (select key from queries order by used desc limit ?)""",
+            (self.max_queries,),
+        )
+        used = set()
+        for (ids,) in cur.execute("select unit_ids from queries"):
+            used.update(json.loads(ids))
+        unused = [(i,) for (i,) in cur.execute("select id from units") if not i in used]
+        cur.executemany("delete from units where id = ?", unused)
+        self.con.commit()
+
+    def export(self, dump_path):
+        """write every unit in the cache as a GEOLEX dump, e.g., to make a
+        stub dataset for offline runs"""
+        sql = "select record from units order by id"
+        records = [json.loads(r) for (r,) in self.con.execute(sql)]
+        with open(dump_path, "w", encoding="utf-8") as f:
+            json.dump(records, f)
+        return len(records)
+
+    def get(self, text):
+        """cached list of unit records for a query, None if it isn't cached"""
+        key = query_key(text)
+        row = self.con.execute(
+            "select unit_ids from queries where key = ? and fetched >= ?",
+            (key, time.time() - self.ttl),
+        ).fetchone()
+        if row is None:
+            return None
+        ids = json.loads(row[0])
+        records = {}
+        if ids:
+            sql = "select id, record from units where id in ({})".format(
+                ",".join("?" * len(ids))
+            )
+            records = {i: json.loads(r) for i, r in self.con.execute(sql, ids)}
+            if len(records) < len(set(ids)):
+                # a unit has gone missing, ask again
+                return None
+        self.con.execute(
+            "update queries set used = ? where key = ?", (time.time(), key)
+        )
+        return [records[i] for i in ids]
+
+    def put(self, text, results):
+        now = time.time()
+        with self.con:
+            self.con.executemany(
+                "insert or replace into units values (?, ?, 0)",
+                [(r["id"], json.dumps(r)) for r in results],
+            )
+            self.con.execute(
+                "insert or replace into queries values (?, ?, ?, ?)",
+                (query_key(text), json.dumps([r["id"] for r in results]), now, now),
+            )
+
+
+def make_session(workers):
+    """one requests Session for all queries, with a connection pool as big as
+    the number of threads that share it"""
+    import requests
+    from requests.adapters import HTTPAdapter, Retry
+
+    s = requests.Session()
+    retries = Retry(total=5, backoff_factor=0.1, status_forcelist=[500, 502, 503, 504])
+    s.mount(
+        "https://",
+        HTTPAdapter(pool_connections=1, pool_maxsize=workers, max_retries=retries),
+    )
+    return s
+
+
+def units_query(session, text):
+    """(results, error message). Send the GET request for one text"""
+    try:
+        response = session.get(units_api, params={"units_in": text}, timeout=60)
+        if not response.status_code == 200:
+            return None, (
+                f"Server error {response.status_code} with the following url:\n"
+                f"{response.url}\n"
+                "The server may be down. Try again later or write to gems@usgs.gov"
+            )
+        return response.json()["results"], None
+    except Exception as e:
+        return None, f"There was a problem connecting to GEOLEX.\n{e}"
+
+
+def fetch_units(texts, cache=None, index=None, workers=8, offline=False, warn=print):
+    """{text: list of unit records or NO_CONNECTION} for every text.
+
+    Texts are looked for in the index if there is one, otherwise in the
+    cache, and only the rest are sent to GEOLEX, workers at a time. With
+    offline=True nothing is sent and texts that aren't cached are
+    NO_CONNECTION"""
+    answers = {}
+    misses = {}  # query key: text, each different query only once
+    for text in texts:
+        if text in answers:
+            continue
+        if index is not None:
+            answers[text] = index.units_in(text)
+            continue
+        cached = cache.get(text) if cache is not None else None
+        if cached is not None:
+            answers[text] = cached
+        else:
+            misses.setdefault(query_key(text), text)
+
+    if misses and offline:
+        for text in misses.values():
+            answers[text] = NO_CONNECTION
+    elif misses:
+        session = make_session(workers)
+        # the threads only do the http, the cache stays in this thread
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            replies = pool.map(lambda t: units_query(session, t), misses.values())
+            for text, (results, error) in zip(misses.values(), replies):
+                if error:
+                    warn(error)
+                    answers[text] = NO_CONNECTION
+                else:
+                    answers[text] = results
+                    if cache is not None:
+                        cache.put(text, results)
+        session.close()
+
+    # texts that differ only in case or spacing share an answer
+    for text in texts:
+        if not text in answers:
+            answers[text] = answers[misses[query_key(text)]]
+    return answers
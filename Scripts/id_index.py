@@ -0,0 +1,72 @@
+"""Hashed index of key values for duplicate checks.
+
+Values are added table by table with the row (OID) they came from. Every
+lookup is a dictionary lookup, so building the index and finding duplicates
+takes time proportional to the number of values. The first table and row
+where each value was seen is kept so that duplicates, including duplicates
+between two different tables, can be reported together with where the value
+was first found.
+
+Does not import arcpy so it can be used and benchmarked on its own, see
+benchmarks/bench_id_index.py
+"""
+
+from collections import Counter
+
+
+class IdIndex:
+    def __init__(self):
+        # value: number of times it has been seen
+        self.counts = Counter()
+        # value: (table, oid) where it was seen first
+        self.first_seen = {}
+        # value: [(table, oid), ...] for the second and later sightings
+        self.repeats = {}
+        # [(table, oid), ...] of rows with no value
+        self.nulls = []
+
+    def add(self, table, oid, value):
+        if value is None:
+            self.nulls.append((table, oid))
+            return
+
+        self.counts[value] += 1
+        if value in self.first_seen:
+            self.repeats.setdefault(value, []).append((table, oid))
+        else:
+            self.first_seen[value] = (table, oid)
+
+    def add_column(self, table, oids, values):
+        """Add a whole column of values, oids and values are parallel sequences"""
+        for oid, value in zip(oids, values):
+            self.add(table, oid, value)
+
+    def __len__(self):
+        return len(self.first_seen)
+
+    def __contains__(self, value):
+        return value in self.first_seen
+
+    def count(self, value):
+        return self.counts[value]
+
+    def duplicates(self):
+        """Values seen more than once, in the order they were first repeated"""
+        return list(self.repeats)
+
+    def locations(self, value):
+        """Every (table, oid) in which value was found, first sighting first"""
+        if not value in self.first_seen:
+            return []
+        return [self.first_seen[value]] + self.repeats.get(value, [])
+
+    def collisions(self):
+        """{value: [(table, oid), ...]} of the repeated values found in more
+        than one table"""
+        cross = {}
+        for value, repeats in self.repeats.items():
+            origin = self.first_seen[value][0]
+            if any(t != origin for t, oid in repeats):
+                cross[value] = self.locations(value)
+
+        return cross
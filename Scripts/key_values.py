@@ -0,0 +1,164 @@
+"""Rule tables for GeMS_AttributeByKeyValues.py
+
+A key-value file, see Resources/Dig24K_KeyValues.txt, has a block for each
+feature class: the name of the feature class, a line with the independent
+field and the dependent fields, and a line for each value of the independent
+field with the values of the dependent fields. AttributeByKeyValues used to
+make a table view, count it and run CalculateField for every dependent field
+of every line. parse reads the file once into a RuleTable per feature class.
+A RuleTable is a dictionary lookup on the value of the independent field, so
+all of the rules of a feature class are applied to each row in one
+UpdateCursor pass, with the number of rows selected and calculated kept for
+every rule.
+
+Does not import arcpy
+"""
+
+separator = "|"
+numeric_types = ("Double", "Single", "Integer", "SmallInteger")
+
+
+class KeyValueError(Exception):
+    pass
+
+
+class Rule:
+    """one line of a key-value file"""
+
+    def __init__(self, line, key, values):
+        self.line = line
+        self.key = key
+        self.values = values
+        self.selected = 0
+        # {dependent field: rows calculated}
+        self.calculated = {}
+
+
+class RuleTable:
+    def __init__(self, fc, fields):
+        self.fc = fc
+        self.independent = fields[0]
+        self.dependent = fields[1:]
+        self.rules = []
+        self._lookup = {}
+
+    def add(self, line, vals):
+        if len(vals) != len(self.dependent) + 1:
+            raise KeyValueError(
+                "\nline:\n  {}\nhas wrong number of values. Exiting.".format(line)
+            )
+        self.rules.append(Rule(line, vals[0], vals[1:]))
+
+    def compile(self, field_types):
+        """convert the values of the rules to the types of the fields,
+        {field: arcpy field type}, and build the lookup. Dependent fields
+        that are not text or numbers are left out, as CalculateField was not
+        run for them. Returns the fields that are not in field_types"""
+        missing = [
+            f for f in [self.independent] + self.dependent if not f in field_types
+        ]
+        if missing:
+            return missing
+
+        self.targets = [
+            i
+            for i, f in enumerate(self.dependent)
+            if field_types[f] == "String" or field_types[f] in numeric_types
+        ]
+        self.empty = [
+            ("", " ") if field_types[f] == "String" else (0,) for f in self.dependent
+        ]
+        self._lookup = {}
+        for rule in self.rules:
+            rule.key = convert(rule.key, field_types[self.independent])
+            rule.values = [
+                convert(v, field_types[f]) for v, f in zip(rule.values, self.dependent)
+            ]
+            self._lookup.setdefault(rule.key, []).append(rule)
+        return []
+
+    def apply(self, row, force):
+        """fill in the dependent values of row, [independent value, dependent
+        values], in place. With force, existing values are overwritten,
+        otherwise only null, blank or 0 values are. Returns True if row
+        changed"""
+        rules = self._lookup.get(row[0])
+        if rules is None:
+            return False
+        changed = False
+        # the lines of a value are applied in the order they are in the file
+        for rule in rules:
+            rule.selected += 1
+            for i in self.targets:
+                old = row[i + 1]
+                if force or old is None or old in self.empty[i]:
+                    new = rule.values[i]
+                    field = self.dependent[i]
+                    rule.calculated[field] = rule.calculated.get(field, 0) + 1
+                    if new != old:
+                        row[i + 1] = new
+                        changed = True
+        return changed
+
+    def report(self):
+        """lines of text with the counts of every rule"""
+        lines = []
+        for rule in self.rules:
+            lines.append(
+                "    selected {} = {}, n = {}".format(
+                    self.independent, rule.key, rule.selected
+                )
+            )
+            for field in self.dependent:
+                if field in rule.calculated:
+                    lines.append(
+                        "        calculated {} = {}, n = {}".format(
+                            field,
+                            rule.values[self.dependent.index(field)],
+                            rule.calculated[field],
+                        )
+                    )
+        return lines
+
+
+def convert(value, field_type):
+    if field_type == "String":
+        return value
+    try:
+        if field_type in ("Double", "Single"):
+            return float(value)
+        if field_type in ("Integer", "SmallInteger"):
+            return int(float(value))
+    except ValueError:
+        raise KeyValueError("{} is not a {} value".format(value, field_type))
+    return value
+
+
+def clean(value):
+    """value without quotes and surrounding whitespace"""
+    return value.replace("'", "").replace('"', "").strip()
+
+
+def parse(lines):
+    """[RuleTable] of the blocks of the lines of a key-value file. Empty
+    lines and comments are skipped"""
+    lines = [l.strip() for l in lines]
+    lines = [l for l in lines if len(l) > 1 and l[0:1] != "#"]
+    tables = []
+    table = None
+    n = 0
+    while n < len(lines):
+        terms = lines[n].split(separator)
+        if len(terms) == 1:
+            n += 1
+            if n == len(lines):
+                raise KeyValueError(f"no fields are given for {terms[0]}")
+            fields = [f.strip() for f in lines[n].split(separator)]
+            table = RuleTable(terms[0], fields)
+            tables.append(table)
+        elif table is None:
+            raise KeyValueError(f"line\n  {lines[n]}\ncomes before a feature class")
+        else:
+            table.add(lines[n], [clean(v) for v in terms])
+        n += 1
+    return tables
@@ -0,0 +1,129 @@
+"""Placement of the inclination labels of GeMS_InclinationNumbers.py
+
+A label goes a fixed distance on the page from its orientation point, in the
+direction of the azimuth for planar features and 90 degrees counterclockwise
+of it for linear ones, so that it sits beside the rotated symbol.
+InclinationNumbers used to work this out one point at a time in a Python
+loop. label_points does it with NumPy for all points at once.
+
+displace optionally moves labels that would land on top of another label or
+symbol around their own symbol, at the same distance from it, to the first
+free spot. Labels and symbols are kept in a uniform grid with cells as big as
+the spacing, so each test looks at the 9 cells around the label.
+
+diff compares the labels that are wanted with those already in
+OrientationPointLabels, matched on OrientationPoints_ID, so that only the
+labels of changed points are written.
+
+Does not import arcpy
+"""
+
+import math
+import numpy as np
+
+# distance of the label from the symbol, mm on the page
+planar_radius = 2.4
+linear_radius = 7.4
+
+# turns, degrees, tried in this order when a label is displaced
+turns = (30, -30, 60, -60, 90, -90, 120, -120, 150, -150, 180)
+
+
+def label_points(x, y, azimuth, planar, map_units_per_mm):
+    """(x, y) arrays of the label positions of points with azimuth arrays.
+    planar is a boolean array, False for linear features"""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    planar = np.asarray(planar, dtype=bool)
+    radius = np.where(planar, planar_radius, linear_radius) * map_units_per_mm
+    angle = np.radians(np.where(planar, azimuth, np.asarray(azimuth) - 90.0))
+    return x + np.cos(angle) * radius, y - np.sin(angle) * radius
+
+
+class Grid:
+    """points in square cells of size spacing, to find points closer than
+    spacing"""
+
+    def __init__(self, spacing):
+        self.spacing = spacing
+        self.cells = {}
+
+    def cell(self, x, y):
+        return (int(math.floor(x / self.spacing)), int(math.floor(y / self.spacing)))
+
+    def add(self, x, y):
+        self.cells.setdefault(self.cell(x, y), []).append((x, y))
+
+    def crowded(self, x, y, own=None):
+        """True if a point other than own is closer than spacing to (x, y)"""
+        ci, cj = self.cell(x, y)
+        s2 = self.spacing * self.spacing
+        for i in (-1, 0, 1):
+            for j in (-1, 0, 1):
+                for ox, oy in self.cells.get((ci + i, cj + j), ()):
+                    if (ox, oy) == own:
+                        continue
+                    if (ox - x) * (ox - x) + (oy - y) * (oy - y) < s2:
+                        return True
+        return False
+
+
+def displace(lx, ly, x, y, spacing):
+    """label positions, with labels that are within spacing of a label placed
+    before them or of another symbol turned around their own symbol (x, y)
+    until they are clear. Labels with no clear spot are left where they were.
+    Returns the new lx, ly and the number of labels moved"""
+    lx = np.array(lx, dtype=float)
+    ly = np.array(ly, dtype=float)
+    grid = Grid(spacing)
+    symbols = Grid(spacing)
+    for sx, sy in zip(x, y):
+        symbols.add(sx, sy)
+    moved = 0
+    for n in range(len(lx)):
+        own = (x[n], y[n])
+        if grid.crowded(lx[n], ly[n]) or symbols.crowded(lx[n], ly[n], own):
+            dx = lx[n] - x[n]
+            dy = ly[n] - y[n]
+            for turn in turns:
+                c = math.cos(math.radians(turn))
+                s = math.sin(math.radians(turn))
+                tx = x[n] + dx * c - dy * s
+                ty = y[n] + dx * s + dy * c
+                if not grid.crowded(tx, ty) and not symbols.crowded(tx, ty, own):
+                    lx[n] = tx
+                    ly[n] = ty
+                    moved += 1
+                    break
+        grid.add(lx[n], ly[n])
+    return lx, ly, moved
+
+
+def diff(existing, wanted, tolerance):
+    """(inserts, updates, deletes) to turn the labels existing into wanted.
+    Both are {id: (x, y, inclination text, plot at scale)}. A label is updated if
+    it moved more than tolerance or its values changed. inserts and updates
+    are lists of ids, deletes a list of the ids of existing"""
+    inserts = []
+    updates = []
+    for key, label in wanted.items():
+        old = existing.get(key)
+        if old is None:
+            inserts.append(key)
+        elif (
+            old[0] is None
+            or abs(old[0] - label[0]) > tolerance
+            or abs(old[1] - label[1]) > tolerance
+            or old[2] != label[2]
+            or not _same_scale(old[3], label[3])
+        ):
+            updates.append(key)
+    deletes = [key for key in existing if not key in wanted]
+    return inserts, updates, deletes
+
+
+def _same_scale(a, b):
+    # PlotAtScale is a single precision field
+    if a is None or b is None:
+        return a is b
+    return math.isclose(a, b, rel_tol=1e-6)
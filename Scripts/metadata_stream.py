@@ -0,0 +1,100 @@
+"""Helpers for writing large FGDC metadata records, for GeMS_FGDCMetadata.py
+
+The entity and attribute section, eainfo, has a <detailed> element for every
+table and an <edom> for every value of every field with an enumerated
+domain. GeMS_FGDCMetadata.py used to build all of them in the metadata tree
+before writing it. write_metadata writes the record with lxml's incremental
+xmlfile writer instead, and a function passed to it writes the <detailed>
+elements one attribute at a time, so only one <attr> is in memory at a time.
+
+Parsed templates are kept by path and modification time, so running the tool
+again in the same ArcGIS Pro session does not parse the template again, and
+Terms looks up the definitions of the values of a term dictionary,
+including concatenated DataSources_IDs, only once per value.
+
+Does not import arcpy
+"""
+
+import copy
+from pathlib import Path
+from lxml import etree
+
+_templates = {}
+
+
+def parse_template(template_path):
+    """copy of the root of a parsed xml file, parsed again only if the file
+    has changed"""
+    path = Path(template_path).resolve()
+    key = (str(path), path.stat().st_mtime_ns)
+    if not key in _templates:
+        # keep only the latest version of each file
+        for k in [k for k in _templates if k[0] == key[0]]:
+            del _templates[k]
+        _templates[key] = etree.parse(str(path)).getroot()
+    # callers edit the tree
+    return copy.deepcopy(_templates[key])
+
+
+class Terms:
+    """Lookups in a term dictionary, {term: definition} or
+    {term: [definition, source]}, with the answers for values that hold
+    several terms separated by '|' kept after the first lookup"""
+
+    def __init__(self, terms, missing="PROVIDE A DEFINITION FOR {}"):
+        self.terms = terms or {}
+        self.missing = missing
+        self._m2m = {}
+
+    def __contains__(self, term):
+        return term in self.terms
+
+    def __getitem__(self, term):
+        return self.terms[term]
+
+    def m2m(self, value):
+        """definition of value, or the definitions of the terms in value,
+        e.g., "DAS03 | DAS05", joined by ' | '"""
+        if value is None:
+            return None
+        if not value in self._m2m:
+            if "|" in value:
+                defs = []
+                for term in value.split("|"):
+                    term = term.strip()
+                    if term in self.terms:
+                        defs.append(first(self.terms[term]))
+                    else:
+                        defs.append(self.missing.format(term))
+                self._m2m[value] = " | ".join(defs)
+            elif value in self.terms:
+                self._m2m[value] = self.terms[value]
+            else:
+                self._m2m[value] = self.missing.format(value)
+        return self._m2m[value]
+
+
+def first(definition):
+    if isinstance(definition, list):
+        return definition[0]
+    return definition
+
+
+def write_metadata(out_path, root, write_entities):
+    """write the metadata tree root to out_path. write_entities(xf) is called
+    inside the eainfo element, after its existing children, to write more
+    <detailed> elements to xf, an lxml xmlfile"""
+    with etree.xmlfile(str(out_path), encoding="utf-8") as xf:
+        xf.write_declaration()
+        with xf.element(root.tag, root.attrib):
+            xf.write("\n")
+            for child in root:
+                if child.tag == "eainfo":
+                    with xf.element("eainfo", child.attrib):
+                        xf.write("\n")
+                        for c in child:
+                            xf.write(c, pretty_print=True)
+                        write_entities(xf)
+                    xf.write("\n")
+                else:
+                    xf.write(child, pretty_print=True)
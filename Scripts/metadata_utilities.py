@@ -8,7 +8,6 @@ from lxml import etree
 import tempfile
 import csv
 from pathlib import Path
-from osgeo import ogr
 import subprocess
 import re
 import GeMS_utilityFunctions as guf
@@ -579,12 +578,15 @@ def md_from_scratch(db_dict, obj=None):
     return etree.ElementTree(metadata).getroot()
 
 
+# max_bounding, get_spdoinfo and add_spref read the database through su.pool, so
+# it is opened once for all of its layers. The caller closes it with
+# su.pool.close(db_path) when the spatial elements of every layer are made
 def max_bounding(db_path):
     north = []
     south = []
     west = []
     east = []
-    for layer in ogr.Open(db_path):
+    for layer in su.pool.get(str(db_path)):
         if layer.GetGeomType() != 100:
             # if "MapUnitPolys" in layer.GetName() or "ContactsAndFaults" in layer.GetName():
             if layer.GetSpatialRef():
@@ -641,7 +643,7 @@ def add_spref(db_dict, layer, dom):
     db_path = wksp.connectionProperties.database
     spref_node = None
     try:
-        spref_node = su.get_spref(db_path, layer, db_dict[layer]["datasetType"])
+        spref_node = su.get_spref(str(db_path), layer)
     except Exception as e:
         arcpy.AddWarning(
             f"""Could not determine the coordinate system of {layer}
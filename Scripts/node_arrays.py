@@ -0,0 +1,512 @@
+"""Array versions of getNodes and processNodes of GeMS_TopologyCheck.py
+
+Those functions and the helpers named in the comments below (adjoiningMapUnits,
+arcOrder, youngestMapUnit, ...) are in GeMS_TopologyCheck.py up to the version
+of 8/21/23 and are the readable version of the node rules.
+
+Arc endpoints are held as NumPy columns (EndPoints) with the string
+attributes stored as integer codes. Endpoints are sorted into nodes with
+np.lexsort and the 1-, 2-, 3- and 4-arc rules are evaluated with masks over
+all the nodes that have the same number of arcs. Only the nodes that end up
+in one of the output lists are turned back into [x, y, [CAF_arc, ...], note, ...]
+lists, so the results are the same as those of processNodes(getNodes()).
+
+No arcpy in here. The rows are read by GeMS_TopologyCheck.py and the CAF_arc
+objects are made with the class that is passed in.
+"""
+
+from operator import itemgetter
+import numpy as np
+
+# fields of the endpoint rows after POINT_X, POINT_Y, in CAF_arc.fieldList order
+arcFields = [
+    "Type",
+    "IsConcealed",
+    "ExistenceConfidence",
+    "IdentityConfidence",
+    "LocationConfidenceMeters",
+    "DataSourceID",
+    "Notes",
+    "LineDir",
+    "ToFrom",
+    "RIGHT_MapUnit",
+    "LEFT_MapUnit",
+    "ORIG_FID",
+]
+# fields compared by sameArcAttributes
+sameFields = arcFields[:7]
+
+# notes for badNodes, by code
+notes = [
+    "dangling concealed contact",
+    "dangling contact",
+    "mismatched Type values",
+    "one arc concealed, one not",
+    "impossible number of concealed arcs",
+    "at least 2 arcs must be same Type",
+    "all arcs concealed but bounding map units not all the same",
+    "too many concealed arcs",
+    "opposite arcs must have same Type",
+    "adjacent arcs concealed",
+    "arcs adjacent to single concealed arc must not be faults",
+    "concealed arc and unconcealed continuation must be same Type",
+    "4 unconcealed arcs",
+    "too many arcs",
+]
+noteCode = {n: i for i, n in enumerate(notes)}
+# notes that are made from the attributes of the node
+toFromNote = -1  # 'From, From' of a 2-arc fault-flip node
+youngestNote = -2  # '# X is not youngest unit in [...]'
+noNote = -3
+
+# output lists
+BAD, FLIP, MISSING = 0, 1, 2
+
+
+def isFault(lType):
+    return lType.upper().find("FAULT") > -1
+
+
+def factorize(values, lookup=None):
+    """Integer codes for a sequence of values and the {value: code} dictionary.
+    Values are compared with a dictionary so equality is the same as in Python"""
+    if lookup is None:
+        lookup = {}
+    for v in dict.fromkeys(values):
+        lookup.setdefault(v, len(lookup))
+    codes = np.fromiter(map(lookup.__getitem__, values), np.int64, len(values))
+    return codes, lookup
+
+
+def combine(columns):
+    """One code per row for several columns of codes, same code for same values"""
+    key = np.zeros(len(columns[0]), dtype=np.int64)
+    for col in columns:
+        # renumber after every column so the key can't overflow
+        key = np.unique(key * (col.max() + 1) + col, return_inverse=True)[1].ravel()
+    return key
+
+
+class EndPoints:
+    """Columns of the arc endpoint rows, sorted into nodes.
+
+    Every attribute is a NumPy array in node order and, within a node, in
+    LineDir order. starts and counts give the first endpoint and the number
+    of endpoints of each node. row is the index of the endpoint in the rows
+    it was made from.
+    """
+
+    def __init__(self, rows, zeroValue):
+        self.rows = rows
+        n = len(rows)
+        cols = [list(map(itemgetter(i), rows)) for i in range(len(arcFields) + 2)]
+        x = np.array(cols[0], dtype=float)
+        y = np.array(cols[1], dtype=float)
+        byName = dict(zip(arcFields, cols[2:]))
+
+        order, self.starts = groupEndPoints(x, y, zeroValue)
+        self.counts = np.diff(np.append(self.starts, n))
+        self.nodeX = x[order][self.starts]
+        self.nodeY = y[order][self.starts]
+
+        # arcs are sorted by LineDir within each node so that they are in
+        # clockwise order. lexsort is stable, like list.sort in getNodes
+        node = np.repeat(np.arange(len(self.starts)), self.counts)
+        lineDir = np.array(byName["LineDir"], dtype=float)
+        self.row = order[np.lexsort((lineDir[order], node))]
+
+        self.lookups = {}
+        codes = {}
+        # right and left map units share one lookup so they can be compared
+        units = {}
+        for f in arcFields:
+            if f in ("RIGHT_MapUnit", "LEFT_MapUnit"):
+                codes[f], units = factorize(byName[f], units)
+                self.lookups[f] = units
+            elif not f in ("LineDir", "ORIG_FID"):
+                codes[f], self.lookups[f] = factorize(byName[f])
+
+        r = self.row
+        self.type = codes["Type"][r]
+        self.isConc = codes["IsConcealed"][r]
+        self.toFrom = codes["ToFrom"][r]
+        self.ofid = np.array(byName["ORIG_FID"], dtype=np.int64)[r] if n else r
+
+        # tests made once for every distinct value
+        faultTypes = np.array([isFault(t) for t in self.lookups["Type"]], dtype=bool)
+        concealed = np.array(
+            [c.lower() == "y" for c in self.lookups["IsConcealed"]], dtype=bool
+        )
+        self.fault = faultTypes[self.type] if n else np.zeros(0, dtype=bool)
+        self.concealed = concealed[self.isConc] if n else np.zeros(0, dtype=bool)
+
+        # arcs with the same code have the same sameArcAttributes fields
+        if n:
+            self.attribs = combine([codes[f][r] for f in sameFields])
+        else:
+            self.attribs = np.zeros(0, dtype=np.int64)
+
+        # map unit on the node side of each arc, see adjoiningMapUnits
+        isFrom = self.toFrom == self.lookups["ToFrom"].get("From", -1)
+        self.unit = np.where(
+            isFrom, codes["RIGHT_MapUnit"][r], codes["LEFT_MapUnit"][r]
+        )
+
+    def __len__(self):
+        return len(self.starts)
+
+    def values(self, field):
+        """[value by code] for one of the factorized fields"""
+        return list(self.lookups[field])
+
+
+def groupEndPoints(x, y, zeroValue):
+    """Sort endpoints by x, then y, and find the first endpoint of every node.
+    As in getNodes, an endpoint belongs to the current node if it is within
+    zeroValue of the first endpoint of that node in both x and y.
+    Returns (order, starts) where starts index into x[order]"""
+    order = np.lexsort((y, x))
+    xs = x[order]
+    ys = y[order]
+    n = len(xs)
+    if n == 0:
+        return order, np.zeros(0, dtype=np.int64)
+
+    # break wherever an endpoint is not within zeroValue of the one before it
+    close = (np.abs(np.diff(xs)) < zeroValue) & (np.abs(np.diff(ys)) < zeroValue)
+    starts = np.concatenate(([0], np.flatnonzero(~close) + 1))
+
+    # that is the same as walking the sorted endpoints as long as every endpoint
+    # is close to the first endpoint of its node and no first endpoint is
+    # close to the first endpoint of the node before it
+    s = np.repeat(starts, np.diff(np.append(starts, n)))
+    inNode = (np.abs(xs - xs[s]) < zeroValue) & (np.abs(ys - ys[s]) < zeroValue)
+    sx = xs[starts]
+    sy = ys[starts]
+    merged = (np.abs(np.diff(sx)) < zeroValue) & (np.abs(np.diff(sy)) < zeroValue)
+    if inNode.all() and not merged.any():
+        return order, starts
+
+    # clusters of endpoints spread over more than zeroValue, walk them
+    starts = [0]
+    lastX = xs[0]
+    lastY = ys[0]
+    for i in range(1, n):
+        if not (abs(xs[i] - lastX) < zeroValue and abs(ys[i] - lastY) < zeroValue):
+            starts.append(i)
+            lastX = xs[i]
+            lastY = ys[i]
+
+    return order, np.array(starts, dtype=np.int64)
+
+
+class Events:
+    """Collects (node, seq, list, note) and connectFIDs pairs in the order
+    processNodes would make them"""
+
+    def __init__(self):
+        self.flags = []
+        self.connects = []
+
+    def flag(self, nodes, seq, mask, which, note=noNote):
+        nodes = nodes[mask]
+        if len(nodes):
+            f = np.empty((len(nodes), 4), dtype=np.int64)
+            f[:, 0] = nodes
+            f[:, 1:] = seq, which, note
+            self.flags.append(f)
+
+    def connect(self, nodes, seq, mask, fidA, fidB):
+        if mask.any():
+            self.connects.append(
+                np.stack(
+                    [nodes[mask], np.full(mask.sum(), seq), fidA[mask], fidB[mask]],
+                    axis=1,
+                )
+            )
+
+    def sorted(self, parts, width):
+        if not parts:
+            return np.zeros((0, width), dtype=np.int64)
+        a = np.concatenate(parts).astype(np.int64)
+        return a[np.lexsort((a[:, 1], a[:, 0]))]
+
+
+def pick(m, cols):
+    """m[i, cols[i]] for every row i"""
+    return m[np.arange(len(m)), cols]
+
+
+def processNodeArrays(ends, hKeyDict, hKeyTestValue, arcClass):
+    """Array version of processNodes. ends is an EndPoints.
+    Returns badNodes, faultFlipNodes, missingConcealedArcNodes, connectFIDs
+    and the number of nodes with 1, 2, 3, 4 and 5+ arcs"""
+    ev = Events()
+    counts = ends.counts
+    unitValues = ends.values("RIGHT_MapUnit")
+
+    # hierarchy keys of the map units as ranks; '' for None, as in youngestMapUnit.
+    # -1 for map units that are not in hKeyDict
+    keys = [hKeyDict[u] if u in hKeyDict else None for u in unitValues]
+    keys = ["" if k is None else k for k in keys]
+    ranks = {k: i for i, k in enumerate(sorted(set(keys)))}
+    unitRank = np.array(
+        [ranks[k] if u in hKeyDict else -1 for u, k in zip(unitValues, keys)],
+        dtype=np.int64,
+    )
+    covering = np.array(
+        [
+            not (u is None or u == "")
+            and hKeyDict.get(u) is not None
+            and hKeyDict[u] < hKeyTestValue
+            for u in unitValues
+        ],
+        dtype=bool,
+    )
+
+    ######################
+    nodes = np.flatnonzero(counts == 1)
+    a = ends.starts[nodes]
+    contact = ~ends.fault[a]
+    conc = ends.concealed[a]
+    ev.flag(nodes, 0, contact & conc, BAD, noteCode["dangling concealed contact"])
+    ev.flag(nodes, 0, contact & ~conc, BAD, noteCode["dangling contact"])
+
+    ######################
+    nodes = np.flatnonzero(counts == 2)
+    a = ends.starts[nodes]
+    b = a + 1
+    ev.flag(
+        nodes, 0, ends.type[a] != ends.type[b], BAD, noteCode["mismatched Type values"]
+    )
+    ev.flag(
+        nodes,
+        1,
+        ends.isConc[a] != ends.isConc[b],
+        BAD,
+        noteCode["one arc concealed, one not"],
+    )
+    ev.connect(nodes, 2, ends.attribs[a] == ends.attribs[b], ends.ofid[a], ends.ofid[b])
+    flip = ends.fault[a] & ends.fault[b] & (ends.toFrom[a] == ends.toFrom[b])
+    ev.flag(nodes, 3, flip, FLIP, toFromNote)
+
+    ######################
+    nodes = np.flatnonzero(counts == 3)
+    arcs = ends.starts[nodes][:, None] + np.arange(3)
+    t = ends.type[arcs]
+    nCon = ends.concealed[arcs].sum(axis=1)
+    # map units in the order of adjoiningMapUnits
+    mu = ends.unit[arcs[:, [1, 2, 0]]]
+
+    # sameTypeIndices
+    ab = t[:, 0] == t[:, 1]
+    ac = t[:, 0] == t[:, 2]
+    bc = t[:, 1] == t[:, 2]
+    allSame = (ab | ac) & bc
+    twoSame = (ab | ac | bc) & ~allSame
+    s0 = np.where(ab | ac, 0, 1)
+    s1 = np.where(ab, 1, 2)
+    diff = np.where(ab, 2, np.where(ac, 1, 0))
+
+    impossible = (nCon == 1) | (nCon == 2)
+    ev.flag(nodes, 0, impossible, BAD, noteCode["impossible number of concealed arcs"])
+    ok = ~impossible
+    ev.flag(
+        nodes,
+        0,
+        ok & ~(allSame | twoSame),
+        BAD,
+        noteCode["at least 2 arcs must be same Type"],
+    )
+    ok &= allSame | twoSame
+    notAllSameUnit = (mu[:, 0] != mu[:, 1]) | (mu[:, 1] != mu[:, 2])
+    ev.flag(
+        nodes,
+        1,
+        ok & (nCon == 3) & notAllSameUnit,
+        BAD,
+        noteCode["all arcs concealed but bounding map units not all the same"],
+    )
+
+    fault = ends.fault[pick(arcs, s0)]
+    attr0 = ends.attribs[pick(arcs, s0)]
+    attr1 = ends.attribs[pick(arcs, s1)]
+    tf0 = ends.toFrom[pick(arcs, s0)]
+    tf1 = ends.toFrom[pick(arcs, s1)]
+    fid0 = ends.ofid[pick(arcs, s0)]
+    fid1 = ends.ofid[pick(arcs, s1)]
+
+    # two arcs of the same Type, faults
+    two = ok & twoSame
+    ev.flag(nodes, 2, two & fault & (tf0 == tf1), FLIP)
+    ev.connect(nodes, 2, two & fault & (tf0 != tf1) & (attr0 == attr1), fid0, fid1)
+
+    # youngest map unit, first of the lowest hierarchy keys
+    ranked = unitRank[mu]
+    need = ok & ~fault
+    missing = need[:, None] & (ranked < 0)
+    if missing.any():
+        raise KeyError(unitValues[mu[missing][0]])
+    young = np.argmin(ranked, axis=1) if len(nodes) else np.zeros(0, dtype=np.int64)
+    ymu = pick(mu, young)
+    isCovering = covering[ymu]
+
+    # two arcs of the same Type, contacts; the unit between them should be youngest
+    contacts = two & ~fault
+    isYoungest = ymu == pick(mu, diff)
+    ev.connect(nodes, 3, contacts & isYoungest & (attr0 == attr1), fid0, fid1)
+    ev.flag(nodes, 4, contacts & isYoungest & isCovering, MISSING)
+    ev.flag(nodes, 4, contacts & ~isYoungest, BAD, youngestNote)
+
+    # all 3 arcs of the same Type
+    same3 = ok & allSame
+    tf = ends.toFrom[arcs]
+    ev.flag(
+        nodes,
+        5,
+        same3 & fault & (tf[:, 0] == tf[:, 1]) & (tf[:, 1] == tf[:, 2]),
+        FLIP,
+    )
+    # youngArcs are [0, 1, 2] without the index of the youngest unit
+    y0 = np.where(young == 0, 1, 0)
+    y1 = np.where(young == 2, 1, 2)
+    ya = pick(arcs, y0)
+    yb = pick(arcs, y1)
+    contacts = same3 & ~fault
+    ev.connect(
+        nodes,
+        5,
+        contacts & (ends.attribs[ya] == ends.attribs[yb]),
+        ends.ofid[ya],
+        ends.ofid[yb],
+    )
+    ev.flag(nodes, 6, contacts & isCovering, MISSING)
+
+    ######################
+    nodes = np.flatnonzero(counts == 4)
+    arcs = ends.starts[nodes][:, None] + np.arange(4)
+    concMatrix = ends.concealed[arcs]
+    nCon = concMatrix.sum(axis=1)
+    c0 = np.argmax(concMatrix, axis=1)  # first concealed arc
+    c1 = 3 - np.argmax(concMatrix[:, ::-1], axis=1)  # last concealed arc
+    # see arcOrder
+    opp = pick(arcs, (c0 + 2) % 4)
+    adj0 = pick(arcs, np.where(c0 % 2 == 0, 1, 0))
+    adj1 = pick(arcs, np.where(c0 % 2 == 0, 3, 2))
+    con0 = pick(arcs, c0)
+    con1 = pick(arcs, c1)
+    t = ends.type
+
+    ev.flag(nodes, 0, nCon > 2, BAD, noteCode["too many concealed arcs"])
+
+    two = nCon == 2
+    badTypes = (t[con0] != t[con1]) | (t[adj0] != t[adj1])
+    ev.flag(
+        nodes, 0, two & badTypes, BAD, noteCode["opposite arcs must have same Type"]
+    )
+    adjacent = ~badTypes & ~ends.concealed[opp]
+    ev.flag(nodes, 0, two & adjacent, BAD, noteCode["adjacent arcs concealed"])
+    good = two & ~badTypes & ~adjacent
+    sameAdj = ends.attribs[adj0] == ends.attribs[adj1]
+    ev.connect(nodes, 1, good & sameAdj, ends.ofid[adj0], ends.ofid[adj1])
+    flip = ends.fault[con0] & (ends.toFrom[con0] == ends.toFrom[opp])
+    ev.flag(nodes, 2, good & flip, FLIP)
+    ev.connect(
+        nodes,
+        2,
+        good & ~flip & (ends.attribs[con0] == ends.attribs[opp]),
+        ends.ofid[con0],
+        ends.ofid[opp],
+    )
+
+    one = nCon == 1
+    adjFault = ends.fault[adj0]
+    ev.flag(
+        nodes,
+        0,
+        one & adjFault,
+        BAD,
+        noteCode["arcs adjacent to single concealed arc must not be faults"],
+    )
+    noContinuation = ~adjFault & (t[opp] != t[con0])
+    ev.flag(
+        nodes,
+        0,
+        one & noContinuation,
+        BAD,
+        noteCode["concealed arc and unconcealed continuation must be same Type"],
+    )
+    ev.connect(
+        nodes,
+        1,
+        one & ~adjFault & ~noContinuation & sameAdj,
+        ends.ofid[adj0],
+        ends.ofid[adj1],
+    )
+
+    ev.flag(nodes, 0, nCon == 0, BAD, noteCode["4 unconcealed arcs"])
+
+    ######################
+    nodes = np.flatnonzero(counts > 4)
+    ev.flag(nodes, 0, np.ones(len(nodes), dtype=bool), BAD, noteCode["too many arcs"])
+
+    ######################
+    flags = ev.sorted(ev.flags, 4)
+    connects = ev.sorted(ev.connects, 4)
+
+    # make lists only for the nodes that were flagged. The same list is
+    # shared by every output list the node is in, as in processNodes
+    nodeLists = {}
+    outLists = ([], [], [])
+    for node, seq, which, note in flags.tolist():
+        if not node in nodeLists:
+            nodeLists[node] = nodeList(ends, node, arcClass)
+        n = nodeLists[node]
+        if note != noNote:
+            n.append(nodeNote(ends, n, note))
+        outLists[which].append(n)
+
+    nodeCounts = [int((counts == i).sum()) for i in (1, 2, 3, 4)]
+    nodeCounts.append(int((counts > 4).sum()))
+    badNodes, faultFlipNodes, missingConcealedArcNodes = outLists
+
+    return (
+        badNodes,
+        faultFlipNodes,
+        missingConcealedArcNodes,
+        connects[:, 2:].tolist(),
+        nodeCounts,
+    )
+
+
+def nodeList(ends, node, arcClass):
+    """[x, y, [CAF_arc, ...]] for node, as made by getNodes"""
+    first = ends.starts[node]
+    arcs = [
+        arcClass(ends.rows[r][2:])
+        for r in ends.row[first : first + ends.counts[node]].tolist()
+    ]
+    return [ends.nodeX[node].item(), ends.nodeY[node].item(), arcs]
+
+
+def nodeNote(ends, node, note):
+    arcs = node[2]
+    if note == toFromNote:
+        return arcs[0].ToFrom + ", " + arcs[1].ToFrom
+    elif note == youngestNote:
+        mapUnits = []
+        for a in (arcs[1], arcs[2], arcs[0]):
+            if a.ToFrom == "From":
+                mapUnits.append(a.RMU)
+            else:
+                mapUnits.append(a.LMU)
+        types = [a.Type for a in arcs]
+        if types[0] == types[1]:
+            diff = 2
+        elif types[0] == types[2]:
+            diff = 1
+        else:
+            diff = 0
+        return "# " + str(mapUnits[diff]) + " is not youngest unit in " + str(mapUnits)
+    else:
+        return notes[note]
@@ -0,0 +1,162 @@
+"""In-memory graph of the nodes (arc endpoints) of a line feature class.
+
+Replaces the FeatureVerticesToPoints - AddXY - Sort round trip through
+temporary feature classes. Lines are read once with a SearchCursor. The first
+and last points of every line are put in a hash grid of cells searchRadius
+wide, so the endpoints that are within searchRadius of each other in x and y
+are found by looking in the 3 x 3 cells around a point and end up at the same
+node. Every node keeps the list of arc ends that meet there, and every arc
+end keeps the direction of the line as it leaves the node, calculated from
+the first or last segment of the line.
+
+Used by GeMS_Deplanarize.py and GeMS_TopologyCheck.py
+"""
+
+import math
+import arcpy
+
+
+def geographicAzimuth(pt1, pt2):
+    """azimuth from pt1 to pt2, in degrees clockwise from north"""
+    dx = pt2[0] - pt1[0]
+    dy = pt2[1] - pt1[1]
+    azi = 90 - math.degrees(math.atan2(dy, dx))
+    if azi < 0:
+        azi = azi + 360
+    return azi
+
+
+def nodeName(x, y):
+    xstr = str(int(round(x * 100)))
+    ystr = str(int(round(y * 100)))
+    return xstr + "_" + ystr
+
+
+class ArcEnd:
+    """One end of an arc at a node. direction is the azimuth of the line
+    leaving the node, isStart is True for the first point of the line"""
+
+    __slots__ = ("arcID", "isStart", "x", "y", "direction", "attribs")
+
+    def __init__(self, arcID, isStart, x, y, direction, attribs):
+        self.arcID = arcID
+        self.isStart = isStart
+        self.x = x
+        self.y = y
+        self.direction = direction
+        self.attribs = attribs
+
+    def toFrom(self):
+        # 'From' ends are the first point of an arc, as in TopologyCheck
+        if self.isStart:
+            return "From"
+        else:
+            return "To"
+
+
+class NodeGraph:
+    """Nodes of a set of arcs and the arc ends at each node.
+
+    Nodes are numbered in the order they are first found. nodeXY[n] is the
+    location of the first arc end found at node n, nodeEnds[n] is the list
+    of ArcEnds at node n and arcNodes[arcID] is [start node, end node].
+    """
+
+    def __init__(self, searchRadius):
+        self.searchRadius = searchRadius
+        self.grid = {}  # (column, row) of cell: [node, ...]
+        self.nodeXY = []
+        self.nodeEnds = []
+        self.arcs = {}  # arcID: attribs
+        self.arcNodes = {}  # arcID: [startNode, endNode]
+        self.ends = []
+
+    @classmethod
+    def fromFeatureClass(cls, fc, fields, searchRadius, where=None):
+        """Graph of the lines in fc. The values of fields are kept as the
+        attribs tuple of each arc, arcIDs are OBJECTIDs"""
+        graph = cls(searchRadius)
+        with arcpy.da.SearchCursor(
+            fc, ["OID@", "SHAPE@"] + list(fields), where
+        ) as cursor:
+            for row in cursor:
+                if row[1] is None:
+                    continue
+                graph.addArc(row[0], tuple(row[2:]), linePoints(row[1]))
+        return graph
+
+    def __len__(self):
+        return len(self.nodeXY)
+
+    def cell(self, x, y):
+        return (
+            int(math.floor(x / self.searchRadius)),
+            int(math.floor(y / self.searchRadius)),
+        )
+
+    def findNode(self, x, y):
+        """node within searchRadius of x, y in both x and y, None if there is none.
+        If there are several, the one found first"""
+        r = self.searchRadius
+        i, j = self.cell(x, y)
+        found = None
+        for ci in (i - 1, i, i + 1):
+            for cj in (j - 1, j, j + 1):
+                for n in self.grid.get((ci, cj), ()):
+                    nx, ny = self.nodeXY[n]
+                    if abs(x - nx) < r and abs(y - ny) < r:
+                        if found is None or n < found:
+                            found = n
+        return found
+
+    def addNode(self, x, y):
+        n = len(self.nodeXY)
+        self.nodeXY.append((x, y))
+        self.nodeEnds.append([])
+        self.grid.setdefault(self.cell(x, y), []).append(n)
+        return n
+
+    def addArc(self, arcID, attribs, points):
+        """points are the (x, y) vertices of the arc in order. Only the first
+        two and the last two are used"""
+        if len(points) < 2:
+            points = [points[0], points[0]]
+        self.arcs[arcID] = attribs
+        nodes = []
+        for isStart, pt, nextPt in (
+            (True, points[0], points[1]),
+            (False, points[-1], points[-2]),
+        ):
+            n = self.findNode(pt[0], pt[1])
+            if n is None:
+                n = self.addNode(pt[0], pt[1])
+            end = ArcEnd(
+                arcID, isStart, pt[0], pt[1], geographicAzimuth(pt, nextPt), attribs
+            )
+            self.nodeEnds[n].append(end)
+            self.ends.append(end)
+            nodes.append(n)
+        self.arcNodes[arcID] = nodes
+
+    def nodeName(self, n):
+        return nodeName(*self.nodeXY[n])
+
+    def arcEnds(self):
+        """Every ArcEnd, start points first, in the order the arcs were added"""
+        return [a for a in self.ends if a.isStart] + [
+            a for a in self.ends if not a.isStart
+        ]
+
+
+def linePoints(shape):
+    """first two and last two vertices of a polyline as (x, y) tuples"""
+    first = shape.getPart(0)
+    last = shape.getPart(shape.partCount - 1)
+    pts = [(first[0].X, first[0].Y)]
+    if len(first) > 1:
+        pts.append((first[1].X, first[1].Y))
+    n = len(last)
+    if n > 1:
+        pts.append((last[n - 2].X, last[n - 2].Y))
+    pts.append((last[n - 1].X, last[n - 1].Y))
+    return pts
@@ -0,0 +1,170 @@
+"""Greedy thinning of points for GeMS_SetPlotAtScales.py
+
+The closest pair of points is found, one of the two is dropped and its
+separation recorded, and so on until no two remaining points are closer
+than searchRadius. This is what the near-table loop in SetPlotAtScales did,
+without a near table: each point's nearest neighbour is found in a uniform
+grid and kept in a priority queue (heapq) as (distance, fid, nearest fid).
+Entries are invalidated lazily. When an entry comes off the queue and its
+nearest neighbour has been dropped, the nearest neighbour of the point is
+found again and pushed back. Distances only grow as points are dropped, so
+the queue always gives the closest pair that is left.
+
+Ties are broken like the sorted near table, by distance, then the fid of the
+point, then the fid of its neighbour.
+
+Does not import arcpy, see benchmarks/bench_point_thinning.py
+"""
+
+import heapq
+import math
+
+
+def secondPoint(fid1, fid2):
+    """default for which point of a pair is dropped, the near point"""
+    return fid2
+
+
+class PointGrid:
+    """Uniform grid of points for nearest neighbour searches. Points can be
+    removed. The grid is rebuilt with bigger cells as points are removed so
+    that a search looks at about the same number of points"""
+
+    def __init__(self, points, maxDistance):
+        # points is {fid: (x, y)}
+        self.points = points
+        self.maxDistance = maxDistance
+        self.alive = set(points)
+        xs = [p[0] for p in points.values()]
+        ys = [p[1] for p in points.values()]
+        if points:
+            self.area = max(max(xs) - min(xs), maxDistance) * max(
+                max(ys) - min(ys), maxDistance
+            )
+        else:
+            self.area = maxDistance**2
+        self.build()
+
+    def build(self):
+        # about 2 points per cell, no bigger than maxDistance
+        n = max(len(self.alive), 1)
+        self.cellSize = min(self.maxDistance, math.sqrt(2 * self.area / n))
+        if self.cellSize <= 0:
+            self.cellSize = self.maxDistance
+        self.builtFor = n
+        self.rings = []
+        self.cells = {}
+        # cells hold (fid, x, y) so a search doesn't have to look up points
+        for fid in self.alive:
+            x, y = self.points[fid]
+            self.cells.setdefault(self.cell(x, y), []).append((fid, x, y))
+
+    def cell(self, x, y):
+        return (int(math.floor(x / self.cellSize)), int(math.floor(y / self.cellSize)))
+
+    def remove(self, fid):
+        self.alive.discard(fid)
+        x, y = self.points[fid]
+        self.cells[self.cell(x, y)].remove((fid, x, y))
+        if len(self.alive) < self.builtFor // 2:
+            self.build()
+
+    def ring(self, r):
+        """(column, row) offsets of the cells r cells away from a cell"""
+        while len(self.rings) <= r:
+            k = len(self.rings)
+            self.rings.append(
+                [
+                    (i, j)
+                    for i in range(-k, k + 1)
+                    for j in range(-k, k + 1)
+                    if max(abs(i), abs(j)) == k
+                ]
+            )
+        return self.rings[r]
+
+    def nearest(self, fid, excluded=()):
+        """(distance, nearest fid) of the closest other point within
+        maxDistance, smallest fid first if several are equally close.
+        None if there is none"""
+        points = self.points
+        cells = self.cells
+        x, y = points[fid]
+        ci, cj = self.cell(x, y)
+        size = self.cellSize
+        # squared distances until the end
+        maxD2 = self.maxDistance * self.maxDistance
+        bestD2 = None
+        bestFid = None
+        for r in range(int(math.ceil(self.maxDistance / size)) + 1):
+            for i, j in self.ring(r):
+                inCell = cells.get((ci + i, cj + j))
+                if not inCell:
+                    continue
+                for other, ox, oy in inCell:
+                    d2 = (ox - x) * (ox - x) + (oy - y) * (oy - y)
+                    if d2 > maxD2 or other == fid or other in excluded:
+                        continue
+                    if (
+                        bestD2 is None
+                        or d2 < bestD2
+                        or (d2 == bestD2 and other < bestFid)
+                    ):
+                        bestD2 = d2
+                        bestFid = other
+            # every point in the next ring is at least r * size away
+            if bestD2 is not None and bestD2 < (r * size) ** 2:
+                break
+
+        if bestFid is None:
+            return None
+        ox, oy = points[bestFid]
+        return math.hypot(ox - x, oy - y), bestFid
+
+
+def thinPoints(points, searchRadius, lessSignificant=secondPoint):
+    """points is {fid: (x, y)}. Drops the less significant point of the
+    closest pair until no two points are within searchRadius of each other.
+    lessSignificant(fid1, fid2) returns the fid to drop, or None to keep both
+    and never compare that pair again.
+
+    Returns [(fid, separation), ...] of the dropped points in the order they
+    were dropped"""
+    grid = PointGrid(points, searchRadius)
+    excluded = {}  # fid: set of fids it is not compared with
+
+    queue = []
+    for fid in points:
+        nn = grid.nearest(fid)
+        if nn is not None:
+            queue.append((nn[0], fid, nn[1]))
+    heapq.heapify(queue)
+
+    def push(fid):
+        nn = grid.nearest(fid, excluded.get(fid, ()))
+        if nn is not None:
+            heapq.heappush(queue, (nn[0], fid, nn[1]))
+
+    dropped = []
+    while queue:
+        d, fid, near = heapq.heappop(queue)
+        if not fid in grid.alive:
+            continue
+        if not near in grid.alive or near in excluded.get(fid, ()):
+            # stale, near has been dropped since
+            push(fid)
+            continue
+
+        pt = lessSignificant(fid, near)
+        if pt is None:
+            excluded.setdefault(fid, set()).add(near)
+            excluded.setdefault(near, set()).add(fid)
+            push(fid)
+            continue
+
+        dropped.append((pt, d))
+        grid.remove(pt)
+        if pt != fid:
+            push(fid)
+
+    return dropped
@@ -0,0 +1,200 @@
+"""Polygons from lines with Shapely (GEOS), for GeMS_MakePolys3.py
+
+An alternative to FeatureToPolygon - TruncateTable - Append. The lines are
+noded with union_all, which indexes the segments in an STRtree, and
+polygonized. Every new polygon gets the attributes of the label point inside
+it or, if there is none, of the old polygon whose point-on-surface (the
+equivalent of FeatureToPoint INSIDE) is inside it, all in one point-in-polygon
+query of an STRtree of the new polygons. New polygons are then matched with
+the old polygons so that only the polygons whose shape or attributes changed
+have to be written.
+
+Geometries are NumPy arrays of Shapely geometries, attributes are tuples in
+the same order as the fields of MapUnitPolys. Does not import arcpy.
+"""
+
+try:
+    import numpy as np
+    import shapely
+
+    use_shapely = True
+except ImportError:
+    use_shapely = False
+
+LABEL = 1
+OLD = 2
+
+
+def polygonize(lines, grid_size=None):
+    """array of the polygons made by lines. With grid_size, vertices and
+    intersections are snapped to a grid of that size, e.g., the xy resolution
+    of the feature dataset"""
+    noded = shapely.union_all(lines, grid_size=grid_size)
+    polys = shapely.get_parts(shapely.polygonize(shapely.get_parts(noded)))
+    return np.asarray(polys)
+
+
+def points_in(polys, points):
+    """(point index, polygon index) arrays of the points that are inside polygons"""
+    if len(points) == 0 or len(polys) == 0:
+        return np.empty(0, dtype=int), np.empty(0, dtype=int)
+    tree = shapely.STRtree(polys)
+    pt, poly = tree.query(points, predicate="within")
+    return pt, poly
+
+
+def first_per_polygon(poly_idx, item_idx, rank):
+    """{polygon index: item index} of the item with the lowest rank in each
+    polygon, and the polygon indexes with more than one item"""
+    order = np.lexsort((rank[item_idx], poly_idx))
+    poly_sorted = poly_idx[order]
+    polys, first, counts = np.unique(poly_sorted, return_index=True, return_counts=True)
+    chosen = dict(zip(polys.tolist(), item_idx[order][first].tolist()))
+    return chosen, polys[counts > 1]
+
+
+def same_shape(new, old, tolerance):
+    """boolean array, True where new[i] is the same polygon as old[i] within
+    tolerance"""
+    same = shapely.equals_exact(
+        shapely.normalize(new), shapely.normalize(old), tolerance
+    )
+    rest = np.flatnonzero(~same)
+    if len(rest):
+        # vertices may have moved by less than the tolerance or been added
+        # along straight segments
+        diff = shapely.area(shapely.symmetric_difference(new[rest], old[rest]))
+        same[rest] = diff <= tolerance * shapely.length(new[rest])
+    return same
+
+
+class PolygonPlan:
+    """What to write to MapUnitPolys to replace old polygons with new ones.
+
+    For each new polygon i:
+        source_kind[i] is LABEL, OLD or 0 (no attributes)
+        source[i] is the index of the label point or old polygon
+        attribs[i] is the tuple of attribute values, None for all Null
+        target[i] is the index of the old polygon it replaces, -1 if it is
+            to be inserted
+        write_shape[i], write_attribs[i] tell if the shape or attributes of
+            target[i] need to be updated
+    deletes are the indexes of the old polygons that are not replaced and
+    multi_label are the indexes of polygons with more than one label point
+    """
+
+    def __init__(self, polys):
+        n = len(polys)
+        self.polys = polys
+        self.source_kind = np.zeros(n, dtype=int)
+        self.source = np.full(n, -1)
+        self.attribs = [None] * n
+        self.target = np.full(n, -1)
+        self.write_shape = np.ones(n, dtype=bool)
+        self.write_attribs = np.ones(n, dtype=bool)
+        self.deletes = []
+        self.multi_label = np.empty(0, dtype=int)
+        self.labels_in = {}  # polygon index: [label index, ...]
+
+    def unchanged(self):
+        """number of new polygons that are already in MapUnitPolys"""
+        return int(np.sum((self.target >= 0) & ~self.write_shape & ~self.write_attribs))
+
+
+def plan(
+    polys,
+    old_polys,
+    old_attribs,
+    labels=None,
+    label_attribs=None,
+    label_oids=None,
+    use_old=True,
+    tolerance=0.0,
+):
+    """PolygonPlan for polys, the array of new polygons.
+
+    old_polys and old_attribs are the geometries and attribute tuples of the
+    polygons in MapUnitPolys. labels, label_attribs and label_oids are those
+    of the label points, if there are any. The label point with the lowest
+    OID is used when a polygon has several. With use_old, polygons without a
+    label point get the attributes of the biggest old polygon whose
+    point-on-surface is inside them"""
+    p = PolygonPlan(polys)
+
+    if labels is not None and len(labels):
+        pt, poly = points_in(polys, labels)
+        chosen, p.multi_label = first_per_polygon(poly, pt, np.asarray(label_oids))
+        for i, j in chosen.items():
+            p.source_kind[i] = LABEL
+            p.source[i] = j
+            p.attribs[i] = label_attribs[j]
+        for j, i in zip(pt.tolist(), poly.tolist()):
+            p.labels_in.setdefault(i, []).append(j)
+
+    if use_old and len(old_polys):
+        old_points = shapely.point_on_surface(old_polys)
+        pt, poly = points_in(polys, old_points)
+        chosen, _ = first_per_polygon(poly, pt, -shapely.area(old_polys))
+        for i, k in chosen.items():
+            if p.source_kind[i] == 0:
+                p.source_kind[i] = OLD
+                p.source[i] = k
+                p.attribs[i] = old_attribs[k]
+
+    # an old polygon is replaced by the new polygon that got its attributes,
+    # otherwise by the new polygon with a point-on-surface inside it
+    claimed = set()
+    for i in np.flatnonzero(p.source_kind == OLD).tolist():
+        p.target[i] = p.source[i]
+        claimed.add(p.source[i])
+    others = np.flatnonzero(p.source_kind != OLD)
+    if len(others) and len(old_polys):
+        rep_pt, old = points_in(old_polys, shapely.point_on_surface(polys[others]))
+        for j, k in zip(rep_pt.tolist(), old.tolist()):
+            if not k in claimed:
+                p.target[others[j]] = k
+                claimed.add(k)
+    p.deletes = sorted(set(range(len(old_polys))) - claimed)
+
+    # only write what changed
+    has_target = np.flatnonzero(p.target >= 0)
+    if len(has_target):
+        p.write_shape[has_target] = ~same_shape(
+            polys[has_target], old_polys[p.target[has_target]], tolerance
+        )
+    n_fields = len(old_attribs[0]) if len(old_attribs) else 0
+    for i in has_target.tolist():
+        attribs = p.attribs[i] or (None,) * n_fields
+        p.write_attribs[i] = tuple(attribs) != tuple(old_attribs[p.target[i]])
+
+    return p
+
+
+def unit_changes(polys, units, old_polys, old_units, tolerance=0.0):
+    """indexes of the new polygons that overlap an old polygon that had
+    another, not Null, MapUnit"""
+    if len(polys) == 0 or len(old_polys) == 0:
+        return []
+    tree = shapely.STRtree(old_polys)
+    new_i, old_i = tree.query(polys, predicate="intersects")
+    differ = np.array(
+        [
+            old_units[k] not in (None, "") and old_units[k] != units[i]
+            for i, k in zip(new_i.tolist(), old_i.tolist())
+        ],
+        dtype=bool,
+    )
+    new_i = new_i[differ]
+    old_i = old_i[differ]
+    # polygons that only share a boundary don't count
+    overlap = shapely.area(shapely.intersection(polys[new_i], old_polys[old_i]))
+    return sorted(set(new_i[overlap > tolerance * tolerance].tolist()))
+
+
+def from_wkb(wkbs):
+    """array of geometries from a list of WKB, e.g., read with SHAPE@WKB"""
+    return shapely.from_wkb(np.array([bytes(w) for w in wkbs], dtype=object))
+
+
+def to_wkb(geom):
+    return bytearray(shapely.to_wkb(geom))
@@ -57,6 +57,7 @@ Evan Thoms
 
 import os
 import collections
+import threading
 import math
 
 import numpy as np
@@ -445,9 +446,105 @@ def transform_point(xy, from_srs, to_srs):
     return results[0], results[1]
 
 
+class DatasetPool:
+    """
+    Least recently used pool of open GDAL/OGR datasets, keyed by
+    (path, mode). A dataset is opened again if the files of the dataset have
+    changed since it was opened. Datasets dropped from the pool are closed
+    when the last layer or reference to them goes away.
+
+    Parameters
+    ----------
+    size : int
+            The number of datasets kept open
+    """
+
+    def __init__(self, size=8):
+        self.size = size
+        self.datasets = collections.OrderedDict()
+        self.opens = 0
+        self._lock = threading.Lock()
+
+    def get(self, fname, mode=0):
+        fname = str(fname)
+        key = (fname, mode)
+        stamp = data_stamp(fname)
+        with self._lock:
+            entry = self.datasets.get(key)
+            if entry is not None and entry[1] == stamp:
+                self.datasets.move_to_end(key)
+                return entry[0]
+
+            ds = _open_dataset(fname, mode)
+            self.opens += 1
+            self.datasets[key] = (ds, stamp)
+            self.datasets.move_to_end(key)
+            while len(self.datasets) > self.size:
+                self.datasets.popitem(last=False)
+            return ds
+
+    def close(self, fname=None):
+        """
+        Drop the datasets of fname, or all of them
+        """
+        with self._lock:
+            for key in list(self.datasets):
+                if fname is None or key[0] == str(fname):
+                    del self.datasets[key]
+
+
+def data_stamp(fname):
+    """
+    Latest modification time of a file, or of the files in a folder,
+    e.g., a file geodatabase. The lock files arcpy makes and removes while a
+    geodatabase is open are left out
+
+    Parameters
+    ----------
+    fname : str
+            The filename and path to the file
+
+    Returns
+    -------
+    int, nanoseconds
+    """
+    try:
+        if os.path.isdir(fname):
+            with os.scandir(fname) as entries:
+                return max(
+                    (
+                        e.stat().st_mtime_ns
+                        for e in entries
+                        if e.is_file() and not e.name.lower().endswith(".lock")
+                    ),
+                    default=0,
+                )
+        return os.stat(fname).st_mtime_ns
+    except OSError:
+        return 0
+
+
+def _open_dataset(fname, mode=0):
+    if fname.endswith(".shp"):
+        driver = ogr.GetDriverByName("ESRI Shapefile")
+        return driver.Open(fname, mode)
+    elif fname.endswith(".gdb"):
+        driver = ogr.GetDriverByName("OpenFileGDB")
+        return driver.Open(fname, mode)
+    elif fname.endswith(".gpkg"):
+        driver = ogr.GetDriverByName("GPKG")
+        return driver.Open(fname, mode)
+    else:
+        # it better be a raster
+        return gdal.Open(fname, mode)
+
+
+pool = DatasetPool()
+
 def get_layer(fname, feature_class=None):
     """
     Type agnostic function for opening a file without specifying it's type
+    The dataset is taken from the pool of open datasets
 
 
     Parameters
@@ -462,27 +559,18 @@ def get_layer(fname, feature_class=None):
     -------
     Either a gdal Dataset or a ogr layer depending on the input
     """
-    if fname.endswith(".shp"):
-        driver = ogr.GetDriverByName("ESRI Shapefile")
-        global dataset
-        dataset = driver.Open(fname)
-        return dataset.GetLayer()
-    elif fname.endswith(".gdb"):
-        driver = ogr.GetDriverByName("OpenFileGDB")
-        global gdb
-        gdb = driver.Open(fname, 0)
-        return gdb.GetLayerByName(feature_class)
-    elif fname.endswith(".gpkg"):
-        driver = ogr.GetDriverByName("GPKG")
-        global db
-        db = driver.Open(fname, 0)
-        return db.GetLayerByName(feature_class)
+    fname = str(fname)
+    ds = pool.get(fname)
+    if ds is None:
+        return None
 
+    if fname.endswith(".shp"):
+        return ds.GetLayer()
+    elif fname.endswith(".gdb") or fname.endswith(".gpkg"):
+        return ds.GetLayerByName(feature_class)
     else:
         # it better be a raster
-        return gdal.Open(fname)
-
-    return None
+        return ds
 
 
 def get_spref(fname, feature_class=None):
@@ -503,7 +591,6 @@ def get_spref(fname, feature_class=None):
     ogr spatial reference object
     """
     layer = get_layer(fname, feature_class=feature_class)
-
     params = get_params(layer)
 
     spref = xml_node("spref")
@@ -1477,29 +1564,7 @@ def get_bounding(fname, feature_class=None):
     -------
     lxml element with FGDC Bounding
     """
-    # for some reason, calling get_layer causes my jupyter notebook to crash, even when the
-    # function has been moved to the notebook itself. But if the contents of get_layer are
-    # included in this function, it works
-    # layer = get_layer(fname, feature_class)
-
-    if fname.endswith(".shp"):
-        driver = ogr.GetDriverByName("ESRI Shapefile")
-        global dataset
-        dataset = driver.Open(fname)
-        layer = dataset.GetLayer()
-    elif fname.endswith(".gdb"):
-        driver = ogr.GetDriverByName("OpenFileGDB")
-        global gdb
-        gdb = driver.Open(fname, 0)
-        layer = gdb.GetLayerByName(feature_class)
-    elif fname.endswith(".gpkg"):
-        driver = ogr.GetDriverByName("GPKG")
-        db = driver.Open(fname, 0)
-        layer = db.GetLayerByName(feature_class)
-    else:
-        # it better be a raster
-        layer = gdal.Open(fname)
-
+    layer = get_layer(fname, feature_class=feature_class)
     extent = get_geographic_extent(layer)
 
     extent = format_bounding(extent)
@@ -1576,27 +1641,21 @@ def get_spdoinfo(fname, feature_class=None):
     -------
     lxml element with FGDC Bounding
     """
-    if fname.endswith(".shp"):
-        driver = ogr.GetDriverByName("ESRI Shapefile")
-        dataset = driver.Open(fname)
-        layer = dataset.GetLayer()
-        return vector_spdoinfo(layer)
-    elif fname.endswith(".gdb"):
-        driver = ogr.GetDriverByName("OpenFileGDB")
-        gdb = driver.Open(fname, 0)
-        layer = gdb.GetLayerByName(feature_class)
-        return vector_spdoinfo(layer)
-    elif fname.endswith(".gpkg"):
-        driver = ogr.GetDriverByName("GPKG")
-        db = driver.Open(fname, 0)
-        layer = db.GetLayerByName(feature_class)
+    fname = str(fname)
+    if fname.endswith((".shp", ".gdb", ".gpkg")):
+        layer = get_layer(fname, feature_class=feature_class)
         return vector_spdoinfo(layer)
     else:
         # it better be a raster
-        data = gdal.Open(fname)
+        data = get_layer(fname)
         return raster_spdoinfo(data)
 
-    return None
+
+def layer_counts(layer):
+    """
+    (feature count, geometry type) of an OGR layer
+    """
+    return layer.GetFeatureCount(), layer.GetGeomType()
 
 
 def vector_spdoinfo(layer):
@@ -1611,14 +1670,26 @@ def vector_spdoinfo(layer):
     lxml element
     """
     # introspect our layer to get the info we need
-    feature_count = layer.GetFeatureCount()
     # for geo in layer:
     # geo_ref = geo.GetGeometryRef()
     # geo_type = geo_ref.GetGeometryType()
     # break
+    return sdts_spdoinfo(*layer_counts(layer))
 
-    geo_type = layer.GetGeomType()
 
+def sdts_spdoinfo(feature_count, geo_type):
+    """
+    generate a fgdc Point Vector Object information element from the number of
+    features and OGR geometry type of a layer
+    Parameters
+    ----------
+    feature_count : int
+    geo_type : int, OGR geometry type
+
+    Returns
+    -------
+    lxml element
+    """
     # create the FGDC element
     spdoinfo = xml_node("spdoinfo")
     direct = xml_node("direct", text="Vector", parent_node=spdoinfo)
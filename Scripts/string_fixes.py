@@ -0,0 +1,73 @@
+"""Detection of text values that GeMS_FixStrings.py fixes.
+
+A text value needs fixing if it has leading or trailing whitespace, or if it
+is empty, whitespace only or a spelled-out null such as '<null>' once it is
+stripped, in which case it becomes a system null. FixStrings used to build
+and check a new row for every row of every table. changes finds the few
+values that need fixing in the columns of a table, read once per table by
+table_scan.TableScan, so FixStrings writes only those rows and fields.
+
+The same test is used by rule 3.13 of GeMS_ValidateDatabase.py, and by the
+dry run of FixStrings, through problems.
+
+Does not import arcpy
+"""
+
+# spelled-out nulls, compared in lower case
+bad_nulls = ("", "<null>", "&ltnull&gt")
+longest = max(len(n) for n in bad_nulls)
+
+SPACES = "leading or trailing spaces"
+NULL = "zero-length, whitespace-only, or bad null value"
+
+
+def fixed(value):
+    """value as FixStrings leaves it"""
+    if value is None:
+        return None
+    stripped = value.strip()
+    if stripped.lower() in bad_nulls:
+        return None
+    return stripped
+
+
+def issues(value):
+    """[SPACES and/or NULL] for a value, empty if it is clean"""
+    found = []
+    if not isinstance(value, str):
+        return found
+    stripped = value.strip()
+    if stripped != value:
+        found.append(SPACES)
+    if len(stripped) <= longest and stripped.lower() in bad_nulls:
+        found.append(NULL)
+    return found
+
+
+def changes(oids, columns):
+    """{oid: {field: fixed value}} of the values in columns, {field: [values]}
+    in the order of oids, that need fixing"""
+    found = {}
+    for field, values in columns.items():
+        for oid, value in zip(oids, values):
+            # most values are clean, test them with as little work as possible
+            if value is None:
+                continue
+            stripped = value.strip()
+            if stripped == value and (
+                len(value) > longest or not value.lower() in bad_nulls
+            ):
+                continue
+            found.setdefault(oid, {})[field] = fixed(value)
+    return found
+
+
+def problems(oids, columns):
+    """[(field, oid, issue)] of the values in columns that need fixing, field
+    by field and in the order of oids"""
+    found = []
+    for field, values in columns.items():
+        for oid, value in zip(oids, values):
+            for issue in issues(value):
+                found.append((field, oid, issue))
+    return found
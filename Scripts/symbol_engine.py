@@ -0,0 +1,131 @@
+"""Symbol lookup tables for GeMS_SetSymbols.py
+
+SetSymbols used to look up the Type of every row in lists of the keys of the
+symbol dictionaries and to work out and format the symbol of every row again.
+SymbolTable compiles the dictionaries of Type-FgdcSymbol.txt once into one
+row of symbols per Type:
+
+    lines   8 symbols, the 'certain, accurate' symbol incremented by
+            1 if queried + 2 if approximate, 4 if inferred or 6 if concealed
+    points  2 symbols, well oriented and approximately oriented
+
+Types in the My Symbols dictionary have the same symbol in every column. The
+columns of a feature class are read into arrays, the questionable and
+concealed tests are made once for every distinct value, and the symbols of
+all rows are picked from the table with one index operation. changes then
+gives only the rows whose symbol is different from the one they have.
+
+Does not import arcpy
+"""
+
+import numpy as np
+
+# line variants, added to the 'certain, accurate' symbol number
+QUERIED = 1
+APPROXIMATE = 2
+INFERRED = 4
+CONCEALED = 6
+
+
+def increment_symbol(sym, increment):
+    words = sym.split(".")
+    last = words[-1]
+    return sym[: -len(last)] + str(int(last) + increment).zfill(len(last))
+
+
+def factorize(values):
+    """integer codes of values and the distinct values, in first-seen order"""
+    lookup = {}
+    for v in values:
+        lookup.setdefault(v, len(lookup))
+    codes = np.fromiter(map(lookup.__getitem__, values), np.int64, len(values))
+    return codes, list(lookup)
+
+
+def floats(values):
+    """float array, None is NaN so that it is not over any threshold"""
+    return np.array([np.nan if v is None else v for v in values], dtype=float)
+
+
+class SymbolTable:
+    """Type-FgdcSymbol dictionaries compiled into lookup tables.
+    questionable(value) says if an ExistenceConfidence or IdentityConfidence
+    value makes a line queried"""
+
+    def __init__(self, eightfold, twofold, mine, questionable):
+        self.questionable = questionable
+        self.lines = {}
+        self.points = {}
+        for typ, sym in mine.items():
+            self.lines[typ] = [sym] * (CONCEALED + QUERIED + 1)
+            self.points[typ] = [sym, sym]
+        for typ, sym in eightfold.items():
+            self.lines[typ] = [
+                increment_symbol(sym, i) for i in range(CONCEALED + QUERIED + 1)
+            ]
+        for typ, syms in twofold.items():
+            self.points[typ] = list(syms)
+
+    def _lookup(self, table, types, variant):
+        """symbols picked from table by Type and variant column, None for Types
+        that are not in it, and the unrecognized Types"""
+        codes, distinct = factorize(types)
+        width = len(next(iter(table.values()), [None]))
+        lut = np.empty((len(distinct), width), dtype=object)
+        unrecognized = []
+        for i, typ in enumerate(distinct):
+            if typ in table:
+                lut[i] = table[typ]
+            else:
+                unrecognized.append(typ)
+        if not len(codes):
+            return np.empty(0, dtype=object), unrecognized
+        return lut[codes, variant], unrecognized
+
+    def line_symbols(
+        self,
+        types,
+        is_concealed,
+        loc_conf,
+        ex_conf,
+        id_conf,
+        approx_threshold,
+        inferred_threshold,
+        use_inferred,
+    ):
+        """Symbol of every line, (symbols, unrecognized Types)"""
+        n = len(types)
+        variant = np.zeros(n, dtype=np.int64)
+
+        for column in (ex_conf, id_conf):
+            codes, distinct = factorize(column)
+            queried = np.array([bool(self.questionable(v)) for v in distinct])
+            if n:
+                variant |= queried[codes].astype(np.int64)
+
+        codes, distinct = factorize(is_concealed)
+        concealed = np.array([str(v).lower() != "n" for v in distinct], dtype=bool)
+        concealed = concealed[codes] if n else np.zeros(0, dtype=bool)
+
+        conf = floats(loc_conf)
+        located = np.zeros(n, dtype=np.int64)
+        located[conf > approx_threshold] = APPROXIMATE
+        if use_inferred:
+            located[conf > inferred_threshold] = INFERRED
+        variant += np.where(concealed, CONCEALED, located)
+
+        return self._lookup(self.lines, types, variant)
+
+    def point_symbols(self, types, orient_conf, threshold, use_approx):
+        """Symbol of every orientation point, (symbols, unrecognized Types)"""
+        variant = np.zeros(len(types), dtype=np.int64)
+        if use_approx:
+            variant[floats(orient_conf) > threshold] = 1
+        return self._lookup(self.points, types, variant)
+
+
+def changes(oids, old, new):
+    """{oid: new symbol} of the rows whose symbol changes"""
+    return {
+        oid: n for oid, o, n in zip(oids, old, new.tolist()) if n is not None and n != o
+    }
@@ -0,0 +1,226 @@
+"""Single-pass, columnar reader for the tables of a GeMS database.
+
+Validation rules used to open a new SearchCursor for every (table, field) pair
+which meant the big feature classes were read dozens of times. A TableScan reads
+each table once, all attribute columns together, and keeps the values as one list
+per field so that every rule can work from the same in-memory copy.
+
+Tables are read through OGR (OpenFileGDB or GPKG driver) so the scan also works
+where arcpy is not licensed. If GDAL cannot be imported, or OGR cannot open a
+particular layer, arcpy.da.SearchCursor is used instead, still one pass per table.
+"""
+
+import datetime
+import hashlib
+import threading
+import arcpy
+from GeMS_utilityFunctions import addMsgAndPrint as ap
+
+try:
+    from osgeo import ogr
+
+    ogr.UseExceptions()
+    use_ogr = True
+except ImportError:
+    use_ogr = False
+
+# arcpy is not thread-safe. Code that may run in a worker thread holds this lock
+# around its arcpy calls so that no two threads are in arcpy at the same time
+arcpy_lock = threading.RLock()
+
+# arcpy field types that are never needed by the rules and are expensive to hold
+skip_types = ("Geometry", "Blob", "Raster")
+
+
+def ogr_driver(db_path):
+    """Name of the OGR driver that opens db_path"""
+    if str(db_path).lower().endswith(".gpkg"):
+        return "GPKG"
+    else:
+        return "OpenFileGDB"
+
+
+def ogr_value(feat, i, f_type):
+    """Value of field i of an OGR feature, None for nulls. Dates are returned
+    as datetime objects so they match what arcpy.da cursors return"""
+    if not feat.IsFieldSetAndNotNull(i):
+        return None
+    if f_type in (ogr.OFTDate, ogr.OFTDateTime):
+        y, m, d, h, mi, s, tz = feat.GetFieldAsDateTime(i)
+        return datetime.datetime(y, m, d, h, mi, int(s))
+    return feat.GetField(i)
+
+
+class TableScan:
+    """Lazily loaded {table: {field: [values]}} cache of a database.
+
+    db_dict is the dictionary made by GeMS_utilityFunctions.gdb_object_dict.
+    Every column of a table has the same length and the same row order, so
+    columns can be zipped together, and the OID column can be used to report rows.
+
+    A scan can be shared by rules running in different threads. Each table is
+    still only read once and every thread opens its own OGR dataset because
+    GDAL datasets cannot be shared between threads.
+    """
+
+    def __init__(self, db_path, db_dict):
+        self.db_path = str(db_path)
+        self.db_dict = db_dict
+        self.tables = {}
+        self.reads = 0
+        self._lock = threading.Lock()
+        self._table_locks = {}
+        self._local = threading.local()
+
+    def oid_field(self, table):
+        oids = [f.name for f in self.db_dict[table]["fields"] if f.type == "OID"]
+        if oids:
+            return oids[0]
+        else:
+            return None
+
+    def scan_fields(self, table):
+        """Attribute fields of table that are loaded in the scan"""
+        return [
+            f.name
+            for f in self.db_dict[table]["fields"]
+            if not f.type in skip_types
+            and not f.name.lower() in ("shape_length", "shape_area")
+        ]
+
+    def columns(self, table):
+        """{field: [values]} for table. The table is read on the first request only"""
+        if not table in self.tables:
+            with self._lock:
+                table_lock = self._table_locks.setdefault(table, threading.Lock())
+            with table_lock:
+                if not table in self.tables:
+                    self.tables[table] = self._read(table)
+        return self.tables[table]
+
+    def column(self, table, field):
+        return self.columns(table)[field]
+
+    def rows(self, table, fields):
+        """Iterate over tuples of the requested fields, like a SearchCursor would"""
+        cols = self.columns(table)
+        return zip(*[cols[f] for f in fields])
+
+    def geometry_digest(self, table):
+        """sha1 hex digest of the WKB of every shape in a feature class, in
+        reading order. Geometry is not kept in the scan, it is streamed through
+        the hash"""
+        h = hashlib.sha1()
+        layer = None
+        if use_ogr:
+            try:
+                ds = self._dataset()
+                layer = ds.GetLayerByName(table) if ds else None
+            except Exception:
+                layer = None
+
+        if layer is not None:
+            defn = layer.GetLayerDefn()
+            layer.SetIgnoredFields(
+                [defn.GetFieldDefn(i).GetName() for i in range(defn.GetFieldCount())]
+            )
+            layer.ResetReading()
+            for feat in layer:
+                geom = feat.GetGeometryRef()
+                h.update(geom.ExportToWkb() if geom else b"")
+            layer.SetIgnoredFields([])
+        else:
+            path = self.db_dict[table]["catalogPath"]
+            with arcpy_lock, arcpy.da.SearchCursor(path, ["SHAPE@WKB"]) as cursor:
+                for row in cursor:
+                    h.update(bytes(row[0]) if row[0] else b"")
+
+        return h.hexdigest()
+
+    def invalidate(self, table):
+        """Drop the cached columns of a table that has been edited"""
+        self.tables.pop(table, None)
+
+    def close(self):
+        self.tables = {}
+        self._local = threading.local()
+
+    def _dataset(self):
+        ds = getattr(self._local, "ds", None)
+        if ds is None:
+            driver = ogr.GetDriverByName(ogr_driver(self.db_path))
+            ds = driver.Open(self.db_path, 0)
+            self._local.ds = ds
+        return ds
+
+    def _read(self, table):
+        fields = self.scan_fields(table)
+        with self._lock:
+            self.reads += 1
+        cols = None
+        if use_ogr:
+            try:
+                cols = self._read_ogr(table, fields)
+            except Exception as e:
+                ap(f"\tCould not read {table} with OGR, using arcpy: {e}")
+                cols = None
+
+        if cols is None:
+            cols = self._read_arcpy(table, fields)
+
+        return cols
+
+    def _read_ogr(self, table, fields):
+        ds = self._dataset()
+        if ds is None:
+            return None
+        layer = ds.GetLayerByName(table)
+        if layer is None:
+            return None
+
+        defn = layer.GetLayerDefn()
+        ogr_fields = {}
+        for i in range(defn.GetFieldCount()):
+            fd = defn.GetFieldDefn(i)
+            ogr_fields[fd.GetName().lower()] = (i, fd.GetType(), fd.GetName())
+
+        # every field other than the OID has to be found in the OGR layer
+        # or we can't guarantee the same values arcpy would return
+        oid = self.oid_field(table)
+        lookup = []
+        for f in fields:
+            if f == oid:
+                lookup.append(None)
+            elif f.lower() in ogr_fields:
+                lookup.append(ogr_fields[f.lower()])
+            else:
+                return None
+
+        # skip geometry and the attributes we don't want
+        wanted = [f.lower() for f in fields]
+        ignored = [v[2] for k, v in ogr_fields.items() if not k in wanted]
+        ignored.extend(["OGR_GEOMETRY", "OGR_STYLE"])
+        layer.SetIgnoredFields(ignored)
+
+        data = [[] for f in fields]
+        layer.ResetReading()
+        for feat in layer:
+            for col, lu in zip(data, lookup):
+                if lu is None:
+                    col.append(feat.GetFID())
+                else:
+                    col.append(ogr_value(feat, lu[0], lu[1]))
+
+        layer.SetIgnoredFields([])
+        return dict(zip(fields, data))
+
+    def _read_arcpy(self, table, fields):
+        data = [[] for f in fields]
+        with arcpy_lock, arcpy.da.SearchCursor(
+            self.db_dict[table]["catalogPath"], fields
+        ) as cursor:
+            for row in cursor:
+                for col, v in zip(data, row):
+                    col.append(v)
+
+        return dict(zip(fields, data))
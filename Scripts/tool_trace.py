@@ -0,0 +1,363 @@
+"""Timing spans, counters and profiles of tool runs, written as a trace file.
+
+Set GEMS_TRACE=1 to trace the runs of the tools. A run starts with start,
+which GeMS_utilityFunctions.checkVersion calls at the top of every tool, and
+ends with finish, called at the bottom of the tool. ArcGIS Pro runs script
+tools in its own process and keeps the modules imported, so everything is
+reset by finish and each run is written to its own
+<tool>_<time>_trace.json file in the Chrome trace format, which
+chrome://tracing and https://ui.perfetto.dev display as a timeline. A run that
+stops before it reaches finish, on an error or sys.exit, is written when the
+next run starts, or when Python exits, and ends at its last event. The file
+goes in the folder set with set_workdir, or the folder of the database given
+as the first argument. To put it elsewhere, set GEMS_TRACE to a folder.
+
+The trace holds:
+  - a span for the whole run and one for every `with span(name):` block or
+    function decorated with @span(name), in the thread that ran it
+  - counters of each span, from count(name, n) and, for arcpy.da cursors
+    opened inside the span, 'cursor opens', 'rows read' and 'rows written'
+  - every message passed to arcpy.AddMessage, AddWarning or AddError, as an
+    instant event, so the time between messages can be read off the timeline
+
+GEMS_TRACE_PROFILE=cprofile also writes a <tool>_<time>.prof file of the run
+for pstats or snakeviz. GEMS_TRACE_PROFILE=tracemalloc records the memory
+allocated by Python, and the peak so far, at the end of each span and the top
+allocation sites of the run. Both can be given, separated by a comma.
+
+Without GEMS_TRACE, span and count do nothing and nothing is wrapped.
+
+Does not import arcpy
+"""
+
+import atexit
+import cProfile
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+setting = os.environ.get("GEMS_TRACE", "").strip()
+enabled = setting not in ("", "0")
+profiles = {
+    p.strip().lower()
+    for p in os.environ.get("GEMS_TRACE_PROFILE", "").split(",")
+    if p.strip()
+}
+
+_lock = threading.Lock()
+_local = threading.local()
+_events = []
+_totals = {}
+_threads = {}
+_workdir = None
+_started = None
+_profiler = None
+_tool = None
+_instrumented = False
+_own_tracemalloc = False
+
+
+def _now():
+    # microseconds since the start of the run
+    return (time.perf_counter() - _started) * 1e6
+
+
+def _stack():
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+        with _lock:
+            _threads[threading.get_ident()] = threading.current_thread().name
+    return _local.stack
+
+
+def _add(event):
+    event["pid"] = os.getpid()
+    event["tid"] = threading.get_ident()
+    with _lock:
+        _events.append(event)
+
+
+class span:
+    """Named span of time, `with span("read DMU"):` or, on a function,
+    `@span()` or `@span("name")`. cat is the category shown in the viewer"""
+
+    def __init__(self, name=None, cat="tool", **args):
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self):
+        if enabled and _started is not None:
+            record = {"owner": self, "start": _now(), "counts": {}}
+            if "tracemalloc" in profiles:
+                record["memory"] = tracemalloc.get_traced_memory()[0]
+            _stack().append(record)
+        return self
+
+    def __exit__(self, *exc):
+        stack = _stack() if enabled and _started is not None else None
+        if stack and stack[-1]["owner"] is self:
+            record = stack.pop()
+            args = dict(self.args)
+            args.update(record["counts"])
+            if "memory" in record:
+                current, peak = tracemalloc.get_traced_memory()
+                args["memory change MB"] = (current - record["memory"]) / 2**20
+                args["peak MB"] = peak / 2**20
+            if exc[0] is not None:
+                args["error"] = exc[0].__name__
+            _add(
+                {
+                    "name": self.name,
+                    "cat": self.cat,
+                    "ph": "X",
+                    "ts": record["start"],
+                    "dur": _now() - record["start"],
+                    "args": args,
+                }
+            )
+        return False
+
+    def __call__(self, func):
+        name = self.name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, self.cat, **self.args):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+
+def count(name, n=1):
+    """add n to counter name of the innermost span of this thread, and of the
+    run"""
+    if not enabled or _started is None:
+        return
+    stack = _stack()
+    if stack:
+        counts = stack[-1]["counts"]
+        counts[name] = counts.get(name, 0) + n
+    with _lock:
+        _totals[name] = _totals.get(name, 0) + n
+
+
+def mark(message, cat="message"):
+    """instant event on the timeline"""
+    if enabled and _started is not None:
+        _add({"name": message[:200], "cat": cat, "ph": "i", "s": "t", "ts": _now()})
+
+
+def set_workdir(path):
+    """folder for the trace, unless GEMS_TRACE names one"""
+    global _workdir
+    _workdir = str(path)
+
+
+class CountingCursor:
+    """arcpy.da cursor that counts the rows read and written through it"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._read = 0
+        self._written = 0
+        count("cursor opens")
+
+    def _flush(self):
+        if self._read:
+            count("rows read", self._read)
+            self._read = 0
+        if self._written:
+            count("rows written", self._written)
+            self._written = 0
+
+    def __enter__(self):
+        self._cursor.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        self._flush()
+        return self._cursor.__exit__(*exc)
+
+    def __del__(self):
+        self._flush()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            row = next(self._cursor)
+        except StopIteration:
+            self._flush()
+            raise
+        self._read += 1
+        return row
+
+    next = __next__
+
+    def insertRow(self, row):
+        self._written += 1
+        return self._cursor.insertRow(row)
+
+    def updateRow(self, row):
+        self._written += 1
+        return self._cursor.updateRow(row)
+
+    def deleteRow(self, *args):
+        self._written += 1
+        return self._cursor.deleteRow(*args)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def _counting(factory):
+    @functools.wraps(factory)
+    def make(*args, **kwargs):
+        return CountingCursor(factory(*args, **kwargs))
+
+    return make
+
+
+def _marking(func, cat):
+    @functools.wraps(func)
+    def add_message(message, *args, **kwargs):
+        mark(str(message), cat)
+        return func(message, *args, **kwargs)
+
+    return add_message
+
+
+def instrument(arcpy):
+    """wrap the arcpy.da cursors and the message functions of arcpy, once"""
+    global _instrumented
+    if not enabled or _instrumented:
+        return
+    _instrumented = True
+    for name in ("SearchCursor", "UpdateCursor", "InsertCursor"):
+        setattr(arcpy.da, name, _counting(getattr(arcpy.da, name)))
+    for name, cat in (
+        ("AddMessage", "message"),
+        ("AddWarning", "warning"),
+        ("AddError", "error"),
+    ):
+        setattr(arcpy, name, _marking(getattr(arcpy, name), cat))
+    # a run that is never finished is written when Python exits
+    atexit.register(finish, True)
+
+
+def start(tool=None):
+    """start the trace of a run of tool, by default the script in sys.argv.
+    A run that was not finished is written first"""
+    global _started, _profiler, _tool, _own_tracemalloc
+    if not enabled:
+        return
+    if _started is not None:
+        finish(True)
+    _tool = tool or tool_name()
+    _started = time.perf_counter()
+    if "tracemalloc" in profiles and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _own_tracemalloc = True
+    if "cprofile" in profiles:
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+
+
+def tool_name():
+    if _tool:
+        return _tool
+    return os.path.splitext(os.path.basename(sys.argv[0] or "python"))[0]
+
+
+def trace_folder():
+    if setting != "1" and os.path.isdir(setting):
+        return setting
+    if _workdir and os.path.isdir(_workdir):
+        return _workdir
+    # the folder of the database, usually the first argument
+    if len(sys.argv) > 1 and os.path.exists(sys.argv[1]):
+        return os.path.dirname(os.path.abspath(sys.argv[1]))
+    return os.getcwd()
+
+
+def finish(unfinished=False):
+    """end the run span, write the trace and forget the run. unfinished runs
+    end at their last event"""
+    global _profiler
+    if _started is None:
+        return
+    if unfinished:
+        end = max((e["ts"] + e.get("dur", 0) for e in _events), default=0)
+    else:
+        end = _now()
+    args = {"unfinished": True} if unfinished else {}
+    _add(
+        {
+            "name": tool_name(),
+            "cat": "run",
+            "ph": "X",
+            "ts": 0,
+            "dur": end,
+            "args": args,
+        }
+    )
+
+    stem = os.path.join(
+        trace_folder(), f"{tool_name()}_{time.strftime('%Y%m%d_%H%M%S')}"
+    )
+    other = {"tool": tool_name(), "argv": sys.argv[1:], "totals": dict(_totals)}
+    if _profiler is not None:
+        _profiler.disable()
+        _profiler.dump_stats(stem + ".prof")
+        other["cprofile"] = stem + ".prof"
+        _profiler = None
+    if tracemalloc.is_tracing():
+        stats = tracemalloc.take_snapshot().statistics("lineno")[:20]
+        other["top allocations"] = [
+            {"where": str(s.traceback), "MB": s.size / 2**20, "blocks": s.count}
+            for s in stats
+        ]
+
+    names = []
+    for tid, name in _threads.items():
+        names.append(
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": os.getpid(),
+                "tid": tid,
+                "args": {"name": name},
+            }
+        )
+    trace = {
+        "traceEvents": names + _events,
+        "displayTimeUnit": "ms",
+        "otherData": other,
+    }
+    try:
+        with open(stem + "_trace.json", "w") as f:
+            json.dump(trace, f, default=str)
+    except OSError:
+        pass
+    _reset()
+
+
+def _reset():
+    global _local, _events, _totals, _threads, _workdir, _started, _tool
+    global _own_tracemalloc
+    if _own_tracemalloc:
+        tracemalloc.stop()
+        _own_tracemalloc = False
+    _local = threading.local()
+    _events = []
+    _totals = {}
+    _threads = {}
+    _workdir = None
+    _started = None
+    _tool = None
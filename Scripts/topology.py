@@ -1,8 +1,10 @@
+import os
 import arcpy
 from osgeo import ogr
 from lxml import etree
 from pathlib import Path
 from GeMS_utilityFunctions import addMsgAndPrint as ap
+import topology_engine as te
 
 # find the version of Pro being used
 # we have at least one 3+ only method - ExportFeatures
@@ -171,9 +173,9 @@ def add_rules(topology, caf, mup, db_dict):
     arcpy.AddRuleToTopology_management(topology, rules_dict[37], mup, None, caf)
 
 
-def make_topology(work_dir, topo_pair, db_dict):
-    """make a topology in a scratch gdb. Called in the case of no topology
-    in input gdb or geopackage
+def topology_name(topo_pair, db_dict):
+    """name of the feature dataset for the topology of topo_pair and its
+    spatial reference
     topo_pair  = [GeologicMap feature dataset(if gdb), fd_tag_name, mapunitpolys, contactsandfaults]
     """
 
@@ -216,6 +218,16 @@ def make_topology(work_dir, topo_pair, db_dict):
 
             gmap = f"{prefix}{gmap}{suffix}"
 
+    return gmap, sr
+
+
+def make_topology(work_dir, topo_pair, db_dict):
+    """make a topology in a scratch gdb. Called in the case of no topology
+    in input gdb or geopackage
+    topo_pair  = [GeologicMap feature dataset(if gdb), fd_tag_name, mapunitpolys, contactsandfaults]
+    """
+
+    gmap, sr = topology_name(topo_pair, db_dict)
     gdb_path, topo_mup, topo_caf = create_fd(work_dir, gmap, sr, topo_pair, db_dict)
     top_path = add_topology(gdb_path, gmap, topo_caf, topo_mup)
     add_rules(top_path, topo_caf, topo_mup, db_dict)
@@ -235,13 +247,23 @@ def get_gdb_item(ds, sql):
         return None
 
 
-def make_topology_dict(ds, root, db_dict):
+def gdb_item_names(ds):
+    """{ObjectID: Name} of every row in GDB_Items, in one query"""
+    names = {}
+    l = ds.ExecuteSQL("SELECT ObjectID, Name FROM GDB_Items")
+    if not l is None:
+        for feat in l:
+            names[str(feat.GetField(0))] = feat.GetField(1)
+        ds.ReleaseResultSet(l)
+    return names
+
+
+def make_topology_dict(names, root, db_dict):
+    """names is the {ObjectID: Name} dictionary from gdb_item_names"""
     rules = root.findall(".//TopologyRule")
     top_dict = {}
     for rule in rules:
-        origin_id = rule.find("OriginClassID").text
-        sql = f"SELECT Name from GDB_Items WHERE ObjectID = {origin_id}"
-        origin_class = get_gdb_item(ds, sql)
+        origin_class = names.get(rule.find("OriginClassID").text)
         rule_type = rule.find("TopologyRuleType").text
         if not origin_class in top_dict:
             top_dict[origin_class] = [rule_type]
@@ -253,8 +275,7 @@ def make_topology_dict(ds, root, db_dict):
             rule_type == "esriTRTAreaBoundaryCoveredByLine"
             and db_dict[origin_class]["gems_equivalent"] == "MapUnitPolys"
         ):
-            sql = f"SELECT Name from GDB_Items WHERE ObjectID = {rule.find('DestinationClassID').text}"
-            dest_class = get_gdb_item(ds, sql)
+            dest_class = names.get(rule.find("DestinationClassID").text)
             top_dict["mup_dest"] = dest_class
         else:
             top_dict["mup_dest"] = None
@@ -262,20 +283,44 @@ def make_topology_dict(ds, root, db_dict):
     return top_dict
 
 
-def check_errors_table(ds, table, origin_id, rule_ids, dest_id=None):
-    """select rows from the T_errors table where the rule and the class ids match
-    a valid topology will return no rows"""
+def error_counts(ds, table):
+    """{(TopoRuleType, OriginClassID): number of errors} of the errors that
+    are not exceptions in a T_<id>_*Errors table, in one pass"""
+    counts = {}
+    sql = f"""SELECT TopoRuleType, OriginClassID, COUNT(*) FROM {table}
+        WHERE IsException = 0 GROUP BY TopoRuleType, OriginClassID"""
+    try:
+        # OGR SQL has no GROUP BY, the SQLite dialect does
+        l = ds.ExecuteSQL(sql, dialect="SQLite")
+    except Exception:
+        l = None
+    if not l is None:
+        for feat in l:
+            counts[(feat.GetField(0), feat.GetField(1))] = feat.GetField(2)
+        ds.ReleaseResultSet(l)
+        return counts
+
+    # GDAL without SQLite, still one pass through the table
+    l = ds.ExecuteSQL(
+        f"SELECT TopoRuleType, OriginClassID FROM {table} WHERE IsException = 0"
+    )
+    if not l is None:
+        for feat in l:
+            key = (feat.GetField(0), feat.GetField(1))
+            counts[key] = counts.get(key, 0) + 1
+        ds.ReleaseResultSet(l)
+    return counts
+
+
+def check_errors_table(counts, origin_id, rule_ids, dest_id=None):
+    """look up the number of errors for the rules and the origin class id in the
+    error_counts of a T_errors table. A valid topology has none"""
     errors = []
     errors_pass = True
 
     for n in rule_ids:
-        # if n != 37:
-        sql = f"""SELECT * from {table} WHERE TopoRuleType = {n} 
-            and OriginClassID = {origin_id}
-            and IsException = 0"""
-        l = ds.ExecuteSQL(sql)
-        if l.GetFeatureCount() > 0:
-            i = l.GetFeatureCount()
+        i = counts.get((n, int(origin_id)), 0)
+        if i > 0:
             if i == 1:
                 errors.append(f"Rule '{rules_dict[n]}' has {i} error")
             else:
@@ -285,6 +330,46 @@ def check_errors_table(ds, table, origin_id, rule_ids, dest_id=None):
     return (errors_pass, errors)
 
 
+def dirty_areas(ds, top_id):
+    """list of the areas in T_<id>_DirtyAreas, None if there is no such table"""
+    result = ds.ExecuteSQL(f"SELECT DirtyArea_Area from T_{top_id}_DirtyAreas")
+    if result is None:
+        return None
+    areas = [area.GetField(0) for area in result]
+    ds.ReleaseResultSet(result)
+    return areas
+
+
+def topology_state(top_path):
+    """the rows (OriginClassID, OriginID, TopoRuleType, IsException) of the errors
+    tables and the dirty areas of the topology at top_path, sorted. Changes when the
+    topology is validated or errors are marked as exceptions"""
+    db = Path(top_path).parent.parent
+    top_name = Path(top_path).stem
+    ds = ogr.GetDriverByName("OpenFileGDB").Open(str(db))
+    top_def = get_gdb_item(
+        ds, f"SELECT Definition FROM GDB_Items WHERE name = '{top_name}'"
+    )
+    if top_def is None:
+        return None
+    top_id = etree.fromstring(top_def).find("TopologyID").text
+
+    rows = []
+    for kind in ("Point", "Line", "Poly"):
+        l = ds.ExecuteSQL(
+            f"""SELECT OriginClassID, OriginID, TopoRuleType, IsException
+            FROM T_{top_id}_{kind}Errors"""
+        )
+        if l is None:
+            continue
+        rows.extend(
+            sorted((kind,) + tuple(feat.GetField(i) for i in range(4)) for feat in l)
+        )
+        ds.ReleaseResultSet(l)
+
+    return rows, dirty_areas(ds, top_id)
+
+
 def has_been_validated(top_path):
     """query the T_<id>_DirtyAreas feature class to see if there are any dirty areas
     apparently this will contain polygons of 0 area if they were once dirty but
@@ -300,19 +385,11 @@ def has_been_validated(top_path):
     root = etree.fromstring(top_def)
     top_id = root.find("TopologyID").text
 
-    # use arcpy search cursor to look at table
-    dirty_areas = f"T_{top_id}_DirtyAreas"
-    has_been_validated = True
-    sql = f"SELECT DirtyArea_Area from {dirty_areas}"
-    result = ds.ExecuteSQL(sql)
-    if not result is None:
-        for area in result:
-            if area.GetField(0) > 0:
-                has_been_validated = False
-    else:
-        has_been_validated = False
+    areas = dirty_areas(ds, top_id)
+    if areas is None:
+        return False
 
-    return has_been_validated
+    return not any(a > 0 for a in areas)
 
 
 def eval_topology(db, top, db_dict, gmap, level_2_errors, level_3_errors):
@@ -321,12 +398,18 @@ def eval_topology(db, top, db_dict, gmap, level_2_errors, level_3_errors):
 
     # make a dictionary of d[FeatureClass] = [rule1, rule2, rule3] from the Definition in XML
     root = etree.fromstring(top_def)
-    top_dict = make_topology_dict(ds, root, db_dict)
+    names = gdb_item_names(ds)
+    ids = {v: k for k, v in names.items()}
+    top_dict = make_topology_dict(names, root, db_dict)
     top_id = root.find("TopologyID").text
     point_errors = f"T_{top_id}_PointErrors"
     line_errors = f"T_{top_id}_LineErrors"
     poly_errors = f"T_{top_id}_PolyErrors"
 
+    # one GROUP BY query per errors table
+    error_tables = [point_errors, line_errors, poly_errors]
+    counts = {t: error_counts(ds, t) for t in error_tables}
+
     found_caf = False
     found_mup = False
 
@@ -359,17 +442,13 @@ def eval_topology(db, top, db_dict, gmap, level_2_errors, level_3_errors):
                 )
 
         # now, check the T_<top_id>_errors tables
-        origin_id = get_gdb_item(
-            ds, f"SELECT ObjectID FROM GDB_Items WHERE Name = '{mup}'"
-        )
+        origin_id = ids[mup]
         dest_id = None
         if mup_dest:
-            dest_id = get_gdb_item(
-                ds, f"SELECT ObjectID FROM GDB_Items WHERE Name = '{mup_dest}'"
-            )
+            dest_id = ids.get(mup_dest)
 
         for table in [line_errors, poly_errors]:
-            results = check_errors_table(ds, table, origin_id, level_2_ids, dest_id)
+            results = check_errors_table(counts[table], origin_id, level_2_ids, dest_id)
             if not results[0]:
                 level_2_errors.extend([f"&emsp;{res}" for res in results[1]])
 
@@ -384,9 +463,7 @@ def eval_topology(db, top, db_dict, gmap, level_2_errors, level_3_errors):
         found_caf = True
         caf_rules = top_dict[caf]
         # now, check the T_<top_id>_errors tables
-        origin_id = get_gdb_item(
-            ds, f"SELECT ObjectID FROM GDB_Items WHERE Name = '{caf}'"
-        )
+        origin_id = ids[caf]
 
         level_3_errors.extend(
             [
@@ -397,10 +474,16 @@ def eval_topology(db, top, db_dict, gmap, level_2_errors, level_3_errors):
         )
 
         for table in [point_errors, line_errors, poly_errors]:
-            results = check_errors_table(ds, table, origin_id, level_3_ids)
+            results = check_errors_table(counts[table], origin_id, level_3_ids)
             if not results[0]:
                 level_3_errors.extend([f"&emsp;{r}" for r in results[1]])
 
+    return finish_errors(level_2_errors, level_3_errors, found_mup, found_caf, gmap)
+
+
+def finish_errors(level_2_errors, level_3_errors, found_mup, found_caf, gmap):
+    """add the missing feature class messages and the name of the map to the
+    lists of errors of a topology"""
     if not found_caf:
         level_2_errors.append(
             "&emsp;Topology is missing a ContactsAndFaults feature class"
@@ -423,3 +506,44 @@ def eval_topology(db, top, db_dict, gmap, level_2_errors, level_3_errors):
         level_3_errors.insert(3, f'<span class="table">{gmap}</span>')
 
     return level_2_errors, level_3_errors
+
+
+# "native" to check the topology rules with topology_engine instead of an Esri
+# topology in a scratch gdb, where the database has no topology of its own
+engine = os.environ.get("GEMS_TOPOLOGY_ENGINE", "esri").lower()
+
+
+def use_native():
+    """True if topology_engine was asked for and can be imported"""
+    return engine == "native" and te.use_engine
+
+
+def eval_native(db_path, topo_pair, db_dict, level_2_errors, level_3_errors):
+    """check the GeMS topology rules of topo_pair with topology_engine,
+    reading the feature classes straight from the database. Reports errors in
+    the same way as eval_topology, without the copy to Topology.gdb"""
+    gmap, sr = topology_name(topo_pair, db_dict)
+    mup, caf = topo_pair[2], topo_pair[3]
+    found_mup = not "__missing__" in mup
+    found_caf = not "__missing__" in caf
+
+    tolerance = getattr(sr, "XYTolerance", None) or 0.0
+    resolution = getattr(sr, "XYResolution", None) or None
+
+    ap("\t\tChecking topology rules with topology_engine, not an Esri topology")
+    mup_polys = te.read_geometries(db_path, mup) if found_mup else None
+    caf_lines = te.read_geometries(db_path, caf) if found_caf else None
+    counts = te.evaluate(mup_polys, caf_lines, tolerance, resolution)
+
+    # same {(rule, origin class): n} as error_counts, origin 0 for both
+    counts = {(rule, 0): n for rule, n in counts.items()}
+    if found_mup:
+        results = check_errors_table(counts, 0, level_2_ids)
+        if not results[0]:
+            level_2_errors.extend([f"&emsp;{res}" for res in results[1]])
+    if found_caf:
+        results = check_errors_table(counts, 0, level_3_ids)
+        if not results[0]:
+            level_3_errors.extend([f"&emsp;{r}" for r in results[1]])
+
+    return finish_errors(level_2_errors, level_3_errors, found_mup, found_caf, gmap)
@@ -0,0 +1,213 @@
+"""GeMS topology rules evaluated on geometries read with OGR, without an Esri
+topology.
+
+check_topology in GeMS_ValidateDatabase.py used to copy MapUnitPolys and
+ContactsAndFaults into a scratch Topology.gdb, build an Esri topology there
+and validate it, only to count the errors. This engine reads the two feature
+classes directly with OGR (OpenFileGDB or GPKG), puts them in GEOS STRtrees
+with Shapely and counts the errors of each rule:
+
+    MapUnitPolys       1  Must Not Have Gaps (Area)
+                       3  Must Not Overlap (Area)
+                       37 Boundary Must Be Covered By (Area-Line)
+    ContactsAndFaults  19 Must Not Overlap (Line)
+                       39 Must Not Self-Overlap (Line)
+                       40 Must Not Self-Intersect (Line)
+                       single_part  Must Be Single Part (Line), on request
+
+The rule numbers are the esriTopologyRuleType values used in topology.py.
+Features are split into square tiles by the centres of their extents and the
+tiles are evaluated in parallel threads (GEOS releases the GIL). Each tile
+compares its own features with every feature in the tree, and a pair of
+features is only counted by the tile of the first one, so the counts do not
+depend on the tiling.
+
+The rules are close to, not the same as, those of an Esri topology: overlaps
+of polygons count if their area is more than tolerance squared, boundaries are
+covered by lines within tolerance (a buffer of their union) and a line
+self-intersects if it is not simple and does not self-overlap. ValidateDatabase
+only uses the engine when GEMS_TOPOLOGY_ENGINE=native, see topology.py. The
+fixture cases in tests/test_topology_engine.py show what each rule counts.
+
+Does not import arcpy
+"""
+
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import numpy as np
+    import shapely
+
+    use_shapely = True
+except ImportError:
+    use_shapely = False
+
+try:
+    from osgeo import ogr
+
+    use_engine = use_shapely
+except ImportError:
+    use_engine = False
+
+GAPS = 1
+AREA_OVERLAP = 3
+LINE_OVERLAP = 19
+BOUNDARY_COVERED = 37
+SELF_OVERLAP = 39
+SELF_INTERSECT = 40
+SINGLE_PART = "single_part"
+
+level_2_ids = [GAPS, AREA_OVERLAP, BOUNDARY_COVERED]
+level_3_ids = [LINE_OVERLAP, SELF_OVERLAP, SELF_INTERSECT]
+rule_names = {SINGLE_PART: "Must Be Single Part (Line)"}
+
+# features per tile and number of threads
+tile_size = 5000
+workers = 4
+
+
+def read_geometries(db_path, layer_name):
+    """array of the shapes of a layer, curves are densified"""
+    ds = ogr.Open(str(db_path))
+    layer = ds.GetLayerByName(layer_name)
+    wkbs = []
+    for feat in layer:
+        geom = feat.GetGeometryRef()
+        if geom is None or geom.IsEmpty():
+            continue
+        if geom.HasCurveGeometry():
+            geom = geom.GetLinearGeometry()
+        wkbs.append(geom.ExportToIsoWkb())
+    ds = None
+    return shapely.from_wkb(np.array(wkbs, dtype=object))
+
+
+def tiles(geoms, size=None):
+    """lists of indexes of geoms, grouped in square tiles of about size features"""
+    size = size or tile_size
+    n = len(geoms)
+    if n <= size:
+        return [np.arange(n)]
+    bounds = shapely.bounds(geoms)
+    cx = (bounds[:, 0] + bounds[:, 2]) / 2
+    cy = (bounds[:, 1] + bounds[:, 3]) / 2
+    k = int(math.ceil(math.sqrt(n / size)))
+    width = max(cx.max() - cx.min(), cy.max() - cy.min()) / k or 1.0
+    col = np.minimum(((cx - cx.min()) / width).astype(int), k - 1)
+    row = np.minimum(((cy - cy.min()) / width).astype(int), k - 1)
+    cell = row * k + col
+    order = np.argsort(cell, kind="stable")
+    splits = np.flatnonzero(np.diff(cell[order])) + 1
+    return np.split(order, splits)
+
+
+def per_tile(func, geoms):
+    """sum of func(tile indexes) over the tiles of geoms, in parallel"""
+    if len(geoms) == 0:
+        return 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return sum(pool.map(func, tiles(geoms)))
+
+
+def pairs(tree, geoms, idx):
+    """(i, j) arrays of the features i in idx whose extents meet features j,
+    i < j so that each pair is found once"""
+    i, j = tree.query(geoms[idx], predicate="intersects")
+    i = idx[i]
+    keep = i < j
+    return i[keep], j[keep]
+
+
+def area_overlaps(polys, tolerance):
+    """pairs of polygons that share more than a sliver of area"""
+    tree = shapely.STRtree(polys)
+
+    def tile(idx):
+        i, j = pairs(tree, polys, idx)
+        area = shapely.area(shapely.intersection(polys[i], polys[j]))
+        return int(np.sum(area > tolerance * tolerance))
+
+    return per_tile(tile, polys)
+
+
+def gaps(polys, grid_size=None):
+    """rings of the union of the polygons. The outside boundary of the map is
+    one of them, as it is in an Esri topology"""
+    if len(polys) == 0:
+        return 0
+    parts = shapely.get_parts(shapely.union_all(polys, grid_size=grid_size))
+    return int(np.sum(1 + shapely.get_num_interior_rings(parts)))
+
+
+def uncovered_boundaries(polys, lines, tolerance):
+    """pieces of polygon boundaries that are not covered by lines"""
+    tree = shapely.STRtree(lines)
+
+    def tile(idx):
+        n = 0
+        p, l = tree.query(polys[idx], predicate="intersects")
+        near = {}
+        for a, b in zip(p.tolist(), l.tolist()):
+            near.setdefault(a, []).append(b)
+        for k, i in enumerate(idx.tolist()):
+            boundary = shapely.boundary(polys[i])
+            if k in near:
+                cover = shapely.buffer(shapely.union_all(lines[near[k]]), tolerance)
+                boundary = shapely.difference(boundary, cover)
+            pieces = shapely.get_parts(shapely.line_merge(boundary))
+            n += int(np.sum(shapely.length(pieces) > tolerance))
+        return n
+
+    return per_tile(tile, polys)
+
+
+def line_overlaps(lines, tolerance):
+    """pairs of lines that share a segment"""
+    tree = shapely.STRtree(lines)
+
+    def tile(idx):
+        i, j = pairs(tree, lines, idx)
+        length = shapely.length(shapely.intersection(lines[i], lines[j]))
+        return int(np.sum(length > tolerance))
+
+    return per_tile(tile, lines)
+
+
+def self_overlapping(lines, tolerance):
+    """boolean array, lines that go over part of themselves again. Noding a
+    line against itself dissolves the repeated segments"""
+    dissolved = shapely.union(lines, lines)
+    return shapely.length(lines) - shapely.length(dissolved) > tolerance
+
+
+def self_intersecting(lines, tolerance):
+    """boolean array, lines that cross or touch themselves without overlapping"""
+    return ~shapely.is_simple(lines) & ~self_overlapping(lines, tolerance)
+
+
+def multipart(lines):
+    return shapely.get_num_geometries(lines) > 1
+
+
+def evaluate(mup_polys, caf_lines, tolerance=0.0, grid_size=None, extra_rules=()):
+    """{rule: number of errors} for the polygons of MapUnitPolys and the lines
+    of ContactsAndFaults, either may be None if the feature class is missing.
+    extra_rules may include SINGLE_PART"""
+    counts = {}
+    if mup_polys is not None:
+        counts[GAPS] = gaps(mup_polys, grid_size)
+        counts[AREA_OVERLAP] = area_overlaps(mup_polys, tolerance)
+        if caf_lines is not None:
+            counts[BOUNDARY_COVERED] = uncovered_boundaries(
+                mup_polys, caf_lines, tolerance
+            )
+
+    if caf_lines is not None:
+        counts[LINE_OVERLAP] = line_overlaps(caf_lines, tolerance)
+        counts[SELF_OVERLAP] = int(np.sum(self_overlapping(caf_lines, tolerance)))
+        counts[SELF_INTERSECT] = int(np.sum(self_intersecting(caf_lines, tolerance)))
+        if SINGLE_PART in extra_rules:
+            counts[SINGLE_PART] = int(np.sum(multipart(caf_lines)))
+
+    return counts
@@ -0,0 +1,150 @@
+"""Cache of ValidateDatabase results for incremental re-validation.
+
+The results of every rule are saved in <gdb name>-ValidationCache.json in the
+validation output folder together with fingerprints of the tables the rule
+read. A table fingerprint records the row count, the largest OID, a hash of
+the schema and a hash of the attribute values (and of the shapes for rules
+that look at geometry, e.g., topology). On the next run, a rule whose tables
+have the same fingerprints is not evaluated again and its cached results go
+into the report instead. Rules that read something other than tables, e.g.,
+the errors tables of a topology or a reference file, add a digest of it to
+their fingerprint.
+
+Delete the cache file to force a full validation.
+"""
+
+import copy
+import hashlib
+import json
+import threading
+from pathlib import Path
+from GeMS_utilityFunctions import addMsgAndPrint as ap
+
+
+def digest(obj):
+    """sha1 hex digest of the repr of an object"""
+    return hashlib.sha1(repr(obj).encode("utf-8", "replace")).hexdigest()
+
+
+def field_schema(db_dict, table):
+    return [
+        (f.name, f.type, f.length, f.isNullable, f.domain)
+        for f in db_dict[table].get("fields", [])
+    ]
+
+
+def schema_fingerprint(db_dict):
+    """Hash of the structure of the whole database; names, data types, fields,
+    feature datasets and spatial references of every object"""
+    items = []
+    for k in sorted(db_dict):
+        v = db_dict[k]
+        sr = v.get("spatialReference")
+        items.append(
+            (
+                k,
+                v.get("dataType"),
+                v.get("feature_dataset"),
+                v.get("gems_equivalent"),
+                sr.name if sr else None,
+                field_schema(db_dict, k),
+            )
+        )
+
+    return digest(items)
+
+
+class ValidationCache:
+    def __init__(self, cache_path, settings, table_scan):
+        """settings is anything that changes results without changing the
+        database, e.g., the tool version and parameters. Cached results made
+        with other settings are discarded"""
+        self.path = Path(cache_path)
+        self.settings = digest(settings)
+        self.scan = table_scan
+        self.db_dict = table_scan.db_dict
+        self.hits = []
+        self._lock = threading.Lock()
+        self._fingerprints = {}
+        self.entries = {}
+
+        if self.path.exists():
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    saved = json.load(f)
+                if saved.get("settings") == self.settings:
+                    self.entries = saved["entries"]
+            except (ValueError, KeyError, OSError):
+                ap(f"\tCould not read {self.path.name}, validating everything")
+
+    def table_fingerprint(self, table, geometry=False):
+        """Fingerprint of the contents of one table or feature class"""
+        key = f"{table}|geometry" if geometry else table
+        if key in self._fingerprints:
+            return self._fingerprints[key]
+
+        if not table in self.db_dict or not "fields" in self.db_dict[table]:
+            fp = None
+        else:
+            cols = self.scan.columns(table)
+            oid = self.scan.oid_field(table)
+            oids = cols[oid] if oid in cols else []
+            fp = {
+                "rows": len(oids),
+                "max_oid": max(oids) if oids else None,
+                "schema": digest(field_schema(self.db_dict, table)),
+                "content": digest([cols[f] for f in sorted(cols)]),
+            }
+            if geometry:
+                fp["geometry"] = self.scan.geometry_digest(table)
+
+        with self._lock:
+            self._fingerprints[key] = fp
+
+        return fp
+
+    def file_fingerprint(self, path):
+        path = Path(path)
+        if not path.exists():
+            return None
+        return {"size": path.stat().st_size, "content": digest(path.read_bytes())}
+
+    def fingerprint(self, tables, geometry_tables=()):
+        """Fingerprint of a set of tables plus the database schema. Shapes are
+        only hashed for the tables in geometry_tables"""
+        fp = {"__schema__": self.schema()}
+        for t in sorted(set(tables)):
+            fp[t] = self.table_fingerprint(t)
+        for t in sorted(set(geometry_tables)):
+            fp[f"{t}|geometry"] = self.table_fingerprint(t, True)
+
+        return fp
+
+    def schema(self):
+        if not "__schema__" in self._fingerprints:
+            self._fingerprints["__schema__"] = schema_fingerprint(self.db_dict)
+        return self._fingerprints["__schema__"]
+
+    def get(self, key, fingerprint):
+        """Cached value for key if it was saved with the same fingerprint"""
+        entry = self.entries.get(key)
+        if entry and entry["fingerprint"] == fingerprint:
+            with self._lock:
+                self.hits.append(key)
+            # callers may change the lists they get back
+            return copy.deepcopy(entry["value"])
+        return None
+
+    def put(self, key, fingerprint, value):
+        # round trip through json now, the lists in value may still be
+        # changed by other rules after this one finishes
+        entry = json.loads(json.dumps({"fingerprint": fingerprint, "value": value}))
+        with self._lock:
+            self.entries[key] = entry
+
+    def save(self):
+        try:
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump({"settings": self.settings, "entries": self.entries}, f)
+        except (OSError, TypeError) as e:
+            ap(f"\tCould not save validation cache {self.path.name}: {e}")
@@ -0,0 +1,136 @@
+"""Checks, in the background, if a tool script is the latest version.
+
+checkVersion in GeMS_utilityFunctions.py used to download the script from
+GitHub every time a tool started, with no timeout. Now the answer for each
+script is kept in a small JSON file, ~/.gems_version_check.json or the path
+in GEMS_VERSION_CACHE, for ttl seconds (a day, an hour if GitHub could not be
+reached). If there is an answer in the file it is reported right away,
+otherwise the script is downloaded in a daemon thread with a short timeout and
+the answer is only written to the file, to be reported the next time a tool
+starts. The thread never calls arcpy, whose messages would be lost or land in
+another tool's messages once the tool that started it has returned, and the
+tool never waits for it.
+
+Set GEMS_HEADLESS=1 (batch runs, air-gapped machines) to skip the check
+altogether. GEMS_VERSION_URL replaces https://raw.githubusercontent.com in the
+url, e.g., with file:///path/to/a/stub/folder, to check against a local copy.
+
+Does not import arcpy
+"""
+
+import json
+import os
+import threading
+import time
+import urllib.request
+
+cache_path = os.environ.get(
+    "GEMS_VERSION_CACHE",
+    os.path.join(os.path.expanduser("~"), ".gems_version_check.json"),
+)
+ttl = 86400
+failed_ttl = 3600
+timeout = 5
+upstream = "https://raw.githubusercontent.com"
+
+UP_TO_DATE = "up to date"
+OBSOLETE = "obsolete"
+NO_CONNECTION = "no connection"
+
+_lock = threading.Lock()
+
+
+def headless():
+    return os.environ.get("GEMS_HEADLESS", "").lower() in ("1", "true", "yes", "y")
+
+
+def fetch(url):
+    """text of the page at url, http(s) or file"""
+    stub = os.environ.get("GEMS_VERSION_URL")
+    if stub and url.startswith(upstream):
+        url = stub.rstrip("/") + url[len(upstream) :]
+    with urllib.request.urlopen(url, timeout=timeout) as page:
+        return page.read().decode("utf-8", "replace")
+
+
+def read_cache():
+    try:
+        with open(cache_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_cache(key, entry):
+    with _lock:
+        cache = read_cache()
+        cache[key] = entry
+        tmp = f"{cache_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(cache, f)
+            os.replace(tmp, cache_path)
+        except OSError:
+            # a read-only home folder only costs a download next time
+            pass
+
+
+def cached_status(vString, rawurl):
+    """status of vString in the cache, None if there is no fresh one"""
+    entry = read_cache().get(rawurl)
+    if not entry or entry["version"] != vString:
+        return None
+    age = time.time() - entry["checked"]
+    if age > (failed_ttl if entry["status"] == NO_CONNECTION else ttl):
+        return None
+    return entry["status"]
+
+
+def status(vString, rawurl):
+    """compares vString to the current script at rawurl and caches the answer"""
+    try:
+        if vString in fetch(rawurl):
+            result = UP_TO_DATE
+        else:
+            result = OBSOLETE
+    except Exception:
+        result = NO_CONNECTION
+    write_cache(rawurl, {"version": vString, "status": result, "checked": time.time()})
+    return result
+
+
+def report(result, vString, toolbox, message, warning):
+    if result == UP_TO_DATE:
+        message(f"This version of the tool is up to date: {vString}")
+    elif result == OBSOLETE:
+        repourl = "https://github.com/DOI-USGS/{}/releases".format(toolbox)
+        warning(
+            "You are using an obsolete version of this tool!\n"
+            + "Please download the latest version from {}".format(repourl)
+        )
+    else:
+        warning(
+            "Could not connect to Github to determine if this version of the tool is the most recent.\n"
+        )
+
+
+def check(vString, rawurl, toolbox, message=print, warning=print):
+    """Reports whether vString is in the script at rawurl, from the cache.
+    Returns the thread that is downloading it to fill the cache, None if the
+    cache answered or the check was skipped"""
+    if headless():
+        return None
+    result = cached_status(vString, rawurl)
+    if result is not None:
+        report(result, vString, toolbox, message, warning)
+        return None
+
+    message(
+        "Checking in the background for a newer version of this tool. "
+        + "The answer is reported the next time the tool runs"
+    )
+    thread = threading.Thread(
+        target=status, args=(vString, rawurl), name="GeMS version check", daemon=True
+    )
+    thread.start()
+    return thread
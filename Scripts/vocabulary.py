@@ -0,0 +1,86 @@
+"""Reference vocabularies for the validation rules in GeMS_ValidateDatabase.py
+
+The rules look up values of the database in four vocabularies, the MapUnits
+in DescriptionOfMapUnits, the Terms in Glossary, the DataSources_IDs in
+DataSources and the valid GeoMaterials. These used to be lists, so every
+lookup was a search of the whole list and a rule was O(rows x vocabulary).
+A Vocabulary is a frozenset, read once and shared by all of the rules.
+
+Rules count the values they find in a Counter (ctx entries all_map_units,
+all_gloss_terms and all_sources), and Vocabulary.unused(counts) gives the
+terms that no rule counted, the lists of rules 3.5, 3.7 and 3.9.
+"""
+
+import threading
+from collections import Counter
+
+
+class Vocabulary:
+    """Frozen set of the terms of a reference table. With key, e.g.,
+    str.lower, terms are compared by key(term)"""
+
+    def __init__(self, terms, key=None):
+        self.key = key
+        self.terms = frozenset(t for t in terms if t is not None)
+        if key:
+            self.keys = frozenset(key(t) for t in self.terms)
+        else:
+            self.keys = self.terms
+
+    def __contains__(self, term):
+        if term is None:
+            return False
+        if self.key:
+            term = self.key(term)
+        return term in self.keys
+
+    def __iter__(self):
+        return iter(self.terms)
+
+    def __len__(self):
+        return len(self.terms)
+
+    def unused(self, counts):
+        """sorted terms that are not in counts, or have a count of 0"""
+        if self.key:
+            used = {self.key(t) for t, n in counts.items() if n and t is not None}
+            return sorted(t for t in self.terms if not self.key(t) in used)
+        return sorted(t for t in self.terms if not counts.get(t))
+
+
+def count(counts, vals):
+    """add the values that are not None or empty to counts, a Counter or a
+    dictionary of counts from an earlier validation. Returns the Counter"""
+    if not isinstance(counts, Counter):
+        counts = Counter(counts)
+    counts.update(v for v in vals if v)
+    return counts
+
+
+def normalized(term):
+    return term.lower().strip()
+
+
+class References:
+    """The vocabularies of one database, each read on first use.
+    loaders is {name: function that returns the terms}, keys is
+    {name: key function} for the vocabularies that need one"""
+
+    def __init__(self, loaders, keys=None):
+        self.loaders = loaders
+        self.keys = keys or {}
+        self.vocabularies = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name):
+        # rules run in threads, only one of them reads the table
+        with self._lock:
+            if not name in self.vocabularies:
+                terms = self.loaders[name]() or []
+                self.vocabularies[name] = Vocabulary(terms, self.keys.get(name))
+            return self.vocabularies[name]
+
+    def invalidate(self, name):
+        """read the terms again on next use, e.g., after rows were deleted"""
+        with self._lock:
+            self.vocabularies.pop(name, None)
@@ -0,0 +1,321 @@
+"""Projection of map data onto a cross-section plane with NumPy arrays.
+
+GeMS_ProjectCrossSectionData.py used to make a route of the section line
+with InterpolateShape and CreateRoutes, locate every feature class along it
+with LocateFeaturesAlongRoutes, turn the event tables back into features with
+route event layers and add elevations with AddSurfaceInformation, all
+through scratch feature classes. Here:
+
+    Dem       the part of the DEM around the section, read once into an
+              array and sampled with bilinear interpolation
+    Section   the section line as arrays of segments with the measure at
+              each vertex. locate gives the station (measure), offset and
+              local trend of many points at once, crossings the stations
+              where many segments cross the line, and intervals the pieces
+              of the line inside a polygon
+
+and the apparent inclination formulas of ProjectCrossSectionData work on
+arrays. Nothing is written to disk and nothing is shared between sections,
+so several sections can be projected at the same time.
+
+Does not import arcpy
+"""
+
+import math
+import numpy as np
+
+try:
+    from osgeo import gdal
+
+    gdal.UseExceptions()
+    use_gdal = True
+except ImportError:
+    use_gdal = False
+
+# number of point-segment pairs computed at once
+chunk_pairs = 2_000_000
+
+# start quadrant, as in the ArcGIS Pro tool or in compass terms, to the
+# corner of the extent of the line that measures start nearest to
+quadrant_corners = {
+    "UPPER_LEFT": (0, 1),
+    "LOWER_LEFT": (0, 0),
+    "UPPER_RIGHT": (1, 1),
+    "LOWER_RIGHT": (1, 0),
+    "NW": (0, 1),
+    "SW": (0, 0),
+    "NE": (1, 1),
+    "SE": (1, 0),
+}
+
+
+class Dem:
+    """Elevation array with a GDAL geotransform, (x of left edge, cell
+    width, 0, y of top edge, 0, -cell height). nodata cells are NaN"""
+
+    def __init__(self, z, transform, nodata=None):
+        self.z = np.array(z, dtype=float)
+        if nodata is not None:
+            self.z[self.z == nodata] = np.nan
+        self.transform = transform
+        self.cell_size = min(abs(transform[1]), abs(transform[5]))
+
+    def sample(self, x, y):
+        """bilinear interpolation between the centres of the cells around
+        each (x, y), NaN off the DEM"""
+        x0, dx, _, y0, _, dy = self.transform
+        col = (np.asarray(x, dtype=float) - x0) / dx - 0.5
+        row = (np.asarray(y, dtype=float) - y0) / dy - 0.5
+        nrows, ncols = self.z.shape
+        c0 = np.clip(np.floor(col).astype(np.int64), 0, max(ncols - 2, 0))
+        r0 = np.clip(np.floor(row).astype(np.int64), 0, max(nrows - 2, 0))
+        c1 = np.minimum(c0 + 1, ncols - 1)
+        r1 = np.minimum(r0 + 1, nrows - 1)
+        fc = np.clip(col - c0, 0, 1)
+        fr = np.clip(row - r0, 0, 1)
+        z = (
+            self.z[r0, c0] * (1 - fc) * (1 - fr)
+            + self.z[r0, c1] * fc * (1 - fr)
+            + self.z[r1, c0] * (1 - fc) * fr
+            + self.z[r1, c1] * fc * fr
+        )
+        off = (col < -0.5) | (col > ncols - 0.5) | (row < -0.5) | (row > nrows - 0.5)
+        return np.where(off, np.nan, z)
+
+
+def dem_window(transform, width, height, bounds):
+    """(column offset, row offset, columns, rows) of the cells of a north-up
+    raster of width by height cells with a GDAL geotransform that cover
+    bounds, (xmin, ymin, xmax, ymax), with one more cell all around for the
+    interpolation. None if bounds is off the raster"""
+    x0, dx, _, y0, _, dy = transform
+    xmin, ymin, xmax, ymax = bounds
+    c0 = max(int(math.floor((xmin - x0) / dx)) - 1, 0)
+    c1 = min(int(math.ceil((xmax - x0) / dx)) + 1, width)
+    r0 = max(int(math.floor((ymax - y0) / dy)) - 1, 0)
+    r1 = min(int(math.ceil((ymin - y0) / dy)) + 1, height)
+    if c1 <= c0 or r1 <= r0:
+        return None
+    return c0, r0, c1 - c0, r1 - r0
+
+
+def window_transform(transform, xoff, yoff):
+    """geotransform of a window starting xoff columns and yoff rows in"""
+    x0, dx, rx, y0, ry, dy = transform
+    return (x0 + xoff * dx, dx, rx, y0 + yoff * dy, ry, dy)
+
+
+def read_dem(path, bounds=None):
+    """Dem of the first band of a raster read with GDAL. With bounds, (xmin,
+    ymin, xmax, ymax), only the cells that cover them are read, so a section
+    across a statewide DEM does not load all of it"""
+    ds = gdal.Open(str(path))
+    band = ds.GetRasterBand(1)
+    transform = ds.GetGeoTransform()
+    window = (0, 0, ds.RasterXSize, ds.RasterYSize)
+    if bounds is not None:
+        window = dem_window(transform, ds.RasterXSize, ds.RasterYSize, bounds)
+        if window is None:
+            raise ValueError(f"{path} does not cover the section")
+    z = band.ReadAsArray(*window)
+    dem = Dem(z, window_transform(transform, *window[:2]), band.GetNoDataValue())
+    ds = None
+    return dem
+
+
+class Section:
+    """Section line from an (n, 2) array of vertices. m, the measures of the
+    vertices, default to the distance along the line from the end nearest to
+    the start quadrant corner. z, the elevations of the vertices, are used
+    where there is no DEM"""
+
+    def __init__(self, xy, m=None, z=None, start_quadrant=None):
+        xy = np.asarray(xy, dtype=float)
+        if m is None and start_quadrant in quadrant_corners:
+            lo = xy.min(axis=0)
+            hi = xy.max(axis=0)
+            corner = np.where(quadrant_corners[start_quadrant], hi, lo)
+            if np.hypot(*(xy[-1] - corner)) < np.hypot(*(xy[0] - corner)):
+                xy = xy[::-1]
+                z = None if z is None else np.asarray(z)[::-1]
+        self.xy = xy
+        self.a = xy[:-1]
+        self.d = xy[1:] - xy[:-1]
+        self.seg_len = np.hypot(self.d[:, 0], self.d[:, 1])
+        if m is None:
+            m = np.concatenate(([0.0], np.cumsum(self.seg_len)))
+        self.m = np.asarray(m, dtype=float)
+        self.z = None if z is None else np.asarray(z, dtype=float)
+        self.length = self.m[-1] - self.m[0]
+        # cartesian angle of each segment, degrees counterclockwise from east
+        self.angle = np.degrees(np.arctan2(self.d[:, 1], self.d[:, 0]))
+
+    def locate(self, x, y):
+        """station, offset (positive to the right of the line), cartesian
+        angle of the line and whether the nearest spot on the line is between
+        its ends, for each point (x, y)"""
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        n = len(x)
+        nseg = len(self.a)
+        station = np.empty(n)
+        offset = np.empty(n)
+        seg = np.empty(n, dtype=np.int64)
+        t_near = np.empty(n)
+        step = max(1, chunk_pairs // max(nseg, 1))
+        len2 = np.where(self.seg_len > 0, self.seg_len**2, 1.0)
+        for s in range(0, n, step):
+            px = x[s : s + step, None] - self.a[None, :, 0]
+            py = y[s : s + step, None] - self.a[None, :, 1]
+            t = np.clip((px * self.d[:, 0] + py * self.d[:, 1]) / len2, 0, 1)
+            dist2 = (px - t * self.d[:, 0]) ** 2 + (py - t * self.d[:, 1]) ** 2
+            i = np.argmin(dist2, axis=1)
+            rows = np.arange(len(i))
+            ti = t[rows, i]
+            cross = self.d[i, 0] * py[rows, i] - self.d[i, 1] * px[rows, i]
+            seg[s : s + step] = i
+            t_near[s : s + step] = ti
+            station[s : s + step] = self.m[i] + ti * (self.m[i + 1] - self.m[i])
+            offset[s : s + step] = -np.sign(cross) * np.sqrt(dist2[rows, i])
+        inside = ~(((seg == 0) & (t_near <= 0)) | ((seg == nseg - 1) & (t_near >= 1)))
+        return station, offset, self.angle[seg], inside
+
+    def xy_at(self, station):
+        """coordinates of the spots on the line at each station"""
+        station = np.asarray(station, dtype=float)
+        return (
+            np.interp(station, self.m, self.xy[:, 0]),
+            np.interp(station, self.m, self.xy[:, 1]),
+        )
+
+    def z_at(self, station, dem=None):
+        """elevation of the line at each station, from dem if there is one"""
+        if dem is not None:
+            return dem.sample(*self.xy_at(station))
+        if self.z is not None:
+            return np.interp(station, self.m, self.z)
+        return np.full(np.shape(station), np.nan)
+
+    def crossings(self, p0, p1):
+        """(index of segment, station, x, y) of every spot where one of the
+        segments p0[k] to p1[k], (k, 2) arrays, crosses the line"""
+        p0 = np.asarray(p0, dtype=float).reshape(-1, 2)
+        p1 = np.asarray(p1, dtype=float).reshape(-1, 2)
+        e = p1 - p0
+        nseg = len(self.a)
+        found = [], [], []
+        step = max(1, chunk_pairs // max(nseg, 1))
+        for s in range(0, len(p0), step):
+            q = p0[s : s + step, None, :]
+            r = e[s : s + step, None, :]
+            qa = self.a[None, :, :] - q
+            denom = r[..., 0] * self.d[:, 1] - r[..., 1] * self.d[:, 0]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                u = (qa[..., 0] * self.d[:, 1] - qa[..., 1] * self.d[:, 0]) / denom
+                v = (qa[..., 0] * r[..., 1] - qa[..., 1] * r[..., 0]) / denom
+            # the line's own segments include their start only, so a crossing
+            # at a vertex of the line is found once
+            hit = (denom != 0) & (u >= 0) & (u <= 1) & (v >= 0) & (v <= 1)
+            k, i = np.nonzero(hit)
+            vi = v[k, i]
+            found[0].append(k + s)
+            found[1].append(i)
+            found[2].append(vi)
+        k = np.concatenate(found[0]) if found[0] else np.zeros(0, np.int64)
+        i = np.concatenate(found[1]) if found[1] else np.zeros(0, np.int64)
+        v = np.concatenate(found[2]) if found[2] else np.zeros(0)
+        # a crossing at the very end of the line
+        last = (i == nseg - 1) | (v < 1)
+        station = self.m[i] + v * (self.m[i + 1] - self.m[i])
+        cx = self.a[i, 0] + v * self.d[i, 0]
+        cy = self.a[i, 1] + v * self.d[i, 1]
+        return k[last], station[last], cx[last], cy[last]
+
+    def intervals(self, rings):
+        """[(from station, to station)] of the pieces of the line inside a
+        polygon, rings is a list of (n, 2) closed rings"""
+        if not rings:
+            return []
+        p0 = np.concatenate([r[:-1] for r in rings])
+        p1 = np.concatenate([r[1:] for r in rings])
+        k, stations, cx, cy = self.crossings(p0, p1)
+        cuts = np.unique(np.concatenate(([self.m[0], self.m[-1]], stations)))
+        if len(cuts) < 2:
+            return []
+        mid = (cuts[:-1] + cuts[1:]) / 2
+        inside = contains(p0, p1, *self.xy_at(mid))
+        pieces = []
+        for a, b, keep in zip(cuts[:-1], cuts[1:], inside):
+            if not keep:
+                continue
+            if pieces and pieces[-1][1] == a:
+                pieces[-1] = (pieces[-1][0], b)
+            else:
+                pieces.append((a, b))
+        return pieces
+
+    def stations_between(self, start, end, step):
+        """stations from start to end, at the vertices of the line and every
+        step in between"""
+        inner = self.m[(self.m > start) & (self.m < end)]
+        n = max(1, int(math.ceil((end - start) / step))) if step else 1
+        regular = np.linspace(start, end, n + 1)
+        return np.unique(np.concatenate((regular, inner)))
+
+
+def contains(p0, p1, x, y):
+    """even-odd test of points (x, y) against the polygon with edges p0 to p1"""
+    x = np.asarray(x, dtype=float)[:, None]
+    y = np.asarray(y, dtype=float)[:, None]
+    x0, y0 = p0[:, 0], p0[:, 1]
+    x1, y1 = p1[:, 0], p1[:, 1]
+    straddle = (y0 > y) != (y1 > y)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        xcross = x0 + (y - y0) * (x1 - x0) / (y1 - y0)
+    return np.sum(straddle & (x < xcross), axis=1) % 2 == 1
+
+
+def cartesian_to_geographic(angle):
+    ctg = -90 - np.asarray(angle, dtype=float)
+    return np.where(ctg < 0, ctg + 360, ctg)
+
+
+def obliquity(theta1, theta2):
+    obl = np.abs(np.asarray(theta1, dtype=float) - theta2)
+    obl = np.where(obl > 180, obl - 180, obl)
+    return np.where(obl > 90, 180 - obl, obl)
+
+
+def azimuth_difference(a, b):
+    # a, b are azimuths in clockwise geographic notation, the difference is
+    # in -180..180 and negative if a is counterclockwise of b
+    diff = np.asarray(a, dtype=float) - b
+    diff = np.where(diff > 180, diff - 360, diff)
+    return np.where(diff < -180, diff + 360, diff)
+
+
+def apparent_inclination(azimuth, inclination, cs_azimuth, vert_ex, axial):
+    """apparent inclination and obliquity in the section. axial is a boolean
+    array, True for lineations and axes (apparent plunge), False for planes
+    (apparent dip)"""
+    obl = obliquity(azimuth, cs_azimuth)
+    factor = np.where(axial, np.cos(np.radians(obl)), np.sin(np.radians(obl)))
+    tan = vert_ex * np.tan(np.radians(np.asarray(inclination, dtype=float)))
+    return np.degrees(np.arctan(tan * factor)), obl
+
+
+def plot_azimuth(inclination_direction, cs_azimuth, apparent):
+    diff = azimuth_difference(cs_azimuth, inclination_direction)
+    return np.where(np.abs(diff) <= 90, 270 + apparent, 270 - apparent)
+
+
+def orientations(azimuth, inclination, cs_azimuth, vert_ex, axial):
+    """apparent inclination, obliquity and plot azimuth of orientation data.
+    Planes are inclined toward azimuth + 90"""
+    azimuth = np.asarray(azimuth, dtype=float)
+    apparent, obl = apparent_inclination(
+        azimuth, inclination, cs_azimuth, vert_ex, axial
+    )
+    direction = np.where(axial, azimuth, azimuth + 90)
+    direction = np.where(direction > 360, direction - 360, direction)
+    return apparent, obl, plot_azimuth(direction, cs_azimuth, apparent)
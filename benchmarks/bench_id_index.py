@@ -0,0 +1,75 @@
+"""Scaling benchmark for id_index.IdIndex, the duplicate _ID index used by
+rules 3.10 and 3.12 of GeMS_ValidateDatabase.
+
+Builds indexes of 10^3 to 10^6 _ID values spread over 20 tables, with about
+1% of the values repeated in another table, and times building the index and
+listing duplicates and cross-table collisions. Time per value should stay
+roughly constant, i.e., the fitted scaling exponent should be close to 1.
+
+Usage:
+    python benchmarks/bench_id_index.py [max power of ten, default 6]
+"""
+
+import math
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "Scripts"))
+import id_index as idx
+
+
+def make_ids(n, n_tables=20, seed=0):
+    """{table: (oids, ids)} with n ids in total, about 1% of them repeated"""
+    rnd = random.Random(seed)
+    per_table = n // n_tables
+    tables = {}
+    for t in range(n_tables):
+        name = f"Table{t}"
+        ids = [f"{name[:3].upper()}{t}_{i:07d}" for i in range(per_table)]
+        tables[name] = (list(range(1, per_table + 1)), ids)
+
+    all_ids = [i for oids, ids in tables.values() for i in ids]
+    for t, (oids, ids) in enumerate(tables.values()):
+        for i in rnd.sample(range(per_table), per_table // 100):
+            ids[i] = rnd.choice(all_ids)
+
+    return tables
+
+
+def time_index(tables):
+    start = time.perf_counter()
+    index = idx.IdIndex()
+    for table, (oids, ids) in tables.items():
+        index.add_column(table, oids, ids)
+    dupes = index.duplicates()
+    cross = index.collisions()
+    elapsed = time.perf_counter() - start
+
+    return elapsed, len(dupes), len(cross)
+
+
+def main(max_power=6):
+    results = []
+    print(f"{'ids':>10} {'seconds':>10} {'us/id':>8} {'dupes':>8} {'cross':>8}")
+    for p in range(3, max_power + 1):
+        n = 10**p
+        tables = make_ids(n)
+        elapsed, n_dupes, n_cross = time_index(tables)
+        results.append((n, elapsed))
+        print(
+            f"{n:>10} {elapsed:>10.4f} {elapsed / n * 1e6:>8.3f} {n_dupes:>8} {n_cross:>8}"
+        )
+
+    # slope of log(time) against log(n) between the smallest and largest runs
+    (n0, t0), (n1, t1) = results[0], results[-1]
+    exponent = math.log(t1 / t0) / math.log(n1 / n0)
+    print(f"scaling exponent {exponent:.2f} (1.0 is linear, 2.0 is quadratic)")
+
+    return exponent
+
+
+if __name__ == "__main__":
+    max_power = int(sys.argv[1]) if len(sys.argv) > 1 else 6
+    main(max_power)
@@ -0,0 +1,58 @@
+"""Scaling benchmark for point_thinning.thinPoints, the PlotAtScale solver
+of GeMS_SetPlotAtScales.
+
+Thins 10^3 to 10^6 randomly placed points, at the density of a dense
+OrientationPoints feature class, with a search radius that is large compared
+to the spacing of the points. Time per point should stay roughly constant,
+i.e., the fitted scaling exponent should be close to 1.
+
+Usage:
+    python benchmarks/bench_point_thinning.py [max power of ten, default 6]
+"""
+
+import math
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "Scripts"))
+import point_thinning as pt
+
+
+def make_points(n, spacing=50.0, seed=0):
+    """{fid: (x, y)} of n random points, on average spacing apart"""
+    rnd = random.Random(seed)
+    side = spacing * math.sqrt(n)
+    return {fid: (rnd.random() * side, rnd.random() * side) for fid in range(1, n + 1)}
+
+
+def time_thinning(points, search_radius):
+    start = time.perf_counter()
+    dropped = pt.thinPoints(points, search_radius)
+    elapsed = time.perf_counter() - start
+
+    return elapsed, len(dropped)
+
+
+def main(max_power=6, search_radius=1000.0):
+    results = []
+    print(f"{'points':>10} {'seconds':>10} {'us/point':>9} {'dropped':>10}")
+    for p in range(3, max_power + 1):
+        n = 10**p
+        points = make_points(n)
+        elapsed, n_dropped = time_thinning(points, search_radius)
+        results.append((n, elapsed))
+        print(f"{n:>10} {elapsed:>10.4f} {elapsed / n * 1e6:>9.2f} {n_dropped:>10}")
+
+    # slope of log(time) against log(n) between the smallest and largest runs
+    (n0, t0), (n1, t1) = results[0], results[-1]
+    exponent = math.log(t1 / t0) / math.log(n1 / n0)
+    print(f"scaling exponent {exponent:.2f} (1.0 is linear, 2.0 is quadratic)")
+
+    return exponent
+
+
+if __name__ == "__main__":
+    max_power = int(sys.argv[1]) if len(sys.argv) > 1 else 6
+    main(max_power)
@@ -0,0 +1,410 @@
+"""Regression benchmarks of the GeMS tools on synthetic databases.
+
+For each size, a SyntheticMap (see synthetic_gems.py) of that many polygons,
+with as many OrientationPoints, is made and the parts of the tools that do
+not need arcpy are timed on it:
+
+    validate_topology   topology_engine.evaluate, ValidateDatabase 2.3 and 3.2
+    validate_vocabulary Vocabulary lookups of every term, source and map
+                        unit, ValidateDatabase 2.4, 3.5, 3.7 and 3.9
+    validate_ids        IdIndex of every _ID value, ValidateDatabase 3.10 and
+                        3.12 and the duplicate check of reID
+    topology_nodes      node_arrays.EndPoints and processNodeArrays of every
+                        line end, TopologyCheck
+    plot_at_scales      point_thinning.thinPoints of OrientationPoints,
+                        SetPlotAtScales
+    metadata            metadata_stream.write_metadata of an eainfo section
+                        for every table, FGDCMetadata
+
+Each benchmark is timed, then run again under tracemalloc for its peak
+memory, unless --no-memory. With --tools, the map is also written to a
+GeoPackage with GDAL and ValidateDatabase, SetPlotAtScales, reID, FixStrings
+and, with --template, FGDCMetadata are run on copies of it in a new Python
+process each, which needs arcpy. Peak memory of the tools is measured with
+psutil if it is installed.
+
+The results are written as JSON, one entry per size and benchmark with the
+number of items (rows, features or line ends), seconds, items per second,
+peak memory in MB and, if the benchmark could not run, why it was skipped.
+
+Usage:
+    python benchmarks/bench_tools.py [--sizes 1000,10000,100000] [--seed N]
+        [--output results.json] [--no-memory] [--tools] [--template xml]
+"""
+
+import argparse
+import datetime
+import json
+import math
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+
+import synthetic_gems as sg
+
+scripts = sg.scripts
+import GeMS_Definition as gdef
+import id_index as idx
+import point_thinning as pt
+import vocabulary as vc
+
+try:
+    import node_arrays
+except ImportError:
+    node_arrays = None
+
+try:
+    import shapely
+    import topology_engine as te
+except ImportError:
+    te = None
+
+try:
+    import metadata_stream as ms
+    from lxml import etree
+except ImportError:
+    ms = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+version = "bench_tools.py, version of 10/17/26"
+
+
+class Skipped(Exception):
+    pass
+
+
+def geometry_arrays(smap):
+    """shapely arrays of the polygons and lines of smap"""
+    if te is None:
+        raise Skipped("needs numpy and shapely")
+    tables = smap.tables()
+    rings = [coords for coords, attribs in tables["MapUnitPolys"][2]]
+    paths = [coords for coords, attribs in tables["ContactsAndFaults"][2]]
+    return shapely.polygons(rings), shapely.linestrings(paths)
+
+
+def validate_topology(smap):
+    polys, lines = geometry_arrays(smap)
+    counts = te.evaluate(polys, lines, 0.001)
+    # one ring of the union, the outside of the map
+    if counts[te.GAPS] != 1 or sum(counts.values()) != 1:
+        raise RuntimeError(f"synthetic map has topology errors {counts}")
+    return len(polys) + len(lines)
+
+
+def validate_vocabulary(smap):
+    tables = smap.tables()
+    units = vc.Vocabulary(a["MapUnit"] for c, a in tables["DescriptionOfMapUnits"][2])
+    terms = vc.Vocabulary(
+        (a["Term"] for c, a in tables["Glossary"][2]), key=vc.normalized
+    )
+    sources = vc.Vocabulary(a["DataSources_ID"] for c, a in tables["DataSources"][2])
+    geomaterials = vc.Vocabulary(
+        a["GeoMaterial"] for c, a in tables["GeoMaterialDict"][2]
+    )
+    vocabularies = {"MapUnit": units, "GeoMaterial": geomaterials}
+    for field in gdef.enumeratedValueDomainFieldList:
+        if field.endswith("SourceID"):
+            vocabularies[field] = sources
+        else:
+            vocabularies.setdefault(field, terms)
+
+    n = 0
+    missing = 0
+    counts = {name: Counter() for name in ("units", "terms", "sources", None)}
+    keys = {id(units): "units", id(terms): "terms", id(sources): "sources"}
+    for name, (kind, fields, rows) in tables.items():
+        for coords, attribs in rows:
+            for field, value in attribs.items():
+                if not field in vocabularies:
+                    continue
+                vocab = vocabularies[field]
+                key = keys.get(id(vocab))
+                n += 1
+                counts[key][value] += 1
+                if not value in vocab:
+                    missing += 1
+    units.unused(counts["units"])
+    terms.unused(counts["terms"])
+    sources.unused(counts["sources"])
+    if missing:
+        raise RuntimeError(f"synthetic map has {missing} undefined terms")
+    return n
+
+
+def validate_ids(smap):
+    index = idx.IdIndex()
+    n = 0
+    for name, (kind, fields, rows) in smap.tables().items():
+        id_field = f"{name}_ID"
+        values = [attribs.get(id_field) for coords, attribs in rows]
+        if any(values):
+            index.add_column(name, range(1, len(values) + 1), values)
+            n += len(values)
+    if index.duplicates():
+        raise RuntimeError("synthetic map has duplicate _IDs")
+    return n
+
+
+class BenchArc:
+    """stand-in for CAF_arc of GeMS_TopologyCheck.py, only keeps the row"""
+
+    def __init__(self, attribs):
+        self.attribs = attribs
+
+
+def end_rows(smap):
+    """TopologyCheck endpoint rows of the lines of smap, see getNodeArrays"""
+    rows = []
+    for fid, (pts, line_type, left, right) in enumerate(smap.lines, 1):
+        attribs = ["N", "certain", "certain", 10.0, "DAS0001", None]
+        for (x, y), (nx, ny), to_from in (
+            (pts[0], pts[1], "From"),
+            (pts[-1], pts[-2], "To"),
+        ):
+            # azimuth of the line leaving the node
+            direction = math.degrees(math.atan2(nx - x, ny - y)) % 360
+            row = [x, y, line_type] + attribs + [direction, to_from]
+            row.extend([right, left, fid])
+            rows.append(row)
+    return rows
+
+
+def topology_nodes(smap):
+    if node_arrays is None:
+        raise Skipped("needs numpy")
+    h_keys = {unit: f"{n:03d}" for n, unit in enumerate(smap.units, 1)}
+    h_keys[None] = None
+    h_keys[""] = None
+    h_key_test = f"{len(smap.units) // 2:03d}"
+    rows = end_rows(smap)
+    ends = node_arrays.EndPoints(rows, 0.002)
+    node_arrays.processNodeArrays(ends, h_keys, h_key_test, BenchArc)
+    return len(rows)
+
+
+def plot_at_scales(smap, min_separation_mm=2.0, max_plot_at_scale=500000):
+    points = {fid: xy for fid, (xy, unit) in enumerate(smap.points, 1)}
+    # the search radius of the largest scale, in map units
+    pt.thinPoints(points, min_separation_mm * max_plot_at_scale / 1000.0)
+    return len(points)
+
+
+def metadata(smap):
+    if ms is None:
+        raise Skipped("needs lxml")
+    tables = smap.tables()
+    enum_fields = set(gdef.enumeratedValueDomainFieldList) | {"MapUnit"}
+    terms = ms.Terms({s: f"Source {s}" for s in smap.sources})
+    root = etree.fromstring(
+        "<metadata><idinfo/><eainfo><overview><eaover>GeMS</eaover>"
+        "</overview></eainfo><metainfo/></metadata>"
+    )
+
+    def write_entities(xf):
+        for name, (kind, fields, rows) in tables.items():
+            with xf.element("detailed"):
+                enttyp = etree.Element("enttyp")
+                etree.SubElement(enttyp, "enttypl").text = name
+                xf.write(enttyp, pretty_print=True)
+                for field in fields:
+                    attr = etree.Element("attr")
+                    etree.SubElement(attr, "attrlabl").text = field[0]
+                    attrdomv = etree.SubElement(attr, "attrdomv")
+                    if field[0] in enum_fields:
+                        values = sorted({str(a.get(field[0])) for c, a in rows})
+                        for value in values:
+                            edom = etree.SubElement(attrdomv, "edom")
+                            etree.SubElement(edom, "edomv").text = value
+                            etree.SubElement(edom, "edomvd").text = terms.m2m(value)
+                    else:
+                        etree.SubElement(attrdomv, "udom").text = "text"
+                    xf.write(attr, pretty_print=True)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ms.write_metadata(Path(tmp) / "metadata.xml", root, write_entities)
+    return sum(len(rows) for kind, fields, rows in tables.values())
+
+
+benchmarks = [
+    ("validate_topology", "GeMS_ValidateDatabase", validate_topology),
+    ("validate_vocabulary", "GeMS_ValidateDatabase", validate_vocabulary),
+    ("validate_ids", "GeMS_ValidateDatabase, GeMS_reID", validate_ids),
+    ("topology_nodes", "GeMS_TopologyCheck", topology_nodes),
+    ("plot_at_scales", "GeMS_SetPlotAtScales", plot_at_scales),
+    ("metadata", "GeMS_FGDCMetadata", metadata),
+]
+
+
+def result(name, tool, items=None, seconds=None, peak=None, skipped=None):
+    return {
+        "name": name,
+        "tool": tool,
+        "items": items,
+        "seconds": seconds,
+        "items_per_second": items / seconds if items and seconds else None,
+        "peak_memory_mb": peak,
+        "skipped": skipped,
+    }
+
+
+def run_kernel(name, tool, func, smap, memory=True):
+    try:
+        start = time.perf_counter()
+        items = func(smap)
+        seconds = time.perf_counter() - start
+    except Skipped as e:
+        return result(name, tool, skipped=str(e))
+
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            func(smap)
+            peak = tracemalloc.get_traced_memory()[1] / 2**20
+        finally:
+            tracemalloc.stop()
+    return result(name, tool, items, seconds, peak)
+
+
+def run_script(script, args):
+    """seconds and peak memory in MB of running a tool script"""
+    cmd = [sys.executable, str(scripts / script)] + [str(a) for a in args]
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    peak = None
+    if psutil:
+        p = psutil.Process(proc.pid)
+        peak = 0
+        while proc.poll() is None:
+            try:
+                peak = max(peak, p.memory_info().rss)
+            except psutil.Error:
+                break
+            time.sleep(0.05)
+        peak = peak / 2**20
+    err = proc.communicate()[1]
+    seconds = time.perf_counter() - start
+    if proc.returncode:
+        raise RuntimeError(f"{script} failed\n{err.decode(errors='replace')}")
+    return seconds, peak
+
+
+def tool_runs(smap, work_dir, template=None):
+    """run the tools on copies of a GeoPackage of smap"""
+    try:
+        import arcpy
+    except ImportError:
+        return [result(t, t, skipped="needs arcpy") for t in tool_names]
+    try:
+        gpkg = work_dir / "synthetic.gpkg"
+        sg.write_gpkg(smap, gpkg)
+    except ImportError:
+        return [result(t, t, skipped="needs GDAL") for t in tool_names]
+
+    counts = smap.counts()
+    rows = sum(counts.values())
+    no = ["false"] * 7
+    runs = [
+        ("GeMS_ValidateDatabase", rows, lambda db: [db, work_dir, "#"] + no),
+        (
+            "GeMS_SetPlotAtScales",
+            counts["points"],
+            lambda db: [f"{db}/OrientationPoints", 2, 500000],
+        ),
+        ("GeMS_reID", rows, lambda db: [db, "FALSE", "FALSE", "FALSE"]),
+        ("GeMS_FixStrings", rows, lambda db: [db]),
+    ]
+    if template:
+        args = [
+            "false",
+            "#",
+            template,
+            "save only DataSources",
+            "clear all history",
+            "MISSING",
+            "false",
+        ]
+        runs.append(("GeMS_FGDCMetadata", rows, lambda db: [db] + args))
+
+    results = []
+    for tool, items, args in runs:
+        db = work_dir / f"{tool}.gpkg"
+        shutil.copy(gpkg, db)
+        seconds, peak = run_script(f"{tool}.py", args(db))
+        results.append(result(tool, tool, items, seconds, peak))
+    if not template:
+        results.append(
+            result("GeMS_FGDCMetadata", "GeMS_FGDCMetadata", skipped="needs --template")
+        )
+    results.append(
+        result(
+            "GeMS_TopologyCheck",
+            "GeMS_TopologyCheck",
+            skipped="needs a feature dataset in a file geodatabase",
+        )
+    )
+    return results
+
+
+tool_names = [
+    "GeMS_ValidateDatabase",
+    "GeMS_SetPlotAtScales",
+    "GeMS_reID",
+    "GeMS_FixStrings",
+    "GeMS_FGDCMetadata",
+    "GeMS_TopologyCheck",
+]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="JSON file, default is to print it")
+    parser.add_argument("--no-memory", action="store_true")
+    parser.add_argument("--tools", action="store_true")
+    parser.add_argument("--template", help="metadata template for FGDCMetadata")
+    args = parser.parse_args(argv)
+
+    report = {
+        "version": version,
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "runs": [],
+    }
+    for size in [int(s) for s in args.sizes.split(",")]:
+        smap = sg.SyntheticMap(polygons=size, points=size, seed=args.seed)
+        run = {"size": size, "counts": smap.counts(), "benchmarks": []}
+        for name, tool, func in benchmarks:
+            res = run_kernel(name, tool, func, smap, not args.no_memory)
+            run["benchmarks"].append(res)
+            rate = res["items_per_second"]
+            status = res["skipped"] or f"{res['seconds']:.3f} s, {rate:.0f}/s"
+            print(f"{size:>8} {name:<20} {status}", file=sys.stderr)
+        if args.tools:
+            with tempfile.TemporaryDirectory() as tmp:
+                run["benchmarks"].extend(tool_runs(smap, Path(tmp), args.template))
+        report["runs"].append(run)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,391 @@
+"""Deterministic synthetic GeMS databases for benchmarks.
+
+A SyntheticMap is a jittered grid of map unit polygons. Every grid edge is
+split into one or more ContactsAndFaults lines, and every polygon ring is
+made of exactly the same vertices as the lines around it. So the map has no
+gaps or overlaps, polygon boundaries are covered by lines, and lines meet
+only at their ends. OrientationPoints are scattered inside the polygons and
+carry the MapUnit of the polygon they are in. DescriptionOfMapUnits,
+Glossary, DataSources and GeoMaterialDict hold every value that is used, so
+a valid map is also valid at Level 3, and the fields of every table come
+from GeMS_Definition.tableDict. The same sizes and seed always give the
+same map.
+
+write_gpkg writes the map to a GeoPackage with GDAL/OGR. The geometry and
+rows are plain Python and can be used without GDAL, see bench_tools.py.
+
+Usage:
+    python benchmarks/synthetic_gems.py out.gpkg [--polygons N] [--contacts N]
+        [--points N] [--units N] [--terms N] [--sources N] [--seed N]
+"""
+
+import argparse
+import csv
+import datetime
+import math
+import random
+import sys
+from pathlib import Path
+
+scripts = Path(__file__).parent.parent / "Scripts"
+sys.path.append(str(scripts))
+import GeMS_Definition as gdef
+
+# NAD83 / UTM zone 10N
+epsg = 26910
+origin = (500000.0, 4000000.0)
+
+
+class SyntheticMap:
+    """Map of about `polygons` polygons in a grid of cells `cell` meters wide.
+    Each grid edge is split into enough lines to make about `contacts`
+    ContactsAndFaults in all (at least one line per edge)"""
+
+    def __init__(
+        self,
+        polygons=1000,
+        contacts=None,
+        points=1000,
+        units=20,
+        terms=50,
+        sources=10,
+        seed=0,
+        cell=1000.0,
+    ):
+        self.seed = seed
+        self.rnd = random.Random(seed)
+        self.cell = cell
+        self.nx = max(1, math.ceil(math.sqrt(polygons)))
+        self.ny = max(1, math.ceil(polygons / self.nx))
+        n_edges = self.nx * (self.ny + 1) + self.ny * (self.nx + 1)
+        self.split = max(1, round((contacts or n_edges) / n_edges))
+
+        self.sources = [f"DAS{i:04d}" for i in range(1, max(1, sources) + 1)]
+        self.units = [f"U{i:03d}" for i in range(1, max(1, units) + 1)]
+        self.geomaterials = read_geomaterials()
+
+        self._vertices()
+        self._cells()
+        self._edges()
+        self._points(points)
+        self._terms(terms)
+
+    def _vertices(self):
+        """grid vertices, moved by up to 30% of a cell, except on the edge of
+        the map"""
+        rnd = self.rnd
+        self.xy = {}
+        for i in range(self.nx + 1):
+            for j in range(self.ny + 1):
+                x = origin[0] + i * self.cell
+                y = origin[1] + j * self.cell
+                if 0 < i < self.nx:
+                    x += (rnd.random() - 0.5) * 0.6 * self.cell
+                if 0 < j < self.ny:
+                    y += (rnd.random() - 0.5) * 0.6 * self.cell
+                self.xy[i, j] = (x, y)
+
+    def _cells(self):
+        """map unit of each cell, (i, j) is the cell above and right of
+        vertex (i, j)"""
+        self.cell_unit = {
+            (i, j): self.rnd.choice(self.units)
+            for i in range(self.nx)
+            for j in range(self.ny)
+        }
+
+    def edge_points(self, a, b):
+        """vertices of the edge from grid vertex a to b. Computed once for
+        each edge, from the lower vertex, so that lines and rings share them"""
+        if a > b:
+            return list(reversed(self.edge_points(b, a)))
+        (x0, y0), (x1, y1) = self.xy[a], self.xy[b]
+        k = self.split
+        return [(x0 + (x1 - x0) * m / k, y0 + (y1 - y0) * m / k) for m in range(k + 1)]
+
+    def _edges(self):
+        """lines with their left and right map units"""
+        self.lines = []
+        for j in range(self.ny + 1):
+            for i in range(self.nx):
+                # eastward, the cell above is on the left
+                left = self.cell_unit.get((i, j))
+                right = self.cell_unit.get((i, j - 1))
+                self._add_edge((i, j), (i + 1, j), left, right)
+        for i in range(self.nx + 1):
+            for j in range(self.ny):
+                # northward, the cell to the east is on the right
+                left = self.cell_unit.get((i - 1, j))
+                right = self.cell_unit.get((i, j))
+                self._add_edge((i, j), (i, j + 1), left, right)
+
+    def _add_edge(self, a, b, left, right):
+        pts = self.edge_points(a, b)
+        if left is None or right is None:
+            line_type = "map boundary"
+        elif left == right or self.rnd.random() < 0.1:
+            line_type = "fault"
+        else:
+            line_type = "contact"
+        for m in range(self.split):
+            self.lines.append((pts[m : m + 2], line_type, left, right))
+
+    def ring(self, i, j):
+        """closed ring of cell (i, j), counterclockwise"""
+        corners = [(i, j), (i + 1, j), (i + 1, j + 1), (i, j + 1), (i, j)]
+        ring = [self.xy[i, j]]
+        for a, b in zip(corners[:-1], corners[1:]):
+            ring.extend(self.edge_points(a, b)[1:])
+        return ring
+
+    def _points(self, n):
+        """points inside cells, away from the edges"""
+        rnd = self.rnd
+        self.points = []
+        for k in range(n):
+            i = rnd.randrange(self.nx)
+            j = rnd.randrange(self.ny)
+            # bilinear position in the cell, 20-80% across
+            u = 0.2 + 0.6 * rnd.random()
+            v = 0.2 + 0.6 * rnd.random()
+            (x00, y00), (x10, y10) = self.xy[i, j], self.xy[i + 1, j]
+            (x01, y01), (x11, y11) = self.xy[i, j + 1], self.xy[i + 1, j + 1]
+            x = (1 - u) * (1 - v) * x00 + u * (1 - v) * x10 + (1 - u) * v * x01
+            x += u * v * x11
+            y = (1 - u) * (1 - v) * y00 + u * (1 - v) * y10 + (1 - u) * v * y01
+            y += u * v * y11
+            self.points.append(((x, y), self.cell_unit[i, j]))
+
+    def _terms(self, n):
+        used = [
+            "contact",
+            "fault",
+            "map boundary",
+            "bedding",
+            "certain",
+            "questionable",
+            "DMUUnit1",
+            "High",
+        ]
+        self.terms = used + [f"term {i}" for i in range(1, max(0, n - len(used)) + 1)]
+
+    def tables(self):
+        """{table: (geometry type, [field def], rows)}, geometry type is
+        'polygon', 'line', 'point' or None, rows are (coordinates, {field: value})"""
+        rnd = random.Random(self.seed + 1)
+        src = lambda: rnd.choice(self.sources)
+        tables = {}
+
+        rows = []
+        for n, ((i, j), unit) in enumerate(sorted(self.cell_unit.items()), 1):
+            attribs = {
+                "MapUnit": unit,
+                "IdentityConfidence": "certain",
+                "DataSourceID": src(),
+                "MapUnitPolys_ID": f"MUP{n:07d}",
+            }
+            rows.append((self.ring(i, j), attribs))
+        tables["MapUnitPolys"] = ("polygon", rows)
+
+        rows = []
+        for n, (pts, line_type, left, right) in enumerate(self.lines, 1):
+            attribs = {
+                "Type": line_type,
+                "IsConcealed": "N",
+                "LocationConfidenceMeters": 10.0,
+                "ExistenceConfidence": "certain",
+                "IdentityConfidence": "certain",
+                "DataSourceID": src(),
+                "ContactsAndFaults_ID": f"CAF{n:07d}",
+            }
+            rows.append((pts, attribs))
+        tables["ContactsAndFaults"] = ("line", rows)
+
+        rows = []
+        for n, (xy, unit) in enumerate(self.points, 1):
+            attribs = {
+                "Type": "bedding",
+                "Azimuth": float(rnd.randrange(360)),
+                "Inclination": float(rnd.randrange(90)),
+                "LocationConfidenceMeters": 10.0,
+                "IdentityConfidence": "certain",
+                "OrientationConfidenceDegrees": 5.0,
+                "PlotAtScale": 24000.0,
+                "MapUnit": unit,
+                "LocationSourceID": src(),
+                "OrientationSourceID": src(),
+                "OrientationPoints_ID": f"ORP{n:07d}",
+            }
+            rows.append((xy, attribs))
+        tables["OrientationPoints"] = ("point", rows)
+
+        rows = []
+        for n, unit in enumerate(self.units, 1):
+            attribs = {
+                "MapUnit": unit,
+                "Name": f"Unit {unit}",
+                "FullName": f"Unit {unit} (synthetic)",
+                "Age": "Cretaceous",
+                "Description": f"Synthetic map unit {unit}. " * 5,
+                "HierarchyKey": f"{n:03d}",
+                "ParagraphStyle": "DMUUnit1",
+                "Label": unit,
+                "DescriptionSourceID": src(),
+                "GeoMaterial": self.geomaterials[n % len(self.geomaterials)][1],
+                "GeoMaterialConfidence": "High",
+                "DescriptionOfMapUnits_ID": f"DMU{n:04d}",
+            }
+            rows.append((None, attribs))
+        tables["DescriptionOfMapUnits"] = (None, rows)
+
+        rows = []
+        for n, term in enumerate(self.terms, 1):
+            attribs = {
+                "Term": term,
+                "Definition": f"Definition of {term}",
+                "DefinitionSourceID": src(),
+                "Glossary_ID": f"GLO{n:05d}",
+            }
+            rows.append((None, attribs))
+        tables["Glossary"] = (None, rows)
+
+        rows = []
+        for n, source in enumerate(self.sources, 1):
+            attribs = {
+                "Source": f"Synthetic source {n}",
+                "DataSources_ID": source,
+            }
+            rows.append((None, attribs))
+        tables["DataSources"] = (None, rows)
+
+        rows = []
+        for key, name, indented, definition in self.geomaterials:
+            attribs = {
+                "HierarchyKey": key,
+                "GeoMaterial": name,
+                "IndentedName": indented,
+                "Definition": definition,
+            }
+            rows.append((None, attribs))
+        tables["GeoMaterialDict"] = (None, rows)
+
+        return {
+            name: (kind, gdef.tableDict[name], rows)
+            for name, (kind, rows) in tables.items()
+        }
+
+    def counts(self):
+        return {
+            "polygons": len(self.cell_unit),
+            "contacts": len(self.lines),
+            "points": len(self.points),
+            "units": len(self.units),
+            "terms": len(self.terms),
+            "sources": len(self.sources),
+        }
+
+
+def read_geomaterials():
+    with open(scripts / "GeoMaterialDict.csv", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        next(reader)
+        return [tuple(row) for row in reader]
+
+
+def write_gpkg(synthetic_map, path, batch=50000):
+    """write the tables of synthetic_map to a new GeoPackage at path"""
+    from osgeo import ogr, osr
+
+    ogr.UseExceptions()
+    field_types = {
+        "String": (ogr.OFTString, ogr.OFSTNone),
+        "Single": (ogr.OFTReal, ogr.OFSTFloat32),
+        "Double": (ogr.OFTReal, ogr.OFSTNone),
+        "SmallInteger": (ogr.OFTInteger, ogr.OFSTInt16),
+        "Integer": (ogr.OFTInteger, ogr.OFSTNone),
+        "Date": (ogr.OFTDateTime, ogr.OFSTNone),
+    }
+    geom_types = {
+        "polygon": ogr.wkbPolygon,
+        "line": ogr.wkbLineString,
+        "point": ogr.wkbPoint,
+        None: ogr.wkbNone,
+    }
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(epsg)
+
+    path = Path(path)
+    if path.exists():
+        path.unlink()
+    ds = ogr.GetDriverByName("GPKG").CreateDataSource(str(path))
+    for name, (kind, fields, rows) in synthetic_map.tables().items():
+        layer = ds.CreateLayer(
+            name,
+            srs if kind else None,
+            geom_types[kind],
+            ["FID=OBJECTID", "GEOMETRY_NAME=Shape", "SPATIAL_INDEX=NO"],
+        )
+        for field in fields:
+            ftype, subtype = field_types[field[1]]
+            defn = ogr.FieldDefn(field[0], ftype)
+            defn.SetSubType(subtype)
+            if field[1] == "String":
+                defn.SetWidth(field[3])
+            layer.CreateField(defn)
+
+        defn = layer.GetLayerDefn()
+        layer.StartTransaction()
+        for n, (coords, attribs) in enumerate(rows, 1):
+            feat = ogr.Feature(defn)
+            for field, value in attribs.items():
+                feat.SetField(field, value)
+            if kind:
+                feat.SetGeometry(ogr.CreateGeometryFromWkt(wkt(kind, coords)))
+            layer.CreateFeature(feat)
+            if n % batch == 0:
+                layer.CommitTransaction()
+                layer.StartTransaction()
+        layer.CommitTransaction()
+        if kind:
+            ds.ExecuteSQL(f"SELECT gpkgAddSpatialIndex('{name}', 'Shape')")
+    ds = None
+
+
+def wkt(kind, coords):
+    if kind == "point":
+        return "POINT ({} {})".format(*coords)
+    text = ", ".join(f"{x} {y}" for x, y in coords)
+    if kind == "line":
+        return f"LINESTRING ({text})"
+    return f"POLYGON (({text}))"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("out", help="path of the GeoPackage to write")
+    parser.add_argument("--polygons", type=int, default=1000)
+    parser.add_argument("--contacts", type=int, default=None)
+    parser.add_argument("--points", type=int, default=1000)
+    parser.add_argument("--units", type=int, default=20)
+    parser.add_argument("--terms", type=int, default=50)
+    parser.add_argument("--sources", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    start = datetime.datetime.now()
+    synthetic_map = SyntheticMap(
+        args.polygons,
+        args.contacts,
+        args.points,
+        args.units,
+        args.terms,
+        args.sources,
+        args.seed,
+    )
+    write_gpkg(synthetic_map, args.out)
+    elapsed = (datetime.datetime.now() - start).total_seconds()
+    print(f"{args.out}: {synthetic_map.counts()} in {elapsed:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
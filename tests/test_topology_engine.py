@@ -0,0 +1,120 @@
+"""Fixture cases for topology_engine, the OGR/Shapely check of the GeMS
+topology rules that ValidateDatabase uses when GEMS_TOPOLOGY_ENGINE=native.
+
+Each case is a small map of two unit squares and the lines around them with
+one kind of error added. The expected counts are those of the engine; where
+they differ from what an Esri topology reports, the comment says so.
+
+Usage:
+    python -m pytest tests
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent / "Scripts"))
+import topology_engine as te
+
+if not te.use_shapely:
+    pytest.skip("numpy and shapely are not installed", allow_module_level=True)
+
+import numpy as np
+import shapely
+
+tolerance = 0.001
+
+left = "POLYGON ((0 0, 1 0, 1 1, 0 1, 0 0))"
+right = "POLYGON ((1 0, 2 0, 2 1, 1 1, 1 0))"
+left_outline = "LINESTRING (1 0, 0 0, 0 1, 1 1)"
+right_outline = "LINESTRING (1 1, 2 1, 2 0, 1 0)"
+middle = "LINESTRING (1 0, 1 1)"
+
+# case: (polygons, lines, {rule: errors other than the outside boundary})
+cases = {
+    "clean": ([left, right], [left_outline, right_outline, middle], {}),
+    "gap": (
+        ["POLYGON ((0 0, 3 0, 3 3, 0 3, 0 0), (1 1, 2 1, 2 2, 1 2, 1 1))"],
+        [
+            "LINESTRING (0 0, 3 0, 3 3, 0 3, 0 0)",
+            "LINESTRING (1 1, 2 1, 2 2, 1 2, 1 1)",
+        ],
+        {te.GAPS: 1},
+    ),
+    "overlap": (
+        [left, "POLYGON ((0.5 0, 2 0, 2 1, 0.5 1, 0.5 0))"],
+        [left_outline, right_outline, middle, "LINESTRING (0.5 0, 0.5 1)"],
+        {te.AREA_OVERLAP: 1},
+    ),
+    # the shared edge is uncovered on both sides, one error for each polygon
+    "uncovered boundary": (
+        [left, right],
+        [left_outline, right_outline],
+        {te.BOUNDARY_COVERED: 2},
+    ),
+    "line overlap": (
+        [left, right],
+        [left_outline, right_outline, middle, "LINESTRING (1 0.2, 1 0.8)"],
+        {te.LINE_OVERLAP: 1},
+    ),
+    "self-overlap": (
+        [left, right],
+        [left_outline, right_outline, "LINESTRING (1 0, 1 1, 1 0.5)"],
+        {te.SELF_OVERLAP: 1},
+    ),
+    "self-intersection": (
+        [left, right],
+        [
+            left_outline,
+            right_outline,
+            middle,
+            "LINESTRING (0.2 0.2, 0.8 0.8, 0.8 0.2, 0.2 0.8)",
+        ],
+        {te.SELF_INTERSECT: 1},
+    ),
+}
+
+
+def geometries(wkts):
+    return shapely.from_wkt(np.array(wkts, dtype=object))
+
+
+@pytest.mark.parametrize("case", list(cases))
+def test_rules(case):
+    polys, lines, errors = cases[case]
+    expected = {rule: 0 for rule in te.level_2_ids + te.level_3_ids}
+    # the outside boundary of the map is a gap, as it is in an Esri topology
+    expected[te.GAPS] = 1
+    for rule, n in errors.items():
+        expected[rule] += n
+
+    counts = te.evaluate(geometries(polys), geometries(lines), tolerance)
+
+    assert counts == expected
+
+
+def test_sliver_overlap_is_not_counted():
+    # overlaps of no more than tolerance squared are not errors
+    polys = geometries([left, "POLYGON ((0.9999 0, 2 0, 2 1, 0.9999 1, 0.9999 0))"])
+    assert te.area_overlaps(polys, 0.01) == 0
+    assert te.area_overlaps(polys, 0.0) == 1
+
+
+def test_counts_do_not_depend_on_tiling(monkeypatch):
+    # a row of 30 squares in tiles of 4, every other one overlaps the next but
+    # the last
+    polys = geometries(
+        [
+            f"POLYGON (({x} 0, {x + w} 0, {x + w} 1, {x} 1, {x} 0))"
+            for x, w in ((i, 1.5 if i % 2 else 1) for i in range(30))
+        ]
+    )
+    whole = te.area_overlaps(polys, tolerance)
+    monkeypatch.setattr(te, "tile_size", 4)
+    assert te.area_overlaps(polys, tolerance) == whole == 14
+
+
+def test_missing_feature_class():
+    counts = te.evaluate(None, geometries([left_outline]), tolerance)
+    assert set(counts) == set(te.level_3_ids)